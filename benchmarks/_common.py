@@ -0,0 +1,81 @@
+# benchmarks/_common.py
+"""Utilidades compartidas por los benchmarks: app Flask mínima y payloads sintéticos."""
+import os
+import random
+import time
+from contextlib import contextmanager
+
+from flask import Flask
+
+from src.extensions import db, socketio
+
+BENCH_DATABASE_URL = os.environ.get('BENCH_DATABASE_URL', 'sqlite:///:memory:')
+
+
+def create_bench_app(database_url: str = BENCH_DATABASE_URL) -> Flask:
+    """Crea una app Flask mínima (como `create_tables.py`) con todas las tablas creadas."""
+    import src.models  # noqa: F401  (registra todos los modelos en el metadata)
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    socketio.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def synthetic_price_payload(n_rows: int, seed: int = 42) -> dict:
+    """Genera un payload `listaResult` con `n_rows` símbolos y decimales con coma, como la API real."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n_rows):
+        price = rng.uniform(10, 5000)
+        rows.append({
+            'NEMO': f"SYM{i:06d}",
+            'PRECIO_CIERRE': f"{price:.2f}".replace('.', ','),
+            'VARIACION': f"{rng.uniform(-5, 5):.2f}".replace('.', ','),
+            'PRECIO_COMPRA': round(price * 0.99, 2),
+            'PRECIO_VENTA': round(price * 1.01, 2),
+            'MONTO': rng.randint(0, 10**9),
+            'UN_TRANSADAS': rng.randint(0, 10**6),
+            'MONEDA': 'CLP',
+            'ISIN': f"CL{i:010d}",
+            'BONO_VERDE': 'N',
+        })
+    return {'listaResult': rows}
+
+
+@contextmanager
+def timed(results: dict, key: str):
+    """Acumula en `results[key]` el tiempo (s) del bloque."""
+    start = time.perf_counter()
+    yield
+    results[key] = results.get(key, 0.0) + (time.perf_counter() - start)
+
+
+def seed_snapshot_history(n_symbols: int, n_snapshots: int, seed: int = 42, start=None, step_minutes: int = 1) -> list:
+    """
+    Inserta `n_snapshots` snapshots consecutivos de `n_symbols` símbolos en `stock_prices`
+    (con ~10% de precios cambiados, algunas altas y bajas entre snapshots). Funciona igual
+    en SQLite y PostgreSQL porque escribe con `write_price_frame`. Devuelve los timestamps.
+    """
+    from datetime import datetime, timedelta
+    from src.utils.price_ingest import normalize_price_payload, write_price_frame
+
+    rng = random.Random(seed)
+    rows = synthetic_price_payload(n_symbols, seed)['listaResult']
+    start = start or datetime(2025, 1, 2, 9, 30, 0)
+    timestamps = []
+    for i in range(n_snapshots):
+        ts = start + timedelta(minutes=i * step_minutes)
+        if i:
+            for row in rng.sample(rows, max(1, len(rows) // 10)):
+                row['PRECIO_CIERRE'] = f"{rng.uniform(10, 5000):.2f}".replace('.', ',')
+            rows = [r for r in rows if rng.random() > 0.005]
+            rows.append({**rows[0], 'NEMO': f"NEW{i:06d}"})
+        write_price_frame(normalize_price_payload(rows), ts, db.session)
+        timestamps.append(ts)
+    db.session.commit()
+    return timestamps
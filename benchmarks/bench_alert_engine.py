@@ -0,0 +1,88 @@
+# benchmarks/bench_alert_engine.py
+"""
+Evalúa un snapshot contra N alertas sintéticas: recorrido ingenuo (cada alerta
+contra cada fila, O(alertas × filas)) contra el índice ordenado por símbolo de
+`src.utils.alert_engine` (O(símbolos + disparadas)), y mide la evaluación completa
+con el UPDATE masivo.
+
+Uso:
+    python -m benchmarks.bench_alert_engine [n_alertas n_simbolos]
+
+La base de datos se toma de `BENCH_DATABASE_URL` (por defecto SQLite en memoria).
+"""
+import random
+import sys
+
+from benchmarks._common import create_bench_app, synthetic_price_payload, timed
+from src.extensions import db
+from src.models import Alert
+from src.utils.alert_engine import ALERT_CONDITIONS, AlertEngine, alert_threshold
+from src.utils.price_ingest import frame_to_records, normalize_price_payload
+
+
+def _synthetic_alerts(records, n_alerts, seed=7):
+    """Alertas repartidas entre los símbolos del snapshot con umbrales alrededor del valor actual."""
+    rng = random.Random(seed)
+    alerts = []
+    for i in range(n_alerts):
+        record = rng.choice(records)
+        condition = rng.choice(list(ALERT_CONDITIONS))
+        field = ALERT_CONDITIONS[condition][0]
+        base = abs(record[field] or 1)
+        alerts.append((i + 1, record["symbol"], base * rng.uniform(0.8, 1.2), condition))
+    return alerts
+
+
+def _naive_match(alerts, records):
+    """Referencia: cada alerta contra cada fila del snapshot."""
+    fired = []
+    for alert_id, symbol, target, condition in alerts:
+        field, rising = ALERT_CONDITIONS[condition]
+        threshold = alert_threshold(condition, target)
+        for record in records:
+            value = record[field]
+            if record["symbol"] == symbol and value is not None and (value >= threshold if rising else value <= threshold):
+                fired.append(alert_id)
+                break
+    return fired
+
+
+def main(n_alerts, n_symbols, repeats=3):
+    app = create_bench_app()
+    frame = normalize_price_payload(synthetic_price_payload(n_symbols)["listaResult"])
+    records = frame_to_records(frame, None)
+    alerts = _synthetic_alerts(records, n_alerts)
+
+    results = {}
+    for _ in range(repeats):
+        with timed(results, "ingenuo"):
+            naive = _naive_match(alerts, records)
+        engine = AlertEngine()
+        with timed(results, "build"):
+            engine.build(alerts)
+        with timed(results, "índice"):
+            indexed = engine.match(records)
+    assert sorted(naive) == sorted(f["id"] for f in indexed)
+    print(f"{n_alerts} alertas, {n_symbols} símbolos, {len(indexed)} disparadas")
+    print(f"{'evaluación':>16} {'media (ms)':>11}")
+    for name in ("ingenuo", "build", "índice"):
+        print(f"{name:>16} {results[name] / repeats * 1000:>11.2f}")
+
+    with app.app_context():
+        db.session.bulk_insert_mappings(Alert, [
+            {"id": a[0], "symbol": a[1], "target_price": a[2], "condition": a[3], "triggered": False} for a in alerts
+        ])
+        db.session.commit()
+        engine = AlertEngine()
+        with timed(results, "load"):
+            engine.load()
+        with timed(results, "evaluate"):
+            fired = engine.evaluate(records)
+        print(f"{'load (DB)':>16} {results['load'] * 1000:>11.2f}")
+        print(f"{'evaluate (DB)':>16} {results['evaluate'] * 1000:>11.2f}  ({len(fired)} marcadas en un UPDATE, "
+              f"{db.engine.dialect.name})")
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args or [10000, 2000]))
@@ -0,0 +1,55 @@
+# benchmarks/bench_price_ingest.py
+"""
+Compara la ingesta de precios por filas (legado) contra la ingesta columnar.
+
+Uso:
+    python -m benchmarks.bench_price_ingest [5000 50000 ...]
+
+La base de datos se toma de `BENCH_DATABASE_URL` (por defecto SQLite en memoria);
+con una URL de PostgreSQL el modo columnar usa `COPY` + upsert set-based.
+"""
+import sys
+from datetime import datetime, timedelta
+
+from benchmarks._common import create_bench_app, synthetic_price_payload, timed
+from src.extensions import db
+from src.models import StockPrice
+from src.utils import db_io
+from src.utils.price_ingest import extract_rows, normalize_price_payload, write_price_frame
+
+
+def _run_rows_mode(rows, ts, results):
+    with timed(results, 'parse'):
+        all_stock_data = db_io._build_stock_rows(rows, ts)
+    with timed(results, 'write'):
+        db_io._write_stock_rows(all_stock_data)
+        db.session.commit()
+
+
+def _run_columnar_mode(rows, ts, results):
+    with timed(results, 'parse'):
+        frame = normalize_price_payload(rows)
+    with timed(results, 'write'):
+        write_price_frame(frame, ts, db.session)
+        db.session.commit()
+
+
+def main(sizes):
+    app = create_bench_app()
+    base_ts = datetime(2025, 1, 2, 10, 0, 0)
+    print(f"{'filas':>8} {'modo':>9} {'parse (s)':>10} {'write (s)':>10} {'total (s)':>10}")
+    with app.app_context():
+        for offset, n_rows in enumerate(sizes):
+            rows = extract_rows(synthetic_price_payload(n_rows))
+            for mode_idx, (mode, runner) in enumerate((('rows', _run_rows_mode), ('columnar', _run_columnar_mode))):
+                ts = base_ts + timedelta(minutes=offset * 2 + mode_idx)
+                results = {}
+                runner(rows, ts, results)
+                total = results['parse'] + results['write']
+                print(f"{n_rows:>8} {mode:>9} {results['parse']:>10.3f} {results['write']:>10.3f} {total:>10.3f}")
+            StockPrice.query.delete()
+            db.session.commit()
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [5000, 50000])
@@ -0,0 +1,74 @@
+# benchmarks/bench_snapshot_diff.py
+"""
+Compara la diferencia entre los dos últimos snapshots: implementación anterior
+(DISTINCT sobre toda la columna `timestamp` + dos snapshots completos como objetos
+ORM + diff en Python) contra el motor set-based de `src.utils.snapshot_diff`.
+
+Uso:
+    python -m benchmarks.bench_snapshot_diff [n_simbolos n_snapshots]
+
+La base de datos se toma de `BENCH_DATABASE_URL` (por defecto SQLite en memoria).
+"""
+import sys
+
+from benchmarks._common import create_bench_app, seed_snapshot_history, timed
+from src.extensions import db
+from src.models import StockPrice
+from src.utils.history_summary import backfill_snapshot_summaries
+from src.utils.snapshot_diff import compare_snapshots, last_two_timestamps
+
+
+def _legacy_compare(stock_codes=None):
+    """Copia de la implementación previa de `compare_last_two_db_entries` (referencia)."""
+    timestamps = db.session.query(StockPrice.timestamp).distinct().order_by(StockPrice.timestamp.desc()).limit(2).all()
+    ts_curr, ts_prev = timestamps[0][0], timestamps[1][0]
+    query_curr = StockPrice.query.filter_by(timestamp=ts_curr)
+    query_prev = StockPrice.query.filter_by(timestamp=ts_prev)
+    if stock_codes:
+        query_curr = query_curr.filter(StockPrice.symbol.in_(stock_codes))
+        query_prev = query_prev.filter(StockPrice.symbol.in_(stock_codes))
+    curr_map = {r.symbol: r.to_dict() for r in query_curr.all()}
+    prev_map = {r.symbol: r.to_dict() for r in query_prev.all()}
+    changes, unchanged = [], []
+    for sym in curr_map.keys() & prev_map.keys():
+        curr, prev = curr_map[sym], prev_map[sym]
+        if curr.get("PRECIO_CIERRE") != prev.get("PRECIO_CIERRE") or curr.get("VARIACION") != prev.get("VARIACION"):
+            diff = (curr.get('PRECIO_CIERRE') or 0) - (prev.get('PRECIO_CIERRE') or 0)
+            pct = (diff / prev["PRECIO_CIERRE"] * 100) if prev.get("PRECIO_CIERRE") else 0.0
+            changes.append({"symbol": sym, "old": prev, "new": curr, "abs_diff": diff, "pct_diff": pct})
+        else:
+            unchanged.append(curr)
+    return {"new": set(curr_map) - set(prev_map), "removed": set(prev_map) - set(curr_map),
+            "changes": changes, "unchanged": unchanged}
+
+
+def _set_based_compare(stock_codes=None):
+    return compare_snapshots(*last_two_timestamps(), stock_codes)
+
+
+def main(n_symbols, n_snapshots, repeats=5):
+    app = create_bench_app()
+    with app.app_context():
+        with timed(results := {}, 'seed'):
+            seed_snapshot_history(n_symbols, n_snapshots)
+            backfill_snapshot_summaries()
+        print(f"Sembrado: {n_symbols} símbolos x {n_snapshots} snapshots en {results['seed']:.2f}s "
+              f"({db.engine.dialect.name})")
+
+        legacy, current = _legacy_compare(), _set_based_compare()
+        assert {c['symbol'] for c in legacy['changes']} == {c['symbol'] for c in current['changes']}
+        assert legacy['new'] == {r['symbol'] for r in current['new']}
+        assert legacy['removed'] == {r['symbol'] for r in current['removed']}
+
+        print(f"{'implementación':>16} {'media (ms)':>11}")
+        for name, runner in (('legado', _legacy_compare), ('set-based', _set_based_compare)):
+            results = {}
+            for _ in range(repeats):
+                with timed(results, name):
+                    runner()
+            print(f"{name:>16} {results[name] / repeats * 1000:>11.1f}")
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args or [2000, 60]))
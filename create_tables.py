@@ -8,6 +8,7 @@ load_dotenv()
 # --- Importar todo lo necesario ---
 from src.config import SQLALCHEMY_DATABASE_URI, SQLALCHEMY_TRACK_MODIFICATIONS
 from src.extensions import db
+from src.utils.timescale import bootstrap_timescale
 # Importar TODOS los modelos para que SQLAlchemy los conozca
 from src.models import (
     User, StockPrice, Credential, ColumnPreference, StockFilter, LastUpdate, 
@@ -26,6 +27,8 @@ def create_all_tables():
         print("Creando todas las tablas...")
         db.create_all()
         print("✅ ¡Tablas creadas exitosamente (o ya existían)!")
+        if bootstrap_timescale():
+            print("✅ Hypertables y agregados continuos de TimescaleDB configurados.")
 
 if __name__ == "__main__":
     create_all_tables()
\ No newline at end of file
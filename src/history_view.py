@@ -1,12 +1,12 @@
 import os
 import json
-import glob
 import logging
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
 from src.config import LOGS_DIR
 from src.utils.db_io import compare_last_two_db_entries
+from src.utils.capture_index import CAPTURE_PREFIX, file_index
 from src.utils.json_utils import extract_timestamp_from_filename
 from src.extensions import db
 from src.models.stock_price import StockPrice
@@ -130,9 +130,7 @@ def load_history(logs_dir: Optional[str] = None) -> List[Dict[str, Any]]:
         logger.warning(f"No se pudo cargar el historial desde la DB. Recurriendo a archivos. Error: {e}")
 
     # Fallback: Cargar desde archivos JSON
-    logs_dir = logs_dir or LOGS_DIR
-    pattern = os.path.join(logs_dir, 'acciones-precios-plus_*.json')
-    files = sorted(glob.glob(pattern), key=os.path.getmtime)
+    files = file_index(logs_dir).files(CAPTURE_PREFIX)
     
     history: List[Dict[str, Any]] = []
     prev_data: Optional[Dict[str, Any]] = None
@@ -184,13 +182,11 @@ def compare_latest(logs_dir: Optional[str] = None) -> Dict[str, Any]:
     except Exception as e:
         logger.warning(f"No se pudo comparar desde la DB. Recurriendo a archivos. Error: {e}")
 
-    logs_dir = logs_dir or LOGS_DIR
-    pattern = os.path.join(logs_dir, 'acciones-precios-plus_*.json')
-    files = sorted(glob.glob(pattern), key=os.path.getmtime)
+    files = file_index(logs_dir).latest(CAPTURE_PREFIX, 2)
     if len(files) < 2:
         return {}
 
-    prev_file, curr_file = files[-2], files[-1]
+    prev_file, curr_file = files
     prev_data = _parse_file(prev_file)
     curr_data = _parse_file(curr_file)
 
@@ -13,7 +13,7 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-from src.config import SQLALCHEMY_DATABASE_URI, SQLALCHEMY_TRACK_MODIFICATIONS
+from src.config import CAPTURE_INDEX_WATCH, SQLALCHEMY_DATABASE_URI, SQLALCHEMY_TRACK_MODIFICATIONS
 from src.extensions import db, socketio
 from src.models import (
     User, StockPrice, Credential, LogEntry, ColumnPreference, StockFilter, 
@@ -23,6 +23,16 @@ from src.models import (
 )
 from src.routes import register_blueprints
 from src.scripts.bot_page_manager import close_browser
+from src.scripts.job_scheduler import job_scheduler
+from src.scripts.auto_update_scheduler import auto_update_scheduler
+from src.utils.history_summary import ensure_snapshot_summaries
+from src.utils.timescale import bootstrap_timescale
+from src.utils.table_query import ensure_search_indexes
+from src.utils.dashboard_views import ensure_dashboard_views
+from src.utils.log_sink import log_sink
+from src.utils.retention import start_retention_schedule
+from src.utils.capture_index import file_index
+from src.utils.db_engine import enable_gevent_wait, engine_options
 
 # Configuración de logging
 logging.basicConfig(
@@ -42,13 +52,17 @@ app = Flask(__name__, static_folder=os.path.join(BASE_DIR, "static"), template_f
 app.config.update(
     SQLALCHEMY_DATABASE_URI=SQLALCHEMY_DATABASE_URI,
     SQLALCHEMY_TRACK_MODIFICATIONS=SQLALCHEMY_TRACK_MODIFICATIONS,
+    SQLALCHEMY_ENGINE_OPTIONS=engine_options(SQLALCHEMY_DATABASE_URI),
 )
 app.bot_event_loop = LOOP
+job_scheduler.attach(LOOP)
+log_sink.init_app(app)
 
 # Inicialización de extensiones
 CORS(app)
 db.init_app(app)
-socketio.init_app(app, cors_allowed_origins="*", async_mode="gevent")
+# Los eventos de Socket.IO no usan la sesión de Flask (y Flask-SocketIO 5.3 no puede asignarla en Flask 3.1).
+socketio.init_app(app, cors_allowed_origins="*", async_mode="gevent", manage_session=False)
 
 # Mapeo de modelos para el CRUD genérico
 with app.app_context():
@@ -116,6 +130,8 @@ def _cleanup_resources():
             BOT_THREAD.join(timeout=5)
             if not BOT_THREAD.is_alive():
                 logger.info("✓ Hilo del bot finalizado correctamente.")
+    log_sink.stop()
+    file_index().stop_watch()
     
 atexit.register(_cleanup_resources)
 
@@ -144,11 +160,24 @@ def start_bot_thread():
         BOT_THREAD.start()
 
 if __name__ == "__main__":
+    # Antes de abrir la primera conexión: psycopg2 fija el modo green al conectar.
+    enable_gevent_wait()
     with app.app_context():
         db.create_all()
+        bootstrap_timescale()
+        ensure_search_indexes()
+        ensure_dashboard_views()
+        ensure_snapshot_summaries()
         load_saved_credentials(app.app_context())
 
+    indexed = file_index().rebuild()
+    logger.info(f"✓ Índice de capturas: {indexed} archivos en LOGS_DIR.")
+    if CAPTURE_INDEX_WATCH:
+        file_index().watch()
+    log_sink.start()
     start_bot_thread()
+    auto_update_scheduler.start(app, LOOP)
+    start_retention_schedule(app, LOOP)
 
     from gevent import pywsgi
     from geventwebsocket.handler import WebSocketHandler
@@ -24,6 +24,10 @@ from .prompt_config import PromptConfig
 from .kpi_column_preference import KpiColumnPreference
 from .portfolio_column_preference import PortfolioColumnPreference
 from .anomalous_event import AnomalousEvent
+from .snapshot_summary import SnapshotSummary
+from .drainer_run_state import DrainerRunState
+from .stock_price_daily import StockPriceDaily
+from .kpi_cache_entry import KpiCacheEntry
 
 __all__ = [
     "User",
@@ -46,6 +50,10 @@ __all__ = [
     "KpiColumnPreference",
     "PortfolioColumnPreference",
     "AnomalousEvent",
+    "SnapshotSummary",
+    "DrainerRunState",
+    "StockPriceDaily",
+    "KpiCacheEntry",
 ]
 
 # src/models/__init__.py
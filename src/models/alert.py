@@ -4,8 +4,8 @@ class Alert(db.Model):
     __tablename__ = 'alerts'
     id = db.Column(db.Integer, primary_key=True)
     symbol = db.Column(db.String(50), nullable=False)
-    target_price = db.Column(db.Float, nullable=False)
-    condition = db.Column(db.String(10), nullable=False) # "above" or "below"
+    target_price = db.Column(db.Float, nullable=False) # precio, % de variación o unidades según `condition`
+    condition = db.Column(db.String(10), nullable=False) # "above", "below", "pct_up", "pct_down" o "vol_above"
     triggered = db.Column(db.Boolean, default=False, nullable=False)
 
     def to_dict(self):
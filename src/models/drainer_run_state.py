@@ -0,0 +1,19 @@
+# src/models/drainer_run_state.py
+from src.extensions import db
+
+class DrainerRunState(db.Model):
+    """Marca de agua de cada análisis de drainers, para ejecutarlos de forma incremental."""
+    __tablename__ = 'drainer_run_states'
+
+    analysis = db.Column(db.String(50), primary_key=True)
+    last_analyzed_date = db.Column(db.Date, nullable=True)
+    last_run_at = db.Column(db.DateTime, nullable=True)
+    events_found = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'analysis': self.analysis,
+            'last_analyzed_date': self.last_analyzed_date.isoformat() if self.last_analyzed_date else None,
+            'last_run_at': self.last_run_at.isoformat() if self.last_run_at else None,
+            'events_found': self.events_found,
+        }
@@ -0,0 +1,23 @@
+# src/models/kpi_cache_entry.py
+from src.extensions import db
+
+class KpiCacheEntry(db.Model):
+    """Última respuesta de un proveedor de KPIs por símbolo, con la fecha de obtención de cada campo."""
+    __tablename__ = 'kpi_cache_entries'
+
+    nemo = db.Column(db.String(20), primary_key=True)
+    provider = db.Column(db.String(50), primary_key=True)
+    prompt_hash = db.Column(db.String(16), primary_key=True)
+    values = db.Column(db.JSON, nullable=False, default=dict)
+    fetched_at = db.Column(db.JSON, nullable=False, default=dict)  # campo -> ISO 8601 (UTC)
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'nemo': self.nemo,
+            'provider': self.provider,
+            'prompt_hash': self.prompt_hash,
+            'values': self.values,
+            'fetched_at': self.fetched_at,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
@@ -2,7 +2,11 @@ from src.extensions import db
 from datetime import datetime, timezone
 
 class LastUpdate(db.Model):
+    """Fila DATA_ID: timestamp del último snapshot guardado; HEARTBEAT_ID: de la última captura recibida."""
     __tablename__ = 'last_update'
+    DATA_ID = 1
+    HEARTBEAT_ID = 2
+
     id = db.Column(db.Integer, primary_key=True, default=1)
     timestamp = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
 
@@ -0,0 +1,27 @@
+# src/models/snapshot_summary.py
+from src.extensions import db
+
+class SnapshotSummary(db.Model):
+    """Resumen de cambios de un snapshot de `stock_prices` respecto al anterior."""
+    __tablename__ = 'snapshot_summaries'
+
+    timestamp = db.Column(db.DateTime, primary_key=True)
+    previous_timestamp = db.Column(db.DateTime, nullable=True)
+    total_count = db.Column(db.Integer, nullable=False, default=0)
+    new_count = db.Column(db.Integer, nullable=False, default=0)
+    removed_count = db.Column(db.Integer, nullable=False, default=0)
+    changed_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        """Devuelve el resumen con el formato histórico de `/api/history`."""
+        unchanged = not self.new_count and not self.removed_count and not self.changed_count
+        return {
+            'file': self.timestamp.isoformat(),
+            'timestamp': self.timestamp.strftime('%d/%m/%Y %H:%M:%S'),
+            'total': self.total_count,
+            'changes': self.changed_count,
+            'new': self.new_count,
+            'removed': self.removed_count,
+            'error_count': 0,
+            'status': 'Sin cambios' if unchanged else 'OK',
+        }
@@ -1,4 +1,3 @@
-from sqlalchemy import event, DDL
 from src.extensions import db
 from datetime import datetime, timezone
 
@@ -41,19 +40,3 @@ class StockPrice(db.Model):
             'BONO_VERDE': self.green_bond,
             'timestamp': formatted_timestamp
         }
-
-@event.listens_for(StockPrice.__table__, 'after_create')
-def create_timescale_hypertable(target, connection, **kw):
-    if connection.dialect.name == "postgresql":
-        try:
-            # La extensión debe estar preinstalada en la base de datos.
-            # Esta llamada asegura que está habilitada para la conexión actual.
-            connection.execute(DDL("CREATE EXTENSION IF NOT EXISTS timescaledb;"))
-            # Convierte la tabla en una hypertable
-            connection.execute(
-                DDL("SELECT create_hypertable('stock_prices', 'timestamp', if_not_exists => TRUE);")
-            )
-        except Exception as e:
-            # Esto puede fallar si el usuario de la DB no tiene permisos de superusuario
-            # o si la extensión no está instalada. Lo registramos como una advertencia.
-            print(f"ADVERTENCIA: No se pudo crear/configurar la hypertable de TimescaleDB. Error: {e}")
\ No newline at end of file
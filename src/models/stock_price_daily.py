@@ -0,0 +1,29 @@
+# src/models/stock_price_daily.py
+from src.extensions import db
+
+class StockPriceDaily(db.Model):
+    """Resumen diario de `stock_prices`: lo que queda de los snapshots intradía vencidos por la retención."""
+    __tablename__ = 'stock_prices_daily'
+
+    symbol = db.Column(db.String(50), primary_key=True)
+    date = db.Column(db.Date, primary_key=True, index=True)
+    open = db.Column(db.Float)
+    high = db.Column(db.Float)
+    low = db.Column(db.Float)
+    close = db.Column(db.Float)
+    volume = db.Column(db.BigInteger)
+    amount = db.Column(db.BigInteger)
+    samples = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'symbol': self.symbol,
+            'date': self.date.isoformat() if self.date else None,
+            'open': self.open,
+            'high': self.high,
+            'low': self.low,
+            'close': self.close,
+            'volume': self.volume,
+            'amount': self.amount,
+            'samples': self.samples,
+        }
@@ -3,6 +3,7 @@
 from .api import api_bp
 from .architecture import architecture_bp
 from .errors import errors_bp
+from . import price_socket  # registra los eventos de Socket.IO
 
 def register_blueprints(app):
     """Registra todos los blueprints de la aplicación."""
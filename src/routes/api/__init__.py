@@ -20,4 +20,6 @@ from . import data_routes
 from . import config_routes
 from . import portfolio_routes
 from . import system_routes
-from . import drainer_routes # <-- AÑADIR ESTA LÍNEA
\ No newline at end of file
+from . import drainer_routes # <-- AÑADIR ESTA LÍNEA
+from . import job_routes
+from . import retention_routes
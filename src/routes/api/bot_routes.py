@@ -1,34 +1,72 @@
 # src/routes/api/bot_routes.py
 
 import asyncio
-import json
 import logging
-import os
-import threading
-import time
 # --- INICIO DE LA MODIFICACIÓN: Importar 'request' desde Flask ---
 from flask import jsonify, current_app, request
 # --- FIN DE LA MODIFICACIÓN ---
-from sqlalchemy.dialects.postgresql import insert
 
 from src.routes.api import api_bp
-from src.models import StockFilter, AdvancedKPI, KpiSelection
-
-from src.scripts.bolsa_service import run_bolsa_bot, is_bot_running as is_async_bot_running
-from src.scripts import dividend_service, closing_service, ai_financial_service
-from src.scripts.bot_page_manager import get_page
+from src.models import KpiSelection
+
+from src.scripts.bolsa_service import submit_stocks_update, is_bot_running as is_async_bot_running
+from src.scripts import dividend_service, closing_service, kpi_pipeline
+from src.scripts.auto_update_scheduler import auto_update_scheduler
+from src.scripts.bot_page_manager import CLOSING_PAGE, DIVIDENDS_PAGE, pooled_page, pool_status
+from src.scripts.job_scheduler import (
+    job_scheduler, STOCKS_JOB, DIVIDENDS_JOB, CLOSING_JOB, KPIS_JOB, PRIORITY_NORMAL, PRIORITY_LOW, DONE,
+    SchedulerUnavailable,
+)
 from src.extensions import socketio, db
+from src.utils.capture_stats import capture_stats
+from src.utils.kpi_cache import cache_overview, kpi_cache_stats, prompt_hash
 
 logger = logging.getLogger(__name__)
-_sync_bot_running_lock = threading.Lock() 
 
 def is_bot_busy():
-    """Comprueba tanto el lock síncrono como el estado del loop asíncrono."""
-    return _sync_bot_running_lock.locked() or is_async_bot_running()
+    """Hay una actualización de acciones en cola/en curso en el planificador o el bot ya está corriendo."""
+    return job_scheduler.is_busy(STOCKS_JOB) or is_async_bot_running()
+
+def _job_result_or_error(job):
+    """Payload de los eventos `*_update_complete`: el resultado, o el error si el trabajo no terminó bien."""
+    return job.result if job.status == DONE and isinstance(job.result, dict) else {"error": job.error}
+
+def _job_response(job, created, message):
+    """Respuesta 202 común: el trabajo nuevo o el existente con el que se fusionó la solicitud."""
+    if not created:
+        message = "Ya hay un trabajo idéntico en cola; se reutiliza."
+    return jsonify({"success": True, "message": message, "job_id": job.id, "coalesced": not created, "job": job.to_dict()}), 202
+
+def _scheduler_unavailable(error):
+    """503 cuando el planificador aún no tiene loop (el bot no arrancó o se detuvo)."""
+    logger.warning(f"[API] No se pudo encolar el trabajo: {error}")
+    return jsonify({"success": False, "error": str(error)}), 503
 
 @api_bp.route("/bot-status", methods=["GET"])
 def bot_status():
-    return jsonify({"is_running": is_bot_busy()})
+    return jsonify({"is_running": is_bot_busy(), "pages": pool_status(), "jobs": job_scheduler.stats()})
+
+
+@api_bp.route("/bot/capture-stats", methods=["GET"])
+def bot_capture_stats():
+    """Latencia por captura de precios en modo directo vs. recarga de página."""
+    return jsonify(capture_stats.summary())
+
+
+@api_bp.route("/auto-update", methods=["GET"])
+def auto_update_status():
+    """Estado del auto-update del servidor: fase del mercado, próxima ejecución y plan estimado."""
+    return jsonify(auto_update_scheduler.status())
+
+
+@api_bp.route("/auto-update", methods=["POST"])
+def configure_auto_update():
+    interval = (request.get_json(silent=True) or {}).get("interval", "off")
+    try:
+        auto_update_scheduler.configure(interval)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(auto_update_scheduler.status())
 
 
 @api_bp.route("/stocks/update", methods=["POST"])
@@ -39,140 +77,94 @@ def update_stocks():
         logger.info("[API] Se omite auto-actualización porque ya hay un proceso en curso.")
         return jsonify({"success": False, "message": "Proceso de bot ya está activo, auto-actualización omitida."}), 200
 
-    if not _sync_bot_running_lock.acquire(blocking=False):
-        return jsonify({"success": False, "message": "Ya hay una actualización de acciones en curso."}), 409
-    
-    app_instance = current_app._get_current_object()
-    with app_instance.app_context():
-        stock_filter = StockFilter.query.first()
-        filtered_symbols = json.loads(stock_filter.codes_json or '[]') if stock_filter and not stock_filter.all else None
-        if filtered_symbols:
-             logger.info(f"[API] Se aplicará un filtro para la actualización. Símbolos: {filtered_symbols}")
-
-    username = os.getenv("BOLSA_USERNAME")
-    password = os.getenv("BOLSA_PASSWORD")
-    
-    bot_kwargs = {
-        "app": app_instance, 
-        "username": username, 
-        "password": password,
-        "filtered_symbols": filtered_symbols
-    }
-
-    def target_func(app):
-        try:
-            with app.app_context():
-                loop = app.bot_event_loop
-                future = asyncio.run_coroutine_threadsafe(run_bolsa_bot(**bot_kwargs), loop)
-                future.result(timeout=400)
-        finally:
-            if _sync_bot_running_lock.locked():
-                _sync_bot_running_lock.release()
-            logger.info("[API] Lock de actualización de acciones liberado.")
-    
-    threading.Thread(target=target_func, args=(app_instance,), daemon=True).start()
-    return jsonify({"success": True, "message": "Proceso de actualización de acciones iniciado."}), 202
+    try:
+        job, created = submit_stocks_update(current_app._get_current_object(), is_auto_update=is_auto_update)
+    except SchedulerUnavailable as e:
+        return _scheduler_unavailable(e)
+    return _job_response(job, created, "Proceso de actualización de acciones iniciado.")
 
 
 @api_bp.route("/dividends/update", methods=["POST"])
 def update_dividends():
     app_instance = current_app._get_current_object()
-    def task_in_thread(app):
-        result = {}
-        try:
-            loop = app.bot_event_loop
-            if not loop.is_running(): raise RuntimeError("El loop de eventos del bot no está corriendo.")
-            async def update_task():
-                page = await get_page()
-                with app.app_context():
-                    return await dividend_service.compare_and_update_dividends(page)
-            future = asyncio.run_coroutine_threadsafe(update_task(), loop)
-            result = future.result(timeout=120)
-        except Exception as e:
-            logger.error(f"Error en el hilo de actualización de dividendos: {e}", exc_info=True)
-            result = {"error": str(e)}
-        finally:
-            socketio.emit('dividend_update_complete', result)
-    threading.Thread(target=task_in_thread, args=(app_instance,), daemon=True).start()
-    return jsonify({"success": True, "message": "Proceso de actualización de dividendos iniciado."}), 202
+
+    async def update_task():
+        async with pooled_page(DIVIDENDS_PAGE) as page:
+            with app_instance.app_context():
+                return await dividend_service.compare_and_update_dividends(page)
+
+    try:
+        job, created = job_scheduler.submit(
+            DIVIDENDS_JOB, update_task, priority=PRIORITY_NORMAL, timeout=120,
+            on_finish=lambda job: socketio.emit('dividend_update_complete', _job_result_or_error(job)),
+        )
+    except SchedulerUnavailable as e:
+        return _scheduler_unavailable(e)
+    return _job_response(job, created, "Proceso de actualización de dividendos iniciado.")
 
 
 @api_bp.route("/closing/update", methods=["POST"])
 def update_closing_data():
     app_instance = current_app._get_current_object()
-    def task_in_thread(app):
-        result = {}
-        try:
-            loop = app.bot_event_loop
-            if not loop.is_running(): raise RuntimeError("El loop de eventos del bot no está corriendo.")
-            async def update_task():
-                page = await get_page()
-                with app.app_context():
-                    return await closing_service.update_stock_closings(page)
-            future = asyncio.run_coroutine_threadsafe(update_task(), loop)
-            result = future.result(timeout=120)
-        except Exception as e:
-            logger.error(f"Error en el hilo de actualización de Cierre Bursátil: {e}", exc_info=True)
-            result = {"error": str(e)}
-        finally:
-            socketio.emit('closing_update_complete', result)
-    threading.Thread(target=task_in_thread, args=(app_instance,), daemon=True).start()
-    return jsonify({"success": True, "message": "Proceso de actualización de Cierre Bursátil iniciado."}), 202
+
+    async def update_task():
+        async with pooled_page(CLOSING_PAGE) as page:
+            with app_instance.app_context():
+                return await closing_service.update_stock_closings(page)
+
+    try:
+        job, created = job_scheduler.submit(
+            CLOSING_JOB, update_task, priority=PRIORITY_NORMAL, timeout=120,
+            on_finish=lambda job: socketio.emit('closing_update_complete', _job_result_or_error(job)),
+        )
+    except SchedulerUnavailable as e:
+        return _scheduler_unavailable(e)
+    return _job_response(job, created, "Proceso de actualización de Cierre Bursátil iniciado.")
+
+
+async def _update_kpis_task(app, force=False):
+    async def closing_task():
+        async with pooled_page(CLOSING_PAGE) as page:
+            with app.app_context():
+                return await closing_service.update_stock_closings(page)
+
+    socketio.emit('kpi_update_progress', {'status': 'info', 'message': 'Actualizando datos base de Cierre Bursátil...'})
+    closing_result = await asyncio.wait_for(closing_task(), timeout=180)
+
+    if 'error' in closing_result:
+        raise Exception(f"Fallo al obtener datos base de cierre: {closing_result['error']}")
+
+    socketio.emit('kpi_update_progress', {'status': 'info', 'message': '✓ Datos base actualizados. Iniciando consulta de KPIs...'})
+
+    with app.app_context():
+        nemos_to_update = [s.nemo for s in KpiSelection.query.all()]
+    if not nemos_to_update:
+        return {'message': 'No hay acciones seleccionadas para actualizar.'}
+
+    return await kpi_pipeline.run_kpi_update(app, nemos_to_update, force=force)
 
 
 @api_bp.route("/kpis/update", methods=["POST"])
 def update_advanced_kpis():
+    payload = request.get_json(silent=True) or {}
+    force = bool(payload.get("force")) or request.args.get("force") in ("1", "true")
     app_instance = current_app._get_current_object()
-    def task_in_thread(app):
-        with app.app_context():
-            nemo = ""
-            try:
-                loop = app.bot_event_loop
-                if not loop.is_running(): raise RuntimeError("El loop de eventos del bot no está corriendo.")
-                
-                page_future = asyncio.run_coroutine_threadsafe(get_page(), loop)
-                page = page_future.result(timeout=60)
-                
-                socketio.emit('kpi_update_progress', {'status': 'info', 'message': 'Actualizando datos base de Cierre Bursátil...'})
-                closing_future = asyncio.run_coroutine_threadsafe(closing_service.update_stock_closings(page), loop)
-                closing_result = closing_future.result(timeout=120)
-
-                if 'error' in closing_result:
-                    raise Exception(f"Fallo al obtener datos base de cierre: {closing_result['error']}")
-
-                socketio.emit('kpi_update_progress', {'status': 'info', 'message': '✓ Datos base actualizados. Iniciando consulta de KPIs...'})
-
-                nemos_to_update = [s.nemo for s in KpiSelection.query.all()]
-                if not nemos_to_update:
-                    socketio.emit('kpi_update_complete', {'message': 'No hay acciones seleccionadas para actualizar.'})
-                    return
-                
-                updated_count = 0
-                for i, nemo in enumerate(nemos_to_update):
-                    kpi_data = ai_financial_service.get_advanced_kpis(nemo)
-                    if kpi_data:
-                        data_to_upsert = {
-                            "nemo": nemo, "roe": kpi_data.get('roe'),
-                            "debt_to_equity": kpi_data.get('debt_to_equity'),
-                            "beta": kpi_data.get('beta'),
-                            "analyst_recommendation": kpi_data.get('analyst_recommendation'),
-                            "source": kpi_data.get('source')
-                        }
-                        stmt = insert(AdvancedKPI).values(data_to_upsert)
-                        update_stmt = stmt.on_conflict_do_update(index_elements=['nemo'], set_=data_to_upsert)
-                        db.session.execute(update_stmt)
-                        db.session.commit()
-                        updated_count += 1
-                        socketio.emit('kpi_update_progress', {'nemo': nemo, 'status': 'success', 'progress': f"{i+1}/{len(nemos_to_update)}"})
-                    else:
-                        socketio.emit('kpi_update_progress', {'nemo': nemo, 'status': 'failed', 'progress': f"{i+1}/{len(nemos_to_update)}"})
-                    time.sleep(1.5) 
-                
-                socketio.emit('kpi_update_complete', {'message': f'Actualización completada. {updated_count} de {len(nemos_to_update)} acciones procesadas.'})
-
-            except Exception as e:
-                logger.error(f"Error procesando KPI para {nemo}: {e}", exc_info=True)
-                socketio.emit('kpi_update_complete', {'error': str(e)})
-
-    threading.Thread(target=task_in_thread, args=(app_instance,), daemon=True).start()
-    return jsonify({"success": True, "message": "Proceso de actualización de KPIs iniciado para acciones seleccionadas."}), 202
\ No newline at end of file
+    # Una actualización forzada no se fusiona con una incremental ya en cola.
+    try:
+        job, created = job_scheduler.submit(
+            KPIS_JOB, lambda: _update_kpis_task(app_instance, force), key="force" if force else "",
+            priority=PRIORITY_LOW,
+            on_finish=lambda job: socketio.emit('kpi_update_complete', _job_result_or_error(job)),
+        )
+    except SchedulerUnavailable as e:
+        return _scheduler_unavailable(e)
+    return _job_response(job, created, "Proceso de actualización de KPIs iniciado para acciones seleccionadas.")
+
+
+@api_bp.route("/kpis/cache", methods=["GET"])
+def kpi_cache_status():
+    """Conteos hit/stale/miss por ejecución y estado actual de la caché para las acciones seleccionadas."""
+    provider, config = kpi_pipeline.resolve_provider()
+    nemos = [s.nemo for s in KpiSelection.query.all()]
+    overview = cache_overview(nemos, provider.name, prompt_hash(config.get("prompt_template")), kpi_pipeline.TTL_FIELDS)
+    return jsonify({**kpi_cache_stats.summary(), **overview})
@@ -1,69 +1,148 @@
 # src/routes/api/data_routes.py
 import logging
+from datetime import date, datetime
+
+import pandas as pd
 from flask import jsonify, request, current_app
-from sqlalchemy import select, and_, func
+from sqlalchemy import func
 
 from . import api_bp
 
-from src.utils.db_io import get_latest_data, filter_stocks, compare_last_two_db_entries
+from src.utils.db_io import get_latest_data, get_latest_snapshot, filter_stocks, compare_last_two_db_entries, compare_db_snapshots
 from src.utils import history_view
-from src.extensions import db
-from src.models import (
-    StockPrice, Dividend, StockClosing, AdvancedKPI, KpiSelection, FilteredStockHistory
+from src.utils.downsampling import DOWNSAMPLING_METHODS, downsample_frame
+from src.utils.timescale import INTERVALS, PRICE_OHLC_COLUMNS, auto_interval, history_buckets, price_ohlc
+from src.utils.retention import daily_rollups, naive_utc, read_archive
+from src.utils.dashboard_views import (
+    DIVIDENDS_DASHBOARD, KPI_DASHBOARD, closing_version, dashboard_payload, dashboard_version,
 )
+from src.utils.http_cache import cached_response
+from src.extensions import db
+from src.models import StockPrice, StockClosing, FilteredStockHistory
 
 logger = logging.getLogger(__name__)
 
+HISTORY_PAGE_SIZE = 500
+# Puntos por serie en los gráficos (por defecto y máximo permitido vía `max_points`)
+CHART_MAX_POINTS = 500
+CHART_MAX_POINTS_LIMIT = 5000
+
+def _prices_version():
+    """Versión de los precios: timestamp y huella del último snapshot (None si no hay en la DB)."""
+    snapshot = get_latest_snapshot()
+    return f"{snapshot.timestamp.isoformat()}:{snapshot.digest}" if snapshot else None
+
+def _dashboard_response(name):
+    return current_app.response_class(dashboard_payload(name)[0], mimetype="application/json")
+
+def _parse_datetime_arg(name):
+    """Lee un parámetro de query como fecha ISO 8601 (o None si no viene)."""
+    value = request.args.get(name)
+    return datetime.fromisoformat(value) if value else None
+
 @api_bp.route("/stocks", methods=["GET"])
+@cached_response(_prices_version)
 def get_stocks():
     with current_app.app_context():
         stock_codes = request.args.getlist("code")
-        result = filter_stocks(stock_codes) if stock_codes else get_latest_data()
-        return jsonify(result)
+        if stock_codes:
+            return jsonify(filter_stocks(stock_codes))
+        snapshot = get_latest_snapshot()
+        if snapshot:
+            # Respuesta pre-serializada desde la caché: no toca SQLAlchemy.
+            return current_app.response_class(snapshot.body, mimetype="application/json")
+        return jsonify(get_latest_data())
 
 @api_bp.route("/history", methods=["GET"])
+@cached_response(_prices_version)
 def history_list():
     with current_app.app_context():
-        return jsonify(history_view.load_history())
+        try:
+            start, end = _parse_datetime_arg("from"), _parse_datetime_arg("to")
+        except ValueError:
+            return jsonify({"error": "Parámetros 'from'/'to' deben ser fechas ISO 8601."}), 400
+        limit = request.args.get("limit", HISTORY_PAGE_SIZE, type=int)
+        return jsonify(history_view.load_history(start=start, end=end, limit=limit))
 
 @api_bp.route("/history/compare", methods=["GET"])
 def history_compare():
     with current_app.app_context():
         stock_codes = request.args.getlist("code")
+        try:
+            ts_prev, ts_curr = _parse_datetime_arg("from"), _parse_datetime_arg("to")
+        except ValueError:
+            return jsonify({"error": "Parámetros 'from'/'to' deben ser fechas ISO 8601."}), 400
+        if ts_prev or ts_curr:
+            if not (ts_prev and ts_curr):
+                return jsonify({"error": "Para comparar snapshots específicos se requieren 'from' y 'to'."}), 400
+            return jsonify(compare_db_snapshots(ts_prev, ts_curr, stock_codes or None) or {})
         comparison_data = compare_last_two_db_entries(stock_codes=stock_codes if stock_codes else None)
         return jsonify(comparison_data or history_view.compare_latest(stock_codes=stock_codes if stock_codes else None) or {})
 
 @api_bp.route("/stocks/history/<symbol>", methods=["GET"])
 def stock_history(symbol):
     with current_app.app_context():
-        prices = db.session.query(StockPrice).filter_by(symbol=symbol.upper()).order_by(StockPrice.timestamp).all()
-        labels = [p.timestamp.strftime("%d/%m/%Y %H:%M:%S") for p in prices]
-        data = [p.price for p in prices]
-        return jsonify({"labels": labels, "data": data})
+        interval = request.args.get("interval", "raw")
+        if interval != "raw" and interval not in INTERVALS:
+            return jsonify({"error": f"Intervalo no válido. Use raw, {', '.join(INTERVALS)}."}), 400
+        method = request.args.get("method", "lttb")
+        if method not in DOWNSAMPLING_METHODS:
+            return jsonify({"error": f"Método no válido. Use {', '.join(DOWNSAMPLING_METHODS)}."}), 400
+        try:
+            start, end = _parse_datetime_arg("from"), _parse_datetime_arg("to")
+        except ValueError:
+            return jsonify({"error": "Parámetros 'from'/'to' deben ser fechas ISO 8601."}), 400
+        max_points = request.args.get("max_points", CHART_MAX_POINTS, type=int)
+        max_points = min(max(max_points, 3), CHART_MAX_POINTS_LIMIT)
+
+        if interval == "raw":
+            query = db.session.query(StockPrice.timestamp, StockPrice.price).filter(StockPrice.symbol == symbol.upper())
+            if start:
+                query = query.filter(StockPrice.timestamp >= start)
+            if end:
+                query = query.filter(StockPrice.timestamp <= end)
+            frame = pd.DataFrame(query.order_by(StockPrice.timestamp).all(), columns=["bucket", "close"])
+            # Días que la retención ya sacó de la DB se leen del archivo Parquet.
+            first_in_db = frame["bucket"].min() if not frame.empty else naive_utc(end)
+            archived = read_archive(StockPrice.__tablename__, start, first_in_db, [symbol.upper()], ["timestamp", "price"])
+            if not archived.empty:
+                archived = archived[archived["timestamp"] < first_in_db] if first_in_db is not None else archived
+                frame = pd.concat([archived.set_axis(["bucket", "close"], axis=1), frame], ignore_index=True)
+        else:
+            # OHLC por bucket desde los agregados continuos (o su equivalente sobre filas crudas).
+            frame = pd.DataFrame(price_ohlc([symbol.upper()], interval, start, end), columns=["bucket", *PRICE_OHLC_COLUMNS])
+            if interval == "1d":
+                # Días anteriores a los snapshots retenidos: resúmenes diarios de la retención.
+                first_day = pd.to_datetime(frame["bucket"]).min().date() if not frame.empty else None
+                rollups = pd.DataFrame([r for r in daily_rollups([symbol.upper()], start, end)
+                                        if first_day is None or date.fromisoformat(r["date"]) < first_day])
+                if not rollups.empty:
+                    rollups = rollups.assign(bucket=pd.to_datetime(rollups["date"]))[["bucket", *PRICE_OHLC_COLUMNS]]
+                    frame = pd.concat([rollups, frame], ignore_index=True)
+
+        total_points = len(frame)
+        frame = downsample_frame(frame, "bucket", "close", max_points, method)
+        frame = frame.astype(object).where(frame.notna(), None)
+        response = {
+            "labels": pd.to_datetime(frame["bucket"]).dt.strftime("%d/%m/%Y %H:%M:%S").tolist(),
+            "data": frame["close"].tolist(),
+            "total_points": total_points,
+            "downsampled": len(frame) < total_points,
+        }
+        if interval != "raw":
+            response["interval"] = interval
+            for key in ("open", "high", "low", "close", "volume"):
+                response[key] = frame[key].tolist()
+        return jsonify(response)
 
 @api_bp.route("/dividends", methods=["GET"])
+@cached_response(lambda: dashboard_version(DIVIDENDS_DASHBOARD))
 def get_dividends():
     with current_app.app_context():
-        latest_closing_date = db.session.query(func.max(StockClosing.date)).scalar()
-        if not latest_closing_date:
-            dividends = Dividend.query.order_by(Dividend.payment_date.asc()).all()
-            results = [d.to_dict() for d in dividends]
-            for r in results:
-                r['is_ipsa'] = False
-            return jsonify(results)
-        results = db.session.query(
-            Dividend, StockClosing.belongs_to_ipsa
-        ).outerjoin(
-            StockClosing, and_(Dividend.nemo == StockClosing.nemo, StockClosing.date == latest_closing_date)
-        ).order_by(Dividend.payment_date.asc()).all()
-        enriched_dividends = []
-        for dividend, belongs_to_ipsa in results:
-            dividend_dict = dividend.to_dict()
-            dividend_dict['is_ipsa'] = bool(belongs_to_ipsa) 
-            enriched_dividends.append(dividend_dict)
-        return jsonify(enriched_dividends)
+        return _dashboard_response(DIVIDENDS_DASHBOARD)
 
 @api_bp.route("/closing", methods=["GET"])
+@cached_response(closing_version)
 def get_closing_data():
     with current_app.app_context():
         nemos_to_filter = request.args.getlist("nemo")
@@ -77,28 +156,10 @@ def get_closing_data():
         return jsonify([c.to_dict() for c in closings])
 
 @api_bp.route("/kpis", methods=["GET"])
+@cached_response(lambda: dashboard_version(KPI_DASHBOARD))
 def get_all_kpis():
     with current_app.app_context():
-        selected_nemos_query = select(KpiSelection.nemo)
-        selected_nemos = [row.nemo for row in db.session.execute(selected_nemos_query).all()]
-        if not selected_nemos: return jsonify([])
-        latest_date = db.session.query(func.max(StockClosing.date)).scalar()
-        if not latest_date: return jsonify([])
-        closings = StockClosing.query.filter(StockClosing.nemo.in_(selected_nemos), StockClosing.date == latest_date).all()
-        advanced_kpis = {k.nemo: k.to_dict() for k in AdvancedKPI.query.filter(AdvancedKPI.nemo.in_(selected_nemos)).all()}
-        combined_data = []
-        for closing in closings:
-            data = closing.to_dict()
-            adv_data = advanced_kpis.get(data['nemo'], {})
-            data['roe'] = adv_data.get('roe')
-            data['debt_to_equity'] = adv_data.get('debt_to_equity')
-            data['beta'] = adv_data.get('beta')
-            data['riesgo'] = adv_data.get('analyst_recommendation')
-            data['dividend_yield'] = data.get('ren_actual')
-            data['kpi_last_updated'] = adv_data.get('last_updated')
-            data['kpi_source'] = adv_data.get('source')
-            combined_data.append(data)
-        return jsonify(combined_data)
+        return _dashboard_response(KPI_DASHBOARD)
 
 @api_bp.route("/dashboard/chart-data", methods=["GET"])
 def get_dashboard_chart_data():
@@ -117,7 +178,18 @@ def get_dashboard_chart_data():
         }
         if metric not in valid_metrics: return jsonify({"error": "Métrica no válida."}), 400
         
+        interval = request.args.get("interval") or auto_interval(days_history)
+        if interval != "raw" and interval not in INTERVALS:
+            return jsonify({"error": "Intervalo no válido."}), 400
+
         start_date = datetime.now(timezone.utc) - timedelta(days=days_history)
+        if interval != "raw":
+            chart_data = {symbol: [] for symbol in stock_symbols}
+            for row in history_buckets(stock_symbols, interval, start=start_date):
+                if row[metric] is not None:
+                    chart_data[row["symbol"]].append({"x": row["bucket"].isoformat(), "y": row[metric]})
+            return jsonify(chart_data)
+
         history_data = db.session.query(
             FilteredStockHistory.symbol, FilteredStockHistory.timestamp, valid_metrics[metric]
         ).filter(
@@ -126,6 +198,13 @@ def get_dashboard_chart_data():
         ).order_by(FilteredStockHistory.timestamp).all()
 
         chart_data = {symbol: [] for symbol in stock_symbols}
+        # Puntos ya archivados por la retención (los timestamps del historial no llevan zona horaria).
+        first_in_db = min((timestamp for _, timestamp, _ in history_data), default=None)
+        archived = read_archive(FilteredStockHistory.__tablename__, start_date.replace(tzinfo=None), first_in_db,
+                                stock_symbols, ["symbol", "timestamp", metric])
+        for symbol, timestamp, value in archived.itertuples(index=False):
+            if value is not None and not pd.isna(value) and (first_in_db is None or timestamp < first_in_db):
+                chart_data[symbol].append({"x": timestamp.isoformat(), "y": value})
         for symbol, timestamp, value in history_data:
             if value is not None:
                 chart_data[symbol].append({"x": timestamp.isoformat(), "y": value})
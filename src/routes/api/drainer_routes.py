@@ -1,10 +1,11 @@
 # src/routes/api/drainer_routes.py
 import logging
 import threading
-from flask import jsonify, current_app
+from flask import jsonify, current_app, request
 
 from . import api_bp
 from src.scripts.drainer_service import run_drainer_analysis
+from src.utils.anomaly_detectors import DETECTORS
 from src.models import AnomalousEvent
 
 logger = logging.getLogger(__name__)
@@ -17,12 +18,31 @@ def get_drainer_events():
 
 @api_bp.route("/drainers/analyze", methods=["POST"])
 def trigger_drainer_analysis():
+    # Incremental por defecto; `{"full": true}` (o `?full=1`) borra y recalcula todo.
+    # `{"detectors": [...]}` limita la ejecución a algunos detectores registrados.
+    payload = request.get_json(silent=True) or {}
+    full = bool(payload.get("full")) or request.args.get("full") in ("1", "true")
+    detectors = payload.get("detectors") or None
+    unknown = sorted(set(detectors or ()) - set(DETECTORS))
+    if unknown:
+        return jsonify({"error": f"Detectores desconocidos: {', '.join(unknown)}"}), 400
+
     def analysis_task(app):
         with app.app_context():
-            run_drainer_analysis()
+            run_drainer_analysis(full=full, detectors=detectors)
 
     app_instance = current_app._get_current_object()
     thread = threading.Thread(target=analysis_task, args=(app_instance,), daemon=True)
     thread.start()
     
-    return jsonify({"message": "El análisis de adelantamientos ha comenzado."}), 202
\ No newline at end of file
+    return jsonify({"message": "El análisis de adelantamientos ha comenzado.", "full": full,
+                    "detectors": detectors or list(DETECTORS)}), 202
+
+
+@api_bp.route("/drainers/detectors", methods=["GET"])
+def list_drainer_detectors():
+    return jsonify([
+        {"name": d.name, "event_type": d.event_type, "source": d.label,
+         "needs": {source: list(cols) for source, cols in d.needs.items()}}
+        for d in DETECTORS.values()
+    ])
\ No newline at end of file
@@ -0,0 +1,36 @@
+# src/routes/api/job_routes.py
+import logging
+
+from flask import jsonify, request
+
+from . import api_bp
+from src.scripts.job_scheduler import job_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+@api_bp.route("/jobs", methods=["GET"])
+def list_jobs():
+    """Trabajos recientes del planificador (filtrables por `type` y `status`) y su ocupación por tipo."""
+    jobs = job_scheduler.list_jobs(job_type=request.args.get("type"), status=request.args.get("status"))
+    return jsonify({"jobs": [job.to_dict() for job in jobs], "stats": job_scheduler.stats()})
+
+
+@api_bp.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = job_scheduler.get(job_id)
+    if job is None:
+        return jsonify({"error": "Trabajo no encontrado."}), 404
+    return jsonify(job.to_dict())
+
+
+@api_bp.route("/jobs/<job_id>", methods=["DELETE"])
+def cancel_job(job_id):
+    job = job_scheduler.get(job_id)
+    if job is None:
+        return jsonify({"error": "Trabajo no encontrado."}), 404
+    if not job.is_active:
+        return jsonify({"error": f"El trabajo ya terminó ({job.status}).", "job": job.to_dict()}), 409
+    job_scheduler.cancel(job_id)
+    logger.info(f"[API] Cancelación solicitada para el trabajo {job_id}.")
+    return jsonify({"success": True, "job": job.to_dict()}), 202
@@ -6,6 +6,7 @@ from sqlalchemy import select
 from src.routes.api import api_bp 
 from src.extensions import db
 from src.models import Portfolio, KpiSelection, StockClosing
+from src.utils.dashboard_views import KPI_DASHBOARD, refresh_dashboards
 
 logger = logging.getLogger(__name__)
 
@@ -67,4 +68,5 @@ def handle_kpi_selection():
             new_selections = [KpiSelection(nemo=nemo) for nemo in data["nemos"]]
             db.session.add_all(new_selections)
             db.session.commit()
+            refresh_dashboards(KPI_DASHBOARD)
             return jsonify({"success": True, "message": f"Selección guardada con {len(new_selections)} acciones."})
\ No newline at end of file
@@ -0,0 +1,44 @@
+# src/routes/api/retention_routes.py
+import logging
+
+from flask import jsonify, current_app
+
+from . import api_bp
+from src.scripts.job_scheduler import RETENTION_JOB, SchedulerUnavailable, job_scheduler
+from src.utils.retention import RETENTION_POLICIES, archived_days, cutoff_for, pq, submit_retention
+from src.utils.time_utils import now_chile
+
+logger = logging.getLogger(__name__)
+
+
+@api_bp.route("/retention", methods=["GET"])
+def retention_status():
+    """Políticas de retención vigentes, días archivados por tabla y últimas ejecuciones."""
+    today = now_chile().date()
+    policies = []
+    for policy in RETENTION_POLICIES.values():
+        cutoff = cutoff_for(policy, today)
+        days = archived_days(policy.table) if policy.archive else []
+        policies.append({
+            "table": policy.table,
+            "keep_days": policy.keep_days,
+            "rollup": policy.rollup,
+            "archive": policy.archive,
+            "cutoff": cutoff.isoformat() if cutoff else None,
+            "archived_days": len(days),
+            "archived_from": days[0].isoformat() if days else None,
+            "archived_to": days[-1].isoformat() if days else None,
+        })
+    jobs = job_scheduler.list_jobs(job_type=RETENTION_JOB)
+    return jsonify({"policies": policies, "parquet_available": pq is not None,
+                    "jobs": [job.to_dict() for job in jobs[:10]]})
+
+
+@api_bp.route("/retention/run", methods=["POST"])
+def run_retention():
+    try:
+        job, created = submit_retention(current_app._get_current_object())
+    except SchedulerUnavailable as e:
+        logger.warning(f"[API] No se pudo encolar la retención: {e}")
+        return jsonify({"success": False, "error": str(e)}), 503
+    return jsonify({"job_id": job.id, "coalesced": not created, "job": job.to_dict()}), 202
@@ -5,6 +5,9 @@ from flask import jsonify, request, current_app
 from src.routes.api import api_bp 
 from src.extensions import db
 from src.models import LogEntry, Alert
+from src.utils.alert_engine import ALERT_CONDITIONS
+from src.utils.db_engine import pool_status
+from src.utils.log_sink import log_sink
 
 logger = logging.getLogger(__name__)
 
@@ -13,10 +16,16 @@ def handle_logs():
     with current_app.app_context():
         if request.method == 'POST':
             data = request.get_json(silent=True) or {}
-            log = LogEntry(level="INFO", message=data.get("message", ""), action=data.get("action", "frontend"))
-            db.session.add(log)
-            db.session.commit()
-            return jsonify(log.to_dict()), 201
+            message = data.get("message")
+            if not message:
+                return jsonify({"error": "El campo 'message' es obligatorio."}), 400
+            level = str(data.get("level") or "INFO").upper()[:20]
+            action = str(data.get("action") or "frontend")[:50]
+            # 201 si quedó escrito (sumidero sin hilo), 202 si quedó encolado para el próximo lote.
+            if not log_sink.submit(level, message, action, data.get("stack")):
+                return jsonify({"error": "Log descartado por saturación."}), 503
+            status = 202 if log_sink.running else 201
+            return jsonify({"level": level, "message": message, "action": action, "queued": status == 202}), status
         
         if request.method == 'GET':
             query = LogEntry.query.order_by(LogEntry.timestamp.desc())
@@ -25,6 +34,11 @@ def handle_logs():
                 query = query.filter(LogEntry.message.ilike(f"%{search}%"))
             return jsonify([l.to_dict() for l in query.limit(200).all()])
 
+@api_bp.route("/system/db-pool", methods=["GET"])
+def db_pool_status():
+    """Conexiones en uso, overflow y espera por conexión del pool del engine."""
+    return jsonify(pool_status())
+
 @api_bp.route("/alerts", methods=["GET", "POST"])
 def handle_alerts():
     with current_app.app_context():
@@ -36,7 +50,7 @@ def handle_alerts():
                     target_price=float(data["target_price"]),
                     condition=data["condition"]
                 )
-                if alert.condition not in {"above", "below"}: raise ValueError("Condición inválida")
+                if alert.condition not in ALERT_CONDITIONS: raise ValueError("Condición inválida")
                 db.session.add(alert)
                 db.session.commit()
                 return jsonify(alert.to_dict()), 201
@@ -1,8 +1,13 @@
-from flask import Blueprint, jsonify, request, abort, current_app
+from flask import Blueprint, Response, jsonify, request, abort, current_app, stream_with_context
 from src.extensions import db
-from datetime import datetime
+from datetime import date, datetime
 import json
-from sqlalchemy import or_, String, Text
+from src.utils.snapshot_cache import latest_snapshot_cache
+from src.utils.dashboard_views import DASHBOARD_TABLES, refresh_dashboards
+from src.utils.table_query import (
+    EXPORT_FORMATS, MAX_PAGE_SIZE, SEARCH_MODES, decode_cursor, encode_cursor, iter_export, keyset_page,
+    search_clause, table_count,
+)
 
 crud_bp = Blueprint('crud', __name__)
 
@@ -14,11 +19,18 @@ def model_to_dict(obj):
     d = {}
     for c in obj.__table__.columns:
         val = getattr(obj, c.name)
-        if isinstance(val, datetime):
+        if isinstance(val, (datetime, date)):
             val = val.isoformat()
         d[c.name] = val
     return d
 
+def _invalidate_caches(table_name):
+    """Las escrituras manuales invalidan la caché del último snapshot o refrescan los dashboards que leen la tabla."""
+    if table_name == 'stock_prices':
+        latest_snapshot_cache.invalidate()
+    elif table_name in DASHBOARD_TABLES:
+        refresh_dashboards(*DASHBOARD_TABLES[table_name])
+
 def cast_value(value: str, col_type):
     """Intenta convertir un valor string al tipo de dato de la columna del modelo."""
     try:
@@ -28,6 +40,8 @@ def cast_value(value: str, col_type):
             return str(value).lower() in ('1', 'true', 't', 'yes', 'on')
         if pytype is datetime:
             return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        if pytype is date:
+            return date.fromisoformat(str(value)[:10])
         return pytype(value)
     except (ValueError, TypeError):
         return value
@@ -57,43 +71,102 @@ def list_models():
 
 @crud_bp.route('/mantenedores/<table_name>', methods=['GET'])
 def list_records(table_name):
-    """Devuelve una lista paginada de registros para una tabla específica, con opción de búsqueda."""
+    """
+    Devuelve registros de una tabla, con opción de búsqueda (`q`, `mode=contains|fts`).
+    Por defecto pagina por keyset sobre la clave primaria (`cursor` devuelto como
+    `next_cursor`); `page` mantiene la paginación por OFFSET anterior.
+    """
     model = current_app.model_map.get(table_name)
     if not model: abort(404, description=f"Tabla '{table_name}' no encontrada.")
     
-    page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 50, type=int)
     search_term = request.args.get('q', None, type=str)
+    search_mode = request.args.get('mode', 'contains', type=str)
+    if search_mode not in SEARCH_MODES:
+        abort(400, description=f"Modo de búsqueda inválido. Use uno de: {', '.join(SEARCH_MODES)}.")
 
-    pk_column_names = [c.name for c in model.__table__.primary_key.columns]
+    pk_columns = list(model.__table__.primary_key.columns)
+    pk_column_names = [c.name for c in pk_columns]
     
     query = model.query
 
     if search_term:
-        search_filters = []
-        for column in model.__table__.columns:
-            if isinstance(column.type, (String, Text)):
-                search_filters.append(column.ilike(f"%{search_term}%"))
+        clause = search_clause(model, search_term, search_mode)
+        if clause is not None:
+            query = query.filter(clause)
+
+    if 'page' in request.args:
+        page = request.args.get('page', 1, type=int)
+        pagination = query.order_by(*pk_column_names).paginate(page=page, per_page=per_page, error_out=False)
+        records = pagination.items
         
-        if search_filters:
-            query = query.filter(or_(*search_filters))
+        return jsonify({
+            "pk_columns": pk_column_names,
+            "records": [model_to_dict(r) for r in records],
+            "pagination": {
+                "total_records": pagination.total,
+                "total_pages": pagination.pages,
+                "current_page": pagination.page,
+                "per_page": pagination.per_page,
+                "has_next": pagination.has_next,
+                "has_prev": pagination.has_prev
+            }
+        })
+
+    per_page = max(1, min(per_page, MAX_PAGE_SIZE))
+    after = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            raw_values = decode_cursor(cursor)
+        except ValueError as e:
+            abort(400, description=str(e))
+        if len(raw_values) != len(pk_columns):
+            abort(400, description="El cursor no corresponde a la clave primaria de la tabla.")
+        after = [cast_value(v, c.type) for v, c in zip(raw_values, pk_columns)]
+
+    records, has_next = keyset_page(query, pk_columns, after, per_page)
+    total, is_estimate = table_count(model, query, bool(search_term)) if not cursor else (None, False)
 
-    pagination = query.order_by(*pk_column_names).paginate(page=page, per_page=per_page, error_out=False)
-    records = pagination.items
-    
     return jsonify({
         "pk_columns": pk_column_names,
         "records": [model_to_dict(r) for r in records],
         "pagination": {
-            "total_records": pagination.total,
-            "total_pages": pagination.pages,
-            "current_page": pagination.page,
-            "per_page": pagination.per_page,
-            "has_next": pagination.has_next,
-            "has_prev": pagination.has_prev
+            "per_page": per_page,
+            "has_next": has_next,
+            "next_cursor": encode_cursor(getattr(records[-1], n) for n in pk_column_names) if has_next else None,
+            # Solo en la primera página; None si es una búsqueda sobre una tabla grande.
+            "total_records": total,
+            "total_is_estimate": is_estimate,
         }
     })
 
+
+@crud_bp.route('/mantenedores/<table_name>/export', methods=['GET'])
+def export_records(table_name):
+    """Exporta la tabla completa (o lo que coincida con `q`) como NDJSON o CSV, en streaming."""
+    model = current_app.model_map.get(table_name)
+    if not model: abort(404, description=f"Tabla '{table_name}' no encontrada.")
+
+    fmt = request.args.get('format', 'ndjson', type=str).lower()
+    if fmt not in EXPORT_FORMATS:
+        abort(400, description=f"Formato inválido. Use uno de: {', '.join(EXPORT_FORMATS)}.")
+    search_term = request.args.get('q', None, type=str)
+    search_mode = request.args.get('mode', 'contains', type=str)
+
+    query = model.query
+    if search_term:
+        clause = search_clause(model, search_term, search_mode if search_mode in SEARCH_MODES else 'contains')
+        if clause is not None:
+            query = query.filter(clause)
+
+    pk_columns = list(model.__table__.primary_key.columns)
+    return Response(
+        stream_with_context(iter_export(query, pk_columns, model_to_dict, fmt)),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{table_name}.{fmt}"'},
+    )
+
 @crud_bp.route('/mantenedores/<table_name>', methods=['POST'])
 def create_record(table_name):
     """Crea un nuevo registro en una tabla."""
@@ -108,6 +181,7 @@ def create_record(table_name):
     
     db.session.add(new_record)
     db.session.commit()
+    _invalidate_caches(table_name)
     return jsonify(model_to_dict(new_record)), 201
 
 
@@ -129,6 +203,7 @@ def update_record(table_name, record_id):
             setattr(record, key, value)
             
     db.session.commit()
+    _invalidate_caches(table_name)
     return jsonify(model_to_dict(record))
 
 
@@ -144,6 +219,7 @@ def delete_record(table_name, record_id):
     
     db.session.delete(record)
     db.session.commit()
+    _invalidate_caches(table_name)
     return '', 204
 
 @crud_bp.route('/mantenedores/<table_name>/all', methods=['DELETE'])
@@ -162,6 +238,7 @@ def delete_all_records(table_name):
     try:
         rows_deleted = db.session.query(model).delete()
         db.session.commit()
+        _invalidate_caches(table_name)
         return jsonify({
             "success": True,
             "message": f"Se eliminaron {rows_deleted} registros de la tabla '{table_name}'."
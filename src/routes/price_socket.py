@@ -0,0 +1,43 @@
+# src/routes/price_socket.py
+"""Eventos de Socket.IO para el envío incremental de precios (ver `src.utils.price_push`)."""
+import logging
+
+from flask import request
+from flask_socketio import emit, join_room, leave_room
+
+from src.extensions import socketio
+from src.utils.db_io import get_latest_snapshot
+from src.utils.price_push import PUSH_ENCODINGS, encode, price_push_hub
+
+logger = logging.getLogger(__name__)
+
+
+def _send_snapshot(codes, encoding):
+    emit("price_snapshot", encode(price_push_hub.snapshot_message(get_latest_snapshot(), codes), encoding))
+
+
+@socketio.on("subscribe_prices")
+def subscribe_prices(data=None):
+    """`{codes: [...], encoding: 'json'|'msgpack'}`: entra en la sala de su filtro y recibe el snapshot completo."""
+    data = data or {}
+    codes = data.get("codes") or []
+    encoding = data.get("encoding") if data.get("encoding") in PUSH_ENCODINGS else "json"
+    room, old_room = price_push_hub.subscribe(request.sid, codes, encoding)
+    if old_room and old_room != room:
+        leave_room(old_room)
+    join_room(room)
+    logger.info(f"[PricePush] Cliente {request.sid} suscrito a '{room}'.")
+    _send_snapshot(codes, encoding)
+
+
+@socketio.on("resync_prices")
+def resync_prices(data=None):
+    """El cliente detectó un salto de secuencia: se le reenvía el snapshot de su filtro."""
+    data = data or {}
+    encoding = "msgpack" if (price_push_hub.room_of(request.sid) or "").endswith("|msgpack") else "json"
+    _send_snapshot(data.get("codes") or [], encoding)
+
+
+@socketio.on("disconnect")
+def price_client_disconnected(*args):
+    price_push_hub.unsubscribe(request.sid)
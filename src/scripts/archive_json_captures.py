@@ -0,0 +1,37 @@
+# src/scripts/archive_json_captures.py
+"""
+Migra los `acciones-precios-plus_*.json` de `LOGS_DIR` al archivo columnar de
+capturas (`CAPTURE_ARCHIVE_DIR`), omitiendo los snapshots ya archivados. Con
+`--rebuild-manifest` solo regenera el manifiesto a partir de los archivos `.arrows`
+(y de los `.arrow` de versiones anteriores).
+
+Uso:
+    python -m src.scripts.archive_json_captures [--rebuild-manifest]
+"""
+import argparse
+import logging
+
+from src.utils import capture_archive
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rebuild-manifest", action="store_true", help="Regenera manifest.jsonl")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if not capture_archive.available():
+        logger.error("pyarrow no está instalado; no se puede archivar.")
+        return
+    if args.rebuild_manifest:
+        count = capture_archive.rebuild_manifest()
+        logger.info(f"✓ Manifiesto regenerado con {count} snapshots.")
+    else:
+        count = capture_archive.import_json_files()
+        logger.info(f"✓ {count} capturas JSON archivadas.")
+
+
+if __name__ == "__main__":
+    main()
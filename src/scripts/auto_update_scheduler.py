@@ -0,0 +1,180 @@
+# src/scripts/auto_update_scheduler.py
+"""
+Auto-actualización de precios del lado del servidor.
+
+Reemplaza a los temporizadores del navegador (`autoUpdater.js`): un único ciclo en
+el loop del bot decide cuándo encolar `run_bolsa_bot` según el calendario bursátil
+de Santiago (`time_utils`). No corre en días no hábiles ni fuera de las fases de la
+jornada, y la cadencia depende de la fase:
+
+- pre-apertura: cada 10–15 min;
+- mercado abierto: el intervalo elegido en la UI (1-3, 3-5 o 5-10 min);
+- subasta de cierre: cada 1–2 min;
+- post-cierre: cada 30–40 min (captura el cierre definitivo).
+
+Al entrar en una fase se ejecuta de inmediato; dentro de ella, el siguiente disparo
+es el último más un intervalo aleatorio de su cadencia.
+"""
+from __future__ import annotations
+import asyncio
+import datetime
+import logging
+import random
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.config import AUTO_UPDATE_INTERVAL
+from src.utils.time_utils import (
+    AFTER_HOURS, CLOSE_AUCTION, OPEN, PRE_OPEN, CHILE_TZ, is_trading_day, market_phase, now_chile, phase_windows,
+)
+from .bolsa_service import submit_stocks_update
+
+logger = logging.getLogger(__name__)
+
+# Cadencia (segundos mín., máx.) por fase; la de OPEN la define el intervalo elegido.
+AUTO_UPDATE_INTERVALS: Dict[str, Tuple[int, int]] = {"1-3": (60, 180), "3-5": (180, 300), "5-10": (300, 600)}
+PHASE_CADENCE: Dict[str, Tuple[int, int]] = {
+    PRE_OPEN: (600, 900),
+    CLOSE_AUCTION: (60, 120),
+    AFTER_HOURS: (1800, 2400),
+}
+MAX_LOOKAHEAD_DAYS = 15
+PLAN_SIZE = 5
+
+
+def _midpoint(lo: float, hi: float) -> float:
+    return (lo + hi) / 2
+
+
+def next_run_after(now: datetime.datetime, last_run: Optional[datetime.datetime], open_cadence: Tuple[int, int],
+                   pick: Callable[[float, float], float] = random.uniform) -> Tuple[Optional[datetime.datetime], Optional[str]]:
+    """
+    Próximo disparo `(cuándo, fase)` a partir de `now`, o `(None, None)` si no hay días
+    hábiles en el horizonte. `pick(lo, hi)` elige el intervalo dentro de la cadencia.
+    """
+    now = now.astimezone(CHILE_TZ)
+    for offset in range(MAX_LOOKAHEAD_DAYS):
+        for phase, start, end in phase_windows(now.date() + datetime.timedelta(days=offset)):
+            if now >= end:
+                continue
+            if now < start:
+                return start, phase
+            if last_run is None or last_run < start:
+                return now, phase
+            lo, hi = open_cadence if phase == OPEN else PHASE_CADENCE[phase]
+            candidate = max(now, last_run + datetime.timedelta(seconds=pick(lo, hi)))
+            if candidate < end:
+                return candidate, phase
+    return None, None
+
+
+def build_plan(now: datetime.datetime, last_run: Optional[datetime.datetime], open_cadence: Tuple[int, int],
+               size: int = PLAN_SIZE) -> List[Dict[str, Any]]:
+    """Los próximos `size` disparos estimados (usando el punto medio de cada cadencia)."""
+    plan = []
+    cursor, last = now, last_run
+    for _ in range(size):
+        run_at, phase = next_run_after(cursor, last, open_cadence, pick=_midpoint)
+        if run_at is None:
+            break
+        plan.append({"at": run_at.isoformat(), "phase": phase})
+        cursor = last = run_at
+    return plan
+
+
+class AutoUpdateScheduler:
+    """Ciclo de auto-actualización en el loop del bot, configurable en caliente desde Flask."""
+
+    def __init__(self, interval: str = AUTO_UPDATE_INTERVAL):
+        self.interval = interval if interval in AUTO_UPDATE_INTERVALS else "off"
+        self.last_run: Optional[datetime.datetime] = None
+        self.next_run: Optional[datetime.datetime] = None
+        self.next_phase: Optional[str] = None
+        self.last_job_id: Optional[str] = None
+        self._app = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval != "off"
+
+    def start(self, app, loop: asyncio.AbstractEventLoop) -> None:
+        """Lanza el ciclo en `loop` (puede llamarse antes de que el loop empiece a correr)."""
+        if self._loop is not None:
+            return
+        self._app, self._loop = app, loop
+        asyncio.run_coroutine_threadsafe(self._run(), loop)
+        logger.info(f"[AutoUpdate] Planificador iniciado (intervalo: {self.interval}).")
+
+    def configure(self, interval: str) -> None:
+        """Cambia el intervalo de mercado abierto ('off' lo desactiva) y re-planifica de inmediato."""
+        if interval != "off" and interval not in AUTO_UPDATE_INTERVALS:
+            raise ValueError(f"Intervalo no válido: '{interval}'. Opciones: off, {', '.join(AUTO_UPDATE_INTERVALS)}.")
+        self.interval = interval
+        logger.info(f"[AutoUpdate] Intervalo configurado: {interval}.")
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def status(self) -> Dict[str, Any]:
+        now = now_chile()
+        plan = build_plan(now, self.last_run, AUTO_UPDATE_INTERVALS[self.interval]) if self.enabled else []
+        return {
+            "interval": self.interval,
+            "enabled": self.enabled,
+            "running": self._loop is not None,
+            "now": now.isoformat(),
+            "phase": market_phase(now),
+            "trading_day": is_trading_day(now.date()),
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_job_id": self.last_job_id,
+            "next_run": self.next_run.isoformat() if self.enabled and self.next_run else None,
+            "next_phase": self.next_phase if self.enabled else None,
+            "plan": plan,
+        }
+
+    async def _sleep(self, seconds: Optional[float]) -> bool:
+        """Duerme hasta `seconds` (None = indefinido). True si se despertó por un cambio de configuración."""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            return False
+        self._wakeup.clear()
+        return True
+
+    async def _run(self) -> None:
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                if not self.enabled:
+                    self.next_run = self.next_phase = None
+                    await self._sleep(None)
+                    continue
+
+                run_at, phase = next_run_after(now_chile(), self.last_run, AUTO_UPDATE_INTERVALS[self.interval])
+                self.next_run, self.next_phase = run_at, phase
+                if run_at is None:
+                    await self._sleep(6 * 3600)
+                    continue
+
+                delay = (run_at - now_chile()).total_seconds()
+                if delay > 0:
+                    logger.info(f"[AutoUpdate] Próxima actualización ({phase}) a las {run_at.strftime('%Y-%m-%d %H:%M:%S')}.")
+                    if await self._sleep(delay):
+                        continue
+                await self._trigger(phase)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[AutoUpdate] Error en el ciclo de auto-actualización: {e}", exc_info=True)
+                await asyncio.sleep(60)
+
+    async def _trigger(self, phase: str) -> None:
+        self.last_run = now_chile()
+        # `submit_stocks_update` consulta el filtro guardado en la DB: fuera del loop del bot.
+        job, created = await asyncio.to_thread(submit_stocks_update, self._app, is_auto_update=True)
+        self.last_job_id = job.id
+        logger.info(f"[AutoUpdate] Actualización automática ({phase}) "
+                    f"{'encolada' if created else 'fusionada con el trabajo en cola'}: {job.id}.")
+
+
+auto_update_scheduler = AutoUpdateScheduler()
@@ -0,0 +1,25 @@
+# src/scripts/backfill_snapshot_summaries.py
+"""
+Reconstruye la tabla `snapshot_summaries` a partir de `stock_prices`.
+
+Uso:
+    python -m src.scripts.backfill_snapshot_summaries
+"""
+import logging
+
+from src.main import app
+from src.extensions import db
+from src.utils.history_summary import backfill_snapshot_summaries
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    with app.app_context():
+        db.create_all()
+        count = backfill_snapshot_summaries()
+        logger.info(f"✓ {count} resúmenes de snapshots reconstruidos.")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,9 @@
 
 from __future__ import annotations
 import asyncio
+import json
 import logging
-import traceback
+import os
 import time
 import random
 from datetime import datetime
@@ -11,23 +12,73 @@ from typing import List, Optional
 from flask import current_app
 from playwright.async_api import Page, TimeoutError as PlaywrightTimeoutError, Error as PlaywrightError
 
-from .bot_page_manager import get_page, recreate_page
+from .bot_page_manager import PRICES_PAGE, checkin_page, checkout_page, recreate_page, warm_up_pages
 from .bot_login import auto_login, LoginError, TARGET_DATA_PAGE_URL, BASE_URL
-from .bot_data_capture import capture_market_time, capture_premium_data_via_network, validate_premium_data, DataCaptureError
-from src.utils.db_io import store_prices_in_db, save_filtered_comparison_history
+from .bot_data_capture import (
+    capture_market_time, capture_premium_data_via_network, validate_premium_data, DataCaptureError,
+    can_fetch_direct, capture_direct, forget_learned_requests,
+)
+from src.config import CAPTURE_MODE
+from src.models import StockFilter
+from .job_scheduler import job_scheduler, STOCKS_JOB, PRIORITY_HIGH, PRIORITY_LOW
+from src.utils.db_io import STORED, UNCHANGED, store_prices_in_db, save_filtered_comparison_history
+from src.utils.capture_archive import archive_capture
 from src.extensions import socketio
-from src.routes.errors import log_error
 from src.utils.page_utils import _ensure_target_page
-from src.utils.time_utils import get_fallback_market_time
+from src.utils.time_utils import CLOSE_AUCTION, OPEN, PRE_OPEN, get_fallback_market_time, market_phase, now_chile
+from src.utils.capture_stats import capture_stats
 
 logger = logging.getLogger(__name__)
 _bot_running_lock = asyncio.Lock()
 _is_first_run_since_startup = True
+# Referencia al precalentamiento en segundo plano: sin ella la tarea puede ser recolectada a mitad de camino.
+_warm_up_task: asyncio.Task | None = None
 
 def is_bot_running():
     """Devuelve True si el lock asíncrono del bot está tomado."""
     return _bot_running_lock.locked()
 
+def _log_warm_up_result(task: asyncio.Task) -> None:
+    """Done-callback del precalentamiento: registra su error en vez de dejarlo sin recuperar."""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("[PageManager] Falló el precalentamiento de páginas.", exc_info=task.exception())
+
+def fallback_capture_time() -> datetime:
+    """
+    Hora para una captura sin hora del mercado: la actual de Santiago si la rueda está en
+    curso (nunca el cierre anterior, que sobrescribiría ese snapshot con precios del día),
+    si no la del último cierre. Sin zona horaria, como la que entrega la API.
+    """
+    now = now_chile()
+    market_time = now if market_phase(now) in (PRE_OPEN, OPEN, CLOSE_AUCTION) else get_fallback_market_time()
+    return market_time.replace(tzinfo=None, microsecond=0)
+
+def submit_stocks_update(app, is_auto_update: bool = False):
+    """
+    Encola una actualización de precios en el planificador de trabajos, aplicando el
+    filtro de acciones guardado. Las manuales van con prioridad alta y las automáticas
+    con prioridad baja; una solicitud idéntica a una ya activa se fusiona con ella.
+    Devuelve `(job, created)`.
+    """
+    with app.app_context():
+        stock_filter = StockFilter.query.first()
+        filtered_symbols = json.loads(stock_filter.codes_json or '[]') if stock_filter and not stock_filter.all else None
+        if filtered_symbols:
+             logger.info(f"[Service] Se aplicará un filtro para la actualización. Símbolos: {filtered_symbols}")
+
+    bot_kwargs = {
+        "app": app,
+        "username": os.getenv("BOLSA_USERNAME"),
+        "password": os.getenv("BOLSA_PASSWORD"),
+        "filtered_symbols": filtered_symbols
+    }
+    return job_scheduler.submit(
+        STOCKS_JOB, lambda: run_bolsa_bot(**bot_kwargs),
+        key=json.dumps(sorted(filtered_symbols or [])),
+        priority=PRIORITY_LOW if is_auto_update else PRIORITY_HIGH,
+        timeout=400,
+    )
+
 async def check_if_logged_in(page: Page) -> bool:
     logger.info("[Service] Verificando si existe una sesión activa...")
     if "validate.perfdrive.com" in page.url or "radware" in page.url:
@@ -79,14 +130,93 @@ async def perform_session_health_check(page: Page, username: str, password: str)
 
 async def _attempt_data_capture(page: Page) -> tuple[datetime | None, dict | None]:
     logger.info("Preparando captura concurrente y recarga de página...")
+    started = time.perf_counter()
     time_task = asyncio.create_task(capture_market_time(page, logger))
     data_task = asyncio.create_task(capture_premium_data_via_network(page, logger))
     await asyncio.sleep(0.1)
     logger.info("Disparando recarga de página...")
-    await page.reload(wait_until="domcontentloaded", timeout=30000)
-    market_time, raw_data = await asyncio.gather(time_task, data_task)
+    try:
+        await page.reload(wait_until="domcontentloaded", timeout=30000)
+        market_time, raw_data = await asyncio.gather(time_task, data_task)
+    except Exception:
+        capture_stats.record("reload", time.perf_counter() - started, ok=False)
+        raise
+    elapsed = capture_stats.record("reload", time.perf_counter() - started, ok=bool(market_time and raw_data))
+    logger.info(f"[Capture] Captura por recarga completada en {elapsed * 1000:.0f} ms.")
+    return market_time, raw_data
+
+async def _attempt_direct_capture(page: Page) -> tuple[datetime | None, dict | None]:
+    """
+    Captura llamando directamente a la API JSON. Devuelve (None, None) si falla, para recurrir
+    a la recarga; también si faltó la hora del mercado, para no fechar los precios con otra.
+    """
+    started = time.perf_counter()
+    try:
+        market_time, raw_data = await capture_direct(page, logger)
+        if not market_time:
+            raise DataCaptureError("no se obtuvo la hora del mercado")
+    except Exception as e:
+        capture_stats.record("direct", time.perf_counter() - started, ok=False)
+        logger.warning(f"[Capture] Falló la captura directa ({e}). Se recurrirá a recargar la página.")
+        return None, None
+    elapsed = capture_stats.record("direct", time.perf_counter() - started, ok=True)
+    logger.info(f"[Capture] Captura directa completada en {elapsed * 1000:.0f} ms.")
     return market_time, raw_data
 
+async def _capture_with_reload(page: Page, username: str, password: str) -> tuple[Page, datetime | None, dict | None]:
+    """Flujo completo: chequeo de sesión, navegación a la página de datos y captura recargando la página."""
+    global _is_first_run_since_startup, _warm_up_task
+
+    logger.info("🚀 Fase 1: Chequeo y establecimiento de Sesión.")
+    page = await perform_session_health_check(page, username, password)
+    
+    if _is_first_run_since_startup:
+        _is_first_run_since_startup = False
+        socketio.emit("initial_session_ready")
+        logger.info("✓ Navegador y sesión inicial listos. Notificación enviada al frontend.")
+        # Con la sesión ya iniciada, precalienta en segundo plano las pestañas de dividendos y cierre.
+        _warm_up_task = asyncio.create_task(warm_up_pages())
+        _warm_up_task.add_done_callback(_log_warm_up_result)
+
+    logger.info("🎬 Fase 2: Captura de Datos de Precios de Acciones.")
+    
+    # La verificación de _ensure_target_page ahora es una doble seguridad,
+    # pero la navegación principal ocurre en perform_session_health_check.
+    if not await _ensure_target_page(page, logger):
+         raise DataCaptureError("No se pudo asegurar la página de destino para la captura de acciones.")
+
+    max_attempts = 3
+    market_time, raw_data = None, None
+    
+    for attempt in range(1, max_attempts + 1):
+        logger.info(f"--- Intento de captura de acciones {attempt}/{max_attempts} ---")
+        try:
+            if not page or page.is_closed():
+                logger.warning("[Capture] La página fue cerrada. Recreando y navegando a la página de datos...")
+                page = await recreate_page()
+                await page.goto(TARGET_DATA_PAGE_URL, wait_until="domcontentloaded", timeout=20000)
+
+            market_time, raw_data = await _attempt_data_capture(page)
+            
+            if market_time and raw_data:
+                logger.info(f"✓ Captura de acciones exitosa en el intento {attempt}.")
+                break
+            
+            missing = []
+            if not market_time: missing.append("hora del mercado")
+            if not raw_data: missing.append("datos de precios")
+            logger.warning(f"Intento de captura de acciones {attempt} fallido. Faltan datos: {', '.join(missing)}.")
+            
+        except Exception as e:
+            logger.error(f"Error grave en el intento de captura de acciones {attempt}: {e}", exc_info=True)
+            page = None # Forzar recreación en el siguiente intento
+
+        if attempt < max_attempts:
+            await asyncio.sleep(attempt * 2)
+        else:
+             logger.error("Se agotaron los reintentos de captura de acciones.")
+    return page, market_time, raw_data
+
 async def run_bolsa_bot(app=None, username=None, password=None, filtered_symbols: Optional[List[str]] = None, **kwargs) -> str | None:
     global _is_first_run_since_startup
     
@@ -97,60 +227,25 @@ async def run_bolsa_bot(app=None, username=None, password=None, filtered_symbols
         return "ignored_already_running"
     
     page = None
+    page_checked_out = False
     try:
         logger.info(f"=== INICIO DE EJECUCIÓN DEL BOT (Primera vez: {_is_first_run_since_startup}) ===")
-        page = await get_page()
-        
-        logger.info("🚀 Fase 1: Chequeo y establecimiento de Sesión.")
-        page = await perform_session_health_check(page, username, password)
-        
-        if _is_first_run_since_startup:
-            _is_first_run_since_startup = False
-            socketio.emit("initial_session_ready")
-            logger.info("✓ Navegador y sesión inicial listos. Notificación enviada al frontend.")
-
-        logger.info("🎬 Fase 2: Captura de Datos de Precios de Acciones.")
-        
-        # La verificación de _ensure_target_page ahora es una doble seguridad,
-        # pero la navegación principal ocurre en perform_session_health_check.
-        if not await _ensure_target_page(page, logger):
-             raise DataCaptureError("No se pudo asegurar la página de destino para la captura de acciones.")
+        # Reserva la pestaña de precios del pool; dividendos/cierre usan sus propias pestañas.
+        page = await checkout_page(PRICES_PAGE, navigate=False)
+        page_checked_out = True
 
-        max_attempts = 3
         market_time, raw_data = None, None
-        
-        for attempt in range(1, max_attempts + 1):
-            logger.info(f"--- Intento de captura de acciones {attempt}/{max_attempts} ---")
-            try:
-                if not page or page.is_closed():
-                    logger.warning("[Capture] La página fue cerrada. Recreando y navegando a la página de datos...")
-                    page = await recreate_page()
-                    await page.goto(TARGET_DATA_PAGE_URL, wait_until="domcontentloaded", timeout=20000)
-
-                market_time, raw_data = await _attempt_data_capture(page)
-                
-                if market_time and raw_data:
-                    logger.info(f"✓ Captura de acciones exitosa en el intento {attempt}.")
-                    break
-                
-                missing = []
-                if not market_time: missing.append("hora del mercado")
-                if not raw_data: missing.append("datos de precios")
-                logger.warning(f"Intento de captura de acciones {attempt} fallido. Faltan datos: {', '.join(missing)}.")
-                
-            except Exception as e:
-                logger.error(f"Error grave en el intento de captura de acciones {attempt}: {e}", exc_info=True)
-                page = None # Forzar recreación en el siguiente intento
-
-            if attempt < max_attempts:
-                await asyncio.sleep(attempt * 2)
-            else:
-                 logger.error("Se agotaron los reintentos de captura de acciones.")
+        if CAPTURE_MODE == "direct" and not _is_first_run_since_startup and can_fetch_direct():
+            logger.info("⚡ Captura directa vía API con la sesión activa (sin recargar la página).")
+            market_time, raw_data = await _attempt_direct_capture(page)
+
+        if not raw_data:
+            page, market_time, raw_data = await _capture_with_reload(page, username, password)
         
         if not market_time:
             logger.warning("No se pudo interceptar la hora del mercado. Usando hora de fallback.")
-            market_time = get_fallback_market_time()
-            logger.info(f"✓ Usando hora de fallback: {market_time.strftime('%Y-%m-%d %H:%M:%S %Z')}")
+            market_time = fallback_capture_time()
+            logger.info(f"✓ Usando hora de fallback: {market_time.strftime('%Y-%m-%d %H:%M:%S')}")
 
         if not raw_data:
             raise DataCaptureError("No se pudieron capturar los datos de precios después de varios intentos.")
@@ -161,23 +256,32 @@ async def run_bolsa_bot(app=None, username=None, password=None, filtered_symbols
         logger.info(f"✓ Datos de acciones capturados. Timestamp: {market_time.strftime('%Y-%m-%d %H:%M:%S')}")
         
         with (app or current_app).app_context():
-            store_prices_in_db(raw_data, market_time, app=app, filtered_symbols=filtered_symbols)
-            save_filtered_comparison_history(market_timestamp=market_time, app=app)
+            result = store_prices_in_db(raw_data, market_time, app=app, filtered_symbols=filtered_symbols)
+            if result == STORED:
+                save_filtered_comparison_history(market_timestamp=market_time, app=app)
+        if result != UNCHANGED:
+            # Copia columnar de la captura completa para el fallback de archivos (no bloquea el loop);
+            # también si la DB falló, que es cuando el fallback hace falta.
+            await asyncio.to_thread(archive_capture, raw_data, market_time)
             
         return "update_complete"
 
     except Exception as e:
         if isinstance(e, (LoginError, DataCaptureError)):
             _is_first_run_since_startup = True 
+        if isinstance(e, LoginError):
+            # Las cabeceras y URLs aprendidas son de la sesión vencida: se reaprenden tras el nuevo login.
+            forget_learned_requests()
         
         error_message = f"Error crítico en la ejecución del bot: {str(e)}"
+        # `LogSinkHandler` ya persiste este registro (con su stack) en `log_entries`.
         logger.error(error_message, exc_info=True)
         socketio.emit("bot_error", {"message": str(e)})
-        with (app or current_app).app_context():
-            log_error("bot_automation", str(e), traceback.format_exc())
         return f"error: {e}"
         
     finally:
+        if page_checked_out:
+            await checkin_page(PRICES_PAGE)
         if _bot_running_lock.locked():
              _bot_running_lock.release()
         logger.info("=== FIN DE EJECUCIÓN DEL BOT ===")
\ No newline at end of file
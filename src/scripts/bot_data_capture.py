@@ -1,5 +1,7 @@
+import asyncio
 import json
 import logging
+from dataclasses import dataclass
 from typing import Tuple, Any, Dict, Optional
 from datetime import datetime
 from playwright.async_api import Page, Response, TimeoutError as PlaywrightTimeoutError
@@ -10,6 +12,105 @@ class DataCaptureError(Exception): pass
 MARKET_TIME_URL_FRAGMENT = "api/Comunes/getHoraMercado"
 SESSION_STATUS_URL_FRAGMENT = "api/Comunes/getEstadoSesionUsuario"
 
+PRICES_REQUEST = "prices"
+MARKET_TIME_REQUEST = "market_time"
+DIRECT_FETCH_TIMEOUT_MS = 15000
+
+# Cabeceras que no se reenvían: las gestiona el propio cliente HTTP (o el contexto, en el caso de las cookies).
+_SKIPPED_HEADERS = {"cookie", "content-length", "host", "connection", "accept-encoding"}
+
+@dataclass
+class LearnedRequest:
+    """Petición a la API observada durante una recarga, reutilizable para llamadas directas."""
+    url: str
+    method: str
+    headers: Dict[str, str]
+    post_data: Optional[str]
+
+# Peticiones aprendidas de la última captura por recarga, por tipo (precios / hora del mercado)
+_LEARNED_REQUESTS: Dict[str, LearnedRequest] = {}
+
+async def _remember_request(key: str, response: Response) -> None:
+    request = response.request
+    try:
+        headers = await request.all_headers()
+    except Exception:
+        headers = request.headers
+    _LEARNED_REQUESTS[key] = LearnedRequest(
+        url=request.url, method=request.method,
+        headers={k: v for k, v in headers.items() if not k.startswith(":") and k.lower() not in _SKIPPED_HEADERS},
+        post_data=request.post_data,
+    )
+
+def can_fetch_direct() -> bool:
+    """True si ya se observó la petición de precios (requisito para el modo directo)."""
+    return PRICES_REQUEST in _LEARNED_REQUESTS
+
+def forget_learned_requests() -> None:
+    _LEARNED_REQUESTS.clear()
+
+def _parse_market_time(data: Dict[str, Any]) -> datetime:
+    hora_str = data.get("HORA")
+    if not hora_str: raise DataCaptureError("API de hora no contiene 'HORA'.")
+    try: return datetime.strptime(hora_str, "%Y-%m-%d %H:%M:%S.%f")
+    except ValueError: return datetime.strptime(hora_str, "%Y-%m-%d %H:%M:%S")
+
+async def _refreshed_headers(page: Page, learned: LearnedRequest) -> Dict[str, str]:
+    """Copia las cabeceras aprendidas actualizando los tokens CSRF/XSRF con las cookies vigentes."""
+    headers = dict(learned.headers)
+    token_headers = [k for k in headers if "xsrf" in k.lower() or "csrf" in k.lower()]
+    if token_headers:
+        cookies = {c["name"].lower(): c["value"] for c in await page.context.cookies(learned.url)}
+        token = next((v for name, v in cookies.items() if "xsrf" in name or "csrf" in name), None)
+        if token:
+            for k in token_headers:
+                headers[k] = token
+    return headers
+
+async def fetch_json_direct(page: Page, key: str) -> Any:
+    """Repite una petición aprendida con `page.request` (comparte cookies con el contexto de la página)."""
+    learned = _LEARNED_REQUESTS.get(key)
+    if not learned:
+        raise DataCaptureError(f"No hay una petición '{key}' aprendida para el modo directo.")
+    response = await page.request.fetch(
+        learned.url, method=learned.method, headers=await _refreshed_headers(page, learned),
+        data=learned.post_data, timeout=DIRECT_FETCH_TIMEOUT_MS, max_redirects=0,
+    )
+    if response.status != 200:
+        raise DataCaptureError(f"La API respondió {response.status} en modo directo ({key}).")
+    try:
+        return await response.json()
+    except Exception as e:
+        # Una sesión expirada suele devolver HTML (página de login) en vez de JSON.
+        raise DataCaptureError(f"Respuesta no JSON en modo directo ({key}): {e}") from e
+
+async def capture_direct(page: Page, logger_instance=None) -> Tuple[Optional[datetime], Dict[str, Any]]:
+    """
+    Captura precios (y hora del mercado, si se aprendió) llamando directamente a la API JSON,
+    sin recargar la página. Lanza `DataCaptureError` si los precios no se pudieron obtener.
+    """
+    log = logger_instance or logging.getLogger(__name__)
+    tasks = [fetch_json_direct(page, PRICES_REQUEST)]
+    if MARKET_TIME_REQUEST in _LEARNED_REQUESTS:
+        tasks.append(fetch_json_direct(page, MARKET_TIME_REQUEST))
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    raw_data = results[0]
+    if isinstance(raw_data, Exception):
+        raise raw_data if isinstance(raw_data, DataCaptureError) else DataCaptureError(str(raw_data))
+    if not validate_premium_data(raw_data):
+        raise DataCaptureError("El formato de los datos obtenidos en modo directo no es válido.")
+
+    market_time = None
+    if len(results) > 1:
+        try:
+            if isinstance(results[1], Exception): raise results[1]
+            market_time = _parse_market_time(results[1])
+        except Exception as e:
+            log.warning(f"[DataCapture] No se obtuvo la hora del mercado en modo directo: {e}")
+    log.info("[DataCapture] ✓ Precios obtenidos en modo directo (sin recargar la página).")
+    return market_time, raw_data
+
 async def capture_market_time(page: Page, logger_instance=None) -> Optional[datetime]:
     log = logger_instance or logging.getLogger(__name__)
     log.info("[DataCapture] 🕒 Escuchando por la hora del mercado...")
@@ -18,11 +119,8 @@ async def capture_market_time(page: Page, logger_instance=None) -> Optional[date
     try:
         async with page.expect_response(is_time_response, timeout=15000) as response_info:
             response = await response_info.value
-        data = await response.json()
-        hora_str = data.get("HORA")
-        if not hora_str: raise DataCaptureError("API de hora no contiene 'HORA'.")
-        try: market_time = datetime.strptime(hora_str, "%Y-%m-%d %H:%M:%S.%f")
-        except ValueError: market_time = datetime.strptime(hora_str, "%Y-%m-%d %H:%M:%S")
+        market_time = _parse_market_time(await response.json())
+        await _remember_request(MARKET_TIME_REQUEST, response)
         log.info(f"[DataCapture] ✓ Hora del mercado interceptada: {market_time}")
         return market_time
     except Exception as e:
@@ -38,7 +136,9 @@ async def capture_premium_data_via_network(page: Page, logger_instance=None) ->
         async with page.expect_response(is_target_response, timeout=30000) as response_info:
             response = await response_info.value
         log.info(f"[DataCapture] ✓ ¡Precios capturados! URL: {response.url}")
-        return await response.json()
+        data = await response.json()
+        await _remember_request(PRICES_REQUEST, response)
+        return data
     except Exception as e:
         log.error(f"[DataCapture] Fallo al capturar precios: {e}")
         return None
@@ -4,22 +4,36 @@ from __future__ import annotations
 import asyncio
 import logging
 import os
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
 
 from playwright.async_api import async_playwright, Browser, Page, Playwright, BrowserContext
 from playwright_stealth import Stealth
 
-from src.config import STORAGE_STATE_PATH
+from src.config import STORAGE_STATE_PATH, TARGET_DATA_PAGE_URL, CLOSING_PAGE_URL, DIVIDEND_PAGE_URL
 # --- INICIO DE LA MODIFICACIÓN: Importar nueva función de config ---
 from .bot_config import get_playwright_context_options, get_extra_headers, get_browser_launch_options
 # --- FIN DE LA MODIFICACIÓN ---
 
 _LOG = logging.getLogger(__name__)
 
+# Pool de páginas: una pestaña por destino dentro de un único contexto, de modo que
+# todas comparten las cookies/`storage_state` de la sesión iniciada.
+PRICES_PAGE = "prices"
+CLOSING_PAGE = "cierre_bursatil"
+DIVIDENDS_PAGE = "dividendos"
+PAGE_TARGETS: Dict[str, str] = {
+    PRICES_PAGE: TARGET_DATA_PAGE_URL,
+    CLOSING_PAGE: CLOSING_PAGE_URL,
+    DIVIDENDS_PAGE: DIVIDEND_PAGE_URL,
+}
+HEALTH_CHECK_TIMEOUT = 5.0
+
 _PLAYWRIGHT: Optional[Playwright] = None
 _BROWSER: Optional[Browser] = None
-_PAGE: Optional[Page] = None
 _CONTEXT: Optional[BrowserContext] = None
+_PAGES: Dict[str, Page] = {}
+_PAGE_LOCKS: Dict[str, asyncio.Lock] = {}
 _page_creation_lock = asyncio.Lock()
 
 async def _get_playwright_instance() -> Playwright:
@@ -29,66 +43,165 @@ async def _get_playwright_instance() -> Playwright:
         _PLAYWRIGHT = await async_playwright().start()
     return _PLAYWRIGHT
 
-async def recreate_page() -> Page:
-    global _PAGE, _CONTEXT
-    
+def _check_target(target: str) -> None:
+    if target not in PAGE_TARGETS:
+        raise ValueError(f"Destino de página desconocido: '{target}'. Opciones: {', '.join(PAGE_TARGETS)}")
+
+async def _is_page_healthy(page: Optional[Page]) -> bool:
+    """Una página sana no está cerrada y responde a una evaluación trivial de JS."""
+    if page is None or page.is_closed():
+        return False
+    try:
+        await asyncio.wait_for(page.evaluate("() => document.readyState"), timeout=HEALTH_CHECK_TIMEOUT)
+        return True
+    except Exception as e:
+        _LOG.warning(f"[PageManager] La página no respondió al chequeo de salud: {e}")
+        return False
+
+async def _get_context() -> BrowserContext:
+    """Devuelve el contexto compartido, lanzando navegador/contexto si es necesario. Requiere `_page_creation_lock`."""
+    global _BROWSER, _CONTEXT
+
+    if _CONTEXT and _BROWSER and _BROWSER.is_connected():
+        return _CONTEXT
+
+    pw = await _get_playwright_instance()
+
+    if not (_BROWSER and _BROWSER.is_connected()):
+        _LOG.info("[PageManager] 🚀 Lanzando nueva instancia de navegador Chromium con opciones de evasión...")
+        # --- INICIO DE LA MODIFICACIÓN: Usar nuevas opciones de lanzamiento ---
+        launch_options = get_browser_launch_options()
+        _BROWSER = await pw.chromium.launch(**launch_options)
+        # --- FIN DE LA MODIFICACIÓN ---
+        _PAGES.clear()
+
+    storage_state = STORAGE_STATE_PATH if os.path.exists(STORAGE_STATE_PATH) else None
+    if storage_state: _LOG.info(f"[PageManager] Estado de sesión encontrado. Se cargará.")
+
+    context_options = get_playwright_context_options(storage_state_path=storage_state)
+    _LOG.info("[PageManager] Creando nuevo contexto de navegador...")
+    _CONTEXT = await _BROWSER.new_context(**context_options)
+
+    _LOG.info("[PageManager] Aplicando capa de evasión (stealth)...")
+    stealth_instance = Stealth()
+    await stealth_instance.apply_stealth_async(_CONTEXT)
+
+    _CONTEXT.on("close", _save_session_state_sync_wrapper)
+    return _CONTEXT
+
+async def recreate_page(target: str = PRICES_PAGE) -> Page:
+    """
+    Cierra y vuelve a crear solo la página de `target`; las demás páginas del pool
+    (posiblemente en uso por otros trabajos) no se tocan. El contexto compartido se
+    recrea únicamente si ya no es utilizable.
+    """
+    _check_target(target)
+
     async with _page_creation_lock:
-        _LOG.warning("[PageManager] Solicitud para recrear la página. Cerrando instancias actuales si existen...")
-        
-        if _PAGE and not _PAGE.is_closed():
-            try: await _PAGE.close()
+        _LOG.warning(f"[PageManager] Solicitud para recrear la página '{target}'. Cerrando instancia actual si existe...")
+
+        page = _PAGES.pop(target, None)
+        if page and not page.is_closed():
+            try: await page.close()
             except Exception as e: _LOG.error(f"[PageManager] Error al cerrar página existente: {e}")
-        
-        if _CONTEXT:
-             try:
-                await _CONTEXT.close()
-             except Exception as e:
-                _LOG.error(f"[PageManager] Error al cerrar contexto existente: {e}")
-
-        _PAGE = None
-        _CONTEXT = None
-        _LOG.info("[PageManager] Instancias de página y contexto limpiadas.")
-    
-    return await get_page()
-
-async def get_page() -> Page:
-    global _BROWSER, _PAGE, _CONTEXT
-    
+        _LOG.info(f"[PageManager] Página '{target}' limpiada.")
+
+    return await get_page(target)
+
+async def get_page(target: str = PRICES_PAGE) -> Page:
+    """Devuelve la página dedicada a `target` (sin reservarla), creándola si no existe o está cerrada."""
+    global _CONTEXT
+    _check_target(target)
+
     async with _page_creation_lock:
-        if _PAGE and not _PAGE.is_closed():
-            _LOG.info("[PageManager] ✓ Reutilizando conexión de página existente.")
-            return _PAGE
-            
-        pw = await _get_playwright_instance()
-        
-        if not (_BROWSER and _BROWSER.is_connected()):
-            _LOG.info("[PageManager] 🚀 Lanzando nueva instancia de navegador Chromium con opciones de evasión...")
-            # --- INICIO DE LA MODIFICACIÓN: Usar nuevas opciones de lanzamiento ---
-            launch_options = get_browser_launch_options()
-            _BROWSER = await pw.chromium.launch(**launch_options)
-            # --- FIN DE LA MODIFICACIÓN ---
-
-        storage_state = STORAGE_STATE_PATH if os.path.exists(STORAGE_STATE_PATH) else None
-        if storage_state: _LOG.info(f"[PageManager] Estado de sesión encontrado. Se cargará.")
-        
-        context_options = get_playwright_context_options(storage_state_path=storage_state)
-        _LOG.info("[PageManager] Creando nuevo contexto de navegador...")
-        _CONTEXT = await _BROWSER.new_context(**context_options)
-        
-        _LOG.info("[PageManager] Aplicando capa de evasión (stealth)...")
-        stealth_instance = Stealth()
-        await stealth_instance.apply_stealth_async(_CONTEXT)
-
-        _CONTEXT.on("close", _save_session_state_sync_wrapper)
-
-        _LOG.info("[PageManager] Creando una nueva página desde el contexto modificado...")
-        _PAGE = await _CONTEXT.new_page()
-        
-        await _PAGE.set_extra_http_headers(get_extra_headers())
-        
+        page = _PAGES.get(target)
+        if page and not page.is_closed() and _CONTEXT:
+            _LOG.info(f"[PageManager] ✓ Reutilizando página existente '{target}'.")
+            return page
+
+        context = await _get_context()
+        _LOG.info(f"[PageManager] Creando una nueva página '{target}' desde el contexto compartido...")
+        try:
+            page = await context.new_page()
+        except Exception as e:
+            _LOG.warning(f"[PageManager] El contexto compartido no es utilizable ({e}). Recreándolo...")
+            _CONTEXT = None
+            _PAGES.clear()
+            page = await (await _get_context()).new_page()
+
+        await page.set_extra_http_headers(get_extra_headers())
+        _PAGES[target] = page
+
         _LOG.info("[PageManager] ✓ Página creada y configurada con éxito. Lista para navegar.")
-        
-        return _PAGE
+        return page
+
+async def checkout_page(target: str, navigate: bool = True) -> Page:
+    """
+    Reserva la página de `target` para uso exclusivo hasta `checkin_page`. Si la
+    página no pasa el chequeo de salud se recrea; con `navigate` se asegura que
+    esté en la URL de su destino (solo navega si no lo está).
+    """
+    _check_target(target)
+    lock = _PAGE_LOCKS.setdefault(target, asyncio.Lock())
+    await lock.acquire()
+    try:
+        page = _PAGES.get(target)
+        if not await _is_page_healthy(page):
+            page = await (recreate_page(target) if page is not None else get_page(target))
+        if navigate and PAGE_TARGETS[target] not in page.url:
+            _LOG.info(f"[PageManager] Calentando página '{target}' en {PAGE_TARGETS[target]}...")
+            await page.goto(PAGE_TARGETS[target], wait_until="domcontentloaded", timeout=30000)
+        return page
+    except BaseException:
+        lock.release()
+        raise
+
+async def checkin_page(target: str, page: Optional[Page] = None, discard: bool = False) -> None:
+    """Libera la página de `target`. Con `discard` se cierra para que la próxima reserva la recree."""
+    if discard and page is not None and _PAGES.get(target) is page:
+        _PAGES.pop(target, None)
+        if not page.is_closed():
+            try: await page.close()
+            except Exception as e: _LOG.error(f"[PageManager] Error al descartar la página '{target}': {e}")
+    lock = _PAGE_LOCKS.get(target)
+    if lock and lock.locked():
+        lock.release()
+
+@asynccontextmanager
+async def pooled_page(target: str, navigate: bool = True) -> AsyncIterator[Page]:
+    """`async with pooled_page("dividendos") as page:` — checkout/checkin automáticos."""
+    page = await checkout_page(target, navigate=navigate)
+    discard = False
+    try:
+        yield page
+    except Exception:
+        discard = page.is_closed()
+        raise
+    finally:
+        await checkin_page(target, page, discard=discard)
+
+async def warm_up_pages(*targets: str) -> None:
+    """Abre y navega en paralelo las páginas indicadas (por defecto, todas salvo precios)."""
+    targets = targets or tuple(t for t in PAGE_TARGETS if t != PRICES_PAGE)
+
+    async def _warm(target: str):
+        try:
+            async with pooled_page(target):
+                pass
+        except Exception as e:
+            _LOG.warning(f"[PageManager] No se pudo precalentar la página '{target}': {e}")
+
+    await asyncio.gather(*(_warm(t) for t in targets))
+
+def pool_status() -> Dict[str, Dict[str, object]]:
+    """Estado del pool para diagnóstico: si cada página está abierta, reservada y su URL actual."""
+    status = {}
+    for target in PAGE_TARGETS:
+        page = _PAGES.get(target)
+        is_open = bool(page and not page.is_closed())
+        lock = _PAGE_LOCKS.get(target)
+        status[target] = {"open": is_open, "in_use": bool(lock and lock.locked()), "url": page.url if is_open else None}
+    return status
 
 def _save_session_state_sync_wrapper():
     try:
@@ -109,18 +222,20 @@ async def _save_session_state():
         _LOG.error(f"[PageManager] No se pudo guardar el estado de la sesión (probablemente ya estaba cerrado): {e}")
 
 async def close_browser() -> None:
-    global _BROWSER, _PLAYWRIGHT, _PAGE, _CONTEXT
+    global _BROWSER, _PLAYWRIGHT, _CONTEXT
     _LOG.info("[PageManager] Iniciando cierre de recursos de Playwright...")
-    
+
     await _save_session_state()
 
     try:
-        if _PAGE and not _PAGE.is_closed(): await _PAGE.close()
+        for page in _PAGES.values():
+            if not page.is_closed(): await page.close()
         if _CONTEXT: await _CONTEXT.close()
         if _BROWSER and _BROWSER.is_connected(): await _BROWSER.close()
         if _PLAYWRIGHT: await _PLAYWRIGHT.stop()
     except Exception as e:
         _LOG.error(f"Error durante el cierre limpio de Playwright: {e}")
-        
-    _BROWSER, _PLAYWRIGHT, _PAGE, _CONTEXT = None, None, None, None
-    _LOG.info("[PageManager] ✓ Recursos de Playwright cerrados.")
\ No newline at end of file
+
+    _BROWSER, _PLAYWRIGHT, _CONTEXT = None, None, None
+    _PAGES.clear()
+    _LOG.info("[PageManager] ✓ Recursos de Playwright cerrados.")
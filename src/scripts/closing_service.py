@@ -8,12 +8,13 @@ from typing import List, Dict, Any
 from playwright.async_api import Page, TimeoutError as PlaywrightTimeoutError
 from sqlalchemy.dialects.postgresql import insert
 
+from src.config import CLOSING_PAGE_URL
 from src.extensions import db
 from src.models import StockClosing
+from src.utils.dashboard_views import refresh_dashboards
 
 logger = logging.getLogger(__name__)
 
-CLOSING_PAGE_URL = "https://www.bolsadesantiago.com/cierre_bursatil"
 CLOSING_API_PATTERN = "api/RV_ResumenMercado/getCierreBursatilAnterior"
 
 class DataCaptureError(Exception): pass
@@ -87,6 +88,7 @@ async def update_stock_closings(page: Page) -> Dict[str, Any]:
         
         db.session.execute(stmt)
         db.session.commit()
+        refresh_dashboards()  # el último cierre alimenta los dashboards de KPIs y dividendos
         
         processed_count = len(processed_data)
         logger.info(f"✓ Base de datos de Cierre Bursátil actualizada con {processed_count} registros.")
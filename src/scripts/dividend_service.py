@@ -7,12 +7,13 @@ from typing import List, Dict, Any
 
 from playwright.async_api import Page, TimeoutError as PlaywrightTimeoutError
 
+from src.config import DIVIDEND_PAGE_URL
 from src.extensions import db
 from src.models import Dividend
+from src.utils.dashboard_views import DIVIDENDS_DASHBOARD, refresh_dashboards
 
 logger = logging.getLogger(__name__)
 
-DIVIDEND_PAGE_URL = "https://www.bolsadesantiago.com/dividendos"
 DIVIDEND_API_PATTERN = "api/RV_ResumenMercado/getDividendos"
 
 class DataCaptureError(Exception): pass
@@ -113,6 +114,7 @@ async def compare_and_update_dividends(page: Page) -> Dict[str, Any]:
             new_db_entries = [Dividend(**data) for data in new_dividends_processed]
             db.session.add_all(new_db_entries)
             db.session.commit()
+            refresh_dashboards(DIVIDENDS_DASHBOARD)
             logger.info(f"✓ Base de datos de dividendos actualizada con {len(new_db_entries)} registros.")
         except Exception as e:
             db.session.rollback()
@@ -1,63 +1,108 @@
 # src/scripts/drainer_service.py
 import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
 import pandas as pd
-from sqlalchemy import func
-from datetime import date, timedelta
+from sqlalchemy import func, select
 
+from src.config import DRAINER_WORKERS
 from src.extensions import db, socketio
-from src.models import StockClosing, AnomalousEvent
+from src.models import StockClosing, StockPrice, Dividend, AnomalousEvent, DrainerRunState
+from src.utils.anomaly_detectors import (
+    CLOSINGS, PRICES, DIVIDENDS, DETECTORS, forward_price_changes, frames_for, required_columns, run_detector,
+)
 
 logger = logging.getLogger(__name__)
 
-def _analyze_volume_spikes(days_history=90, std_dev_threshold=3.5):
-    logger.info("[DrainerService] Iniciando análisis de picos de volumen...")
-    events = []
-    
-    end_date = db.session.query(func.max(StockClosing.date)).scalar() or date.today()
-    start_date = end_date - timedelta(days=days_history)
-
-    query = db.session.query(
-        StockClosing.nemo,
-        StockClosing.date,
-        StockClosing.previous_day_amount,
-        StockClosing.previous_day_close_price
-    ).filter(StockClosing.date.between(start_date, end_date)).order_by(StockClosing.nemo, StockClosing.date)
-    
-    df = pd.DataFrame(query.all())
-    if df.empty:
-        logger.warning("[DrainerService] No hay datos de cierre para analizar picos de volumen.")
-        return []
-
-    df['volume_ma'] = df.groupby('nemo')['previous_day_amount'].transform(lambda x: x.rolling(window=30, min_periods=10).mean())
-    df['volume_std'] = df.groupby('nemo')['previous_day_amount'].transform(lambda x: x.rolling(window=30, min_periods=10).std())
-    df['spike_threshold'] = df['volume_ma'] + (df['volume_std'] * std_dev_threshold)
-    spikes_df = df[df['previous_day_amount'] > df['spike_threshold']].copy()
-    
-    for index, row in spikes_df.iterrows():
-        future_date = row['date'] + timedelta(days=5)
-        future_price_row = df[(df['nemo'] == row['nemo']) & (df['date'] >= future_date)].sort_values('date').iloc[:1]
-        
-        price_change = None
-        if not future_price_row.empty and row['previous_day_close_price'] and row['previous_day_close_price'] > 0:
-            future_price = future_price_row['previous_day_close_price'].values[0]
-            price_change = ((future_price - row['previous_day_close_price']) / row['previous_day_close_price']) * 100
-
-        avg_vol = row['volume_ma']
-        spike_vol = row['previous_day_amount']
-        times_avg = (spike_vol / avg_vol) if avg_vol and avg_vol > 0 else 0
-
-        event = AnomalousEvent(
-            nemo=row['nemo'],
-            event_date=row['date'],
-            event_type='Pico de Volumen',
-            description=f"Volumen transado ({spike_vol or 0:,.0f} CLP) fue {times_avg:.1f} veces el promedio.",
-            source='Análisis Interno de Volumen',
-            price_change_pct=price_change
-        )
-        events.append(event)
-        
-    logger.info(f"[DrainerService] Se detectaron {len(events)} picos de volumen anómalos.")
-    return events
+DAYS_HISTORY = 90
+
+# fuente -> (modelo, columna nemo, columna fecha); las columnas se exponen como `nemo` y `date`
+SOURCE_MODELS = {
+    CLOSINGS: (StockClosing, StockClosing.nemo, StockClosing.date),
+    PRICES: (StockPrice, StockPrice.symbol, StockPrice.timestamp),
+    DIVIDENDS: (Dividend, Dividend.nemo, Dividend.limit_date),
+}
+
+def _source_end(source):
+    _, _, date_column = SOURCE_MODELS[source]
+    value = db.session.query(func.max(date_column)).scalar()
+    return value.date() if isinstance(value, datetime) else value
+
+def _load_frames(columns, starts) -> dict:
+    """Una consulta por fuente con la unión de columnas que piden los detectores, desde su fecha más antigua."""
+    frames = {}
+    for source, cols in columns.items():
+        model, nemo_column, date_column = SOURCE_MODELS[source]
+        query = select(nemo_column.label('nemo'), date_column.label('date'), *(getattr(model, c) for c in cols))
+        if starts.get(source):
+            query = query.where(date_column >= starts[source])
+        rows = db.session.execute(query.order_by(nemo_column, date_column)).all()
+        frames[source] = pd.DataFrame(rows, columns=['nemo', 'date', *cols])
+    return frames
+
+def _run_detectors(jobs, workers):
+    """
+    Ejecuta `jobs` [(nombre, frames)] en un pool de procesos (o en este proceso si `workers` <= 1)
+    y entrega `(nombre, eventos, segundos, error)` a medida que cada detector termina.
+    """
+    pending = dict(jobs)
+    if workers > 1 and len(pending) > 1:
+        try:
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=min(workers, len(pending)), mp_context=context) as pool:
+                futures = {pool.submit(run_detector, name, frames): name for name, frames in pending.items()}
+                for future in as_completed(futures):
+                    name = futures[future]
+                    try:
+                        _, events, elapsed = future.result()
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as e:
+                        pending.pop(name)
+                        yield name, [], 0.0, e
+                        continue
+                    pending.pop(name)
+                    yield name, events, elapsed, None
+            return
+        except (BrokenProcessPool, OSError) as e:
+            logger.warning(f"[DrainerService] Pool de procesos no disponible ({e}). Ejecutando {len(pending)} detectores en este proceso.")
+    for name, frames in pending.items():
+        try:
+            _, events, elapsed = run_detector(name, frames)
+            yield name, events, elapsed, None
+        except Exception as e:
+            yield name, [], 0.0, e
+
+def _existing_keys(event_types, since):
+    query = select(AnomalousEvent.nemo, AnomalousEvent.event_date, AnomalousEvent.event_type).where(
+        AnomalousEvent.event_type.in_(event_types))
+    if since:
+        query = query.where(AnomalousEvent.event_date >= since)
+    return set(db.session.execute(query).all())
+
+def _backfill_forward_price_changes(closings, event_types) -> int:
+    """Completa `price_change_pct` de eventos anteriores que al detectarse aún no tenían precio a 5 días."""
+    if closings.empty:
+        return 0
+    pending = AnomalousEvent.query.filter(
+        AnomalousEvent.event_type.in_(event_types),
+        AnomalousEvent.price_change_pct.is_(None),
+        AnomalousEvent.event_date >= closings['date'].min(),
+    ).all()
+    if not pending:
+        return 0
+    changes = forward_price_changes(closings, [e.nemo for e in pending], [e.event_date for e in pending])
+    updated = 0
+    for event, change in zip(pending, changes):
+        if not np.isnan(change):
+            event.price_change_pct = float(change)
+            updated += 1
+    return updated
 
 def _simulate_insider_tracking():
     logger.info("[DrainerService] Simulando rastreo de insiders...")
@@ -71,28 +116,112 @@ def _simulate_insider_tracking():
         )
     return None
 
-def run_drainer_analysis():
+def _replace_simulated_event(event) -> None:
+    """Borra el evento simulado anterior (mismo tipo y fuente): cada corrida deja uno solo."""
+    AnomalousEvent.query.filter_by(event_type=event.event_type, source=event.source) \
+        .delete(synchronize_session=False)
+
+def run_drainer_analysis(full=False, detectors=None, workers=None):
+    """
+    Ejecuta los detectores registrados en `src/utils/anomaly_detectors.py` (o solo `detectors`).
+    Cada columna requerida se carga una vez en un frame compartido por fuente, los detectores
+    corren en paralelo en un pool de procesos y sus eventos se deduplican contra los existentes.
+    Por defecto es incremental por detector (`DrainerRunState`); con `full`, o sin ejecuciones
+    previas, borra los eventos anteriores de los detectores elegidos y los recalcula.
+    """
     try:
-        AnomalousEvent.query.delete()
-        db.session.commit()
-        socketio.emit('drainer_progress', {'status': 'info', 'message': 'Resultados anteriores limpiados. Iniciando análisis...'})
-        
-        all_events = []
-        volume_events = _analyze_volume_spikes()
-        all_events.extend(volume_events)
-        socketio.emit('drainer_progress', {'status': 'info', 'message': f'Análisis de volumen completo. {len(volume_events)} eventos encontrados.'})
-        
+        selected = [DETECTORS[name] for name in (detectors or DETECTORS)]
+        workers = DRAINER_WORKERS if workers is None else workers
+        states = {d.name: db.session.get(DrainerRunState, d.name) for d in selected}
+        if full or not db.session.query(DrainerRunState.analysis).first():
+            # Solo los tipos de los detectores elegidos: los demás conservan eventos y marca de agua.
+            AnomalousEvent.query.filter(AnomalousEvent.event_type.in_([d.event_type for d in selected])) \
+                .delete(synchronize_session=False)
+            db.session.commit()
+            states = dict.fromkeys(states)
+            socketio.emit('drainer_progress', {'status': 'info', 'message': 'Resultados anteriores limpiados. Iniciando análisis...'})
+        since = {name: state.last_analyzed_date if state else None for name, state in states.items()}
+        if any(since.values()):
+            socketio.emit('drainer_progress', {'status': 'info', 'message': f'Análisis incremental de {len(selected)} detectores...'})
+
+        # Ventana de carga por fuente: la más antigua que pida algún detector.
+        ends = {source: _source_end(source) for source in required_columns(selected)}
+        starts = {}
+        for detector in selected:
+            end = ends[detector.primary_source] or date.today()
+            start = (since[detector.name] - timedelta(days=detector.lookback_days)) if since[detector.name] \
+                else end - timedelta(days=DAYS_HISTORY)
+            for source in detector.needs:
+                starts[source] = min(starts.get(source, start), start)
+
+        load_start = time.perf_counter()
+        frames = _load_frames(required_columns(selected), starts)
+        load_ms = (time.perf_counter() - load_start) * 1000
+        socketio.emit('drainer_progress', {
+            'status': 'info', 'detector': None, 'elapsed_ms': round(load_ms, 1),
+            'message': f'Datos cargados ({", ".join(f"{s}: {len(f)} filas" for s, f in frames.items())}) en {load_ms:.0f} ms.',
+        })
+
+        event_types = [d.event_type for d in selected]
+        watermark = min((v for v in since.values() if v), default=None)
+        existing = _existing_keys(event_types, watermark) if watermark else set()
+        all_events, timings = [], {}
+        jobs = [(d.name, frames_for(d, frames)) for d in selected]
+        for name, found, elapsed, error in _run_detectors(jobs, workers):
+            detector = DETECTORS[name]
+            timings[name] = round(elapsed * 1000, 1)
+            if error:
+                logger.error(f"[DrainerService] Detector '{name}' falló: {error}", exc_info=error)
+                socketio.emit('drainer_progress', {'status': 'error', 'detector': name, 'elapsed_ms': timings[name],
+                                                   'message': f'{detector.event_type}: error ({error}).'})
+                states[name] = False
+                continue
+            new_events = []
+            for event in found:
+                key = (event['nemo'], event['event_date'], detector.event_type)
+                # El día de la marca de agua se vuelve a evaluar (p. ej. capturas posteriores); lo deduplica `existing`.
+                if (since[name] and event['event_date'] < since[name]) or key in existing:
+                    continue
+                existing.add(key)
+                new_events.append(AnomalousEvent(event_type=detector.event_type, source=detector.label, **event))
+            all_events.extend(new_events)
+            logger.info(f"[DrainerService] {name}: {len(new_events)} eventos nuevos en {timings[name]:.0f} ms.")
+            socketio.emit('drainer_progress', {
+                'status': 'info', 'detector': name, 'events': len(new_events), 'elapsed_ms': timings[name],
+                'message': f'{detector.event_type}: {len(new_events)} eventos ({timings[name]:.0f} ms).',
+            })
+
+        if watermark and CLOSINGS in frames:
+            backfilled = _backfill_forward_price_changes(frames[CLOSINGS], event_types)
+            if backfilled:
+                logger.info(f"[DrainerService] Se completó el cambio de precio de {backfilled} eventos anteriores.")
+
         insider_event = _simulate_insider_tracking()
-        if insider_event: all_events.append(insider_event)
+        if insider_event:
+            # No es un detector (sin marca de agua ni limpieza por tipo): se reemplaza en vez de acumularse.
+            _replace_simulated_event(insider_event)
+            all_events.append(insider_event)
         socketio.emit('drainer_progress', {'status': 'info', 'message': 'Rastreo de insiders (simulado) completo.'})
-        
+
         if all_events:
             db.session.bulk_save_objects(all_events)
-            db.session.commit()
             logger.info(f"✓ Guardados {len(all_events)} eventos anómalos en la base de datos.")
+
+        now = datetime.now(timezone.utc)
+        for detector in selected:
+            state = states[detector.name]
+            if state is False:  # falló: se reintenta desde la misma marca de agua
+                continue
+            state = db.session.get(DrainerRunState, detector.name) or DrainerRunState(analysis=detector.name)
+            state.last_analyzed_date = ends[detector.primary_source] or state.last_analyzed_date
+            state.last_run_at = now
+            state.events_found = sum(1 for e in all_events if e.event_type == detector.event_type)
+            db.session.add(state)
+        db.session.commit()
         
-        socketio.emit('drainer_complete', {'status': 'success', 'message': f'Análisis finalizado. Total de eventos detectados: {len(all_events)}.'})
+        socketio.emit('drainer_complete', {'status': 'success', 'timings': timings,
+                                           'message': f'Análisis finalizado. Total de eventos detectados: {len(all_events)}.'})
     except Exception as e:
         logger.error(f"Error crítico durante el análisis de drainers: {e}", exc_info=True)
         db.session.rollback()
-        socketio.emit('drainer_complete', {'status': 'error', 'message': f'Error en el análisis: {e}'})
\ No newline at end of file
+        socketio.emit('drainer_complete', {'status': 'error', 'message': f'Error en el análisis: {e}'})
@@ -0,0 +1,275 @@
+# src/scripts/job_scheduler.py
+"""
+Planificador único de trabajos del bot, corriendo sobre el loop de eventos del bot.
+
+Los endpoints ya no lanzan un hilo por solicitud: encolan un trabajo con `submit`
+(seguro desde cualquier hilo) y el planificador lo despacha en el loop según:
+
+- prioridad (menor número = antes) y orden de llegada;
+- un límite de concurrencia por tipo de trabajo (p. ej. una sola actualización de
+  acciones a la vez);
+- deduplicación: un trabajo idéntico (mismo tipo y misma clave) que ya está en cola
+  se reutiliza en lugar de crear otro, de modo que las ráfagas de clics o
+  auto-actualizaciones se fusionan. Si el idéntico ya está en curso, se encola un
+  único trabajo de seguimiento (sus datos serían anteriores a la solicitud).
+
+Los trabajos se pueden cancelar (en cola o en curso) y su estado se consulta vía
+`/api/jobs`.
+"""
+from __future__ import annotations
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from src.config import JOB_HISTORY_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Tipos de trabajo conocidos y su concurrencia máxima
+STOCKS_JOB = "stocks"
+DIVIDENDS_JOB = "dividends"
+CLOSING_JOB = "closing"
+KPIS_JOB = "kpis"
+RETENTION_JOB = "retention"
+DEFAULT_CONCURRENCY_LIMITS: Dict[str, int] = {
+    STOCKS_JOB: 1, DIVIDENDS_JOB: 1, CLOSING_JOB: 1, KPIS_JOB: 1, RETENTION_JOB: 1,
+}
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 10
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+
+class SchedulerUnavailable(RuntimeError):
+    """El planificador no tiene un loop de eventos asociado (el bot aún no arrancó o ya se detuvo)."""
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@dataclass
+class Job:
+    """Un trabajo encolado. `factory` crea la corrutina a ejecutar (se invoca recién al despacharlo)."""
+    job_type: str
+    key: str
+    factory: Callable[[], Awaitable[Any]]
+    priority: int = PRIORITY_NORMAL
+    timeout: Optional[float] = None
+    on_finish: Optional[Callable[["Job"], None]] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    status: str = QUEUED
+    created_at: datetime = field(default_factory=_now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Any = None
+    error: Optional[str] = None
+    coalesced: int = 0
+    seq: int = 0
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ACTIVE_STATUSES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "type": self.job_type,
+            "key": self.key,
+            "priority": self.priority,
+            "status": self.status,
+            "coalesced": self.coalesced,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "result": self.result if isinstance(self.result, (dict, list, str, int, float)) else None,
+            "error": self.error,
+        }
+
+
+class JobScheduler:
+    """
+    Cola de prioridad + límites por tipo sobre un loop de asyncio. Todo el estado se
+    protege con un `threading.Lock`, porque `submit`/`cancel` llegan desde los hilos
+    de Flask y el despacho ocurre en el hilo del loop.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None, history_size: int = JOB_HISTORY_SIZE):
+        self._limits = dict(DEFAULT_CONCURRENCY_LIMITS if limits is None else limits)
+        self._history_size = history_size
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._heap: List[Tuple[int, int, str]] = []
+        self._seq = itertools.count()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active: Dict[Tuple[str, str], Job] = {}
+        self._running: Dict[str, int] = {}
+
+    def attach(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Asocia el planificador al loop donde se ejecutarán los trabajos."""
+        self._loop = loop
+
+    # --- API pública (thread-safe) ---
+
+    def submit(self, job_type: str, factory: Callable[[], Awaitable[Any]], *, key: str = "",
+               priority: int = PRIORITY_NORMAL, timeout: Optional[float] = None,
+               on_finish: Optional[Callable[[Job], None]] = None) -> Tuple[Job, bool]:
+        """
+        Encola un trabajo y devuelve `(job, created)`. Si ya hay uno en cola con el mismo
+        tipo y clave, devuelve ese con `created=False` (y lo sube de prioridad si la nueva
+        solicitud tiene mayor prioridad). Si el idéntico ya está en curso, encola uno de
+        seguimiento, con el que se fusionan las solicitudes siguientes. Lanza
+        `SchedulerUnavailable` si no hay loop asociado.
+        """
+        if self._loop is None or self._loop.is_closed():
+            raise SchedulerUnavailable("El planificador de trabajos no está asociado a un loop de eventos.")
+
+        with self._lock:
+            # `_active` guarda el último trabajo activo por clave: el de seguimiento si lo hay.
+            existing = self._active.get((job_type, key))
+            if existing is not None and existing.status == QUEUED:
+                existing.coalesced += 1
+                if priority < existing.priority:
+                    existing.priority = priority
+                    self._push(existing)
+                logger.info(f"[Jobs] Solicitud '{job_type}' fusionada con el trabajo en cola {existing.id}.")
+                return existing, False
+
+            job = Job(job_type=job_type, key=key, factory=factory, priority=priority,
+                      timeout=timeout, on_finish=on_finish)
+            self._jobs[job.id] = job
+            self._active[(job_type, key)] = job
+            self._push(job)
+            self._trim_history()
+
+        follow_up = f" tras el trabajo en curso {existing.id}" if existing is not None else ""
+        logger.info(f"[Jobs] Trabajo {job.id} '{job_type}' encolado (prioridad {priority}){follow_up}.")
+        self._loop.call_soon_threadsafe(self._dispatch)
+        return job, True
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancela un trabajo en cola (de inmediato) o en curso (cancelando su tarea). None si no existe."""
+        finished = None
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status == QUEUED:
+                self._finish(job, CANCELLED, error="Cancelado antes de iniciar.")
+                finished = job
+            elif job.status == RUNNING and job.task is not None:
+                self._loop.call_soon_threadsafe(job.task.cancel)
+        if finished is not None:
+            self._notify(finished)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self, job_type: Optional[str] = None, status: Optional[str] = None) -> List[Job]:
+        """Trabajos recientes, del más nuevo al más antiguo."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [j for j in reversed(jobs)
+                if (job_type is None or j.job_type == job_type) and (status is None or j.status == status)]
+
+    def is_busy(self, job_type: str) -> bool:
+        """True si hay un trabajo de `job_type` en cola o en curso."""
+        with self._lock:
+            return any(t == job_type for t, _ in self._active)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            queued: Dict[str, int] = {}
+            for job in self._active.values():
+                if job.status == QUEUED:
+                    queued[job.job_type] = queued.get(job.job_type, 0) + 1
+            return {
+                job_type: {"limit": limit, "running": self._running.get(job_type, 0), "queued": queued.get(job_type, 0)}
+                for job_type, limit in self._limits.items()
+            }
+
+    # --- Internos (requieren `self._lock` salvo donde se indica) ---
+
+    def _push(self, job: Job) -> None:
+        job.seq = next(self._seq)
+        heapq.heappush(self._heap, (job.priority, job.seq, job.id))
+
+    def _trim_history(self) -> None:
+        excess = len(self._jobs) - self._history_size
+        for job_id in [jid for jid, j in self._jobs.items() if not j.is_active][:max(excess, 0)]:
+            del self._jobs[job_id]
+
+    def _finish(self, job: Job, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        job.status, job.result, job.error = status, result, error
+        job.finished_at = _now()
+        if self._active.get((job.job_type, job.key)) is job:
+            del self._active[(job.job_type, job.key)]
+
+    def _dispatch(self) -> None:
+        """Inicia los trabajos en cola que caben en su límite. Se ejecuta en el hilo del loop."""
+        with self._lock:
+            deferred = []
+            while self._heap:
+                priority, seq, job_id = heapq.heappop(self._heap)
+                job = self._jobs.get(job_id)
+                if job is None or job.status != QUEUED or job.seq != seq:
+                    continue  # entrada obsoleta (cancelado o re-priorizado)
+                if self._running.get(job.job_type, 0) >= self._limits.get(job.job_type, 1):
+                    deferred.append((priority, seq, job_id))
+                    continue
+                self._running[job.job_type] = self._running.get(job.job_type, 0) + 1
+                job.status, job.started_at = RUNNING, _now()
+                job.task = self._loop.create_task(self._run(job))
+            for entry in deferred:
+                heapq.heappush(self._heap, entry)
+
+    async def _run(self, job: Job) -> None:
+        logger.info(f"[Jobs] ▶ Iniciando trabajo {job.id} '{job.job_type}'.")
+        status, result, error = DONE, None, None
+        try:
+            result = await asyncio.wait_for(job.factory(), timeout=job.timeout)
+        except asyncio.CancelledError:
+            status, error = CANCELLED, "Cancelado durante la ejecución."
+        except asyncio.TimeoutError:
+            status, error = FAILED, f"Tiempo de espera agotado ({job.timeout}s)."
+        except Exception as e:
+            logger.error(f"[Jobs] Error en el trabajo {job.id} '{job.job_type}': {e}", exc_info=True)
+            status, error = FAILED, str(e)
+
+        with self._lock:
+            self._running[job.job_type] -= 1
+            self._finish(job, status, result, error)
+            job.task = None
+        elapsed = (job.finished_at - job.started_at).total_seconds()
+        logger.info(f"[Jobs] ■ Trabajo {job.id} '{job.job_type}' terminó como '{status}' en {elapsed:.1f}s.")
+        self._notify(job)
+        self._dispatch()
+
+    def _notify(self, job: Job) -> None:
+        """Invoca `on_finish` fuera del lock; sus errores no afectan al planificador."""
+        if job.on_finish is None:
+            return
+        try:
+            job.on_finish(job)
+        except Exception as e:
+            logger.error(f"[Jobs] Error en el callback de fin del trabajo {job.id}: {e}", exc_info=True)
+
+
+job_scheduler = JobScheduler()
@@ -0,0 +1,348 @@
+# src/scripts/kpi_pipeline.py
+"""
+Pipeline asíncrono de enriquecimiento de KPIs avanzados (`/api/kpis/update`).
+
+- El proveedor se elige desde `PromptConfig.api_provider` (registro `PROVIDERS`;
+  `KPI_DEFAULT_PROVIDER` si no hay configuración o el proveedor no está registrado).
+- Hasta `KPI_CONCURRENCY` consultas simultáneas, limitadas además por un token
+  bucket por proveedor (`KPI_PROVIDER_RATES`: solicitudes/s y ráfaga).
+- Cada símbolo se reintenta hasta `KPI_MAX_RETRIES` veces con backoff exponencial
+  y jitter completo cuando el proveedor falla o no devuelve datos.
+- Los resultados se guardan en `advanced_kpis` por lotes de `KPI_UPSERT_BATCH`
+  filas (un upsert multi-fila y un commit por lote) fuera del loop del bot.
+- `kpi_update_progress` se sigue emitiendo por cada símbolo terminado.
+- Solo se consultan los símbolos sin entrada vigente en la caché de KPIs
+  (`src/utils/kpi_cache.py`), salvo con `force`.
+
+El proveedor `stub` es local (sin red) y determinista, para pruebas de throughput.
+"""
+from __future__ import annotations
+import asyncio
+import hashlib
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from src.config import (
+    KPI_CONCURRENCY,
+    KPI_DEFAULT_PROVIDER,
+    KPI_MAX_RETRIES,
+    KPI_PROVIDER_RATES,
+    KPI_RETRY_BASE_DELAY,
+    KPI_STUB_LATENCY,
+    KPI_UPSERT_BATCH,
+)
+from src.extensions import db, socketio
+from src.models import AdvancedKPI, PromptConfig
+from src.scripts import ai_financial_service
+from src.utils.dashboard_views import KPI_DASHBOARD, refresh_dashboards
+from src.utils.kpi_cache import (
+    RefreshPlan, kpi_cache_stats, merge_response, plan_refresh, prompt_hash, upsert_entries,
+)
+
+logger = logging.getLogger(__name__)
+
+KPI_FIELDS = ("roe", "debt_to_equity", "beta", "analyst_recommendation", "source")
+TTL_FIELDS = KPI_FIELDS[:-1]  # `source` no vence por sí mismo
+MAX_RETRY_DELAY = 30.0
+
+FetchFunc = Callable[[str, Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class TokenBucket:
+    """Limitador asíncrono: `rate` solicitudes por segundo con ráfagas de hasta `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        # El lock hace que los que esperan obtengan su token en orden de llegada.
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class KpiProvider:
+    name: str
+    fetch: FetchFunc
+    rate: float
+    burst: float
+
+
+PROVIDERS: Dict[str, FetchFunc] = {}
+_buckets: Dict[Tuple[str, float, float, int], TokenBucket] = {}
+
+
+def register_provider(name: str):
+    """Decorador que registra una función `async fetch(nemo, config) -> dict | None`."""
+    def decorator(func: FetchFunc) -> FetchFunc:
+        PROVIDERS[name.lower()] = func
+        return func
+    return decorator
+
+
+@register_provider("simulado")
+async def _simulated_fetch(nemo: str, config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    # `get_advanced_kpis` es bloqueante: se ejecuta fuera del loop del bot.
+    return await asyncio.to_thread(ai_financial_service.get_advanced_kpis, nemo)
+
+
+@register_provider("stub")
+async def _stub_fetch(nemo: str, config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Proveedor local sin red: valores deterministas por símbolo tras `KPI_STUB_LATENCY` segundos."""
+    await asyncio.sleep(KPI_STUB_LATENCY)
+    seed = int.from_bytes(hashlib.blake2b(nemo.encode(), digest_size=4).digest(), "big")
+    return {
+        "roe": round(5 + seed % 2500 / 100, 2),
+        "debt_to_equity": round(seed % 300 / 100, 2),
+        "beta": round(0.5 + seed % 150 / 100, 2),
+        "analyst_recommendation": ("Comprar", "Mantener", "Vender")[seed % 3],
+        "source": "Stub local",
+    }
+
+
+def parse_rate(spec: Optional[str]) -> Tuple[float, float]:
+    """
+    `"tasa[:ráfaga]"` -> (solicitudes/s, ráfaga). Sin límite configurado: 1 solicitud/s.
+    La tasa debe ser positiva y la ráfaga de al menos 1, o el token bucket no entregaría nunca un token.
+    """
+    if not spec:
+        return 1.0, 1.0
+    rate, _, burst = spec.partition(":")
+    rate_value = float(rate)
+    burst_value = float(burst) if burst else max(rate_value, 1.0)
+    if not rate_value > 0:
+        raise ValueError(f"la tasa debe ser mayor que 0 (recibido {rate!r})")
+    if not burst_value >= 1:
+        raise ValueError(f"la ráfaga debe ser al menos 1 (recibido {burst!r})")
+    return rate_value, burst_value
+
+
+def validate_provider_rates(rates: Dict[str, str]) -> None:
+    """Rechaza límites de proveedores no registrados o con formato inválido (`BOLSA_KPI_PROVIDER_RATES`)."""
+    unknown = sorted(set(rates) - set(PROVIDERS))
+    if unknown:
+        raise ValueError(f"BOLSA_KPI_PROVIDER_RATES: proveedores sin implementación: {', '.join(unknown)} "
+                         f"(registrados: {', '.join(sorted(PROVIDERS))}).")
+    for name, spec in rates.items():
+        try:
+            parse_rate(spec)
+        except ValueError as e:
+            raise ValueError(f"BOLSA_KPI_PROVIDER_RATES: límite inválido para '{name}': '{spec}' ({e}).") from None
+
+
+validate_provider_rates(KPI_PROVIDER_RATES)
+
+
+def _bucket_for(provider: KpiProvider) -> TokenBucket:
+    # Compartido entre ejecuciones; cada loop de asyncio tiene su propio lock, así que se crea por loop.
+    key = (provider.name, provider.rate, provider.burst, id(asyncio.get_running_loop()))
+    bucket = _buckets.get(key)
+    if bucket is None:
+        bucket = _buckets[key] = TokenBucket(provider.rate, provider.burst)
+    return bucket
+
+
+def resolve_provider(name: Optional[str] = None) -> Tuple[KpiProvider, Dict[str, Any]]:
+    """
+    Proveedor y su configuración (`PromptConfig` como dict). Requiere contexto de aplicación
+    si no se indica `name`.
+    """
+    config: Dict[str, Any] = {}
+    if name is None:
+        prompt_config = PromptConfig.query.order_by(PromptConfig.id).first()
+        if prompt_config:
+            config = {**prompt_config.to_dict(), "api_key": prompt_config.api_key}
+            name = prompt_config.api_provider
+    name = (name or KPI_DEFAULT_PROVIDER).lower()
+    if name not in PROVIDERS:
+        logger.warning(f"[KpiPipeline] Proveedor '{name}' sin implementación; se usa '{KPI_DEFAULT_PROVIDER}'.")
+        name = KPI_DEFAULT_PROVIDER
+    rate, burst = parse_rate(KPI_PROVIDER_RATES.get(name))
+    return KpiProvider(name, PROVIDERS[name], rate, burst), config
+
+
+def retry_delay(attempt: int, base: float = KPI_RETRY_BASE_DELAY) -> float:
+    """Backoff exponencial con jitter completo para el reintento número `attempt` (desde 1)."""
+    return random.uniform(0, min(MAX_RETRY_DELAY, base * 2 ** (attempt - 1)))
+
+
+def _upsert_kpis(app, rows: List[Dict[str, Any]], cache_rows: Optional[List[Dict[str, Any]]] = None) -> int:
+    """Upsert multi-fila en `advanced_kpis` (PostgreSQL o SQLite) y en la caché, con un solo commit."""
+    if not rows:
+        return 0
+    with app.app_context():
+        insert = pg_insert if db.engine.dialect.name == "postgresql" else sqlite_insert
+        stmt = insert(AdvancedKPI).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["nemo"],
+            set_={**{c: stmt.excluded[c] for c in KPI_FIELDS}, "last_updated": stmt.excluded.last_updated},
+        )
+        try:
+            db.session.execute(stmt)
+            upsert_entries(cache_rows or [])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        refresh_dashboards(KPI_DASHBOARD)
+    return len(rows)
+
+
+@dataclass
+class KpiResult:
+    nemo: str
+    data: Optional[Dict[str, Any]]
+    attempts: int
+    error: Optional[str] = None
+
+
+@dataclass
+class KpiRunStats:
+    total: int
+    succeeded: int = 0
+    failed: int = 0
+    retries: int = 0
+    written: int = 0
+    batches: int = 0
+    failures: List[str] = field(default_factory=list)
+
+
+async def _fetch_with_retry(provider: KpiProvider, config: Dict[str, Any], nemo: str, bucket: TokenBucket,
+                            semaphore: asyncio.Semaphore, max_retries: int) -> KpiResult:
+    error = None
+    for attempt in range(1, max_retries + 2):
+        if attempt > 1:
+            await asyncio.sleep(retry_delay(attempt - 1))  # sin ocupar un cupo de concurrencia
+        async with semaphore:
+            await bucket.acquire()
+            try:
+                data = await provider.fetch(nemo, config)
+                if data:
+                    return KpiResult(nemo, data, attempt)
+                error = "sin datos"
+            except Exception as e:
+                error = str(e) or type(e).__name__
+        logger.debug(f"[KpiPipeline] {nemo}: intento {attempt} fallido ({error}).")
+    return KpiResult(nemo, None, max_retries + 1, error)
+
+
+async def enrich_kpis(app, nemos: List[str], provider: KpiProvider, config: Optional[Dict[str, Any]] = None,
+                      concurrency: Optional[int] = None, max_retries: Optional[int] = None,
+                      batch_size: Optional[int] = None, plan: Optional[RefreshPlan] = None) -> KpiRunStats:
+    """
+    Consulta los KPIs de `nemos` en paralelo y los guarda por lotes. Emite `kpi_update_progress`.
+    Con `plan`, cada respuesta se fusiona con su entrada de caché y la caché se actualiza en el mismo lote.
+    """
+    concurrency = concurrency or KPI_CONCURRENCY
+    max_retries = KPI_MAX_RETRIES if max_retries is None else max_retries
+    batch_size = batch_size or KPI_UPSERT_BATCH
+    stats = KpiRunStats(total=len(nemos))
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+    bucket = _bucket_for(provider)
+    tasks = [asyncio.ensure_future(_fetch_with_retry(provider, config or {}, nemo, bucket, semaphore, max_retries))
+             for nemo in nemos]
+    pending_rows: List[Dict[str, Any]] = []
+    cache_rows: List[Dict[str, Any]] = []
+
+    async def flush():
+        rows, pending_rows[:] = list(pending_rows), []
+        entries, cache_rows[:] = list(cache_rows), []
+        stats.written += await asyncio.to_thread(_upsert_kpis, app, rows, entries)
+        stats.batches += 1
+
+    try:
+        for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+            result = await task
+            stats.retries += result.attempts - 1
+            if result.data:
+                stats.succeeded += 1
+                now = datetime.now(timezone.utc)
+                values = result.data
+                if plan is not None:
+                    values, fetched_at = merge_response(plan.entries.get(result.nemo), result.data, KPI_FIELDS, now)
+                    cache_rows.append({"nemo": result.nemo, "provider": plan.provider, "prompt_hash": plan.prompt_hash,
+                                       "values": values, "fetched_at": fetched_at, "updated_at": now})
+                pending_rows.append({"nemo": result.nemo, **{c: values.get(c) for c in KPI_FIELDS},
+                                     "last_updated": now})
+                status = "success"
+            else:
+                stats.failed += 1
+                stats.failures.append(result.nemo)
+                status = "failed"
+            socketio.emit('kpi_update_progress', {'nemo': result.nemo, 'status': status,
+                                                  'progress': f"{done}/{stats.total}", 'attempts': result.attempts})
+            if len(pending_rows) >= batch_size:
+                await flush()
+        if pending_rows:
+            await flush()
+    finally:
+        for task in tasks:
+            task.cancel()
+    return stats
+
+
+def _hits_to_sync(plan: RefreshPlan) -> List[Dict[str, Any]]:
+    """Filas de `advanced_kpis` que difieren de su entrada vigente en caché (p. ej. tras volver a un proveedor)."""
+    if not plan.hits:
+        return []
+    current = {k.nemo: k for k in AdvancedKPI.query.filter(AdvancedKPI.nemo.in_(list(plan.hits)))}
+    rows = []
+    for nemo, values in plan.hits.items():
+        kpi = current.get(nemo)
+        if kpi is None or any(getattr(kpi, c) != values.get(c) for c in KPI_FIELDS):
+            rows.append({"nemo": nemo, **{c: values.get(c) for c in KPI_FIELDS},
+                         "last_updated": plan.entries[nemo].updated_at})
+    return rows
+
+
+async def run_kpi_update(app, nemos: List[str], provider_name: Optional[str] = None,
+                         force: bool = False) -> Dict[str, Any]:
+    """
+    Resuelve el proveedor, consulta solo los símbolos vencidos o sin caché (todos con `force`)
+    y devuelve el resumen para `kpi_update_complete`.
+    """
+    with app.app_context():
+        provider, config = resolve_provider(provider_name)
+        plan = plan_refresh(nemos, provider.name, prompt_hash(config.get("prompt_template")), TTL_FIELDS, force)
+        synced = _hits_to_sync(plan)
+    if synced:
+        await asyncio.to_thread(_upsert_kpis, app, synced)
+    started = time.perf_counter()
+    stats = await enrich_kpis(app, plan.to_fetch, provider, config, plan=plan)
+    elapsed = time.perf_counter() - started
+    cache_run = kpi_cache_stats.record(plan, refreshed=stats.succeeded, failed=stats.failed)
+    logger.info(f"[KpiPipeline] {stats.succeeded}/{stats.total} KPIs vía '{provider.name}' en {elapsed:.1f}s "
+                f"({stats.retries} reintentos, {stats.batches} lotes). Caché: {cache_run.hits} vigentes, "
+                f"{cache_run.stale} vencidos, {cache_run.misses} sin entrada{' (forzado)' if force else ''}.")
+    return {
+        'message': f'Actualización completada. {stats.succeeded} de {stats.total} acciones consultadas '
+                   f'({len(plan.hits)} vigentes en caché).',
+        'provider': provider.name,
+        'cache': {'hits': cache_run.hits, 'stale': cache_run.stale, 'misses': cache_run.misses, 'forced': force},
+        'succeeded': stats.succeeded,
+        'failed': stats.failures,
+        'retries': stats.retries,
+        'elapsed_seconds': round(elapsed, 2),
+    }
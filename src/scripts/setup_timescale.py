@@ -0,0 +1,26 @@
+# src/scripts/setup_timescale.py
+"""
+Migra `stock_prices` y `filtered_stock_history` a hypertables de TimescaleDB
+(compresión y agregados continuos incluidos). Es idempotente.
+
+Uso:
+    python -m src.scripts.setup_timescale
+"""
+import logging
+
+from src.main import app
+from src.extensions import db
+from src.utils.timescale import bootstrap_timescale
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    with app.app_context():
+        db.create_all()
+        if not bootstrap_timescale():
+            logger.warning("TimescaleDB no disponible: las consultas por bucket usarán filas crudas.")
+
+
+if __name__ == "__main__":
+    main()
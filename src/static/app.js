@@ -21,7 +21,9 @@ window.app = {
                 'UN_TRANSADAS': { title: 'Unidades', render: uiManager.createNumberRenderer() }
             }
         },
-        stockFilters: { codes: [], all: true }
+        stockFilters: { codes: [], all: true },
+        priceSeq: 0,
+        pricesSubscribed: false
     },
     
     socket: null,
@@ -60,7 +62,7 @@ window.app = {
             await closingManager.loadClosings();
         }
         
-        await this.fetchAndDisplayStocks();
+        await this.subscribePrices();
         
         const savedInterval = sessionStorage.getItem('autoUpdateInterval');
         const autoUpdateSelect = document.getElementById('autoUpdateSelect');
@@ -116,6 +118,49 @@ window.app = {
         }
     },
     
+    // Suscripción a precios por WebSocket: el servidor responde con `price_snapshot` y luego
+    // envía solo las filas que cambian (`price_delta`) para el filtro actual.
+    filterCodes() {
+        return this.state.stockFilters.all ? [] : this.state.stockFilters.codes.filter(Boolean);
+    },
+
+    async subscribePrices() {
+        if (!this.socket || !this.socket.connected) {
+            await this.fetchAndDisplayStocks();
+        }
+        this.state.pricesSubscribed = true;
+        this.socket.emit('subscribe_prices', { codes: this.filterCodes() });
+    },
+
+    rowsToObjects(columns, rows) {
+        return rows.map(row => Object.fromEntries(columns.map((column, i) => [column, row[i]])));
+    },
+
+    applyPriceSnapshot(message) {
+        this.state.priceColumns = message.columns;
+        this.state.priceSeq = message.seq;
+        if (message.ts) this.state.timestamp = message.ts;
+        this.state.stockPriceMap.clear();
+        this.rowsToObjects(message.columns, message.rows).forEach(stock => this.state.stockPriceMap.set(stock.NEMO, stock));
+        this.state.stockData = Array.from(this.state.stockPriceMap.values());
+        this.renderAllTables();
+    },
+
+    applyPriceDelta(message) {
+        if (message.seq <= this.state.priceSeq) return;
+        if (!this.state.priceColumns || message.seq !== this.state.priceSeq + 1) {
+            console.warn(`[App] Salto en la secuencia de precios (${this.state.priceSeq} -> ${message.seq}). Resincronizando...`);
+            this.socket.emit('resync_prices', { codes: this.filterCodes() });
+            return;
+        }
+        this.state.priceSeq = message.seq;
+        this.state.timestamp = message.ts;
+        this.rowsToObjects(this.state.priceColumns, message.rows).forEach(stock => this.state.stockPriceMap.set(stock.NEMO, stock));
+        message.removed.forEach(symbol => this.state.stockPriceMap.delete(symbol));
+        this.state.stockData = Array.from(this.state.stockPriceMap.values());
+        this.renderAllTables();
+    },
+
     renderAllTables() {
         uiManager.renderTable(this.state.stockData, this.state.timestamp, this.state.columnPrefs.visible, this.state.columnPrefs.config);
         portfolioManager.render(this.state.stockPriceMap);
@@ -134,7 +179,13 @@ window.app = {
     // ---- 4. WEBSOCKETS Y EVENT LISTENERS ----
     setupWebSocket() {
         this.socket = io();
-        this.socket.on('connect', () => uiManager.updateStatus('Conectado al servidor.', 'success'));
+        this.socket.on('connect', () => {
+            uiManager.updateStatus('Conectado al servidor.', 'success');
+            // Tras una reconexión la sala se perdió: se vuelve a suscribir (y a resincronizar).
+            if (this.state.pricesSubscribed) this.socket.emit('subscribe_prices', { codes: this.filterCodes() });
+        });
+        this.socket.on('price_snapshot', (message) => this.applyPriceSnapshot(message));
+        this.socket.on('price_delta', (message) => this.applyPriceDelta(message));
         this.socket.on('disconnect', () => uiManager.updateStatus('Desconectado.', 'danger'));
 
         this.socket.on('initial_session_ready', () => {
@@ -150,12 +201,16 @@ window.app = {
             }
         });
         
-        this.socket.on('new_data', async () => {
+        this.socket.on('new_data', (data) => {
             this.state.isUpdating = false;
             uiManager.toggleLoading(false);
             this.updateRefreshButton();
-            uiManager.updateStatus("¡Nuevos datos recibidos! Actualizando...", 'success');
-            await this.fetchAndDisplayStocks();
+            // Las filas ya llegaron (o llegarán) por `price_delta`; no se vuelve a pedir /api/stocks.
+            if (data && data.unchanged) {
+                uiManager.updateStatus("Captura sin cambios respecto al último snapshot.", 'info');
+            } else {
+                uiManager.updateStatus("¡Nuevos datos recibidos!", 'success');
+            }
             
             const select = document.getElementById('autoUpdateSelect');
             if (select && select.value !== 'off') {
@@ -1,126 +1,105 @@
 // src/static/js/autoUpdater.js
 
+// La auto-actualización la decide el servidor (`/api/auto-update`) según el calendario
+// bursátil de Santiago. Este módulo solo configura el intervalo y muestra la cuenta
+// regresiva hacia la próxima ejecución planificada.
+const PHASE_LABELS = {
+    pre_open: 'pre-apertura',
+    open: 'mercado abierto',
+    close_auction: 'subasta de cierre',
+    after_hours: 'post-cierre',
+};
+
 window.autoUpdater = {
-    timerId: null,
     countdownInterval: null,
-    // Se elimina 'ui: null'
-    
-    init() { // Se elimina el argumento uiManager
-        // Este listener se adjunta una vez, sin importar la página
+    refreshTimer: null,
+
+    async init() {
         const autoUpdateSelect = document.getElementById('autoUpdateSelect');
         if (autoUpdateSelect) {
             autoUpdateSelect.addEventListener('change', () => this.handleAutoUpdateChange());
-
-            // Restaurar el valor guardado en sessionStorage al cargar cualquier página
-            const savedInterval = sessionStorage.getItem('autoUpdateInterval');
-            if (savedInterval) {
-                autoUpdateSelect.value = savedInterval;
-            }
         }
-        this.resume(); 
-        console.log('[AutoUpdater] Módulo inicializado y reanudado si es necesario.');
+        await this.refresh();
+        console.log('[AutoUpdater] Módulo inicializado con el plan del servidor.');
     },
-    // --- NUEVA FUNCIÓN ---
+
     handleAutoUpdateChange() {
         const select = document.getElementById('autoUpdateSelect');
-        if (!select) return;
+        if (select) this.configure(select.value);
+    },
 
-        const intervalValue = select.value;
-        sessionStorage.setItem('autoUpdateInterval', intervalValue);
-        
-        // Solo la página del dashboard (donde existe `window.app`) puede iniciar la actualización.
-        if (intervalValue === "off") {
-            this.stop();
-        } else if (window.app && typeof window.app.handleUpdateClick === 'function') {
-            this.start(intervalValue, () => window.app.handleUpdateClick(true));
+    async configure(intervalValue) {
+        try {
+            const response = await fetch('/api/auto-update', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ interval: intervalValue })
+            });
+            const status = await response.json();
+            if (!response.ok) throw new Error(status.error || 'Error desconocido del servidor.');
+            this.render(status);
+        } catch (error) {
+            console.error('[AutoUpdater] No se pudo configurar la auto-actualización:', error);
+            this.updateCountdownText('(Error de configuración)');
         }
     },
 
-    isTradingHours() {
-        const now = new Date();
-        const hour = now.getHours();
-        const minute = now.getMinutes();
-        
-        const isAfterOpen = (hour > 9) || (hour === 9 && minute >= 30);
-        const isBeforeClose = hour < 16;
-        
-        const tradingHours = isAfterOpen && isBeforeClose;
-        if (!tradingHours) {
-            console.log('[AutoUpdater] Fuera de horario de mercado. No se programará actualización.');
-            // Llamamos a la función interna para actualizar el texto
-            this.updateCountdownText('(Fuera de horario)');
+    async refresh() {
+        try {
+            const response = await fetch('/api/auto-update');
+            this.render(await response.json());
+        } catch (error) {
+            console.error('[AutoUpdater] No se pudo obtener el plan de auto-actualización:', error);
         }
-        return tradingHours;
     },
 
-    start(intervalValue, updateCallback) {
-        this.stop();
-        if (intervalValue === "off") return;
-        if (!this.isTradingHours()) return;
-
-        const [min, max] = intervalValue.split('-').map(Number);
-        const randomSeconds = Math.floor(Math.random() * (max * 60 - min * 60 + 1)) + (min * 60);
-        
-        const targetTimestamp = Date.now() + randomSeconds * 1000;
-        sessionStorage.setItem('autoUpdateTarget', targetTimestamp);
+    render(status) {
+        this.clearTimers();
+        const select = document.getElementById('autoUpdateSelect');
+        if (select) select.value = status.interval;
 
-        console.log(`[AutoUpdater] Próxima actualización programada para ${new Date(targetTimestamp).toLocaleTimeString()}.`);
-        
-        this.schedule(targetTimestamp, updateCallback);
-    },
+        if (!status.enabled) {
+            this.updateCountdownText('');
+            return;
+        }
+        if (!status.next_run) {
+            this.updateCountdownText('(Sin jornadas próximas)');
+            return;
+        }
 
-    resume() {
-        const targetTimestamp = sessionStorage.getItem('autoUpdateTarget');
-        if (targetTimestamp && Date.now() < targetTimestamp && this.isTradingHours()) {
-            console.log('[AutoUpdater] Reanudando temporizador de actualización pendiente.');
-            this.schedule(parseInt(targetTimestamp), () => window.app.handleUpdateClick(true));
+        const target = new Date(status.next_run).getTime();
+        const phase = PHASE_LABELS[status.next_phase] || status.next_phase;
+        if (status.phase === 'closed') {
+            const when = new Date(status.next_run).toLocaleString([], { weekday: 'short', hour: '2-digit', minute: '2-digit' });
+            this.updateCountdownText(`(Mercado cerrado · próxima ${when})`);
         } else {
-            sessionStorage.removeItem('autoUpdateTarget');
+            this.startCountdown(target, phase);
         }
+        // Se vuelve a pedir el plan un poco después del disparo (o cada 5 min si falta mucho).
+        const refreshIn = Math.min(Math.max(target - Date.now(), 0) + 5000, 5 * 60 * 1000);
+        this.refreshTimer = setTimeout(() => this.refresh(), refreshIn);
     },
 
-    schedule(targetTimestamp, updateCallback) {
-        this.stop();
-        
-        const remainingMs = targetTimestamp - Date.now();
-        if (remainingMs <= 0) {
-            sessionStorage.removeItem('autoUpdateTarget');
-            return; 
-        }
-
-        this.timerId = setTimeout(() => {
-            console.log('[AutoUpdater] Disparando actualización automática.');
-            sessionStorage.removeItem('autoUpdateTarget');
-            if (this.isTradingHours()) {
-                updateCallback();
-            } else {
-                console.log('[AutoUpdater] Tiempo cumplido, pero ya estamos fuera de horario. Se cancela la ejecución.');
-                const select = document.getElementById('autoUpdateSelect');
-                const intervalValue = select ? select.value : 'off';
-                if(intervalValue !== 'off') {
-                    this.start(intervalValue, updateCallback);
-                }
-            }
-        }, remainingMs);
-
-        this.startCountdown(Math.ceil(remainingMs / 1000));
+    // Compatibilidad con los llamadores existentes: el servidor ya planifica, solo se refresca el plan.
+    start() {
+        this.refresh();
     },
 
     stop() {
-        if (this.timerId) clearTimeout(this.timerId);
+        this.clearTimers();
+        this.updateCountdownText('');
+    },
+
+    clearTimers() {
+        if (this.refreshTimer) clearTimeout(this.refreshTimer);
         if (this.countdownInterval) clearInterval(this.countdownInterval);
-        this.timerId = null;
+        this.refreshTimer = null;
         this.countdownInterval = null;
-        this.updateCountdownText(''); // Usamos la función interna
-        sessionStorage.removeItem('autoUpdateTarget');
     },
 
-    startCountdown(totalSeconds) {
-        if (this.countdownInterval) clearInterval(this.countdownInterval);
-        
-        let remaining = totalSeconds;
-        
+    startCountdown(targetTimestamp, phase) {
         const update = () => {
+            const remaining = Math.ceil((targetTimestamp - Date.now()) / 1000);
             if (remaining <= 0) {
                 clearInterval(this.countdownInterval);
                 this.countdownInterval = null;
@@ -129,15 +108,13 @@ window.autoUpdater = {
             }
             const minutes = Math.floor(remaining / 60);
             const seconds = remaining % 60;
-            this.updateCountdownText(`(Próxima en ${minutes}:${seconds < 10 ? '0' : ''}${seconds})`);
-            remaining--;
+            this.updateCountdownText(`(Próxima en ${minutes}:${seconds < 10 ? '0' : ''}${seconds} · ${phase})`);
         };
-        
+
         update();
         this.countdownInterval = setInterval(update, 1000);
     },
-    
-    // --- NUEVA FUNCIÓN INTERNA ---
+
     updateCountdownText(text) {
         const countdownEl = document.getElementById('countdownTimer');
         if (countdownEl) {
@@ -153,4 +130,4 @@ document.addEventListener('DOMContentLoaded', () => {
         autoUpdater.init();
     }
 });
-// --- FIN DE LA MODIFICACIÓN ---
\ No newline at end of file
+// --- FIN DE LA MODIFICACIÓN ---
@@ -9,13 +9,17 @@ document.addEventListener('DOMContentLoaded', () => {
 
     async function plotSingleStock(symbol) {
         try {
-            const res = await fetch(`/api/stocks/history/${encodeURIComponent(symbol)}`);
+            // El servidor reduce la serie (LTTB) a ~1 punto por píxel del gráfico.
+            const maxPoints = Math.max(100, Math.min(2000, priceChartCtx.canvas.clientWidth || 500));
+            const res = await fetch(`/api/stocks/history/${encodeURIComponent(symbol)}?max_points=${maxPoints}`);
             if (!res.ok) throw new Error('Error al obtener datos');
             const data = await res.json();
 
             if (priceChart) {
                 priceChart.destroy();
             }
+            chartSymbol = symbol;
+            socket.emit('subscribe_prices', { codes: [symbol] });
 
             priceChart = new Chart(priceChartCtx, {
                 type: 'line',
@@ -44,11 +48,29 @@ document.addEventListener('DOMContentLoaded', () => {
         if (symbol) plotSingleStock(symbol);
     });
 
+    // El gráfico se suscribe a la sala de su símbolo y agrega los puntos que llegan por
+    // `price_delta`, en lugar de volver a pedir todo el histórico en cada actualización.
     const socket = io();
-    socket.on('new_data', () => {
-        const symbol = symbolInput.value.trim().toUpperCase();
-        if (symbol && priceChart) {
-            plotSingleStock(symbol); // Refresca el gráfico si hay un símbolo activo
+    let chartSymbol = null;
+    let chartSeq = 0;
+    let priceColumn = -1;
+
+    socket.on('price_snapshot', (message) => {
+        chartSeq = message.seq;
+        priceColumn = message.columns.indexOf('PRECIO_CIERRE');
+    });
+    socket.on('price_delta', (message) => {
+        if (!chartSymbol || !priceChart || message.seq <= chartSeq) return;
+        if (message.seq !== chartSeq + 1) {
+            plotSingleStock(chartSymbol); // salto de secuencia: se recarga el histórico
+            return;
+        }
+        chartSeq = message.seq;
+        const row = message.rows.find(r => r[0] === chartSymbol);
+        if (row && priceColumn >= 0) {
+            priceChart.data.labels.push(message.ts);
+            priceChart.data.datasets[0].data.push(row[priceColumn]);
+            priceChart.update('none');
         }
     });
 
@@ -57,14 +57,8 @@ window.eventHandlers = {
     
     // Maneja el cambio en el selector de auto-actualización
     handleAutoUpdateChange(event) {
-        const intervalValue = event.target.value;
-        sessionStorage.setItem('autoUpdateInterval', intervalValue);
-        
-        if (intervalValue === "off") {
-            autoUpdater.stop();
-        } else {
-            autoUpdater.start(intervalValue, () => this.handleUpdateClick(true));
-        }
+        // El intervalo se guarda en el servidor, que es quien dispara las auto-actualizaciones.
+        autoUpdater.configure(event.target.value);
     },
 
     // Maneja el envío del formulario de filtro de acciones
@@ -80,8 +74,8 @@ window.eventHandlers = {
             body: JSON.stringify(window.app.state.stockFilters)
         });
         
-        // Pide a la app principal que recargue los datos
-        await window.app.fetchAndDisplayStocks();
+        // Cambia de sala de precios: el servidor responde con el snapshot del nuevo filtro
+        await window.app.subscribePrices();
     },
 
     // Maneja el guardado de preferencias de columnas de la tabla de mercado
@@ -7,6 +7,10 @@ $(document).ready(function() {
     const searchInput = document.getElementById('searchInput');
     const addBtn = document.getElementById('addRecordBtn');
     const deleteAllBtn = document.getElementById('deleteAllBtn');
+    const loadMoreBtn = document.getElementById('loadMoreBtn');
+    const exportGroup = document.getElementById('exportGroup');
+    const exportCsvBtn = document.getElementById('exportCsvBtn');
+    const exportNdjsonBtn = document.getElementById('exportNdjsonBtn');
     const modalEl = document.getElementById('recordModal');
     const modal = new bootstrap.Modal(modalEl);
     const form = document.getElementById('recordForm');
@@ -17,6 +21,12 @@ $(document).ready(function() {
     let recordsDataTable = null;
     let pkColumns = [];
     let allRecords = [];
+    let nextCursor = null;
+    let totalRecords = null;
+    let totalIsEstimate = false;
+
+    // Las páginas se piden por cursor (keyset) y la búsqueda la resuelve el servidor.
+    const PAGE_SIZE = 500;
 
     const createGenericRenderer = () => (data, type, row) => {
         if (type === 'display') {
@@ -51,17 +61,37 @@ $(document).ready(function() {
         }
     }
 
+    function buildQuery(params) {
+        const query = new URLSearchParams(params);
+        const term = searchInput.value.trim();
+        if (term) query.set('q', term);
+        return query.toString();
+    }
+
+    function updateExportLinks() {
+        if (!currentTable) return;
+        exportCsvBtn.href = `/api/mantenedores/${currentTable}/export?${buildQuery({ format: 'csv' })}`;
+        exportNdjsonBtn.href = `/api/mantenedores/${currentTable}/export?${buildQuery({ format: 'ndjson' })}`;
+    }
+
+    async function fetchPage(name, cursor = null) {
+        const params = { per_page: PAGE_SIZE };
+        if (cursor) params.cursor = cursor;
+        const res = await fetch(`/api/mantenedores/${name}?${buildQuery(params)}`);
+        if (!res.ok) throw new Error(`Error al cargar datos de '${name}'.`);
+        return res.json();
+    }
+
     async function loadTable(name) {
         currentTable = name;
+        updateExportLinks();
         try {
-            // Se asume que la API puede devolver todos los registros para tablas de mantenedores.
-            // Si las tablas son muy grandes, se necesitaría server-side processing.
-            const res = await fetch(`/api/mantenedores/${name}?per_page=10000`);
-            if (!res.ok) throw new Error(`Error al cargar datos de '${name}'.`);
-            
-            const responseData = await res.json();
+            const responseData = await fetchPage(name);
             pkColumns = responseData.pk_columns || [];
             allRecords = responseData.records || [];
+            nextCursor = responseData.pagination.next_cursor;
+            totalRecords = responseData.pagination.total_records;
+            totalIsEstimate = responseData.pagination.total_is_estimate;
             
             renderDataTable(allRecords);
         } catch (error) {
@@ -69,15 +99,42 @@ $(document).ready(function() {
         }
     }
 
+    async function loadMore() {
+        if (!currentTable || !nextCursor) return;
+        loadMoreBtn.disabled = true;
+        try {
+            const responseData = await fetchPage(currentTable, nextCursor);
+            const records = responseData.records || [];
+            nextCursor = responseData.pagination.next_cursor;
+            allRecords = allRecords.concat(records);
+            recordsDataTable.rows.add(records).draw(false);
+        } catch (error) {
+            alert(error.message);
+        } finally {
+            loadMoreBtn.disabled = false;
+        }
+    }
+
+    function updateCounter(settings) {
+        let text = `${settings.fnRecordsDisplay()} de ${settings.fnRecordsTotal()} registros cargados`;
+        if (totalRecords !== null && totalRecords !== undefined) {
+            text += ` (total ${totalIsEstimate ? '≈ ' : ''}${totalRecords.toLocaleString('es-CL')})`;
+        }
+        recordCounter.textContent = `${text}.`;
+        loadMoreBtn.style.display = nextCursor ? 'inline-block' : 'none';
+    }
+
     function renderDataTable(records) {
         if (recordsDataTable) {
             recordsDataTable.destroy();
+            recordsDataTable = null;
         }
         recordsTableContainer.innerHTML = '<table id="recordsTable" class="table table-striped table-bordered table-hover w-100"></table>';
         
         if (!records || records.length === 0) {
             recordsTableContainer.innerHTML = '<div class="alert alert-warning">No hay datos para mostrar.</div>';
             recordCounter.textContent = '0 registros.';
+            loadMoreBtn.style.display = 'none';
             return;
         }
 
@@ -101,10 +158,10 @@ $(document).ready(function() {
             responsive: true,
             language: { url: '//cdn.datatables.net/plug-ins/1.13.6/i18n/es-ES.json' },
             "initComplete": function(settings, json) {
-                recordCounter.textContent = `${settings.fnRecordsDisplay()} de ${settings.fnRecordsTotal()} registros.`;
+                updateCounter(settings);
             },
             "drawCallback": function(settings) {
-                 recordCounter.textContent = `${settings.fnRecordsDisplay()} de ${settings.fnRecordsTotal()} registros.`;
+                updateCounter(settings);
             }
         });
     }
@@ -139,11 +196,14 @@ $(document).ready(function() {
         searchInput.value = '';
         if (currentTable) {
             addBtn.style.display = 'inline-block';
+            exportGroup.style.display = 'inline-flex';
             searchContainer.style.display = 'block';
             deleteAllBtn.style.display = allowedForMassDelete.includes(currentTable) ? 'inline-block' : 'none';
             loadTable(currentTable);
         } else {
             addBtn.style.display = 'none';
+            exportGroup.style.display = 'none';
+            loadMoreBtn.style.display = 'none';
             searchContainer.style.display = 'none';
             deleteAllBtn.style.display = 'none';
             recordsTableContainer.innerHTML = '';
@@ -176,11 +236,11 @@ $(document).ready(function() {
     
     searchForm.addEventListener('submit', (e) => {
         e.preventDefault();
-        if(recordsDataTable) {
-            recordsDataTable.search(searchInput.value).draw();
-        }
+        if (currentTable) loadTable(currentTable);
     });
 
+    loadMoreBtn.addEventListener('click', loadMore);
+
     $('#recordsTableContainer').on('click', '.edit-btn, .delete-btn', async function() {
         const tr = $(this).closest('tr');
         const rowData = recordsDataTable.row(tr).data();
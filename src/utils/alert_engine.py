@@ -0,0 +1,188 @@
+# src/utils/alert_engine.py
+"""
+Motor de evaluación de alertas de precio.
+
+Las alertas activas se mantienen en memoria agrupadas por símbolo y condición,
+cada grupo con sus umbrales ordenados. Evaluar un snapshot cuesta una búsqueda
+binaria por (símbolo, condición) presente más las alertas disparadas, en lugar
+de recorrer todas las alertas por cada fila.
+
+Condiciones soportadas (`Alert.condition`; `target_price` es el umbral):
+
+- `above` / `below`: precio de cierre ≥ / ≤ umbral;
+- `pct_up` / `pct_down`: variación porcentual del día ≥ +umbral / ≤ -umbral;
+- `vol_above`: unidades transadas ≥ umbral.
+
+Las alertas disparadas se marcan `triggered` en un único UPDATE y se emite un
+evento `alert_triggered` por cada una. Cualquier cambio ORM sobre `Alert` (API,
+CRUD genérico) invalida el índice, que se recarga en la siguiente evaluación.
+"""
+from __future__ import annotations
+import logging
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, select, update
+
+from src.extensions import db, socketio
+from src.models import Alert
+
+logger = logging.getLogger(__name__)
+
+# condición -> (campo del registro evaluado, True si dispara al subir hasta el umbral)
+ALERT_CONDITIONS: Dict[str, Tuple[str, bool]] = {
+    "above": ("price", True),
+    "below": ("price", False),
+    "pct_up": ("variation", True),
+    "pct_down": ("variation", False),
+    "vol_above": ("traded_units", True),
+}
+_CONDITION_LABELS = {
+    "above": "subió a", "below": "bajó a", "pct_up": "subió", "pct_down": "bajó", "vol_above": "transó",
+}
+
+
+def alert_threshold(condition: str, target: float) -> float:
+    """Umbral efectivo: los movimientos porcentuales se expresan con signo según la dirección."""
+    if condition == "pct_up":
+        return abs(target)
+    if condition == "pct_down":
+        return -abs(target)
+    return target
+
+
+def alert_message(symbol: str, condition: str, target: float, value: float) -> str:
+    if condition in ("pct_up", "pct_down"):
+        return f"{symbol} {_CONDITION_LABELS[condition]} {value:+.2f}% (umbral {alert_threshold(condition, target):+.2f}%)."
+    if condition == "vol_above":
+        return f"{symbol} {_CONDITION_LABELS[condition]} {value:,.0f} unidades (umbral {target:,.0f})."
+    return f"{symbol} {_CONDITION_LABELS[condition]} {value} (objetivo {target})."
+
+
+class _Thresholds:
+    """Umbrales ordenados (con sus ids en paralelo) de un par (símbolo, condición)."""
+    __slots__ = ("values", "ids")
+
+    def __init__(self):
+        self.values: List[float] = []
+        self.ids: List[int] = []
+
+    def pop_fired(self, value: float, rising: bool) -> List[int]:
+        """Quita y devuelve los ids cuyo umbral se cruzó con `value`."""
+        if rising:
+            k = bisect_right(self.values, value)
+            fired = self.ids[:k]
+            del self.values[:k], self.ids[:k]
+        else:
+            k = bisect_left(self.values, value)
+            fired = self.ids[k:]
+            del self.values[k:], self.ids[k:]
+        return fired
+
+
+class AlertEngine:
+    """Índice en memoria de las alertas activas; thread-safe y recargable bajo demanda."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index: Dict[str, Dict[str, _Thresholds]] = {}
+        self._alerts: Dict[int, Tuple[str, str, float]] = {}
+        self._dirty = True
+
+    def invalidate(self) -> None:
+        self._dirty = True
+
+    def build(self, alerts: Iterable[Tuple[int, str, float, str]]) -> None:
+        """Construye el índice desde tuplas `(id, symbol, target_price, condition)`."""
+        entries: Dict[Tuple[str, str], List[Tuple[float, int]]] = {}
+        details = {}
+        for alert_id, symbol, target, condition in alerts:
+            if condition not in ALERT_CONDITIONS or target is None:
+                continue
+            entries.setdefault((symbol, condition), []).append((alert_threshold(condition, target), alert_id))
+            details[alert_id] = (symbol, condition, target)
+
+        index: Dict[str, Dict[str, _Thresholds]] = {}
+        for (symbol, condition), pairs in entries.items():
+            pairs.sort()
+            bucket = index.setdefault(symbol, {}).setdefault(condition, _Thresholds())
+            bucket.values = [p[0] for p in pairs]
+            bucket.ids = [p[1] for p in pairs]
+        self._index, self._alerts, self._dirty = index, details, False
+
+    def load(self) -> None:
+        """(Re)carga las alertas no disparadas desde la DB. Requiere app context."""
+        rows = db.session.execute(
+            select(Alert.id, Alert.symbol, Alert.target_price, Alert.condition).where(Alert.triggered.is_(False))
+        ).all()
+        self.build(rows)
+        logger.info(f"[Alerts] Índice cargado con {len(self._alerts)} alertas activas en {len(self._index)} símbolos.")
+
+    def match(self, records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Evalúa registros `{symbol, price, variation, traded_units, ...}` contra el índice
+        (sin tocar la DB) y devuelve las alertas disparadas, retirándolas del índice.
+        """
+        fired = []
+        for record in records:
+            conditions = self._index.get(record.get("symbol"))
+            if not conditions:
+                continue
+            for condition, bucket in conditions.items():
+                field, rising = ALERT_CONDITIONS[condition]
+                value = record.get(field)
+                if value is None or not bucket.ids:
+                    continue
+                for alert_id in bucket.pop_fired(value, rising):
+                    symbol, _, target = self._alerts.pop(alert_id)
+                    fired.append({
+                        "id": alert_id, "symbol": symbol, "condition": condition, "target_price": target,
+                        "value": value, "message": alert_message(symbol, condition, target, value),
+                    })
+        return fired
+
+    def evaluate(self, records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Evalúa un snapshot recién guardado: marca las alertas disparadas en un único UPDATE
+        y emite `alert_triggered` por cada una. Requiere app context; nunca propaga errores
+        (una falla de alertas no debe afectar la ingesta).
+        """
+        try:
+            with self._lock:
+                if self._dirty:
+                    self.load()
+                fired = self.match(records)
+            if not fired:
+                return []
+
+            # Solo se notifican las que realmente pasaron a `triggered` (pudieron borrarse entretanto).
+            stmt = (
+                update(Alert)
+                .where(Alert.id.in_([f["id"] for f in fired]), Alert.triggered.is_(False))
+                .values(triggered=True)
+                .returning(Alert.id)
+            )
+            confirmed = set(db.session.execute(stmt).scalars())
+            db.session.commit()
+
+            fired = [f for f in fired if f["id"] in confirmed]
+            for alert in fired:
+                socketio.emit("alert_triggered", alert)
+            logger.info(f"[Alerts] {len(fired)} alertas disparadas.")
+            return fired
+        except Exception as e:
+            logger.error(f"[Alerts] Error evaluando alertas: {e}", exc_info=True)
+            db.session.rollback()
+            self.invalidate()
+            return []
+
+
+alert_engine = AlertEngine()
+
+
+@event.listens_for(Alert, "after_insert")
+@event.listens_for(Alert, "after_update")
+@event.listens_for(Alert, "after_delete")
+def _invalidate_alert_index(mapper, connection, target) -> None:
+    alert_engine.invalidate()
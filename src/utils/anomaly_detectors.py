@@ -0,0 +1,266 @@
+# src/utils/anomaly_detectors.py
+"""
+Registro de detectores de eventos anómalos ("drainers").
+
+Cada detector declara qué columnas necesita de cada fuente (`closings` =
+`StockClosing`, `prices` = `StockPrice`, `dividends` = `Dividend`) y recibe un
+dict `fuente -> DataFrame` con exactamente esas columnas más `nemo` y `date`,
+ordenado por (nemo, date). Devuelve eventos como dicts
+`{nemo, event_date, description, price_change_pct}`; el tipo y el origen del
+evento los agrega el framework (`src/scripts/drainer_service.py`), que carga cada
+columna una sola vez, ejecuta los detectores en paralelo y deduplica.
+
+Este módulo solo depende de numpy/pandas: los procesos del pool lo importan para
+resolver los detectores por nombre (`run_detector`), sin levantar Flask ni la DB.
+"""
+from __future__ import annotations
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+CLOSINGS = "closings"
+PRICES = "prices"
+DIVIDENDS = "dividends"
+
+ROLLING_WINDOW = 30
+ROLLING_MIN_PERIODS = 10
+SPIKE_STD_THRESHOLD = 3.5
+FORWARD_DAYS = 5
+PRICE_GAP_PCT = 8.0
+IPSA_WEIGHT_CHANGE = 0.5
+DIVIDEND_DRIFT_DAYS = 5
+DIVIDEND_DRIFT_PCT = 5.0
+_KEY_STRIDE = np.int64(1 << 32)
+
+Frames = Dict[str, pd.DataFrame]
+DetectorFunc = Callable[[Frames], List[Dict[str, Any]]]
+
+
+@dataclass(frozen=True)
+class Detector:
+    name: str
+    event_type: str
+    label: str
+    func: DetectorFunc
+    # fuente -> columnas requeridas (además de `nemo` y `date`); la primera fuente marca la fecha de corte
+    needs: Dict[str, Tuple[str, ...]] = field(default_factory=dict)
+    # días calendario de historia previa a la marca de agua que necesita en modo incremental
+    lookback_days: int = 0
+
+    @property
+    def primary_source(self) -> str:
+        return next(iter(self.needs))
+
+
+DETECTORS: Dict[str, Detector] = {}
+
+
+def register_detector(name: str, event_type: str, label: str, needs: Dict[str, Iterable[str]],
+                      lookback_days: int = 0) -> Callable[[DetectorFunc], DetectorFunc]:
+    """Decorador: registra `func` como detector `name`."""
+    def decorator(func: DetectorFunc) -> DetectorFunc:
+        DETECTORS[name] = Detector(name, event_type, label, func,
+                                   {source: tuple(cols) for source, cols in needs.items()}, lookback_days)
+        return func
+    return decorator
+
+
+def required_columns(detectors: Iterable[Detector]) -> Dict[str, List[str]]:
+    """Unión de columnas por fuente, para cargar cada columna una sola vez."""
+    columns: Dict[str, List[str]] = {}
+    for detector in detectors:
+        for source, cols in detector.needs.items():
+            merged = columns.setdefault(source, [])
+            merged.extend(c for c in cols if c not in merged)
+    return columns
+
+
+def frames_for(detector: Detector, frames: Frames) -> Frames:
+    """Vista de `frames` con solo las columnas del detector (lo que se envía a cada proceso)."""
+    return {source: frames[source][["nemo", "date", *cols]] for source, cols in detector.needs.items()}
+
+
+def run_detector(name: str, frames: Frames) -> Tuple[str, List[Dict[str, Any]], float]:
+    """Punto de entrada de los procesos del pool: `(nombre, eventos, segundos)`."""
+    start = time.perf_counter()
+    events = DETECTORS[name].func(frames)
+    return name, events, time.perf_counter() - start
+
+
+# --- Utilidades vectorizadas ---
+
+def _keys(nemo_codes: np.ndarray, dates) -> np.ndarray:
+    days = pd.to_datetime(pd.Series(dates)).to_numpy(dtype="datetime64[D]").astype(np.int64)
+    return nemo_codes.astype(np.int64) * _KEY_STRIDE + days
+
+
+def forward_price_changes(closings: pd.DataFrame, nemos, dates, forward_days: int = FORWARD_DAYS) -> np.ndarray:
+    """
+    Variación % entre el cierre de cada (nemo, fecha) y el primer cierre del mismo nemo
+    `forward_days` días después o más (NaN si falta alguno de los dos). `closings` debe
+    estar ordenado por (nemo, fecha): la clave compuesta nemo·2^32 + día queda ordenada
+    y un único `searchsorted` resuelve la búsqueda de todos los símbolos a la vez.
+    """
+    if not len(nemos) or closings.empty:
+        return np.full(len(nemos), np.nan)
+    categories = pd.Index(pd.unique(closings["nemo"]))
+    codes = categories.get_indexer(closings["nemo"])
+    keys = _keys(codes, closings["date"])
+    prices = closings["previous_day_close_price"].to_numpy(dtype=float)
+
+    query_codes = categories.get_indexer(pd.Index(nemos))
+    query_keys = _keys(np.where(query_codes < 0, 0, query_codes), dates)
+    last = len(keys) - 1
+
+    base_idx = np.minimum(np.searchsorted(keys, query_keys, side="left"), last)
+    has_base = (query_codes >= 0) & (keys[base_idx] == query_keys)
+    fwd = np.searchsorted(keys, query_keys + forward_days, side="left")
+    fwd_idx = np.minimum(fwd, last)
+    has_fwd = (query_codes >= 0) & (fwd < len(keys)) & (codes[fwd_idx] == query_codes)
+
+    base = prices[base_idx]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = (prices[fwd_idx] - base) / base * 100
+    return np.where(has_base & has_fwd & (base > 0), change, np.nan)
+
+
+def _rolling_spikes(df: pd.DataFrame, column: str, threshold: float = SPIKE_STD_THRESHOLD) -> pd.DataFrame:
+    """Filas cuyo `column` supera media móvil + N desviaciones de su nemo (una pasada de `groupby().rolling()`)."""
+    values = pd.to_numeric(df[column], errors="coerce")
+    rolling = values.groupby(df["nemo"], sort=False).rolling(window=ROLLING_WINDOW, min_periods=ROLLING_MIN_PERIODS)
+    mean = rolling.mean().reset_index(level=0, drop=True)
+    std = rolling.std().reset_index(level=0, drop=True)
+    mask = values > mean + std * threshold
+    return df.loc[mask].assign(_value=values[mask], _mean=mean[mask])
+
+
+def _event(nemo, event_date, description: str, price_change) -> Dict[str, Any]:
+    return {
+        "nemo": nemo, "event_date": pd.Timestamp(event_date).date(), "description": description,
+        "price_change_pct": None if price_change is None or np.isnan(price_change) else float(price_change),
+    }
+
+
+# --- Detectores incluidos ---
+
+@register_detector("volume_spikes", "Pico de Volumen", "Análisis Interno de Volumen",
+                   {CLOSINGS: ("previous_day_amount", "previous_day_close_price")}, lookback_days=60)
+def detect_volume_spikes(frames: Frames) -> List[Dict[str, Any]]:
+    closings = frames[CLOSINGS]
+    spikes = _rolling_spikes(closings, "previous_day_amount")
+    changes = forward_price_changes(closings, spikes["nemo"], spikes["date"])
+    return [
+        _event(nemo, day, f"Volumen transado ({value or 0:,.0f} CLP) fue "
+                          f"{(value / mean) if mean and mean > 0 else 0:.1f} veces el promedio.", change)
+        for nemo, day, value, mean, change in zip(spikes["nemo"], spikes["date"], spikes["_value"], spikes["_mean"], changes)
+    ]
+
+
+@register_detector("traded_units_spikes", "Pico de Unidades Transadas", "Análisis Interno de Rotación",
+                   {CLOSINGS: ("previous_day_traded_units", "previous_day_trades", "previous_day_close_price")},
+                   lookback_days=60)
+def detect_traded_units_spikes(frames: Frames) -> List[Dict[str, Any]]:
+    closings = frames[CLOSINGS]
+    spikes = _rolling_spikes(closings, "previous_day_traded_units")
+    changes = forward_price_changes(closings, spikes["nemo"], spikes["date"])
+    return [
+        _event(nemo, day, f"Unidades transadas ({value:,.0f} en {trades or 0:,.0f} negocios) fueron "
+                          f"{(value / mean) if mean and mean > 0 else 0:.1f} veces el promedio.", change)
+        for nemo, day, value, mean, trades, change in zip(
+            spikes["nemo"], spikes["date"], spikes["_value"], spikes["_mean"], spikes["previous_day_trades"], changes)
+    ]
+
+
+@register_detector("price_gaps", "Salto de Precio", "Análisis Interno de Precios",
+                   {PRICES: ("price",), CLOSINGS: ("previous_day_close_price",)}, lookback_days=1)
+def detect_price_gaps(frames: Frames) -> List[Dict[str, Any]]:
+    """Saltos entre capturas consecutivas de un símbolo ≥ `PRICE_GAP_PCT`; uno por (nemo, día), el mayor."""
+    prices = frames[PRICES]
+    price = pd.to_numeric(prices["price"], errors="coerce")
+    previous = price.groupby(prices["nemo"], sort=False).shift()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gap = (price - previous) / previous * 100
+    gaps = prices.assign(gap=gap, previous=previous, day=pd.to_datetime(prices["date"]).dt.normalize())
+    gaps = gaps[(previous > 0) & (gap.abs() >= PRICE_GAP_PCT)]
+    if gaps.empty:
+        return []
+    gaps = gaps.loc[gaps["gap"].abs().groupby([gaps["nemo"], gaps["day"]]).idxmax()]
+    changes = forward_price_changes(frames[CLOSINGS], gaps["nemo"], gaps["day"])
+    return [
+        _event(nemo, day, f"Salto de precio de {pct:+.2f}% entre capturas ({before:,.2f} → {after:,.2f}).", change)
+        for nemo, day, pct, before, after, change in zip(
+            gaps["nemo"], gaps["day"], gaps["gap"], gaps["previous"], gaps["price"], changes)
+    ]
+
+
+@register_detector("ipsa_weight_changes", "Cambio en IPSA", "Análisis Interno de Índices",
+                   {CLOSINGS: ("belongs_to_ipsa", "weight_ipsa", "previous_day_close_price")}, lookback_days=7)
+def detect_ipsa_weight_changes(frames: Frames) -> List[Dict[str, Any]]:
+    """Entradas/salidas del IPSA y cambios de ponderación ≥ `IPSA_WEIGHT_CHANGE` puntos."""
+    closings = frames[CLOSINGS]
+    member = closings["belongs_to_ipsa"].fillna(False).astype(bool)
+    weight = pd.to_numeric(closings["weight_ipsa"], errors="coerce")
+    by_nemo = closings["nemo"]
+    prev_member = member.groupby(by_nemo, sort=False).shift()
+    prev_weight = weight.groupby(by_nemo, sort=False).shift()
+    joined = prev_member.notna() & member & (prev_member == False)  # noqa: E712
+    left = prev_member.notna() & ~member & (prev_member == True)  # noqa: E712
+    moved = member & (prev_member == True) & ((weight - prev_weight).abs() >= IPSA_WEIGHT_CHANGE)  # noqa: E712
+    rows = closings.assign(weight=weight, prev_weight=prev_weight, joined=joined, left=left)[joined | left | moved]
+    changes = forward_price_changes(closings, rows["nemo"], rows["date"])
+
+    events = []
+    for nemo, day, w, pw, is_join, is_left, change in zip(
+            rows["nemo"], rows["date"], rows["weight"], rows["prev_weight"], rows["joined"], rows["left"], changes):
+        if is_join:
+            description = f"Ingresó al IPSA con ponderación {w or 0:.2f}%."
+        elif is_left:
+            description = f"Salió del IPSA (ponderación previa {pw or 0:.2f}%)."
+        else:
+            description = f"Ponderación IPSA cambió de {pw:.2f}% a {w:.2f}%."
+        events.append(_event(nemo, day, description, change))
+    return events
+
+
+@register_detector("dividend_drift", "Deriva Pre-Dividendo", "Análisis Interno de Dividendos",
+                   {CLOSINGS: ("previous_day_close_price",), DIVIDENDS: ("value",)},
+                   lookback_days=DIVIDEND_DRIFT_DAYS + 7)
+def detect_dividend_drift(frames: Frames) -> List[Dict[str, Any]]:
+    """
+    Variación del precio en los `DIVIDEND_DRIFT_DAYS` días previos a la fecha límite de un
+    dividendo (`date` de la fuente `dividends`) ≥ `DIVIDEND_DRIFT_PCT`: posicionamiento anticipado.
+    """
+    closings, dividends = frames[CLOSINGS], frames[DIVIDENDS]
+    if closings.empty or dividends.empty:
+        return []
+    dividends = dividends[pd.to_datetime(dividends["date"]) <= pd.to_datetime(closings["date"]).max()]
+    categories = pd.Index(pd.unique(closings["nemo"]))
+    codes = categories.get_indexer(closings["nemo"])
+    keys = _keys(codes, closings["date"])
+    prices = closings["previous_day_close_price"].to_numpy(dtype=float)
+
+    div_codes = categories.get_indexer(pd.Index(dividends["nemo"]))
+    valid = div_codes >= 0
+    dividends, div_codes = dividends[valid], div_codes[valid]
+    limit_keys = _keys(div_codes, dividends["date"])
+    # último cierre en o antes de cada fecha (mismo nemo)
+    at_limit = np.searchsorted(keys, limit_keys, side="right") - 1
+    before = np.searchsorted(keys, limit_keys - DIVIDEND_DRIFT_DAYS, side="right") - 1
+    ok = (at_limit >= 0) & (before >= 0)
+    at_limit, before = np.maximum(at_limit, 0), np.maximum(before, 0)
+    ok &= (codes[at_limit] == div_codes) & (codes[before] == div_codes) & (at_limit != before)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drift = (prices[at_limit] - prices[before]) / prices[before] * 100
+    flagged = ok & (prices[before] > 0) & (np.abs(drift) >= DIVIDEND_DRIFT_PCT)
+
+    rows = dividends[flagged]
+    changes = forward_price_changes(closings, rows["nemo"], rows["date"])
+    return [
+        _event(nemo, day, f"Precio varió {pct:+.2f}% en los {DIVIDEND_DRIFT_DAYS} días previos a la fecha límite "
+                          f"de un dividendo de {value:,.2f} ({value / price * 100 if price else 0:.2f}% del precio).", change)
+        for nemo, day, value, pct, price, change in zip(
+            rows["nemo"], rows["date"], rows["value"], drift[flagged], prices[at_limit][flagged], changes)
+    ]
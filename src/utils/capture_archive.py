@@ -0,0 +1,281 @@
+# src/utils/capture_archive.py
+"""
+Archivo columnar de las capturas de precios (fallback de archivos en `LOGS_DIR`).
+
+Cada captura se normaliza con `normalize_price_payload` y se agrega al final del
+archivo del día (`CAPTURE_ARCHIVE_DIR/<AAAA-MM-DD>.arrows`) como un stream Arrow
+IPC propio (esquema + un record batch + fin de stream). `manifest.jsonl` registra
+una línea por snapshot (timestamp, archivo, número de batch, offset, filas), de
+modo que las lecturas:
+
+- eligen los snapshots por timestamp sin abrir ningún archivo de datos;
+- abren el archivo del día con `pa.memory_map`, saltan al offset de cada snapshot
+  y leen solo las columnas pedidas (sin compresión, para que la lectura sea zero-copy).
+
+El formato de stream no lleva footer: agregar un snapshot solo escribe sus bytes
+al final del archivo (sin reescribir el día ni reemplazarlo mientras otro lo tiene
+mapeado). Los `.arrow` de versiones anteriores (formato IPC de archivo, sin offset
+en el manifiesto) se siguen leyendo. Requiere pyarrow; sin él, archivar y leer no
+hacen nada y se usan los JSON.
+"""
+from __future__ import annotations
+import glob
+import json
+import logging
+import os
+import threading
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from src.config import CAPTURE_ARCHIVE, CAPTURE_ARCHIVE_DIR, LOGS_DIR
+from src.utils.capture_index import CAPTURE_PREFIX, file_index
+from src.utils.price_ingest import FLOAT_FIELDS, INT_FIELDS, TEXT_FIELDS, normalize_price_payload
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # dependencia opcional
+    pa = ipc = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.jsonl"
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+if pa is not None:
+    CAPTURE_SCHEMA = pa.schema(
+        [("timestamp", pa.timestamp("s")), ("symbol", pa.string())]
+        + [(c, pa.float64()) for c in FLOAT_FIELDS.values()]
+        + [(c, pa.int64()) for c in INT_FIELDS.values()]
+        + [(c, pa.string()) for c in TEXT_FIELDS.values()]
+    )
+else:
+    CAPTURE_SCHEMA = None
+
+_write_lock = threading.Lock()
+_manifest_cache: Dict[str, Tuple[int, int, List["ManifestEntry"]]] = {}  # ruta -> (inode, offset, entradas)
+_manifest_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    ts: str
+    file: str
+    batch: int
+    rows: int
+    offset: Optional[int] = None  # inicio del stream del snapshot; None en los `.arrow` anteriores
+
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.strptime(self.ts, TIMESTAMP_FORMAT)
+
+    @property
+    def label(self) -> str:
+        return f"{self.file}#{self.batch}"
+
+
+def available() -> bool:
+    return pa is not None
+
+
+def archive_dir(logs_dir: Optional[str] = None) -> str:
+    """Directorio del archivo: `CAPTURE_ARCHIVE_DIR`, o `<logs_dir>/captures` para otro directorio de logs."""
+    if logs_dir and os.path.abspath(logs_dir) != os.path.abspath(LOGS_DIR):
+        return os.path.join(logs_dir, "captures")
+    return CAPTURE_ARCHIVE_DIR
+
+
+def _day_path(directory: str, ts: datetime) -> str:
+    return os.path.join(directory, f"{ts:%Y-%m-%d}.arrows")
+
+
+def _to_batch(frame: pd.DataFrame, ts: datetime) -> "pa.RecordBatch":
+    frame = frame.assign(timestamp=pd.Timestamp(ts.replace(tzinfo=None)))
+    return pa.RecordBatch.from_pandas(frame[CAPTURE_SCHEMA.names], schema=CAPTURE_SCHEMA, preserve_index=False)
+
+
+def _append_batch(path: str, batch: "pa.RecordBatch") -> int:
+    """Agrega `batch` al final del archivo del día como un stream IPC y devuelve su offset."""
+    with open(path, "ab") as sink:
+        offset = sink.tell()
+        with ipc.new_stream(sink, CAPTURE_SCHEMA) as writer:
+            writer.write_batch(batch)
+    return offset
+
+
+def archive_capture(data_object: Dict | List, ts: datetime, directory: Optional[str] = None) -> Optional[ManifestEntry]:
+    """
+    Archiva una captura completa como un snapshot del día de `ts`. Devuelve la entrada
+    del manifiesto, o None si el archivado está desactivado, no hay pyarrow o falla.
+    """
+    if pa is None or not (CAPTURE_ARCHIVE or directory):
+        return None
+    directory = directory or CAPTURE_ARCHIVE_DIR
+    try:
+        frame = normalize_price_payload(data_object)
+        batch = _to_batch(frame, ts)
+        with _write_lock:
+            os.makedirs(directory, exist_ok=True)
+            path = _day_path(directory, ts)
+            name = os.path.basename(path)
+            index = sum(1 for e in read_manifest(directory) if e.file == name)
+            offset = _append_batch(path, batch)
+            entry = ManifestEntry(ts=ts.strftime(TIMESTAMP_FORMAT), file=name, batch=index,
+                                  rows=batch.num_rows, offset=offset)
+            with open(os.path.join(directory, MANIFEST_NAME), "a", encoding="utf-8") as f:
+                f.write(json.dumps(asdict(entry)) + "\n")
+        return entry
+    except Exception as e:
+        logger.error(f"[CaptureArchive] No se pudo archivar la captura de {ts}: {e}", exc_info=True)
+        return None
+
+
+def read_manifest(directory: Optional[str] = None) -> List[ManifestEntry]:
+    """Entradas del manifiesto ordenadas por timestamp; solo se leen las líneas nuevas desde la última llamada."""
+    directory = directory or CAPTURE_ARCHIVE_DIR
+    path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return []
+    with _manifest_lock:
+        inode = os.stat(path).st_ino
+        cached_inode, offset, entries = _manifest_cache.get(path, (inode, 0, []))
+        if cached_inode != inode:  # manifiesto reconstruido (reemplazado)
+            offset, entries = 0, []
+        with open(path, "r", encoding="utf-8") as f:
+            f.seek(offset)
+            new = []
+            for line in iter(f.readline, ""):
+                if not line.endswith("\n"):
+                    break  # línea a medio escribir: se lee en la próxima llamada
+                offset += len(line.encode("utf-8"))
+                try:
+                    new.append(ManifestEntry(**json.loads(line)))
+                except (ValueError, TypeError):
+                    logger.warning(f"[CaptureArchive] Línea inválida en {path}: {line.strip()[:80]}")
+        if new:
+            entries = sorted(entries + new, key=lambda e: e.ts)
+        _manifest_cache[path] = (inode, offset, entries)
+        return entries
+
+
+def rebuild_manifest(directory: Optional[str] = None) -> int:
+    """Regenera el manifiesto leyendo solo la columna `timestamp` de cada batch. Devuelve los snapshots."""
+    if pa is None:
+        return 0
+    directory = directory or CAPTURE_ARCHIVE_DIR
+    entries = []
+
+    def add(path, index, batch, offset=None):
+        if batch.num_rows:
+            ts = batch.column(0)[0].as_py()
+            entries.append(ManifestEntry(ts.strftime(TIMESTAMP_FORMAT), os.path.basename(path), index,
+                                         batch.num_rows, offset))
+
+    for path in sorted(glob.glob(os.path.join(directory, "*.arrow"))):
+        with pa.memory_map(path, "r") as source:
+            reader = ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                add(path, i, reader.get_batch(i))
+    for path in sorted(glob.glob(os.path.join(directory, "*.arrows"))):
+        with pa.memory_map(path, "r") as source:
+            index, offset, size = 0, 0, source.size()
+            while offset < size:
+                source.seek(offset)
+                try:
+                    batches = list(ipc.open_stream(source))  # un batch por stream, hasta su fin de stream
+                except (pa.ArrowInvalid, OSError):
+                    # Cola de una escritura interrumpida: nunca llegó al manifiesto.
+                    logger.warning(f"[CaptureArchive] Se ignora el final incompleto de {os.path.basename(path)} "
+                                   f"desde el byte {offset}.")
+                    break
+                for batch in batches:
+                    add(path, index, batch, offset)
+                    index += 1
+                offset = source.tell()
+    with _write_lock:
+        tmp_path = os.path.join(directory, f"{MANIFEST_NAME}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(asdict(e)) + "\n" for e in sorted(entries, key=lambda e: e.ts))
+        os.replace(tmp_path, os.path.join(directory, MANIFEST_NAME))
+    return len(entries)
+
+
+def select_entries(directory: Optional[str] = None, start: Optional[datetime] = None,
+                   end: Optional[datetime] = None, limit: Optional[int] = None) -> List[ManifestEntry]:
+    """Snapshots archivados entre `start` y `end`; con `limit`, los más recientes."""
+    entries = read_manifest(directory)
+    if start is not None:
+        entries = [e for e in entries if e.timestamp >= start]
+    if end is not None:
+        entries = [e for e in entries if e.timestamp <= end]
+    return entries[-limit:] if limit else entries
+
+
+def read_snapshots(entries: Iterable[ManifestEntry], columns: Optional[List[str]] = None,
+                   directory: Optional[str] = None) -> Iterator[Tuple[ManifestEntry, "pa.RecordBatch"]]:
+    """
+    Lee los batches de `entries` (en el orden dado) con las columnas pedidas. Cada archivo
+    del día se mapea en memoria una vez por tramo consecutivo de entradas que lo usan.
+    """
+    if pa is None:
+        return
+    directory = directory or CAPTURE_ARCHIVE_DIR
+    entries = list(entries)
+    i = 0
+    while i < len(entries):
+        name = entries[i].file
+        with pa.memory_map(os.path.join(directory, name), "r") as source:
+            legacy = ipc.open_file(source) if entries[i].offset is None else None
+            while i < len(entries) and entries[i].file == name:
+                if legacy is not None:
+                    batch = legacy.get_batch(entries[i].batch)
+                else:
+                    source.seek(entries[i].offset)
+                    batch = ipc.open_stream(source).read_next_batch()
+                yield entries[i], batch.select(columns) if columns else batch
+                i += 1
+
+
+def price_map(batch: "pa.RecordBatch") -> Dict[str, Dict[str, Any]]:
+    """`{símbolo: {'symbol', 'price'}}` desde un batch con al menos `symbol` y `price`."""
+    symbols = batch.column(batch.schema.get_field_index("symbol")).to_pylist()
+    prices = batch.column(batch.schema.get_field_index("price")).to_pylist()
+    return {s: {"symbol": s, "price": p} for s, p in zip(symbols, prices) if s}
+
+
+def latest_records(directory: Optional[str] = None) -> Tuple[Optional[ManifestEntry], List[Dict[str, Any]]]:
+    """Último snapshot archivado como registros con las columnas de `stock_prices`."""
+    entries = read_manifest(directory)
+    if not entries or pa is None:
+        return None, []
+    for entry, batch in read_snapshots(entries[-1:], directory=directory):
+        return entry, batch.to_pylist()
+    return None, []
+
+
+def import_json_files(logs_dir: Optional[str] = None, directory: Optional[str] = None) -> int:
+    """Archiva los `acciones-precios-plus_*.json` de `logs_dir` que aún no están en el manifiesto."""
+    from src.utils.json_utils import DATE_FORMAT_STR, extract_timestamp_from_filename
+
+    if pa is None:
+        return 0
+    logs_dir = logs_dir or LOGS_DIR
+    directory = directory or archive_dir(logs_dir)
+    known = {e.ts for e in read_manifest(directory)}
+    imported = 0
+    for path in file_index(logs_dir).files(CAPTURE_PREFIX):
+        ts = datetime.strptime(extract_timestamp_from_filename(path), DATE_FORMAT_STR)
+        if ts.strftime(TIMESTAMP_FORMAT) in known:
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"[CaptureArchive] Se omite {os.path.basename(path)}: {e}")
+            continue
+        if archive_capture(data, ts, directory=directory):
+            imported += 1
+    return imported
@@ -0,0 +1,210 @@
+# src/utils/capture_index.py
+"""
+Índice en memoria de los archivos de captura de `LOGS_DIR` (`<prefijo>_AAAAMMDD_HHMMSS.json`).
+
+El directorio mezcla miles de capturas, resúmenes HAR y screenshots; en lugar de
+`glob` + `getmtime` por archivo en cada consulta, el índice mantiene por prefijo
+una lista ordenada por el timestamp del nombre:
+
+- se construye con un solo `os.scandir` (sin `stat` por archivo);
+- `save_json_with_timestamp` registra cada archivo nuevo con `add`;
+- antes de cada consulta se compara el mtime del directorio (un solo `stat`) y
+  solo se vuelve a recorrer si cambió por una escritura externa; con `watch()`
+  (requiere `watchdog`, que usa inotify en Linux) los eventos del sistema de
+  archivos mantienen el índice y ni siquiera ese `stat` es necesario.
+
+Así "el último" y "los dos últimos" son O(1) y listar el historial es O(n).
+"""
+from __future__ import annotations
+import bisect
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from src.config import LOGS_DIR
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # dependencia opcional
+    FileSystemEventHandler = object
+    Observer = None
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_PREFIX = "acciones-precios-plus"
+SUMMARY_PREFIX = "network_summary"
+FILENAME_RE = re.compile(r"^(?P<prefix>.+)_(?P<date>\d{8})_(?P<time>\d{6})\.json$")
+
+_Item = Tuple[datetime, str]
+
+
+def parse_filename(name: str) -> Optional[Tuple[str, datetime]]:
+    """`(prefijo, timestamp)` de un nombre `<prefijo>_AAAAMMDD_HHMMSS.json`, o None."""
+    match = FILENAME_RE.match(name)
+    if not match:
+        return None
+    try:
+        ts = datetime.strptime(match["date"] + match["time"], "%Y%m%d%H%M%S")
+    except ValueError:
+        return None
+    return match["prefix"], ts
+
+
+class _IndexEventHandler(FileSystemEventHandler):
+    def __init__(self, index: "CaptureFileIndex"):
+        super().__init__()
+        self.index = index
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.index.add(event.src_path)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self.index.discard(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.index.discard(event.src_path)
+            self.index.add(event.dest_path)
+
+
+class CaptureFileIndex:
+    """Archivos `<prefijo>_AAAAMMDD_HHMMSS.json` de un directorio, ordenados por timestamp por prefijo."""
+
+    def __init__(self, directory: str):
+        self.directory = os.path.abspath(directory)
+        self._lock = threading.RLock()
+        self._files: Dict[str, List[_Item]] = {}
+        self._dir_mtime: Optional[int] = None
+        self._observer = None
+
+    @property
+    def watching(self) -> bool:
+        return self._observer is not None
+
+    def _dir_stat(self) -> Optional[int]:
+        try:
+            return os.stat(self.directory).st_mtime_ns
+        except OSError:
+            return None
+
+    def directory_mtime(self) -> Optional[int]:
+        """mtime del directorio; tomarlo antes de escribir un archivo y pasarlo a `add`."""
+        return self._dir_stat()
+
+    def rebuild(self) -> int:
+        """Recorre el directorio una vez y reemplaza el índice. Devuelve los archivos indexados."""
+        files: Dict[str, List[_Item]] = {}
+        mtime = self._dir_stat()  # antes del recorrido: un archivo creado durante él fuerza otra pasada
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    parsed = parse_filename(entry.name)
+                    if parsed:
+                        files.setdefault(parsed[0], []).append((parsed[1], entry.path))
+        except OSError as e:
+            logger.warning(f"[CaptureIndex] No se pudo recorrer {self.directory}: {e}")
+        for items in files.values():
+            items.sort()
+        with self._lock:
+            self._files = files
+            self._dir_mtime = mtime
+        return sum(len(items) for items in files.values())
+
+    def _refresh(self) -> None:
+        if self.watching:
+            return
+        if self._dir_mtime is None or self._dir_stat() != self._dir_mtime:
+            self.rebuild()
+
+    def add(self, path: str, mtime_before: Optional[int] = None) -> bool:
+        """
+        Registra un archivo recién escrito. `mtime_before` es `directory_mtime()` tomado antes
+        de escribirlo. False si el nombre no tiene el formato esperado.
+        """
+        path = os.path.abspath(path)
+        parsed = parse_filename(os.path.basename(path))
+        if not parsed or os.path.dirname(path) != self.directory:
+            return False
+        prefix, ts = parsed
+        with self._lock:
+            items = self._files.setdefault(prefix, [])
+            position = bisect.bisect_left(items, (ts, path))
+            if position == len(items) or items[position] != (ts, path):
+                items.insert(position, (ts, path))
+            if not self.watching and self._dir_mtime is not None:
+                if mtime_before is not None and mtime_before == self._dir_mtime:
+                    # Solo cambió por la escritura propia, que ya quedó registrada: no hay que recorrerlo.
+                    self._dir_mtime = self._dir_stat()
+                else:
+                    # Pudo haber escrituras externas antes de la propia: se recorre en la próxima lectura.
+                    self._dir_mtime = None
+        return True
+
+    def discard(self, path: str) -> None:
+        path = os.path.abspath(path)
+        parsed = parse_filename(os.path.basename(path))
+        if not parsed:
+            return
+        with self._lock:
+            items = self._files.get(parsed[0], [])
+            position = bisect.bisect_left(items, (parsed[1], path))
+            if position < len(items) and items[position] == (parsed[1], path):
+                del items[position]
+
+    def files(self, prefix: str = CAPTURE_PREFIX) -> List[str]:
+        """Rutas de `prefix`, de la más antigua a la más reciente."""
+        self._refresh()
+        with self._lock:
+            return [path for _, path in self._files.get(prefix, [])]
+
+    def latest(self, prefix: str = CAPTURE_PREFIX, count: int = 1) -> List[str]:
+        """Las `count` rutas más recientes de `prefix` (en orden cronológico)."""
+        self._refresh()
+        with self._lock:
+            return [path for _, path in self._files.get(prefix, [])[-count:]]
+
+    def latest_file(self, prefix: str = CAPTURE_PREFIX) -> Optional[str]:
+        latest = self.latest(prefix)
+        return latest[0] if latest else None
+
+    def watch(self) -> bool:
+        """Mantiene el índice con eventos del sistema de archivos. False si `watchdog` no está instalado."""
+        if Observer is None:
+            logger.warning("[CaptureIndex] watchdog no está instalado; se usa el mtime del directorio.")
+            return False
+        if self.watching:
+            return True
+        observer = Observer()
+        observer.schedule(_IndexEventHandler(self), self.directory, recursive=False)
+        observer.daemon = True
+        observer.start()
+        self._observer = observer
+        self.rebuild()  # después de iniciar el observador, para no perder archivos creados entre medio
+        logger.info(f"[CaptureIndex] Observando {self.directory}.")
+        return True
+
+    def stop_watch(self) -> None:
+        observer, self._observer = self._observer, None
+        if observer is not None:
+            observer.stop()
+            observer.join(timeout=5)
+
+
+_indexes: Dict[str, CaptureFileIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def file_index(directory: Optional[str] = None) -> CaptureFileIndex:
+    """Índice (compartido) del directorio; `LOGS_DIR` por defecto."""
+    key = os.path.abspath(directory or LOGS_DIR)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = CaptureFileIndex(key)
+        return index
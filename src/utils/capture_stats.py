@@ -0,0 +1,56 @@
+# src/utils/capture_stats.py
+"""
+Latencias de captura de precios por modo (`direct` / `reload`).
+
+Guarda una ventana de las últimas mediciones por modo para exponer en la API
+promedio y percentiles, y así comparar el modo directo contra la recarga.
+"""
+from __future__ import annotations
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+import numpy as np
+
+STATS_WINDOW = 200
+
+
+class CaptureStats:
+    """Acumulador thread-safe de latencias (segundos) y resultados por modo de captura."""
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self._lock = threading.Lock()
+        self._window = window
+        self._samples: Dict[str, Deque[Tuple[float, bool]]] = {}
+        self._totals: Dict[str, Dict[str, int]] = {}
+
+    def record(self, mode: str, seconds: float, ok: bool = True) -> float:
+        """Registra una captura y devuelve la latencia registrada (para loguearla)."""
+        with self._lock:
+            self._samples.setdefault(mode, deque(maxlen=self._window)).append((seconds, ok))
+            totals = self._totals.setdefault(mode, {"count": 0, "failures": 0})
+            totals["count"] += 1
+            totals["failures"] += 0 if ok else 1
+        return seconds
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Por modo: totales históricos y estadísticas (ms) de las capturas exitosas de la ventana."""
+        with self._lock:
+            snapshot = {mode: (list(samples), dict(self._totals[mode])) for mode, samples in self._samples.items()}
+        result = {}
+        for mode, (samples, totals) in snapshot.items():
+            latencies = np.array([s for s, ok in samples if ok]) * 1000
+            stats = {**totals, "window": len(samples), "last_ms": round(samples[-1][0] * 1000, 1)}
+            if latencies.size:
+                p50, p95 = np.percentile(latencies, [50, 95])
+                stats.update(avg_ms=round(float(latencies.mean()), 1), p50_ms=round(float(p50), 1), p95_ms=round(float(p95), 1))
+            result[mode] = stats
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+
+
+capture_stats = CaptureStats()
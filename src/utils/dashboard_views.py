@@ -0,0 +1,238 @@
+# src/utils/dashboard_views.py
+"""
+Vistas de los dashboards de KPIs (`/api/kpis`) y dividendos (`/api/dividends`).
+
+Cada dashboard es una sola consulta que une sus tablas con el último cierre
+(`max(stock_closings.date)`), en lugar de varias idas y vueltas unidas en Python:
+
+- KPIs: selección ⨝ cierre del último día ⟕ `advanced_kpis`;
+- dividendos: `dividends` ⟕ cierre del último día (para `is_ipsa`).
+
+En PostgreSQL `ensure_dashboard_views` las materializa (con índice único, para
+poder refrescarlas con `CONCURRENTLY`); en otros motores (SQLite en tests) se
+ejecuta la misma consulta directamente.
+
+La respuesta se guarda ya serializada junto con un hash de su contenido, que es la
+versión con la que `cached_response` arma el ETag: un dashboard sin cambios se
+sirve sin consultar la DB y `If-None-Match` recibe 304. Quien escribe en esas
+tablas llama a `refresh_dashboards` tras su commit: refresca la vista
+materializada y descarta la respuesta guardada.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import logging
+import threading
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, column, func, select, table, text
+
+from src.extensions import db
+from src.models import AdvancedKPI, Dividend, KpiSelection, StockClosing
+
+logger = logging.getLogger(__name__)
+
+KPI_DASHBOARD = "kpi_dashboard"
+DIVIDENDS_DASHBOARD = "dividends_dashboard"
+
+
+def _latest_closing_date():
+    return select(func.max(StockClosing.date)).scalar_subquery()
+
+
+def _kpi_select():
+    c, k = StockClosing, AdvancedKPI
+    return (
+        select(
+            c.date, c.nemo, c.previous_day_amount, c.previous_day_trades, c.previous_day_close_price,
+            c.belongs_to_igpa, c.belongs_to_ipsa, c.weight_igpa, c.weight_ipsa, c.price_to_earnings_ratio,
+            c.current_yield, c.previous_day_traded_units, k.roe, k.debt_to_equity, k.beta,
+            k.analyst_recommendation, k.source.label("kpi_source"), k.last_updated.label("kpi_last_updated"),
+        )
+        .select_from(KpiSelection)
+        .join(c, and_(c.nemo == KpiSelection.nemo, c.date == _latest_closing_date()))
+        .outerjoin(k, k.nemo == KpiSelection.nemo)
+    )
+
+
+def _dividends_select():
+    d = Dividend
+    return (
+        select(
+            d.id, d.nemo, d.description, d.limit_date, d.payment_date, d.currency, d.value, d.num_acc_ant,
+            d.num_acc_der, d.num_acc_nue, d.pre_ant_vc, d.pre_ex_vc, StockClosing.belongs_to_ipsa,
+        )
+        .outerjoin(StockClosing, and_(StockClosing.nemo == d.nemo, StockClosing.date == _latest_closing_date()))
+    )
+
+
+def _iso(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def _kpi_row(r) -> Dict[str, Any]:
+    """Mismo formato que `StockClosing.to_dict` más los campos de `AdvancedKPI`."""
+    return {
+        'fec_fij_cie': _iso(r.date), 'nemo': r.nemo, 'monto_ant': r.previous_day_amount,
+        'neg_ant': r.previous_day_trades, 'precio_cierre_ant': r.previous_day_close_price,
+        'PERTENECE_IGPA': 1 if r.belongs_to_igpa else 0, 'PERTENECE_IPSA': 1 if r.belongs_to_ipsa else 0,
+        'PESO_IGPA': r.weight_igpa, 'PESO_IPSA': r.weight_ipsa,
+        'razon_pre_uti': r.price_to_earnings_ratio, 'ren_actual': r.current_yield,
+        'un_transadas_ant': r.previous_day_traded_units,
+        'roe': r.roe, 'debt_to_equity': r.debt_to_equity, 'beta': r.beta,
+        'riesgo': r.analyst_recommendation, 'dividend_yield': r.current_yield,
+        'kpi_last_updated': _iso(r.kpi_last_updated), 'kpi_source': r.kpi_source,
+    }
+
+
+def _dividend_row(r) -> Dict[str, Any]:
+    """Mismo formato que `Dividend.to_dict` más `is_ipsa`."""
+    return {
+        'id': r.id, 'nemo': r.nemo, 'descrip_vc': r.description,
+        'fec_lim': _iso(r.limit_date), 'fec_pago': _iso(r.payment_date),
+        'moneda': r.currency, 'val_acc': r.value, 'num_acc_ant': r.num_acc_ant,
+        'num_acc_der': r.num_acc_der, 'num_acc_nue': r.num_acc_nue,
+        'pre_ant_vc': r.pre_ant_vc, 'pre_ex_vc': r.pre_ex_vc,
+        'is_ipsa': bool(r.belongs_to_ipsa),
+    }
+
+
+# Vista -> (consulta, columnas del índice único, orden de la respuesta, serializador de fila)
+_DASHBOARDS: Dict[str, Tuple[Callable, List[str], List[str], Callable]] = {
+    KPI_DASHBOARD: (_kpi_select, ["nemo"], ["nemo"], _kpi_row),
+    DIVIDENDS_DASHBOARD: (_dividends_select, ["id"], ["payment_date", "id"], _dividend_row),
+}
+
+# Tabla -> dashboards que la leen
+DASHBOARD_TABLES = {
+    KpiSelection.__tablename__: (KPI_DASHBOARD,),
+    AdvancedKPI.__tablename__: (KPI_DASHBOARD,),
+    StockClosing.__tablename__: (KPI_DASHBOARD, DIVIDENDS_DASHBOARD),
+    Dividend.__tablename__: (DIVIDENDS_DASHBOARD,),
+}
+
+# URL del engine -> ¿existen las vistas materializadas?
+_materialized_cache: Dict[str, bool] = {}
+
+
+def ensure_dashboard_views(engine=None) -> bool:
+    """
+    Crea (si faltan) las vistas materializadas en PostgreSQL. Idempotente; devuelve
+    False sin error en otros motores o si no se pudieron crear.
+    """
+    engine = engine or db.engine
+    if engine.dialect.name != "postgresql":
+        return False
+    try:
+        with engine.begin() as conn:
+            for name, (build, unique, _, _) in _DASHBOARDS.items():
+                query = build().compile(engine, compile_kwargs={"literal_binds": True})
+                conn.execute(text(f"CREATE MATERIALIZED VIEW IF NOT EXISTS {name} AS {query}"))
+                conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS ux_{name} ON {name} ({', '.join(unique)})"))
+    except Exception as e:
+        logger.warning(f"[Dashboards] No se pudieron crear las vistas materializadas: {e}")
+        return False
+    finally:
+        _materialized_cache.pop(str(engine.url), None)
+    logger.info("[Dashboards] ✓ Vistas materializadas de KPIs y dividendos verificadas.")
+    return True
+
+
+def _materialized() -> bool:
+    engine = db.engine
+    key = str(engine.url)
+    if key not in _materialized_cache:
+        _materialized_cache[key] = engine.dialect.name == "postgresql" and bool(
+            db.session.execute(text("SELECT to_regclass(:view)"), {"view": KPI_DASHBOARD}).scalar()
+        )
+    return _materialized_cache[key]
+
+
+def _query_rows(name: str) -> List[Dict[str, Any]]:
+    build, _, order, serialize = _DASHBOARDS[name]
+    query = build()
+    if _materialized():
+        source = table(name, *(column(c.key, c.type) for c in query.selected_columns))
+    else:
+        source = query.subquery()
+    query = select(source).order_by(*(source.c[c] for c in order))
+    return [serialize(r) for r in db.session.execute(query)]
+
+
+class DashboardCache:
+    """
+    Respuestas serializadas (cuerpo JSON y ETag) por dashboard, thread-safe. Cada
+    invalidación sube la generación: una lectura que empezó antes no guarda su resultado.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[bytes, str]] = {}
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, name: str) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            return self._entries.get(name)
+
+    def put(self, name: str, body: bytes, generation: Optional[int] = None) -> Tuple[bytes, str]:
+        entry = (body, hashlib.blake2b(body, digest_size=16).hexdigest())
+        with self._lock:
+            if generation is None or generation == self._generation:
+                self._entries[name] = entry
+        return entry
+
+    def invalidate(self, *names: str) -> None:
+        with self._lock:
+            self._generation += 1
+            for name in names or list(self._entries):
+                self._entries.pop(name, None)
+
+
+dashboard_cache = DashboardCache()
+
+
+def dashboard_payload(name: str) -> Tuple[bytes, str]:
+    """`(cuerpo JSON, ETag)` del dashboard; solo consulta la DB si no hay respuesta guardada."""
+    cached = dashboard_cache.get(name)
+    if cached is not None:
+        return cached
+    generation = dashboard_cache.generation
+    body = json.dumps(_query_rows(name), sort_keys=True).encode("utf-8")
+    return dashboard_cache.put(name, body, generation)
+
+
+def dashboard_version(name: str) -> str:
+    """ETag de contenido del dashboard (la versión que usa `cached_response`)."""
+    return dashboard_payload(name)[1]
+
+
+def closing_version() -> Optional[str]:
+    """
+    Versión de `/api/closing`: último día de cierre más la generación de la caché,
+    que sube en cada `refresh_dashboards` (los upserts de cierres lo llaman).
+    """
+    latest = db.session.query(func.max(StockClosing.date)).scalar()
+    return f"{_iso(latest)}:{dashboard_cache.generation}" if latest else None
+
+
+def refresh_dashboards(*names: str) -> None:
+    """
+    Tras un commit que cambia selección, cierres, KPIs o dividendos: refresca las vistas
+    materializadas afectadas (todas si no se indican) y descarta sus respuestas guardadas.
+    """
+    names = names or tuple(_DASHBOARDS)
+    try:
+        if _materialized():
+            for name in names:
+                db.session.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {name}"))
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"[Dashboards] Error al refrescar {', '.join(names)}: {e}", exc_info=True)
+    finally:
+        dashboard_cache.invalidate(*names)
@@ -0,0 +1,193 @@
+# src/utils/db_engine.py
+"""
+Perfil del engine de base de datos para el servidor gevent.
+
+- `engine_options` arma `SQLALCHEMY_ENGINE_OPTIONS` desde `DB_POOL_*` (PostgreSQL;
+  SQLite usa los valores de Flask-SQLAlchemy) con un `QueuePool` medido: cada
+  checkout registra cuánto esperó por una conexión (incluida la apertura de una
+  nueva) y si venció `DB_POOL_TIMEOUT`. `pool_status` lo expone junto con las
+  conexiones en uso y el overflow.
+- `enable_gevent_wait` registra el callback de espera de psycopg2 sobre
+  `gevent.socket`: las consultas ceden el hub en vez de bloquear a los demás
+  greenlets. Con el callback psycopg2 no admite `COPY`; la ingesta lo detecta con
+  `green_mode` y usa un upsert multi-fila.
+- `run_prepared` ejecuta las consultas frecuentes (último timestamp, filas de un
+  snapshot) como sentencias preparadas: `PREPARE` una vez por conexión física
+  (registrado en `connection.info`) y luego `EXECUTE`. En otros motores, o con
+  `DB_PREPARED_STATEMENTS` desactivado, ejecuta la consulta equivalente.
+"""
+from __future__ import annotations
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from src.config import (
+    DB_GEVENT_WAIT, DB_MAX_OVERFLOW, DB_POOL_PRE_PING, DB_POOL_RECYCLE, DB_POOL_SIZE, DB_POOL_TIMEOUT,
+    DB_PREPARED_STATEMENTS,
+)
+from src.extensions import db
+from src.models import StockPrice
+
+try:
+    import psycopg2
+    from psycopg2 import extensions as pg_extensions
+except ImportError:  # solo necesario con PostgreSQL
+    psycopg2 = pg_extensions = None
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMetrics:
+    """Esperas por conexión acumuladas desde el arranque (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class MeteredQueuePool(QueuePool):
+    """`QueuePool` que mide la espera de cada checkout en `pool_metrics`."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_metrics.record(time.perf_counter() - started)
+        return connection
+
+
+def engine_options(url: str) -> Dict[str, Any]:
+    """`SQLALCHEMY_ENGINE_OPTIONS` para `url` (vacío en SQLite)."""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "poolclass": MeteredQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def pool_status(engine=None) -> Dict[str, Any]:
+    """Estado del pool del engine y esperas medidas (solo si el pool es un `QueuePool`)."""
+    engine = engine or db.engine
+    pool = engine.pool
+    status: Dict[str, Any] = {"pool_class": type(pool).__name__, "status": pool.status()}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+        })
+    if isinstance(pool, MeteredQueuePool):
+        status.update(pool_metrics.summary())
+    status.update({"prepared_statements": DB_PREPARED_STATEMENTS, "gevent_wait": green_mode()})
+    return status
+
+
+def gevent_wait_callback(conn, timeout=None) -> None:
+    """Espera de psycopg2 en modo green: sondea la conexión y cede el hub mientras el socket no está listo."""
+    from gevent.socket import wait_read, wait_write
+
+    while True:
+        state = conn.poll()
+        if state == pg_extensions.POLL_OK:
+            return
+        if state not in (pg_extensions.POLL_READ, pg_extensions.POLL_WRITE):
+            raise psycopg2.OperationalError(f"Resultado inesperado de poll(): {state!r}")
+        wait = wait_read if state == pg_extensions.POLL_READ else wait_write
+        try:
+            wait(conn.fileno(), timeout=timeout)
+        except BaseException:
+            # Espera interrumpida (timeout, KeyboardInterrupt, greenlet.kill): se cancela la consulta en el servidor.
+            conn.cancel()
+            raise
+
+
+def enable_gevent_wait() -> bool:
+    """Registra el callback de gevent en psycopg2. Llamar antes de abrir conexiones."""
+    if not DB_GEVENT_WAIT or pg_extensions is None:
+        return False
+    pg_extensions.set_wait_callback(gevent_wait_callback)
+    logger.info("[DbEngine] ✓ psycopg2 en modo green (callback de espera de gevent).")
+    return True
+
+
+def green_mode() -> bool:
+    return pg_extensions is not None and pg_extensions.get_wait_callback() is not None
+
+
+@dataclass(frozen=True)
+class PreparedQuery:
+    name: str
+    sql: str  # SQL de PostgreSQL con parámetros $1..$n
+    fallback: Callable[..., Any]  # misma consulta con SQLAlchemy Core (mismos parámetros posicionales)
+
+
+_PRICE_COLUMNS = [c.name for c in StockPrice.__table__.columns]
+
+LATEST_PRICE_TIMESTAMP = PreparedQuery(
+    "latest_price_ts",
+    f"SELECT max(timestamp) FROM {StockPrice.__tablename__}",
+    lambda: select(func.max(StockPrice.timestamp)),
+)
+PRICES_AT = PreparedQuery(
+    "prices_at",
+    f"SELECT {', '.join(_PRICE_COLUMNS)} FROM {StockPrice.__tablename__} WHERE timestamp = $1",
+    lambda ts: select(StockPrice.__table__).where(StockPrice.timestamp == ts),
+)
+
+
+def run_prepared(query: PreparedQuery, *params):
+    """Ejecuta `query` en la sesión actual como sentencia preparada (PostgreSQL) o con su equivalente."""
+    connection = db.session.connection()
+    if not DB_PREPARED_STATEMENTS or connection.dialect.name != "postgresql":
+        return db.session.execute(query.fallback(*params))
+    prepared = connection.connection.info.setdefault("prepared_statements", set())
+    if query.name not in prepared:
+        connection.exec_driver_sql(f"PREPARE {query.name} AS {query.sql}",
+                                   execution_options={"no_parameters": True})
+        prepared.add(query.name)
+    binds: Tuple[str, ...] = tuple(f"p{i}" for i in range(len(params)))
+    args = f"({', '.join(':' + b for b in binds)})" if binds else ""
+    return db.session.execute(text(f"EXECUTE {query.name}{args}"), dict(zip(binds, params)))
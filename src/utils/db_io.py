@@ -7,106 +7,196 @@ from contextlib import nullcontext
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 from sqlalchemy.dialects.postgresql import insert
+from src.config import INGEST_DEDUP, PRICE_INGEST_MODE
 from src.extensions import db, socketio
 from src.models import LastUpdate, StockPrice, StockFilter, FilteredStockHistory
 from src.utils.json_utils import (
     extract_timestamp_from_filename,
     get_latest_json_file,
 )
+from src.utils.price_ingest import (
+    extract_rows, frame_to_records, normalize_price_payload, row_hashes, snapshot_digest, write_price_frame,
+)
+from src.utils import capture_archive
+from src.utils.alert_engine import alert_engine
+from src.utils.db_engine import LATEST_PRICE_TIMESTAMP, PRICES_AT, run_prepared
+from src.utils.history_summary import record_snapshot_summary, rows_to_price_map
+from src.utils.price_push import price_push_hub
+from src.utils.snapshot_cache import Snapshot, db_record_to_api_row, latest_snapshot_cache
+from src.utils.snapshot_diff import compare_snapshots, diff_snapshots, last_two_timestamps, previous_timestamp
 
 logger = logging.getLogger(__name__)
 
-def store_prices_in_db(data_object: Dict | List, market_timestamp: datetime, app=None, filtered_symbols: Optional[List[str]] = None) -> None:
+# Resultado de `store_prices_in_db`
+STORED = "stored"
+UNCHANGED = "unchanged"
+NO_ROWS = "no_rows"
+FAILED = "failed"
+
+def _safe_float(value):
+    if value is None: return None
+    try: return float(str(value).replace(",", "."))
+    except (ValueError, TypeError): return None
+
+def _safe_int(value):
+    if value is None: return None
+    try: return int(value)
+    except (ValueError, TypeError): return None
+
+def _build_stock_rows(rows: List[Any], ts: datetime, filtered_symbols: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Modo 'rows' (legado): construye un dict por fila recorriendo `listaResult` item a item."""
+    symbols_to_track = set(s.upper() for s in filtered_symbols) if filtered_symbols else None
+
+    all_stock_data = []
+    for item in rows:
+        if not isinstance(item, dict): continue
+
+        symbol = item.get('NEMO')
+        if not symbol: continue
+
+        if symbols_to_track and symbol.upper() not in symbols_to_track:
+            continue
+
+        all_stock_data.append({
+            'symbol': symbol, 'timestamp': ts,
+            'price': _safe_float(item.get('PRECIO_CIERRE')),
+            'variation': _safe_float(item.get('VARIACION')),
+            'buy_price': _safe_float(item.get('PRECIO_COMPRA')),
+            'sell_price': _safe_float(item.get('PRECIO_VENTA')),
+            'amount': _safe_int(item.get('MONTO')),
+            'traded_units': _safe_int(item.get('UN_TRANSADAS')),
+            'currency': item.get('MONEDA'),
+            'isin': item.get('ISIN'),
+            'green_bond': item.get('BONO_VERDE')
+        })
+    return all_stock_data
+
+def _write_stock_rows(all_stock_data: List[Dict[str, Any]]) -> None:
+    """Modo 'rows' (legado): un único `INSERT ... VALUES` con todas las filas."""
+    bind = db.session.get_bind()
+    if bind.dialect.name == "postgresql":
+        stmt = insert(StockPrice).values(all_stock_data)
+        update_dict = {c.name: c for c in stmt.excluded if not c.primary_key}
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['symbol', 'timestamp'],
+            set_=update_dict
+        )
+        db.session.execute(stmt)
+    else: # Fallback para SQLite
+        db.session.bulk_insert_mappings(StockPrice, all_stock_data)
+
+def _touch_last_update(ts: datetime, data_changed: bool) -> None:
+    """Actualiza el latido de captura y, si hubo datos nuevos, también la última actualización."""
+    ids = (LastUpdate.DATA_ID, LastUpdate.HEARTBEAT_ID) if data_changed else (LastUpdate.HEARTBEAT_ID,)
+    for row_id in ids:
+        lu = db.session.get(LastUpdate, row_id) or LastUpdate(id=row_id)
+        lu.timestamp = ts
+        db.session.add(lu)
+
+def store_prices_in_db(data_object: Dict | List, market_timestamp: datetime, app=None, filtered_symbols: Optional[List[str]] = None) -> str:
     """
     Guarda precios desde un objeto en memoria en la DB usando operaciones masivas (bulk)
-    y emite un evento `new_data`.
+    y emite un evento `new_data`. El modo de ingesta se elige con `PRICE_INGEST_MODE`.
+
+    Con `INGEST_DEDUP`, una captura idéntica al último snapshot (misma huella) no escribe
+    filas: solo actualiza el latido en `LastUpdate`. Si repite el timestamp del último
+    snapshot, solo se escriben las filas cuyo hash cambió. Devuelve `STORED` si se guardó
+    un snapshot nuevo o modificado, `UNCHANGED` si era idéntico al último, `NO_ROWS` si no
+    había filas válidas y `FAILED` si la escritura falló (p. ej. sin DB).
     """
     ctx = app.app_context() if app else nullcontext()
     with ctx:
         try:
-            rows = data_object.get("listaResult") if isinstance(data_object, dict) else data_object
-            if not isinstance(rows, list):
+            rows = extract_rows(data_object)
+            if rows is None:
                 logger.warning("El objeto de datos no contiene una lista de resultados válida.")
-                return
+                return NO_ROWS
 
             ts = market_timestamp
-            
-            symbols_to_track = set(s.upper() for s in filtered_symbols) if filtered_symbols else None
-            
-            all_stock_data = []
-            for item in rows:
-                if not isinstance(item, dict): continue
-                
-                symbol = item.get('NEMO')
-                if not symbol: continue
-
-                if symbols_to_track and symbol.upper() not in symbols_to_track:
-                    continue
-
-                def safe_float(value):
-                    if value is None: return None
-                    try: return float(str(value).replace(",", "."))
-                    except (ValueError, TypeError): return None
-                
-                def safe_int(value):
-                    if value is None: return None
-                    try: return int(value)
-                    except (ValueError, TypeError): return None
-
-                stock_price_obj = {
-                    'symbol': symbol, 'timestamp': ts,
-                    'price': safe_float(item.get('PRECIO_CIERRE')),
-                    'variation': safe_float(item.get('VARIACION')),
-                    'buy_price': safe_float(item.get('PRECIO_COMPRA')),
-                    'sell_price': safe_float(item.get('PRECIO_VENTA')),
-                    'amount': safe_int(item.get('MONTO')),
-                    'traded_units': safe_int(item.get('UN_TRANSADAS')),
-                    'currency': item.get('MONEDA'),
-                    'isin': item.get('ISIN'),
-                    'green_bond': item.get('BONO_VERDE')
-                }
-                all_stock_data.append(stock_price_obj)
-
-            if not all_stock_data:
-                logger.info("No hay datos de acciones válidos para guardar (o ninguno pasó el filtro).")
-                lu = db.session.get(LastUpdate, 1) or LastUpdate(id=1)
-                lu.timestamp = ts
-                db.session.add(lu)
+            frame = normalize_price_payload(rows, filtered_symbols)
+            hashes = row_hashes(frame)
+            previous = get_latest_snapshot() if INGEST_DEDUP else latest_snapshot_cache.get()
+
+            if (INGEST_DEDUP and hashes and previous is not None and previous.timestamp <= ts
+                    and snapshot_digest(hashes) == previous.digest):
+                _touch_last_update(ts, data_changed=False)
                 db.session.commit()
-                socketio.emit("new_data", {'message': 'Actualización completada, sin datos nuevos para guardar.'})
-                return
-
-            bind = db.session.get_bind()
-            if bind.dialect.name == "postgresql":
-                stmt = insert(StockPrice).values(all_stock_data)
-                update_dict = {c.name: c for c in stmt.excluded if not c.primary_key}
-                stmt = stmt.on_conflict_do_update(
-                    index_elements=['symbol', 'timestamp'],
-                    set_=update_dict
-                )
-                db.session.execute(stmt)
-            else: # Fallback para SQLite
-                db.session.bulk_insert_mappings(StockPrice, all_stock_data)
-            
-            lu = db.session.get(LastUpdate, 1) or LastUpdate(id=1)
-            lu.timestamp = ts
-            db.session.add(lu)
+                logger.info(f"Captura sin cambios ({len(hashes)} acciones, {ts.strftime('%H:%M:%S')}): "
+                            f"solo se registra el latido.")
+                # El cliente espera `new_data` para salir de "actualizando" y reanudar la auto-actualización.
+                socketio.emit("new_data", {'message': 'Sin cambios', 'unchanged': True})
+                return UNCHANGED
+
+            if PRICE_INGEST_MODE == "rows":
+                all_stock_data = _build_stock_rows(rows, ts, filtered_symbols)
+                if all_stock_data:
+                    _write_stock_rows(all_stock_data)
+                hashes = None  # el modo legado no parsea igual que la huella
+            else:
+                to_write = frame
+                if INGEST_DEDUP and previous is not None and previous.timestamp == ts:
+                    # Mismo timestamp: el upsert solo necesita las filas cuyo hash cambió.
+                    known = previous.row_hashes
+                    to_write = frame[[known.get(s) != hashes[s] for s in frame['symbol']]]
+                write_price_frame(to_write, ts, db.session)
+                all_stock_data = frame_to_records(frame, ts)
+            written = len(all_stock_data)
+
+            _touch_last_update(ts, data_changed=True)
             db.session.commit()
-            
-            socketio.emit("new_data", {'message': 'Datos actualizados!'})
-            logger.info(f"Datos guardados para {len(all_stock_data)} acciones con timestamp {ts.strftime('%Y-%m-%d %H:%M:%S')}")
+
+            if written:
+                api_rows = [db_record_to_api_row(r) for r in all_stock_data]
+                snapshot = latest_snapshot_cache.publish(ts, api_rows, hashes)
+                current_rows = snapshot.rows if snapshot and snapshot.timestamp == ts else api_rows
+                if previous and previous.timestamp < ts:
+                    record_snapshot_summary(ts, rows_to_price_map(current_rows), rows_to_price_map(previous.rows), previous.timestamp)
+                else:
+                    record_snapshot_summary(ts, rows_to_price_map(current_rows))
+
+            if not written:
+                logger.info("No hay datos de acciones válidos para guardar (o ninguno pasó el filtro).")
+                socketio.emit("new_data", {'message': 'Actualización completada, sin datos nuevos para guardar.'})
+                return NO_ROWS
+
+            # Solo las filas que cambiaron, a cada sala de filtro; `new_data` queda como aviso liviano.
+            if previous is None or previous.timestamp <= ts:
+                seq = price_push_hub.publish(ts, previous.rows if previous else None, current_rows)
+            else:
+                seq = price_push_hub.seq  # snapshot atrasado: los clientes ya tienen uno más nuevo
+            socketio.emit("new_data", {'message': 'Datos actualizados!', 'seq': seq})
+            logger.info(f"Datos guardados para {written} acciones con timestamp {ts.strftime('%Y-%m-%d %H:%M:%S')}")
+            alert_engine.evaluate(all_stock_data)
+            return STORED
 
         except Exception as e:
             logger.exception("Error al guardar precios en la DB o emitir evento: %s", e)
             db.session.rollback()
+            return FAILED
+
+def get_latest_snapshot() -> Optional[Snapshot]:
+    """Devuelve el último snapshot desde la caché en memoria, cargándolo de la DB si está fría."""
+    snapshot = latest_snapshot_cache.get()
+    if snapshot is not None:
+        return snapshot
+    latest_update = run_prepared(LATEST_PRICE_TIMESTAMP).scalar()
+    if not latest_update:
+        return None
+    records = [dict(r._mapping) for r in run_prepared(PRICES_AT, latest_update)]
+    return latest_snapshot_cache.load(latest_update, [db_record_to_api_row(r) for r in records])
 
 def get_latest_data() -> Dict[str, Any]:
-    """Devuelve los datos más recientes, priorizando la base de datos."""
+    """Devuelve los datos más recientes, priorizando la base de datos (vía caché de snapshot)."""
     try:
-        latest_update = db.session.query(db.func.max(StockPrice.timestamp)).scalar()
-        if latest_update:
-            prices = StockPrice.query.filter_by(timestamp=latest_update).all()
-            return {"data": [p.to_dict() for p in prices], "timestamp": latest_update.strftime("%d/%m/%Y %H:%M:%S"), "source": "database"}
+        snapshot = get_latest_snapshot()
+        if snapshot:
+            return snapshot.payload
+
+        entry, records = capture_archive.latest_records()
+        if entry is not None:
+            return {"data": [db_record_to_api_row(r) for r in records],
+                    "timestamp": entry.timestamp.strftime("%d/%m/%Y %H:%M:%S"),
+                    "source": f"archive_fallback:{entry.label}"}
 
         latest_json_path = get_latest_json_file()
         if latest_json_path and os.path.exists(latest_json_path):
@@ -123,62 +213,49 @@ def get_latest_data() -> Dict[str, Any]:
 
 def filter_stocks(stock_codes: List[str]) -> Dict[str, Any]:
     """Filtra la lista de acciones por sus códigos (NEMO)."""
+    wanted_codes = [c for c in stock_codes or [] if c and isinstance(c, str)]
+    try:
+        snapshot = get_latest_snapshot()
+    except Exception as exc:
+        logger.exception("Error leyendo el snapshot para filtrar: %s", exc)
+        snapshot = None
+    if snapshot:
+        payload = snapshot.payload
+        if wanted_codes:
+            payload["data"] = snapshot.select(wanted_codes)
+        return payload
+
     latest_data = get_latest_data()
     if "error" in latest_data: return latest_data
 
     all_stocks = latest_data["data"]
-    if not stock_codes:
+    if not wanted_codes:
         return { "data": all_stocks, "timestamp": latest_data["timestamp"], "source": latest_data["source"] }
 
-    wanted_codes = {c.upper().strip() for c in stock_codes if c and isinstance(c, str)}
-    filtered = [s for s in all_stocks if s.get('NEMO', '').upper().strip() in wanted_codes]
+    wanted = {c.upper().strip() for c in wanted_codes}
+    filtered = [s for s in all_stocks if s.get('NEMO', '').upper().strip() in wanted]
     
     return { "data": filtered, "timestamp": latest_data["timestamp"], "source": latest_data["source"] }
 
 
 def compare_last_two_db_entries(stock_codes: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
-    """Compara los dos últimos registros de precios en la DB, filtrando opcionalmente."""
+    """Compara los dos últimos snapshots de precios en la DB, filtrando opcionalmente."""
     try:
-        timestamps = db.session.query(StockPrice.timestamp).distinct().order_by(StockPrice.timestamp.desc()).limit(2).all()
-        if len(timestamps) < 2: return None
-
-        ts_curr, ts_prev = timestamps[0][0], timestamps[1][0]
-        
-        query_curr = StockPrice.query.filter_by(timestamp=ts_curr)
-        query_prev = StockPrice.query.filter_by(timestamp=ts_prev)
-
-        if stock_codes:
-            query_curr = query_curr.filter(StockPrice.symbol.in_(stock_codes))
-            query_prev = query_prev.filter(StockPrice.symbol.in_(stock_codes))
-        
-        curr_map = {r.symbol: r.to_dict() for r in query_curr.all()}
-        prev_map = {r.symbol: r.to_dict() for r in query_prev.all()}
-
-        new_syms = set(curr_map) - set(prev_map)
-        removed_syms = set(prev_map) - set(curr_map)
-
-        changes, unchanged = [], []
-        for sym in curr_map.keys() & prev_map.keys():
-            curr, prev = curr_map[sym], prev_map[sym]
-            if curr.get("PRECIO_CIERRE") != prev.get("PRECIO_CIERRE") or curr.get("VARIACION") != prev.get("VARIACION"):
-                diff = (curr.get('PRECIO_CIERRE') or 0) - (prev.get('PRECIO_CIERRE') or 0)
-                pct = (diff / prev["PRECIO_CIERRE"] * 100) if prev.get("PRECIO_CIERRE") and prev.get("PRECIO_CIERRE") != 0 else 0.0
-                changes.append({ "symbol": sym, "old": prev, "new": curr, "abs_diff": diff, "pct_diff": pct })
-            else:
-                unchanged.append(curr)
-
-        return {
-            "current_timestamp": ts_curr.strftime("%d/%m/%Y %H:%M:%S"),
-            "previous_timestamp": ts_prev.strftime("%d/%m/%Y %H:%M:%S"),
-            "new": [curr_map[s] for s in new_syms],
-            "removed": [prev_map[s] for s in removed_syms],
-            "changes": changes,
-            "unchanged": unchanged,
-        }
+        timestamps = last_two_timestamps()
+        if not timestamps: return None
+        return compare_snapshots(timestamps[0], timestamps[1], stock_codes)
     except Exception as exc:
         logger.exception("Error comparando históricos desde la DB: %s", exc)
         return None
 
+def compare_db_snapshots(ts_prev: datetime, ts_curr: datetime, stock_codes: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """Compara dos snapshots arbitrarios de la DB, filtrando opcionalmente."""
+    try:
+        return compare_snapshots(ts_prev, ts_curr, stock_codes)
+    except Exception as exc:
+        logger.exception("Error comparando snapshots %s y %s: %s", ts_prev, ts_curr, exc)
+        return None
+
 def save_filtered_comparison_history(market_timestamp: datetime, app=None):
     """Compara los últimos datos, filtra por StockFilter y guarda los cambios."""
     ctx = app.app_context() if app else nullcontext()
@@ -198,20 +275,19 @@ def save_filtered_comparison_history(market_timestamp: datetime, app=None):
             stock_codes_to_track = json.loads(stock_filter.codes_json)
             if not stock_codes_to_track: return
 
-            comparison = compare_last_two_db_entries(stock_codes=stock_codes_to_track)
-            if not comparison or 'changes' not in comparison: return
+            ts_prev = previous_timestamp(market_timestamp)
+            if not ts_prev: return
 
             new_entries = [
-                FilteredStockHistory(
-                    timestamp=market_timestamp, symbol=change['symbol'],
-                    price=change.get('new', {}).get('PRECIO_CIERRE'),
-                    previous_price=change.get('old', {}).get('PRECIO_CIERRE'),
-                    price_difference=change.get('abs_diff'), percent_change=change.get('pct_diff')
-                ) for change in comparison.get('changes', [])
+                {
+                    'timestamp': market_timestamp, 'symbol': row['symbol'],
+                    'price': row['new_price'], 'previous_price': row['old_price'],
+                    'price_difference': row['abs_diff'], 'percent_change': row['pct_diff'],
+                } for row in diff_snapshots(ts_prev, market_timestamp, stock_codes_to_track) if row['status'] == 'changed'
             ]
-            
+
             if new_entries:
-                db.session.bulk_save_objects(new_entries)
+                db.session.bulk_insert_mappings(FilteredStockHistory, new_entries)
                 db.session.commit()
                 logger.info(f"✓ Guardados {len(new_entries)} registros en historial filtrado.")
 
@@ -0,0 +1,95 @@
+# src/utils/downsampling.py
+"""
+Reducción de series temporales para gráficos.
+
+Ambos métodos devuelven los *índices* de los puntos a conservar (ordenados), de
+modo que se pueden aplicar a cualquier arreglo paralelo (labels, OHLC, etc.).
+
+- `lttb`: Largest-Triangle-Three-Buckets; conserva la forma visual de la serie.
+- `minmax`: mínimo y máximo de cada bucket; conserva todos los extremos.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+DOWNSAMPLING_METHODS = ("lttb", "minmax")
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Índices elegidos por LTTB. El primer y último punto se conservan siempre; en
+    cada bucket intermedio se elige el punto que forma el triángulo de mayor área
+    con el punto elegido en el bucket anterior y el promedio del bucket siguiente.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Límites de los n_out - 2 buckets intermedios (excluyen el primer y último punto)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+
+    # Promedio de cada bucket (vía sumas acumuladas), usado como tercer vértice
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    next_starts = edges[1:]
+    next_stops = np.append(edges[2:], n)
+    sizes = next_stops - next_starts
+    avg_x = (cum_x[next_stops] - cum_x[next_starts]) / sizes
+    avg_y = (cum_y[next_stops] - cum_y[next_starts]) / sizes
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for i, (start, stop) in enumerate(zip(edges[:-1], edges[1:])):
+        xs, ys = x[start:stop], y[start:stop]
+        area = np.abs((x[prev] - avg_x[i]) * (ys - y[prev]) - (x[prev] - xs) * (avg_y[i] - y[prev]))
+        prev = start + int(np.argmax(area))
+        selected[i + 1] = prev
+    return selected
+
+
+def minmax(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Índices del mínimo y máximo de cada uno de `(n_out - 2) // 2` buckets de igual ancho en `x`."""
+    n = len(y)
+    n_buckets = max((n_out - 2) // 2, 1)
+    if n_out >= n:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    span = x[-1] - x[0]
+    bucket = np.zeros(n, dtype=np.int64) if span <= 0 else \
+        np.minimum(((x - x[0]) / span * n_buckets).astype(np.int64), n_buckets - 1)
+
+    # Ordenando por (bucket, y), el primero de cada bucket es el mínimo y el último el máximo.
+    order = np.lexsort((y, bucket))
+    sorted_buckets = bucket[order]
+    starts = np.flatnonzero(np.r_[True, sorted_buckets[1:] != sorted_buckets[:-1]])
+    ends = np.r_[starts[1:], n] - 1
+    return np.unique(np.concatenate((order[starts], order[ends], [0, n - 1])))
+
+
+def downsample(x: np.ndarray, y: np.ndarray, n_out: int, method: str = "lttb") -> np.ndarray:
+    """Índices a conservar según `method` (`lttb` o `minmax`). Ignora puntos con `y` nulo."""
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.flatnonzero(~np.isnan(y))
+    if not len(valid):
+        return valid
+    # Relativo al primer punto: evita perder precisión con epochs en nanosegundos.
+    x = np.asarray(x)[valid]
+    x = (x - x[0]).astype(np.float64)
+    reducer = minmax if method == "minmax" else lttb
+    return valid[reducer(x, y[valid], n_out)]
+
+
+def downsample_frame(frame: pd.DataFrame, time_col: str, value_col: str, max_points: int,
+                     method: str = "lttb") -> pd.DataFrame:
+    """Aplica `downsample` a un DataFrame ordenado por `time_col`, conservando todas sus columnas."""
+    if len(frame) <= max_points:
+        return frame
+    x = pd.to_datetime(frame[time_col]).to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    y = pd.to_numeric(frame[value_col], errors="coerce").to_numpy(dtype=np.float64)
+    return frame.iloc[downsample(x, y, max_points, method)]
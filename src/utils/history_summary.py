@@ -0,0 +1,140 @@
+# src/utils/history_summary.py
+"""
+Resúmenes por snapshot (`snapshot_summaries`) para `/api/history`.
+
+Se mantienen de forma incremental en cada ingesta (comparando solo contra el
+snapshot anterior) y se pueden reconstruir completos con `backfill_snapshot_summaries`,
+que hace una única pasada SQL con `LAG` sobre particiones por símbolo.
+"""
+from __future__ import annotations
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime, Integer, text
+
+from src.extensions import db
+from src.models import SnapshotSummary, StockPrice
+
+logger = logging.getLogger(__name__)
+
+PriceMap = Dict[str, Tuple[Optional[float], Optional[float]]]
+
+_BACKFILL_SQL = """
+WITH snaps AS (
+    SELECT timestamp,
+           COUNT(*) AS total_count,
+           LAG(timestamp) OVER (ORDER BY timestamp) AS previous_timestamp,
+           LAG(COUNT(*)) OVER (ORDER BY timestamp) AS previous_total
+    FROM stock_prices
+    GROUP BY timestamp
+),
+symbol_rows AS (
+    SELECT timestamp,
+           LAG(timestamp) OVER w AS symbol_previous_timestamp,
+           CASE WHEN price <> LAG(price) OVER w
+                  OR variation <> LAG(variation) OVER w
+                  OR (price IS NULL) <> (LAG(price) OVER w IS NULL)
+                  OR (variation IS NULL) <> (LAG(variation) OVER w IS NULL)
+                THEN 1 ELSE 0 END AS is_changed
+    FROM stock_prices
+    WINDOW w AS (PARTITION BY symbol ORDER BY timestamp)
+)
+SELECT s.timestamp,
+       s.previous_timestamp,
+       s.total_count,
+       SUM(CASE WHEN r.symbol_previous_timestamp = s.previous_timestamp THEN 0 ELSE 1 END) AS new_count,
+       COALESCE(s.previous_total, 0)
+         - SUM(CASE WHEN r.symbol_previous_timestamp = s.previous_timestamp THEN 1 ELSE 0 END) AS removed_count,
+       SUM(CASE WHEN r.symbol_previous_timestamp = s.previous_timestamp THEN r.is_changed ELSE 0 END) AS changed_count
+FROM snaps s
+JOIN symbol_rows r ON r.timestamp = s.timestamp
+GROUP BY s.timestamp, s.previous_timestamp, s.total_count, s.previous_total
+"""
+
+
+def rows_to_price_map(rows: List[Dict[str, Any]]) -> PriceMap:
+    """Reduce filas con formato de API (`NEMO`, `PRECIO_CIERRE`, `VARIACION`) a un mapa símbolo -> (precio, variación)."""
+    return {r.get('NEMO'): (r.get('PRECIO_CIERRE'), r.get('VARIACION')) for r in rows if r.get('NEMO')}
+
+
+def _price_map_from_db(ts: datetime) -> PriceMap:
+    rows = db.session.query(StockPrice.symbol, StockPrice.price, StockPrice.variation).filter(StockPrice.timestamp == ts).all()
+    return {symbol: (price, variation) for symbol, price, variation in rows}
+
+
+def summarize(current: PriceMap, previous: PriceMap) -> Dict[str, int]:
+    """Cuenta símbolos nuevos, eliminados y con cambio de precio/variación."""
+    common = current.keys() & previous.keys()
+    return {
+        'total_count': len(current),
+        'new_count': len(current.keys() - previous.keys()),
+        'removed_count': len(previous.keys() - current.keys()),
+        'changed_count': sum(1 for sym in common if current[sym] != previous[sym]),
+    }
+
+
+def record_snapshot_summary(ts: datetime, current: PriceMap, previous: Optional[PriceMap] = None,
+                            previous_ts: Optional[datetime] = None) -> Optional[SnapshotSummary]:
+    """
+    Calcula y guarda (upsert) el resumen del snapshot `ts`. Si no se entrega el
+    snapshot anterior, se busca en la DB con una consulta acotada a ese timestamp.
+    """
+    try:
+        if previous is None:
+            previous_ts = db.session.query(db.func.max(StockPrice.timestamp)).filter(StockPrice.timestamp < ts).scalar()
+            previous = _price_map_from_db(previous_ts) if previous_ts else {}
+
+        summary = db.session.get(SnapshotSummary, ts) or SnapshotSummary(timestamp=ts)
+        summary.previous_timestamp = previous_ts
+        for key, value in summarize(current, previous).items():
+            setattr(summary, key, value)
+        if previous_ts is None:
+            summary.new_count = summary.total_count
+        db.session.add(summary)
+        db.session.commit()
+        return summary
+    except Exception as e:
+        logger.error(f"No se pudo guardar el resumen del snapshot {ts}: {e}", exc_info=True)
+        db.session.rollback()
+        return None
+
+
+def query_history(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                  limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Historial de snapshots (más reciente primero) dentro de la ventana `[start, end]`."""
+    query = SnapshotSummary.query.filter(SnapshotSummary.previous_timestamp.isnot(None))
+    if start:
+        query = query.filter(SnapshotSummary.timestamp >= start)
+    if end:
+        query = query.filter(SnapshotSummary.timestamp <= end)
+    query = query.order_by(SnapshotSummary.timestamp.desc())
+    if limit:
+        query = query.limit(limit)
+    return [s.to_dict() for s in query.all()]
+
+
+def backfill_snapshot_summaries() -> int:
+    """Reconstruye todos los resúmenes con una sola pasada de funciones de ventana. Devuelve cuántos se guardaron."""
+    stmt = text(_BACKFILL_SQL).columns(
+        timestamp=DateTime, previous_timestamp=DateTime, total_count=Integer,
+        new_count=Integer, removed_count=Integer, changed_count=Integer,
+    )
+    try:
+        rows = [dict(r._mapping) for r in db.session.execute(stmt)]
+        SnapshotSummary.query.delete()
+        if rows:
+            db.session.bulk_insert_mappings(SnapshotSummary, rows)
+        db.session.commit()
+        logger.info(f"✓ Backfill de resúmenes completado: {len(rows)} snapshots.")
+        return len(rows)
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def ensure_snapshot_summaries() -> None:
+    """Ejecuta el backfill si hay precios pero todavía no existen resúmenes (primer arranque tras migrar)."""
+    if db.session.query(SnapshotSummary.timestamp).first() is None and db.session.query(StockPrice.symbol).first() is not None:
+        logger.info("No existen resúmenes de snapshots. Ejecutando backfill inicial...")
+        backfill_snapshot_summaries()
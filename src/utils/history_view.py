@@ -1,16 +1,14 @@
 import os
 import json
-import glob
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
-from itertools import groupby
 
-from src.config import LOGS_DIR
 from src.utils.db_io import compare_last_two_db_entries
-from src.utils.json_utils import extract_timestamp_from_filename, get_latest_json_file
-from src.extensions import db
-from src.models.stock_price import StockPrice
+from src.utils import capture_archive
+from src.utils.capture_index import CAPTURE_PREFIX, file_index
+from src.utils.history_summary import query_history
+from src.utils.json_utils import DATE_FORMAT_STR, extract_timestamp_from_filename, get_latest_json_file
 
 logger = logging.getLogger(__name__)
 
@@ -41,153 +39,137 @@ def _parse_file(path: str) -> Dict[str, Any]:
         return {'map': {}, 'errors': [str(e)], 'timestamp': ''}
 
 
-def _history_from_db() -> List[Dict[str, Any]]:
+def _history_from_db(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                     limit: Optional[int] = None) -> List[Dict[str, Any]]:
     """
-    Construye un resumen del historial de cargas de forma eficiente, haciendo una
-    sola consulta a la base de datos.
+    Devuelve el historial de cargas desde la tabla de resúmenes por snapshot,
+    paginando por ventana de tiempo en lugar de recorrer todos los precios.
     """
     try:
-        # 1. Obtener todos los registros de una vez, ordenados por fecha
-        all_prices = StockPrice.query.order_by(StockPrice.timestamp).all()
-        if not all_prices:
-            return []
-
-        # 2. Agrupar los registros por timestamp en un diccionario
-        data_by_ts = {
-            ts: list(items) for ts, items in groupby(all_prices, key=lambda p: p.timestamp)
-        }
-        
-        timestamps = sorted(data_by_ts.keys())
-        if len(timestamps) < 2:
-            return []
+        return query_history(start=start, end=end, limit=limit)
+    except Exception as e:
+        logger.error(f"Error al construir historial desde DB: {e}", exc_info=True)
+        return []
 
-        history: List[Dict[str, Any]] = []
 
-        # 3. Iterar sobre los timestamps para comparar los datos ya cargados en memoria
-        for i in range(1, len(timestamps)):
-            ts_curr, ts_prev = timestamps[i], timestamps[i-1]
-            
-            curr_rows = data_by_ts[ts_curr]
-            prev_rows = data_by_ts[ts_prev]
+def _summary_row(label: str, timestamp: str, current: Dict[str, Any], previous: Optional[Dict[str, Any]],
+                 errors: List[str]) -> Dict[str, Any]:
+    """Resumen de un snapshot (mapa símbolo -> {'price'}) respecto del anterior."""
+    symbols = set(current.keys())
+    changes, new, removed = 0, 0, 0
+    if previous is not None:
+        prev_symbols = set(previous.keys())
+        new = len(symbols - prev_symbols)
+        removed = len(prev_symbols - symbols)
+        for sym in symbols & prev_symbols:
+            if current[sym]['price'] != previous[sym]['price']:
+                changes += 1
+
+    status = 'OK'
+    if errors:
+        status = 'Con errores'
+    elif previous is not None and not new and not removed and not changes:
+        status = 'Sin cambios'
 
-            curr_map = {r.symbol: r for r in curr_rows}
-            prev_map = {r.symbol: r for r in prev_rows}
-            
-            curr_symbols = set(curr_map.keys())
-            prev_symbols = set(prev_map.keys())
-                
-            new = len(curr_symbols - prev_symbols)
-            removed = len(prev_symbols - curr_symbols)
-            
-            changes = 0
-            for sym in curr_symbols & prev_symbols:
-                # Comparamos los atributos directamente desde los objetos del modelo
-                if curr_map[sym].price != prev_map[sym].price or curr_map[sym].variation != prev_map[sym].variation:
-                    changes += 1
-
-            status = "OK"
-            if not new and not removed and not changes:
-                status = "Sin cambios"
-
-            history.append({
-                "file": ts_curr.isoformat(),
-                "timestamp": ts_curr.strftime("%d/%m/%Y %H:%M:%S"),
-                "total": len(curr_map),
-                "changes": changes,
-                "new": new,
-                "removed": removed,
-                "error_count": 0,
-                "status": status,
-            })
-        
-        # Ordenar el resultado final para mostrar lo más reciente primero
-        history.sort(key=lambda x: x["file"], reverse=True)
-        return history
+    return {
+        'file': label,
+        'timestamp': timestamp,
+        'total': len(symbols),
+        'changes': changes,
+        'new': new,
+        'removed': removed,
+        'error_count': len(errors),
+        'status': status,
+    }
 
-    except Exception as e:
-        logger.error(f"Error al construir historial desde DB: {e}", exc_info=True)
+
+def _history_from_archive(logs_dir: Optional[str] = None, start: Optional[datetime] = None,
+                          end: Optional[datetime] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Historial desde el archivo columnar de capturas: el manifiesto elige los snapshots
+    y de cada uno solo se leen las columnas `symbol` y `price`.
+    """
+    directory = capture_archive.archive_dir(logs_dir)
+    entries = capture_archive.select_entries(directory, start=start, end=end, limit=limit)
+    if not entries:
         return []
+    # El snapshot anterior al primero pedido solo sirve de base para contar cambios.
+    all_entries = capture_archive.read_manifest(directory)
+    position = all_entries.index(entries[0])
+    to_read = all_entries[max(position - 1, 0):position] + entries
+    wanted = set(entries)
+
+    history: List[Dict[str, Any]] = []
+    prev_map: Optional[Dict[str, Any]] = None
+    for entry, batch in capture_archive.read_snapshots(to_read, columns=['symbol', 'price'], directory=directory):
+        current = capture_archive.price_map(batch)
+        if entry in wanted:
+            history.append(_summary_row(entry.label, entry.timestamp.strftime(DATE_FORMAT_STR), current, prev_map, []))
+        prev_map = current
+    history.reverse()
+    return history
 
 
-def load_history(logs_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+def _select_json_files(logs_dir: Optional[str] = None, start: Optional[datetime] = None,
+                       end: Optional[datetime] = None,
+                       limit: Optional[int] = None) -> Tuple[Optional[str], List[str]]:
+    """
+    Capturas JSON entre `start` y `end` (por el timestamp del nombre); con `limit`, solo las
+    más recientes. Devuelve también la captura anterior, que solo sirve de base para contar cambios.
+    """
+    start = start.replace(tzinfo=None) if start else None
+    end = end.replace(tzinfo=None) if end else None
+    files = file_index(logs_dir).files(CAPTURE_PREFIX)
+    stamps = [datetime.strptime(extract_timestamp_from_filename(path), DATE_FORMAT_STR) for path in files]
+    selected = [i for i, ts in enumerate(stamps) if (start is None or ts >= start) and (end is None or ts <= end)]
+    if limit:
+        selected = selected[-limit:]
+    if not selected:
+        return None, []
+    first = selected[0]
+    return (files[first - 1] if first > 0 else None), [files[i] for i in selected]
+
+
+def load_history(logs_dir: Optional[str] = None, start: Optional[datetime] = None,
+                 end: Optional[datetime] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
     """
     Devuelve una lista de resúmenes del historial de cargas, priorizando la base de datos.
-    Si la base de datos falla, recurre a los archivos JSON como fallback.
+    Si la base de datos falla, recurre al archivo columnar de capturas y, por último,
+    a los archivos JSON.
     """
     try:
-        db_history = _history_from_db()
+        db_history = _history_from_db(start=start, end=end, limit=limit)
         # Solo usamos la historia de la DB si tiene contenido
         if db_history:
             return db_history
     except Exception as e:
         logger.warning(f"No se pudo cargar el historial desde la DB. Recurriendo a archivos. Error: {e}")
 
-    # --- Fallback a archivos JSON si la DB no devuelve historial ---
-    logs_dir = logs_dir or LOGS_DIR
-    pattern = os.path.join(logs_dir, 'acciones-precios-plus_*.json')
-    files = sorted(glob.glob(pattern), key=os.path.getmtime)
-    
+    try:
+        archived = _history_from_archive(logs_dir, start=start, end=end, limit=limit)
+        if archived:
+            return archived
+    except Exception as e:
+        logger.warning(f"No se pudo leer el archivo de capturas. Recurriendo a JSON. Error: {e}")
+
+    # --- Fallback a archivos JSON si no hay historial en la DB ni en el archivo ---
+    baseline, files = _select_json_files(logs_dir, start=start, end=end, limit=limit)
+
     history: List[Dict[str, Any]] = []
-    prev_data: Optional[Dict[str, Any]] = None
+    prev_data: Optional[Dict[str, Any]] = _parse_file(baseline) if baseline else None
 
     for path in files:
         parsed = _parse_file(path)
-        symbols = set(parsed['map'].keys())
-        
-        changes, new, removed = 0, 0, 0
-        if prev_data:
-            prev_symbols = set(prev_data['map'].keys())
-            new = len(symbols - prev_symbols)
-            removed = len(prev_symbols - symbols)
-            for sym in symbols & prev_symbols:
-                if parsed['map'][sym]['price'] != prev_data['map'][sym]['price']:
-                    changes += 1
-
-        status = 'OK'
-        if parsed['errors']:
-            status = 'Con errores'
-        elif prev_data and not new and not removed and not changes:
-            status = 'Sin cambios'
-            
-        history.append({
-            'file': os.path.basename(path),
-            'timestamp': parsed['timestamp'],
-            'total': len(symbols),
-            'changes': changes,
-            'new': new,
-            'removed': removed,
-            'error_count': len(parsed['errors']),
-            'status': status,
-        })
+        history.append(_summary_row(os.path.basename(path), parsed['timestamp'], parsed['map'],
+                                    prev_data['map'] if prev_data else None, parsed['errors']))
         prev_data = parsed
         
     history.reverse()
     return history
 
 
-def compare_latest(stock_codes: Optional[List[str]] = None) -> Dict[str, Any]:
-    """
-    Compara los dos últimos estados de datos, priorizando la base de datos.
-    Si la DB falla, recurre a archivos JSON.
-    """
-    try:
-        # Pasa los códigos de acciones a la función de comparación de la DB
-        db_comparison = compare_last_two_db_entries(stock_codes=stock_codes)
-        if db_comparison:
-            return db_comparison
-    except Exception as e:
-        logger.warning(f"No se pudo comparar desde la DB. Recurriendo a archivos. Error: {e}")
-
-    # --- Fallback a archivos JSON ---
-    pattern = os.path.join(LOGS_DIR, 'acciones-precios-plus_*.json')
-    files = sorted(glob.glob(pattern), key=os.path.getmtime)
-    if len(files) < 2:
-        return {}
-
-    prev_file, curr_file = files[-2], files[-1]
-    prev_data = _parse_file(prev_file)
-    curr_data = _parse_file(curr_file)
-    
+def _compare_maps(curr_data: Dict[str, Any], prev_data: Dict[str, Any],
+                  stock_codes: Optional[List[str]] = None) -> Dict[str, Any]:
     prev_map = prev_data['map']
     curr_map = curr_data['map']
 
@@ -223,4 +205,45 @@ def compare_latest(stock_codes: Optional[List[str]] = None) -> Dict[str, Any]:
         'changes': changes,
         'unchanged': unchanged,
         'errors': curr_data['errors'] + prev_data['errors'],
-    }
\ No newline at end of file
+    }
+
+
+def _latest_archived_pair() -> Optional[List[Dict[str, Any]]]:
+    """Los dos últimos snapshots archivados (anterior, actual) con solo `symbol` y `price`."""
+    entries = capture_archive.read_manifest()
+    if len(entries) < 2:
+        return None
+    return [
+        {'map': capture_archive.price_map(batch), 'errors': [],
+         'timestamp': entry.timestamp.strftime(DATE_FORMAT_STR)}
+        for entry, batch in capture_archive.read_snapshots(entries[-2:], columns=['symbol', 'price'])
+    ]
+
+
+def compare_latest(stock_codes: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Compara los dos últimos estados de datos, priorizando la base de datos.
+    Si la DB falla, recurre al archivo columnar de capturas y luego a archivos JSON.
+    """
+    try:
+        # Pasa los códigos de acciones a la función de comparación de la DB
+        db_comparison = compare_last_two_db_entries(stock_codes=stock_codes)
+        if db_comparison:
+            return db_comparison
+    except Exception as e:
+        logger.warning(f"No se pudo comparar desde la DB. Recurriendo a archivos. Error: {e}")
+
+    try:
+        pair = _latest_archived_pair()
+        if pair:
+            return _compare_maps(pair[1], pair[0], stock_codes)
+    except Exception as e:
+        logger.warning(f"No se pudo leer el archivo de capturas. Recurriendo a JSON. Error: {e}")
+
+    # --- Fallback a archivos JSON ---
+    files = file_index().latest(CAPTURE_PREFIX, 2)
+    if len(files) < 2:
+        return {}
+
+    prev_file, curr_file = files
+    return _compare_maps(_parse_file(curr_file), _parse_file(prev_file), stock_codes)
@@ -0,0 +1,150 @@
+# src/utils/http_cache.py
+"""
+Caché HTTP de los endpoints de solo lectura (validadores, 304 y compresión).
+
+`cached_response(version)` envuelve una vista. `version()` devuelve una cadena
+barata de obtener que cambia cuando cambian los datos (timestamp y huella del
+último snapshot, último día de cierre, versión de un dashboard) o None para no
+cachear. Con ella:
+
+- el ETag se deriva de (endpoint, query, versión): un `If-None-Match` vigente
+  recibe 304 sin ejecutar la vista;
+- la primera respuesta de cada versión se guarda (LRU de `HTTP_CACHE_MAX_ENTRIES`)
+  con su `Last-Modified`; las siguientes no vuelven a serializar;
+- cuerpos desde `HTTP_COMPRESS_MIN_BYTES` se comprimen con brotli (si está
+  instalado) o gzip una sola vez por versión y codificación.
+
+La caché es por proceso, como la del snapshot de precios.
+"""
+from __future__ import annotations
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Callable, Dict, Optional
+
+from flask import current_app, request
+
+from src.config import HTTP_CACHE_MAX_ENTRIES, HTTP_COMPRESS_MIN_BYTES
+
+try:
+    import brotli
+except ImportError:  # dependencia opcional
+    brotli = None
+
+IDENTITY = "identity"
+_COMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {"gzip": lambda body: gzip.compress(body, compresslevel=6)}
+if brotli is not None:
+    _COMPRESSORS = {"br": lambda body: brotli.compress(body, quality=5), **_COMPRESSORS}
+
+
+@dataclass
+class CachedBody:
+    body: bytes
+    mimetype: str
+    last_modified: datetime
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+
+    def encode(self, encoding: str) -> bytes:
+        """Cuerpo en `encoding`, comprimido la primera vez que se pide."""
+        if encoding == IDENTITY:
+            return self.body
+        data = self.encoded.get(encoding)
+        if data is None:
+            data = self.encoded[encoding] = _COMPRESSORS[encoding](self.body)
+        return data
+
+
+class ResponseCache:
+    """LRU thread-safe de respuestas serializadas por clave (endpoint, query, versión)."""
+
+    def __init__(self, max_entries: int = HTTP_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CachedBody]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[CachedBody]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: CachedBody) -> CachedBody:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache()
+
+
+def _negotiate(size: int) -> str:
+    if size < HTTP_COMPRESS_MIN_BYTES:
+        return IDENTITY
+    return request.accept_encodings.best_match(list(_COMPRESSORS)) or IDENTITY
+
+
+def _etag(base: str, encoding: str) -> str:
+    return base if encoding == IDENTITY else f"{base}-{encoding}"
+
+
+def _not_modified(etag: str):
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def cached_response(version: Callable[[], Optional[str]]):
+    """Decorador de vistas GET; ver el docstring del módulo."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            current = version()
+            if current is None:
+                return view(*args, **kwargs)
+            query = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+            key = f"{request.endpoint}|{request.path}?{query}|{current}"
+            base_etag = hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+            # La versión determina el contenido: cualquier codificación de la misma versión vale.
+            for encoding in (IDENTITY, *_COMPRESSORS):
+                if request.if_none_match.contains(_etag(base_etag, encoding)):
+                    return _not_modified(_etag(base_etag, encoding))
+            entry = response_cache.get(key)
+            if (entry is not None and not request.if_none_match and request.if_modified_since
+                    and entry.last_modified <= request.if_modified_since):
+                return _not_modified(_etag(base_etag, _negotiate(len(entry.body))))
+
+            if entry is None:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+                entry = response_cache.put(key, CachedBody(
+                    body=response.get_data(), mimetype=response.mimetype,
+                    last_modified=datetime.now(timezone.utc).replace(microsecond=0),
+                ))
+
+            encoding = _negotiate(len(entry.body))
+            response = current_app.response_class(entry.encode(encoding), mimetype=entry.mimetype)
+            if encoding != IDENTITY:
+                response.headers["Content-Encoding"] = encoding
+            response.set_etag(_etag(base_etag, encoding))
+            response.last_modified = entry.last_modified
+            response.headers["Cache-Control"] = "no-cache"
+            response.vary.add("Accept-Encoding")
+            return response
+        return wrapper
+    return decorator
@@ -3,11 +3,12 @@ Funciones auxiliares para trabajar con archivos JSON de precios de acciones.
 Extraídas de bolsa_service.py sin modificar la lógica original.
 """
 from __future__ import annotations
-import os, re, json, hashlib, glob
+import os, re, json, hashlib
 from datetime import datetime
 from typing import Optional, Tuple, List, Dict, Any
 import logging
 from src.config import LOGS_DIR
+from src.utils.capture_index import CAPTURE_PREFIX, file_index
 
 logger = logging.getLogger(__name__)
 
@@ -24,8 +25,11 @@ def save_json_with_timestamp(
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"{prefix}_{timestamp}.json"
         filepath = os.path.join(LOGS_DIR, filename)
+        index = file_index(LOGS_DIR)
+        mtime_before = index.directory_mtime()
         with open(filepath, "w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
+        index.add(filepath, mtime_before)
 
         # Usar logger personalizado si se proporciona
         log = log_instance or logger
@@ -40,12 +44,10 @@ def save_json_with_timestamp(
 def get_latest_json_file() -> Optional[str]:
     """Devuelve el archivo JSON más reciente `acciones-precios-plus_*.json`."""
     try:
-        pattern = os.path.join(LOGS_DIR, "acciones-precios-plus_*.json")
-        json_files = [f for f in glob.glob(pattern)]
-        if not json_files:
+        latest = file_index(LOGS_DIR).latest_file(CAPTURE_PREFIX)
+        if not latest:
             logger.warning("No se encontraron 'acciones-precios-plus_*.json' en %s", LOGS_DIR)
-            return None
-        return max(json_files, key=os.path.getmtime)
+        return latest
     except Exception as e:
         logger.exception("Error al buscar JSON más reciente: %s", e)
         return None
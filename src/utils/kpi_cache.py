@@ -0,0 +1,175 @@
+# src/utils/kpi_cache.py
+"""
+Caché con vencimiento por campo de las respuestas de los proveedores de KPIs.
+
+Las entradas (`kpi_cache_entries`) se indexan por (nemo, proveedor, hash del
+template del prompt): cambiar de proveedor o de prompt invalida la caché sin
+borrarla. Cada campo guarda cuándo se obtuvo y vence según `KPI_FIELD_TTL_HOURS`
+(los fundamentales como ROE o beta cambian poco; la recomendación, más seguido).
+
+Antes de consultar al proveedor, `plan_refresh` clasifica cada símbolo como:
+- hit: todos los campos vigentes; no se consulta;
+- stale: la entrada existe pero algún campo venció (o nunca llegó);
+- miss: no hay entrada para la clave.
+Con `force` se consultan todos. `kpi_cache_stats` acumula los conteos por ejecución.
+"""
+from __future__ import annotations
+import hashlib
+import threading
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from src.config import KPI_DEFAULT_TTL_HOURS, KPI_FIELD_TTL_HOURS
+from src.extensions import db
+from src.models import KpiCacheEntry
+
+HIT, STALE, MISS = "hit", "stale", "miss"
+
+
+def prompt_hash(template: Optional[str]) -> str:
+    return hashlib.sha256((template or "").encode("utf-8")).hexdigest()[:16]
+
+
+def field_ttl(name: str) -> timedelta:
+    return timedelta(hours=KPI_FIELD_TTL_HOURS.get(name, KPI_DEFAULT_TTL_HOURS))
+
+
+def _parse(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    ts = datetime.fromisoformat(value)
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def entry_status(fetched_at: Optional[Dict[str, str]], fields: Iterable[str], now: datetime) -> str:
+    """HIT si todos los `fields` se obtuvieron hace menos que su TTL; STALE si no; MISS sin entrada."""
+    if fetched_at is None:
+        return MISS
+    for name in fields:
+        ts = _parse(fetched_at.get(name))
+        if ts is None or now - ts >= field_ttl(name):
+            return STALE
+    return HIT
+
+
+@dataclass
+class RefreshPlan:
+    provider: str
+    prompt_hash: str
+    to_fetch: List[str]
+    hits: Dict[str, Dict[str, Any]]  # nemo -> valores en caché
+    entries: Dict[str, KpiCacheEntry]
+    counts: Dict[str, int]
+    forced: bool = False
+
+
+def plan_refresh(nemos: List[str], provider: str, phash: str, fields: Iterable[str],
+                 force: bool = False, now: Optional[datetime] = None) -> RefreshPlan:
+    """Decide qué símbolos consultar. Requiere contexto de aplicación."""
+    now = now or datetime.now(timezone.utc)
+    fields = list(fields)
+    entries = {
+        e.nemo: e for e in KpiCacheEntry.query.filter(
+            KpiCacheEntry.provider == provider, KpiCacheEntry.prompt_hash == phash,
+            KpiCacheEntry.nemo.in_(nemos),
+        )
+    }
+    counts = {HIT: 0, STALE: 0, MISS: 0}
+    to_fetch, hits = [], {}
+    for nemo in nemos:
+        entry = entries.get(nemo)
+        status = entry_status(entry.fetched_at if entry else None, fields, now)
+        counts[status] += 1
+        if status == HIT and not force:
+            hits[nemo] = dict(entry.values)
+        else:
+            to_fetch.append(nemo)
+    return RefreshPlan(provider, phash, to_fetch, hits, entries, counts, force)
+
+
+def merge_response(entry: Optional[KpiCacheEntry], data: Dict[str, Any], fields: Iterable[str],
+                   now: datetime) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Valores y fechas por campo tras una respuesta. Un campo presente cuenta como obtenido
+    aunque venga en None (no se vuelve a pedir hasta que venza); uno ausente conserva su
+    valor y fecha anteriores.
+    """
+    values = dict(entry.values) if entry else {}
+    fetched_at = dict(entry.fetched_at) if entry else {}
+    for name in fields:
+        if name in data:
+            fetched_at[name] = now.isoformat()
+            if data[name] is not None:
+                values[name] = data[name]
+    return values, fetched_at
+
+
+def upsert_entries(rows: List[Dict[str, Any]]) -> None:
+    """Upsert multi-fila en `kpi_cache_entries` dentro de la sesión actual (sin commit)."""
+    if not rows:
+        return
+    insert = pg_insert if db.engine.dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(KpiCacheEntry).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["nemo", "provider", "prompt_hash"],
+        set_={c: stmt.excluded[c] for c in ("values", "fetched_at", "updated_at")},
+    )
+    db.session.execute(stmt)
+
+
+@dataclass
+class KpiCacheRun:
+    provider: str
+    prompt_hash: str
+    forced: bool
+    hits: int
+    stale: int
+    misses: int
+    refreshed: int
+    failed: int
+    finished_at: str
+
+
+@dataclass
+class KpiCacheStats:
+    """Conteos de la última ejecución y acumulados desde el arranque."""
+    runs: int = 0
+    totals: Dict[str, int] = field(default_factory=lambda: {"hits": 0, "stale": 0, "misses": 0,
+                                                            "refreshed": 0, "failed": 0})
+    last_run: Optional[KpiCacheRun] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, plan: RefreshPlan, refreshed: int, failed: int) -> KpiCacheRun:
+        run = KpiCacheRun(plan.provider, plan.prompt_hash, plan.forced, plan.counts[HIT], plan.counts[STALE],
+                          plan.counts[MISS], refreshed, failed, datetime.now(timezone.utc).isoformat())
+        with self._lock:
+            self.runs += 1
+            for key in ("hits", "stale", "misses", "refreshed", "failed"):
+                self.totals[key] += getattr(run, key)
+            self.last_run = run
+        return run
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"runs": self.runs, "totals": dict(self.totals),
+                    "last_run": asdict(self.last_run) if self.last_run else None}
+
+
+kpi_cache_stats = KpiCacheStats()
+
+
+def cache_overview(nemos: List[str], provider: str, phash: str, fields: Iterable[str]) -> Dict[str, Any]:
+    """Estado actual de la caché para `nemos` (sin consultar a nadie) y TTL por campo."""
+    plan = plan_refresh(nemos, provider, phash, fields)
+    return {
+        "provider": provider,
+        "prompt_hash": phash,
+        "selected": len(nemos),
+        "current": plan.counts,
+        "ttl_hours": {name: field_ttl(name).total_seconds() / 3600 for name in fields},
+        "entries": KpiCacheEntry.query.count(),
+    }
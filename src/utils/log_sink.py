@@ -0,0 +1,209 @@
+# src/utils/log_sink.py
+"""
+Sumidero de logs en base de datos con escritura diferida por lotes.
+
+`log_error`, `POST /api/logs` y el handler de `logging` (`LogSinkHandler`) solo
+encolan la entrada; un hilo de fondo las inserta en `log_entries` por lotes (un
+INSERT multi-fila y un commit por lote) cada `LOG_SINK_FLUSH_INTERVAL` segundos,
+o antes si se acumula un lote completo.
+
+- Deduplicación: entradas idénticas (nivel, acción, mensaje, stack) pendientes se
+  agrupan en una sola fila con el número de repeticiones en el mensaje.
+- Saturación: como máximo `LOG_SINK_MAX_PENDING` entradas distintas pendientes. Al
+  llenarse, un ERROR/CRITICAL desplaza a la entrada pendiente menos grave más
+  antigua y cualquier otra entrada se descarta; el siguiente lote deja constancia
+  de cuántas se perdieron. Encolar nunca bloquea.
+
+Sin el hilo iniciado (tests, scripts) cada entrada se escribe de inmediato.
+"""
+from __future__ import annotations
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from src.config import (
+    LOG_SINK_BATCH_SIZE,
+    LOG_SINK_FLUSH_INTERVAL,
+    LOG_SINK_LEVEL,
+    LOG_SINK_LOGGERS,
+    LOG_SINK_MAX_PENDING,
+)
+from src.extensions import db
+from src.models import LogEntry
+
+logger = logging.getLogger(__name__)
+
+_EntryKey = Tuple[str, Optional[str], str, Optional[str]]
+_stack_formatter = logging.Formatter()
+
+
+def _severity(level: str) -> int:
+    value = logging.getLevelName(level)
+    return value if isinstance(value, int) else logging.INFO
+
+
+class LogSink:
+    """Buffer deduplicado de entradas de log + hilo de vaciado por lotes."""
+
+    def __init__(self, max_pending: int = LOG_SINK_MAX_PENDING, batch_size: int = LOG_SINK_BATCH_SIZE,
+                 flush_interval: float = LOG_SINK_FLUSH_INTERVAL):
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._app = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: "OrderedDict[_EntryKey, Dict[str, Any]]" = OrderedDict()
+        self._dropped_unreported = 0
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._handlers: List[Tuple[logging.Logger, logging.Handler]] = []
+        self._stats = {"written": 0, "deduplicated": 0, "dropped": 0, "failed": 0, "batches": 0}
+
+    def init_app(self, app) -> None:
+        self._app = app
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, app=None) -> None:
+        """Inicia el hilo de vaciado y conecta el handler a los loggers de `LOG_SINK_LOGGERS`."""
+        if app is not None:
+            self.init_app(app)
+        if self.running:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+        self._thread.start()
+        for name in LOG_SINK_LOGGERS:
+            handler = LogSinkHandler(self, level=LOG_SINK_LEVEL)
+            target = logging.getLogger(name)
+            target.addHandler(handler)
+            self._handlers.append((target, handler))
+        logger.info(f"[LogSink] Iniciado (lotes de {self.batch_size}, cada {self.flush_interval}s).")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Desconecta los handlers, detiene el hilo y vacía lo pendiente."""
+        for target, handler in self._handlers:
+            target.removeHandler(handler)
+        self._handlers.clear()
+        if self._thread is not None:
+            self._stopping.set()
+            self._wakeup.set()
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def submit(self, level: str, message: str, action: Optional[str] = None,
+               stack: Optional[str] = None) -> bool:
+        """Encola una entrada (o la escribe de inmediato si el hilo no corre). False si se descartó."""
+        row = {"level": level, "message": message, "action": action, "stack": stack,
+               "timestamp": datetime.now(timezone.utc)}
+        if not self.running:
+            return self._write([row]) == 1
+
+        key = (level, action, message, stack)
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is not None:
+                entry["count"] += 1
+                self._stats["deduplicated"] += 1
+                return True
+            if len(self._pending) >= self.max_pending and not self._make_room(level):
+                self._stats["dropped"] += 1
+                self._dropped_unreported += 1
+                return False
+            self._pending[key] = {"row": row, "count": 1}
+            full_batch = len(self._pending) >= self.batch_size
+        if full_batch:
+            self._wakeup.set()
+        return True
+
+    def _make_room(self, level: str) -> bool:
+        """Con el buffer lleno, un error desplaza a la entrada pendiente menos grave más antigua."""
+        severity = _severity(level)
+        if severity < logging.ERROR:
+            return False
+        victim = min(self._pending, key=lambda k: _severity(k[0]))  # la primera de menor gravedad
+        if _severity(victim[0]) >= severity:
+            return False
+        del self._pending[victim]
+        self._stats["dropped"] += 1
+        self._dropped_unreported += 1
+        return True
+
+    def flush(self) -> int:
+        """Escribe todo lo pendiente por lotes. Devuelve las filas insertadas."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, OrderedDict()
+                dropped, self._dropped_unreported = self._dropped_unreported, 0
+            rows = []
+            for entry in pending.values():
+                row = entry["row"]
+                if entry["count"] > 1:
+                    row = {**row, "message": f"{row['message']} (repetido {entry['count']} veces)"}
+                rows.append(row)
+            if dropped:
+                rows.append({"level": "WARNING", "action": "log_sink", "stack": None,
+                             "message": f"Se descartaron {dropped} entradas de log por saturación del buffer.",
+                             "timestamp": datetime.now(timezone.utc)})
+            return sum(self._write(rows[i:i + self.batch_size]) for i in range(0, len(rows), self.batch_size))
+
+    def _write(self, rows: List[Dict[str, Any]]) -> int:
+        if not rows:
+            return 0
+        if self._app is None:
+            logger.error(f"[LogSink] Sin aplicación configurada; se pierden {len(rows)} entradas.")
+            return 0
+        # Contexto propio: la escritura no debe hacer commit de la sesión de quien registra el log.
+        with self._app.app_context():
+            try:
+                db.session.execute(insert(LogEntry), rows)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self._stats["failed"] += len(rows)
+                logger.critical(f"FALLO AL GUARDAR {len(rows)} LOGS EN DB: {e}", exc_info=True)
+                return 0
+        self._stats["written"] += len(rows)
+        self._stats["batches"] += 1
+        return len(rows)
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:  # el hilo no debe morir
+                logger.error(f"[LogSink] Error vaciando el buffer: {e}", exc_info=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending)
+        return {**self._stats, "pending": pending, "running": self.running}
+
+
+class LogSinkHandler(logging.Handler):
+    """Handler de `logging` que persiste los registros en `log_entries` a través de un `LogSink`."""
+
+    def __init__(self, sink: LogSink, level: int | str = logging.WARNING):
+        super().__init__(level)
+        self.sink = sink
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            stack = (self.formatter or _stack_formatter).formatException(record.exc_info) if record.exc_info else None
+            self.sink.submit(record.levelname, record.getMessage(), record.name.rsplit(".", 1)[-1][:50], stack)
+        except Exception:
+            self.handleError(record)
+
+
+log_sink = LogSink()
@@ -0,0 +1,169 @@
+# src/utils/price_ingest.py
+"""
+Ingesta columnar de capturas de precios (`listaResult`).
+
+Normaliza el payload completo en una sola pasada con pandas y lo escribe en
+`stock_prices` de forma masiva: en PostgreSQL mediante `COPY` a una tabla de
+staging seguida de un upsert set-based; en otros motores (SQLite en tests), o
+con psycopg2 en modo green (que no admite `COPY`), mediante un upsert con
+`executemany`.
+
+`row_hashes` / `snapshot_digest` dan una huella canónica de una captura
+normalizada (por fila y del snapshot completo) para omitir capturas repetidas.
+"""
+from __future__ import annotations
+import hashlib
+import io
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from src.models import StockPrice
+from src.utils.db_engine import green_mode
+
+logger = logging.getLogger(__name__)
+
+# Clave del JSON de la Bolsa -> columna de `stock_prices`
+FLOAT_FIELDS = {
+    'PRECIO_CIERRE': 'price',
+    'VARIACION': 'variation',
+    'PRECIO_COMPRA': 'buy_price',
+    'PRECIO_VENTA': 'sell_price',
+}
+INT_FIELDS = {
+    'MONTO': 'amount',
+    'UN_TRANSADAS': 'traded_units',
+}
+TEXT_FIELDS = {
+    'MONEDA': 'currency',
+    'ISIN': 'isin',
+    'BONO_VERDE': 'green_bond',
+}
+PRICE_COLUMNS = ['symbol', *FLOAT_FIELDS.values(), *INT_FIELDS.values(), *TEXT_FIELDS.values()]
+STOCK_PRICE_COLUMNS = ['symbol', 'timestamp', *PRICE_COLUMNS[1:]]
+
+STAGING_TABLE = 'stock_prices_staging'
+
+
+def extract_rows(data_object: Dict | List) -> Optional[List[Any]]:
+    """Devuelve la lista `listaResult` de una captura (o la lista misma)."""
+    rows = data_object.get("listaResult") if isinstance(data_object, dict) else data_object
+    return rows if isinstance(rows, list) else None
+
+
+def _to_float(series: pd.Series) -> pd.Series:
+    """Convierte una columna a float aplicando la corrección de coma decimal."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype('float64')
+    as_text = series.astype('string').str.replace(',', '.', regex=False)
+    return pd.to_numeric(as_text, errors='coerce').astype('float64')
+
+
+def _to_int(series: pd.Series) -> pd.Series:
+    """Convierte una columna a entero nullable (`Int64`), descartando valores no numéricos."""
+    numeric = pd.to_numeric(series, errors='coerce')
+    return pd.Series(np.trunc(numeric.astype('float64')), index=series.index).astype('Int64')
+
+
+def normalize_price_payload(data_object: Dict | List, filtered_symbols: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    Normaliza una captura completa a un DataFrame con las columnas de `stock_prices`
+    (sin `timestamp`). Descarta filas sin NEMO, aplica el filtro de símbolos y
+    conserva la última aparición de cada símbolo repetido.
+    """
+    rows = extract_rows(data_object) or []
+    records = [item for item in rows if isinstance(item, dict) and item.get('NEMO')]
+    source_keys = ['NEMO', *FLOAT_FIELDS, *INT_FIELDS, *TEXT_FIELDS]
+    raw = pd.DataFrame.from_records(records, columns=source_keys)
+
+    frame = pd.DataFrame({'symbol': raw['NEMO'].astype('string')})
+    for key, column in FLOAT_FIELDS.items():
+        frame[column] = _to_float(raw[key])
+    for key, column in INT_FIELDS.items():
+        frame[column] = _to_int(raw[key])
+    for key, column in TEXT_FIELDS.items():
+        frame[column] = raw[key].astype(object).where(raw[key].notna(), None)
+
+    if filtered_symbols:
+        wanted = {s.upper() for s in filtered_symbols}
+        frame = frame[frame['symbol'].str.upper().isin(wanted)]
+
+    return frame.drop_duplicates(subset='symbol', keep='last').reset_index(drop=True)
+
+
+def frame_to_records(frame: pd.DataFrame, ts: datetime) -> List[Dict[str, Any]]:
+    """Convierte el DataFrame normalizado a dicts listos para SQLAlchemy (NaN/NA -> None)."""
+    clean = frame.astype(object).where(frame.notna(), None)
+    records = clean.to_dict('records')
+    for record in records:
+        record['timestamp'] = ts
+    return records
+
+
+def row_hashes(frame: pd.DataFrame) -> Dict[str, int]:
+    """Hash (64 bits) de cada fila normalizada, por símbolo. Iguales valores -> igual hash."""
+    hashes = pd.util.hash_pandas_object(frame[PRICE_COLUMNS], index=False).to_numpy()
+    return dict(zip(frame['symbol'].tolist(), hashes.tolist()))
+
+
+def snapshot_digest(hashes: Dict[str, int]) -> str:
+    """Huella del snapshot completo, independiente del orden de las filas."""
+    ordered = np.array([hashes[s] for s in sorted(hashes)], dtype=np.uint64)
+    return hashlib.blake2b(ordered.tobytes(), digest_size=16).hexdigest()
+
+
+def _copy_upsert_postgres(frame: pd.DataFrame, ts: datetime, session) -> None:
+    """`COPY` a una tabla temporal de staging y upsert set-based en `stock_prices`."""
+    out = frame.copy()
+    out.insert(1, 'timestamp', ts.isoformat(sep=' '))
+    buffer = io.StringIO()
+    out[STOCK_PRICE_COLUMNS].to_csv(buffer, index=False, header=False, na_rep='')
+    buffer.seek(0)
+
+    column_list = ", ".join(STOCK_PRICE_COLUMNS)
+    update_list = ", ".join(f"{c} = EXCLUDED.{c}" for c in STOCK_PRICE_COLUMNS if c not in ('symbol', 'timestamp'))
+
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} "
+            f"(LIKE {StockPrice.__tablename__} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+        )
+        cursor.copy_expert(f"COPY {STAGING_TABLE} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '')", buffer)
+        cursor.execute(
+            f"INSERT INTO {StockPrice.__tablename__} ({column_list}) "
+            f"SELECT {column_list} FROM {STAGING_TABLE} "
+            f"ON CONFLICT (symbol, timestamp) DO UPDATE SET {update_list}"
+        )
+    finally:
+        cursor.close()
+
+
+def _executemany_upsert(frame: pd.DataFrame, ts: datetime, session, dialect_name: str) -> None:
+    """Upsert con `executemany` para motores sin `COPY` (SQLite en tests) o PostgreSQL en modo green."""
+    records = frame_to_records(frame, ts)
+    if dialect_name in ("sqlite", "postgresql"):
+        stmt = (pg_insert if dialect_name == "postgresql" else sqlite_insert)(StockPrice)
+        update_dict = {c.name: c for c in stmt.excluded if not c.primary_key}
+        stmt = stmt.on_conflict_do_update(index_elements=['symbol', 'timestamp'], set_=update_dict)
+        session.execute(stmt, records)
+    else:
+        session.bulk_insert_mappings(StockPrice, records)
+
+
+def write_price_frame(frame: pd.DataFrame, ts: datetime, session) -> int:
+    """Escribe el DataFrame normalizado en `stock_prices` (sin hacer commit). Devuelve las filas escritas."""
+    if frame.empty:
+        return 0
+    dialect_name = session.get_bind().dialect.name
+    if dialect_name == "postgresql" and not green_mode():
+        _copy_upsert_postgres(frame, ts, session)
+    else:
+        _executemany_upsert(frame, ts, session, dialect_name)
+    return len(frame)
+
@@ -0,0 +1,151 @@
+# src/utils/price_push.py
+"""
+Envío incremental de precios por WebSocket.
+
+En lugar de que cada cliente vuelva a pedir `/api/stocks` tras `new_data`, el
+servidor calcula una sola vez por snapshot las filas que cambiaron respecto al
+anterior y las envía (`price_delta`) a cada sala de Socket.IO, una sala por filtro
+de símbolos (y codificación). Las filas van como arreglos en el orden de
+`PUSH_COLUMNS` y cada envío lleva un número de secuencia global: si un cliente
+detecta un salto, pide `resync_prices` y recibe el snapshot completo
+(`price_snapshot`) filtrado a su sala.
+
+La codificación MessagePack es opcional: solo se ofrece si `msgpack` está instalado.
+"""
+from __future__ import annotations
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.extensions import socketio
+from src.utils.snapshot_cache import API_KEYS, TIMESTAMP_FORMAT, Snapshot
+
+try:
+    import msgpack
+except ImportError:  # dependencia opcional
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+PUSH_COLUMNS: List[str] = list(API_KEYS.values())
+PUSH_ENCODINGS = ("json", "msgpack") if msgpack else ("json",)
+ALL_SYMBOLS_ROOM = "prices:*"
+
+
+def row_to_array(row: Dict[str, Any]) -> List[Any]:
+    return [row.get(column) for column in PUSH_COLUMNS]
+
+
+def compute_delta(previous_rows: Optional[Iterable[Dict[str, Any]]],
+                  current_rows: Iterable[Dict[str, Any]]) -> Tuple[List[List[Any]], List[str]]:
+    """
+    `(cambiadas, eliminadas)`: filas (como arreglos) nuevas o con algún valor distinto al
+    snapshot anterior, y símbolos que ya no están. Sin snapshot anterior, todo es nuevo.
+    """
+    previous = {r.get("NEMO"): row_to_array(r) for r in previous_rows or ()}
+    changed, seen = [], set()
+    for row in current_rows:
+        array = row_to_array(row)
+        symbol = array[0]
+        seen.add(symbol)
+        if previous.get(symbol) != array:
+            changed.append(array)
+    removed = sorted(s for s in previous if s not in seen) if previous_rows is not None else []
+    return changed, removed
+
+
+def room_for(codes: Optional[Iterable[str]], encoding: str = "json") -> str:
+    """Sala de un filtro: `prices:*` (todas) o `prices:A,B` con los símbolos normalizados y ordenados."""
+    symbols = sorted({c.strip().upper() for c in codes or () if c and c.strip()})
+    room = f"prices:{','.join(symbols)}" if symbols else ALL_SYMBOLS_ROOM
+    return room if encoding == "json" else f"{room}|{encoding}"
+
+
+class PricePushHub:
+    """Suscripciones (sid -> sala) y secuencia de envíos; thread-safe (el bot publica desde su hilo)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._subscriptions: Dict[str, str] = {}
+        self._rooms: Dict[str, Tuple[Optional[frozenset], str, int]] = {}
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def subscribe(self, sid: str, codes: Optional[Iterable[str]], encoding: str = "json") -> Tuple[str, Optional[str]]:
+        """Registra a `sid` en la sala de su filtro. Devuelve `(sala_nueva, sala_anterior)`."""
+        encoding = encoding if encoding in PUSH_ENCODINGS else "json"
+        codes = [c.strip().upper() for c in codes or () if c and c.strip()]
+        room = room_for(codes, encoding)
+        with self._lock:
+            old_room = self._remove(sid)
+            symbols, _, members = self._rooms.get(room, (frozenset(codes) or None, encoding, 0))
+            self._rooms[room] = (symbols, encoding, members + 1)
+            self._subscriptions[sid] = room
+        return room, old_room
+
+    def unsubscribe(self, sid: str) -> Optional[str]:
+        with self._lock:
+            return self._remove(sid)
+
+    def _remove(self, sid: str) -> Optional[str]:
+        room = self._subscriptions.pop(sid, None)
+        if room in self._rooms:
+            symbols, encoding, members = self._rooms[room]
+            if members <= 1:
+                del self._rooms[room]
+            else:
+                self._rooms[room] = (symbols, encoding, members - 1)
+        return room
+
+    def room_of(self, sid: str) -> Optional[str]:
+        return self._subscriptions.get(sid)
+
+    def rooms(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {room: {"symbols": sorted(symbols) if symbols else None, "encoding": encoding, "members": members}
+                    for room, (symbols, encoding, members) in self._rooms.items()}
+
+    def publish(self, snapshot_ts, previous_rows: Optional[List[Dict[str, Any]]],
+                current_rows: List[Dict[str, Any]]) -> int:
+        """
+        Calcula el delta una vez y lo envía a cada sala (solo sus símbolos). Todas las salas
+        reciben cada secuencia, aunque no tengan cambios, para que los saltos sean detectables.
+        """
+        changed, removed = compute_delta(previous_rows, current_rows)
+        ts = snapshot_ts.strftime(TIMESTAMP_FORMAT)
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            rooms = list(self._rooms.items())
+        for room, (symbols, encoding, _) in rooms:
+            rows = changed if symbols is None else [r for r in changed if r[0] in symbols]
+            gone = removed if symbols is None else [s for s in removed if s in symbols]
+            message = {"seq": seq, "ts": ts, "rows": rows, "removed": gone}
+            socketio.emit("price_delta", encode(message, encoding), to=room)
+        logger.info(f"[PricePush] Delta #{seq}: {len(changed)} filas cambiadas, {len(removed)} eliminadas, "
+                    f"{len(rooms)} salas.")
+        return seq
+
+    def snapshot_message(self, snapshot: Optional[Snapshot], codes: Optional[Iterable[str]]) -> Dict[str, Any]:
+        """Mensaje `price_snapshot` (resincronización completa) para un filtro."""
+        codes = [c for c in codes or () if c and c.strip()]
+        rows = [] if snapshot is None else (snapshot.select(codes) if codes else snapshot.rows)
+        return {
+            "seq": self._seq,
+            "ts": snapshot.timestamp.strftime(TIMESTAMP_FORMAT) if snapshot else None,
+            "columns": PUSH_COLUMNS,
+            "rows": [row_to_array(r) for r in rows],
+        }
+
+
+def encode(message: Dict[str, Any], encoding: str) -> Any:
+    """JSON (dict) o MessagePack (bytes, enviado como adjunto binario de Socket.IO)."""
+    if encoding == "msgpack" and msgpack is not None:
+        return msgpack.packb(message, use_bin_type=True)
+    return message
+
+
+price_push_hub = PricePushHub()
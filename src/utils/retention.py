@@ -0,0 +1,350 @@
+# src/utils/retention.py
+"""
+Retención y archivado por niveles de las tablas que crecen sin límite.
+
+Cada tabla de `RETENTION_POLICIES` conserva sus filas a máxima resolución durante
+N días (`BOLSA_RETENTION_*_DAYS`). Al vencer un día completo:
+
+1. `stock_prices` se resume en `stock_prices_daily` (apertura, máximo, mínimo,
+   cierre, volumen y monto del día por símbolo);
+2. las filas crudas de precios e historial se archivan en Parquet comprimido
+   (`ARCHIVE_DIR/<tabla>/<AAAA-MM-DD>.parquet`, requiere pyarrow);
+3. se borran de la DB en DELETEs por lotes de `RETENTION_DELETE_BATCH` filas, o
+   con `drop_chunks` si la tabla es una hypertable de TimescaleDB.
+
+Si el archivado está activo pero no se pudo escribir un día (p. ej. sin pyarrow),
+sus filas no se borran; los días que ya tienen resumen no se vuelven a cargar ni
+a resumir en las ejecuciones siguientes. `read_archive` y `daily_rollups` permiten que los
+endpoints de historial sigan sirviendo los días que ya salieron de la DB.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+from sqlalchemy import func, select, text
+
+from src.config import (
+    ARCHIVE_DIR,
+    RETENTION_ARCHIVE,
+    RETENTION_DELETE_BATCH,
+    RETENTION_HISTORY_DAYS,
+    RETENTION_LOGS_DAYS,
+    RETENTION_PRICES_DAYS,
+    RETENTION_RUN_AT,
+)
+from src.extensions import db
+from src.models import FilteredStockHistory, LogEntry, StockPrice, StockPriceDaily
+from src.utils.time_utils import CHILE_TZ, now_chile
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # dependencia opcional
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+PARQUET_COMPRESSION = "zstd"
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    model: Any
+    keep_days: int
+    rollup: bool = False
+    archive: bool = False
+
+    @property
+    def table(self) -> str:
+        return self.model.__tablename__
+
+
+RETENTION_POLICIES: Dict[str, RetentionPolicy] = {
+    policy.table: policy for policy in (
+        RetentionPolicy(StockPrice, RETENTION_PRICES_DAYS, rollup=True, archive=RETENTION_ARCHIVE),
+        RetentionPolicy(FilteredStockHistory, RETENTION_HISTORY_DAYS, archive=RETENTION_ARCHIVE),
+        RetentionPolicy(LogEntry, RETENTION_LOGS_DAYS),
+    )
+}
+
+
+def cutoff_for(policy: RetentionPolicy, today: date) -> Optional[datetime]:
+    """Inicio del primer día que se conserva completo (None si la tabla no tiene límite)."""
+    if policy.keep_days <= 0:
+        return None
+    return datetime.combine(today - timedelta(days=policy.keep_days), time.min)
+
+
+# --- Resumen diario ---
+
+def rollup_frame(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Filas de `stock_prices_daily` a partir de snapshots crudos (`symbol`, `timestamp`,
+    `price`, `traded_units`, `amount`). Unidades y monto son acumulados del día: se toma el último.
+    """
+    if frame.empty:
+        return []
+    frame = frame.sort_values(["symbol", "timestamp"])
+    frame = frame.assign(date=pd.to_datetime(frame["timestamp"]).dt.date)
+    grouped = frame.groupby(["symbol", "date"], sort=True)
+    daily = grouped.agg(
+        open=("price", "first"), high=("price", "max"), low=("price", "min"), close=("price", "last"),
+        volume=("traded_units", "last"), amount=("amount", "last"), samples=("price", "size"),
+    ).reset_index()
+    daily = daily.astype(object).where(daily.notna(), None)
+    for column in ("volume", "amount", "samples"):
+        daily[column] = [None if v is None else int(v) for v in daily[column]]
+    return daily.to_dict("records")
+
+
+def _store_rollups(rows: List[Dict[str, Any]]) -> None:
+    for row in rows:
+        db.session.merge(StockPriceDaily(**row))
+    db.session.commit()
+
+
+def _rolled_up_days(start: date, end: date) -> set:
+    """Días de [start, end) que ya tienen resumen (cada día se resume completo, todos los símbolos a la vez)."""
+    query = select(StockPriceDaily.date).where(StockPriceDaily.date >= start, StockPriceDaily.date < end).distinct()
+    return set(db.session.execute(query).scalars())
+
+
+def daily_rollups(symbols: Iterable[str], start: Optional[datetime] = None,
+                  end: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    query = select(StockPriceDaily).where(StockPriceDaily.symbol.in_(list(symbols)))
+    if start:
+        query = query.where(StockPriceDaily.date >= start.date())
+    if end:
+        query = query.where(StockPriceDaily.date <= end.date())
+    return [r.to_dict() for r in db.session.execute(query.order_by(StockPriceDaily.date)).scalars()]
+
+
+# --- Archivo Parquet ---
+
+def archive_path(table: str, day: date) -> str:
+    return os.path.join(ARCHIVE_DIR, table, f"{day.isoformat()}.parquet")
+
+
+def archived_days(table: str) -> List[date]:
+    directory = os.path.join(ARCHIVE_DIR, table)
+    if not os.path.isdir(directory):
+        return []
+    days = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".parquet"):
+            try:
+                days.append(date.fromisoformat(entry.name[:-len(".parquet")]))
+            except ValueError:
+                continue
+    return sorted(days)
+
+
+def archive_frame(table: str, day: date, frame: pd.DataFrame) -> Optional[str]:
+    """Escribe (o completa, si se re-ejecuta) el archivo Parquet del día. None si no hay pyarrow."""
+    if pq is None:
+        return None
+    path = archive_path(table, day)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        frame = pd.concat([pq.read_table(path).to_pandas(), frame], ignore_index=True).drop_duplicates()
+    tmp_path = f"{path}.tmp"
+    pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), tmp_path, compression=PARQUET_COMPRESSION)
+    os.replace(tmp_path, path)
+    return path
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """`value` sin zona horaria (convertido a UTC si la traía), comparable con los `timestamp` archivados."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def read_archive(table: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                 symbols: Optional[Iterable[str]] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Filas archivadas de `table` entre `start` y `end` (por `timestamp`), leyendo solo los días del rango."""
+    if pq is None:
+        return pd.DataFrame(columns=columns)
+    start, end = naive_utc(start), naive_utc(end)
+    days = [d for d in archived_days(table)
+            if (start is None or d >= start.date()) and (end is None or d <= end.date())]
+    filters = [("symbol", "in", list(symbols))] if symbols else None
+    read_columns = None if columns is None else list(dict.fromkeys(["timestamp", *columns]))
+    frames = [pq.read_table(archive_path(table, d), columns=read_columns, filters=filters).to_pandas() for d in days]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    frame = pd.concat(frames, ignore_index=True)
+    if start is not None:
+        frame = frame[frame["timestamp"] >= start]
+    if end is not None:
+        frame = frame[frame["timestamp"] <= end]
+    frame = frame.sort_values("timestamp")
+    return frame[columns] if columns is not None else frame
+
+
+# --- Borrado ---
+
+def _is_hypertable(table: str) -> bool:
+    if db.engine.dialect.name != "postgresql":
+        return False
+    from src.utils.timescale import timescale_enabled
+
+    return timescale_enabled() and bool(db.session.execute(
+        text("SELECT 1 FROM timescaledb_information.hypertables WHERE hypertable_name = :t"), {"t": table}
+    ).first())
+
+
+def _delete_range(model, start: Optional[datetime], end: datetime, batch_size: int) -> int:
+    """
+    Borra las filas con `timestamp` en [start, end) en DELETEs de ~`batch_size` filas:
+    agrupa los timestamps (cada snapshot comparte el suyo) en tramos contiguos y borra
+    tramo a tramo, con un commit por lote, usando el índice de `timestamp`.
+    """
+    column = model.timestamp
+    counts = select(column, func.count()).where(column < end)
+    if start is not None:
+        counts = counts.where(column >= start)
+    counts = db.session.execute(counts.group_by(column).order_by(column)).all()
+
+    deleted, batch_start, batch_rows = 0, None, 0
+    for i, (ts, n) in enumerate(counts):
+        batch_start = ts if batch_start is None else batch_start
+        batch_rows += n
+        is_last = i == len(counts) - 1
+        if batch_rows >= batch_size or is_last:
+            upper = end if is_last else counts[i + 1][0]
+            deleted += db.session.query(model).filter(column >= batch_start, column < upper) \
+                .delete(synchronize_session=False)
+            db.session.commit()
+            batch_start, batch_rows = None, 0
+    return deleted
+
+
+def _load_day(model, day: date) -> pd.DataFrame:
+    start = datetime.combine(day, time.min)
+    columns = [c.name for c in model.__table__.columns]
+    rows = db.session.execute(
+        select(*model.__table__.columns).where(model.timestamp >= start, model.timestamp < start + timedelta(days=1))
+    ).all()
+    return pd.DataFrame(rows, columns=columns)
+
+
+def apply_policy(policy: RetentionPolicy, today: Optional[date] = None,
+                 batch_size: int = RETENTION_DELETE_BATCH) -> Dict[str, Any]:
+    """Aplica la política de una tabla. Requiere app context."""
+    today = today or now_chile().date()
+    cutoff = cutoff_for(policy, today)
+    summary = {"table": policy.table, "cutoff": cutoff.isoformat() if cutoff else None,
+               "days": 0, "rolled_up": 0, "archived": 0, "deleted": 0, "kept_days": []}
+    if cutoff is None:
+        return summary
+    oldest = db.session.query(func.min(policy.model.timestamp)).filter(policy.model.timestamp < cutoff).scalar()
+    if oldest is None:
+        return summary
+
+    if not (policy.rollup or policy.archive):
+        summary["deleted"] = _delete_range(policy.model, None, cutoff, batch_size)
+        return summary
+
+    archive_ready = not policy.archive or pq is not None
+    if not archive_ready:
+        logger.warning(f"[Retention] {policy.table}: el archivado está activo pero pyarrow no está instalado; "
+                       f"no se borra ninguna fila vencida (solo se resumen los días pendientes).")
+        summary["archive_unavailable"] = True
+    rolled_up = _rolled_up_days(oldest.date(), cutoff.date()) if policy.rollup else set()
+
+    hypertable = _is_hypertable(policy.table)
+    day = oldest.date()
+    while day < cutoff.date():
+        if not archive_ready and (day in rolled_up or not policy.rollup):
+            # Nada que hacer con el día: ya está resumido y no se puede archivar ni borrar.
+            day += timedelta(days=1)
+            continue
+        frame = _load_day(policy.model, day)
+        if not frame.empty:
+            summary["days"] += 1
+            if policy.rollup and day not in rolled_up:
+                rollups = rollup_frame(frame)
+                _store_rollups(rollups)
+                summary["rolled_up"] += len(rollups)
+            if policy.archive:
+                if archive_frame(policy.table, day, frame) is None:
+                    summary["kept_days"].append(day.isoformat())
+                    day += timedelta(days=1)
+                    continue
+                summary["archived"] += len(frame)
+            if not hypertable:
+                start = datetime.combine(day, time.min)
+                summary["deleted"] += _delete_range(policy.model, start, start + timedelta(days=1), batch_size)
+        day += timedelta(days=1)
+
+    if summary["kept_days"]:
+        logger.warning(f"[Retention] {policy.table}: {len(summary['kept_days'])} días no se pudieron archivar "
+                       f"(¿pyarrow instalado?); se conservan en la DB.")
+    elif hypertable and archive_ready:
+        # Los chunks completos anteriores al corte se eliminan sin DELETE fila a fila.
+        dropped = db.session.execute(
+            text("SELECT count(*) FROM drop_chunks(:t, older_than => CAST(:cutoff AS timestamp))"),
+            {"t": policy.table, "cutoff": cutoff},
+        ).scalar()
+        db.session.commit()
+        summary["dropped_chunks"] = dropped
+        summary["deleted"] += _delete_range(policy.model, None, cutoff, batch_size)  # restos de chunks parciales
+    return summary
+
+
+def apply_retention(today: Optional[date] = None, tables: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+    """Aplica todas las políticas (o solo `tables`). Requiere app context."""
+    results = []
+    for name in tables or RETENTION_POLICIES:
+        try:
+            result = apply_policy(RETENTION_POLICIES[name], today)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"[Retention] Error aplicando la retención de {name}: {e}", exc_info=True)
+            result = {"table": name, "error": str(e)}
+        else:
+            logger.info(f"[Retention] {name}: {result['days']} días procesados, {result['rolled_up']} resúmenes, "
+                        f"{result['archived']} filas archivadas, {result['deleted']} borradas.")
+        results.append(result)
+    return results
+
+
+# --- Planificación ---
+
+def submit_retention(app):
+    """Encola la retención en el planificador de trabajos (una a la vez). Devuelve `(job, created)`."""
+    from src.scripts.job_scheduler import PRIORITY_LOW, RETENTION_JOB, job_scheduler
+
+    def run():
+        with app.app_context():
+            return apply_retention()
+
+    return job_scheduler.submit(RETENTION_JOB, lambda: asyncio.to_thread(run), priority=PRIORITY_LOW, timeout=3600)
+
+
+def next_retention_run(now: datetime) -> datetime:
+    hour, minute = (int(part) for part in RETENTION_RUN_AT.split(":"))
+    run_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    return run_at if run_at > now else run_at + timedelta(days=1)
+
+
+async def retention_loop(app) -> None:
+    """Encola la retención una vez al día a la hora `RETENTION_RUN_AT` de Santiago."""
+    while True:
+        now = now_chile()
+        await asyncio.sleep((next_retention_run(now) - now).total_seconds())
+        try:
+            submit_retention(app)
+        except Exception as e:
+            logger.error(f"[Retention] No se pudo encolar la retención diaria: {e}", exc_info=True)
+
+
+def start_retention_schedule(app, loop: asyncio.AbstractEventLoop) -> None:
+    asyncio.run_coroutine_threadsafe(retention_loop(app), loop)
+    logger.info(f"[Retention] Retención diaria programada a las {RETENTION_RUN_AT} ({CHILE_TZ}).")
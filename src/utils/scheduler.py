@@ -19,7 +19,6 @@ from __future__ import annotations
 
 # ───────────────────────────────────────────────────────────── imports estándar ──
 import asyncio
-import glob
 import hashlib
 import json
 import logging
@@ -50,6 +49,7 @@ from src.utils.browser_utils import (
 from src.config import BASE_DIR, LOGS_DIR, PROJECT_SRC_DIR, SCRIPTS_DIR
 from src.utils.extensions import socketio
 from src.extensions import db
+from src.utils.capture_index import CAPTURE_PREFIX, SUMMARY_PREFIX, file_index
 from src.models.last_update import LastUpdate
 from src.models.stock_price import StockPrice
 
@@ -199,15 +199,13 @@ def send_enter_key_to_browser(app=None, *, wait_seconds: int = 5) -> Tuple[bool,
 def get_latest_json_file():
     """Obtiene el archivo JSON de datos más reciente generado por el bot."""
     try:
-        pattern = os.path.join(LOGS_DIR, "acciones-precios-plus_*.json")
-        json_files = glob.glob(pattern)
-        if not json_files:
+        latest_json = file_index().latest_file(CAPTURE_PREFIX)
+        if not latest_json:
             logger.warning(
                 "No se encontraron archivos 'acciones-precios-plus_*.json' en %s",
                 LOGS_DIR,
             )
             return None
-        latest_json = max(json_files, key=os.path.getmtime)
         logger.info("JSON más reciente: %s", latest_json)
         return latest_json
     except Exception as e:
@@ -378,14 +376,12 @@ def store_prices_in_db(json_path: str, app=None):
 def get_latest_summary_file() -> Optional[str]:
     """Archivo HAR-summary más reciente, o None."""
     try:
-        pattern = os.path.join(LOGS_DIR, "network_summary_*.json")
-        summary_files = glob.glob(pattern)
-        if not summary_files:
+        summary_file = file_index().latest_file(SUMMARY_PREFIX)
+        if not summary_file:
             logger.warning(
                 "No se encontraron 'network_summary_*.json' en %s", LOGS_DIR
             )
-            return None
-        return max(summary_files, key=os.path.getmtime)
+        return summary_file
     except Exception as e:
         logger.exception("Error al buscar resumen HAR: %s", e)
         return None
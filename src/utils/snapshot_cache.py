@@ -0,0 +1,116 @@
+# src/utils/snapshot_cache.py
+"""
+Caché en memoria del último snapshot de precios (`stock_prices`).
+
+Guarda el payload de `/api/stocks` ya serializado a JSON junto con un índice
+por símbolo, de modo que las lecturas no tocan SQLAlchemy. `store_prices_in_db`
+lo publica tras cada commit; solo se reemplaza cuando llega un snapshot nuevo.
+Cada snapshot expone además su huella (`row_hashes` / `digest`), que la ingesta
+usa para reconocer capturas idénticas sin consultar la DB.
+La caché es por proceso: el servidor gevent corre la app y el bot en el mismo.
+"""
+from __future__ import annotations
+import json
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.utils.price_ingest import (
+    FLOAT_FIELDS, INT_FIELDS, TEXT_FIELDS, normalize_price_payload, row_hashes as frame_row_hashes, snapshot_digest,
+)
+
+TIMESTAMP_FORMAT = "%d/%m/%Y %H:%M:%S"
+
+# Columna de `stock_prices` -> clave usada por la API (igual que `StockPrice.to_dict`)
+API_KEYS = {'symbol': 'NEMO', **{col: key for key, col in {**FLOAT_FIELDS, **INT_FIELDS, **TEXT_FIELDS}.items()}}
+
+
+@dataclass
+class Snapshot:
+    timestamp: datetime
+    rows: List[Dict[str, Any]]
+    index: Dict[str, int] = field(default_factory=dict)
+    body: bytes = b""
+    hashes: Optional[Dict[str, int]] = None
+
+    @property
+    def row_hashes(self) -> Dict[str, int]:
+        """Hash por símbolo de las filas (calculado al primer uso si no vino de la ingesta)."""
+        if self.hashes is None:
+            self.hashes = frame_row_hashes(normalize_price_payload(self.rows))
+        return self.hashes
+
+    @property
+    def digest(self) -> str:
+        return snapshot_digest(self.row_hashes)
+
+    @property
+    def payload(self) -> Dict[str, Any]:
+        return {"data": self.rows, "timestamp": self.timestamp.strftime(TIMESTAMP_FORMAT), "source": "database"}
+
+    def select(self, symbols: Iterable[str]) -> List[Dict[str, Any]]:
+        """Filas de los símbolos pedidos (sin distinguir mayúsculas), en el orden del snapshot."""
+        positions = sorted({self.index[s] for s in (c.upper().strip() for c in symbols) if s in self.index})
+        return [self.rows[i] for i in positions]
+
+
+def db_record_to_api_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Convierte un dict con columnas de `stock_prices` al formato de `StockPrice.to_dict`."""
+    row = {api_key: record.get(column) for column, api_key in API_KEYS.items()}
+    ts = record.get('timestamp')
+    row['timestamp'] = ts.strftime(TIMESTAMP_FORMAT) if ts else None
+    return row
+
+
+def _build_snapshot(ts: datetime, rows: List[Dict[str, Any]], hashes: Optional[Dict[str, int]] = None) -> Snapshot:
+    snapshot = Snapshot(timestamp=ts, rows=rows, hashes=hashes)
+    snapshot.index = {str(r.get('NEMO', '')).upper().strip(): i for i, r in enumerate(rows)}
+    snapshot.body = json.dumps(snapshot.payload, sort_keys=True).encode("utf-8")
+    return snapshot
+
+
+class LatestSnapshotCache:
+    """Contenedor thread-safe del último snapshot conocido."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Snapshot] = None
+
+    def get(self) -> Optional[Snapshot]:
+        return self._snapshot
+
+    def load(self, ts: datetime, rows: List[Dict[str, Any]]) -> Snapshot:
+        """Carga un snapshot leído de la DB (caché fría)."""
+        snapshot = _build_snapshot(ts, rows)
+        with self._lock:
+            if self._snapshot is None or self._snapshot.timestamp <= ts:
+                self._snapshot = snapshot
+            return self._snapshot
+
+    def publish(self, ts: datetime, rows: List[Dict[str, Any]],
+                hashes: Optional[Dict[str, int]] = None) -> Optional[Snapshot]:
+        """
+        Publica filas recién guardadas (con sus `row_hashes`, si ya se calcularon).
+        Un timestamp más nuevo reemplaza el snapshot; el mismo timestamp se fusiona
+        por símbolo; uno más antiguo se ignora. Con la caché fría no se publica nada:
+        la próxima lectura cargará desde la DB.
+        """
+        with self._lock:
+            current = self._snapshot
+            if current is None or ts < current.timestamp:
+                return current
+            if ts == current.timestamp:
+                merged = {r.get('NEMO'): r for r in current.rows}
+                merged.update({r.get('NEMO'): r for r in rows})
+                rows = list(merged.values())
+                hashes = None if hashes is None or current.hashes is None else {**current.hashes, **hashes}
+            self._snapshot = _build_snapshot(ts, rows, hashes)
+            return self._snapshot
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snapshot = None
+
+
+latest_snapshot_cache = LatestSnapshotCache()
@@ -0,0 +1,123 @@
+# src/utils/snapshot_diff.py
+"""
+Motor de diferencias entre dos snapshots de `stock_prices`.
+
+Calcula en una sola consulta SQL (emparejando ambos snapshots por símbolo) los
+símbolos nuevos, eliminados, cambiados y sin cambios, junto con la diferencia
+absoluta y porcentual del precio. Sirve para cualquier par de timestamps.
+"""
+from __future__ import annotations
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, case, func, literal, or_, select
+
+from src.extensions import db
+from src.models import SnapshotSummary, StockPrice
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_FORMAT = "%d/%m/%Y %H:%M:%S"
+
+
+def _paired_snapshots(ts_prev: datetime, ts_curr: datetime, stock_codes: Optional[List[str]]):
+    """
+    Equivalente a `FULL OUTER JOIN` de ambos snapshots por símbolo, expresado como una
+    agregación condicional sobre `timestamp IN (ts_prev, ts_curr)`: una sola pasada por
+    el índice de `timestamp` (SQLite no indexa subconsultas unidas con FULL JOIN y
+    termina en un nested loop).
+    """
+    in_prev = StockPrice.timestamp == ts_prev
+    in_curr = StockPrice.timestamp == ts_curr
+    query = select(
+        StockPrice.symbol.label("symbol"),
+        func.max(case((in_prev, 1), else_=0)).label("in_prev"),
+        func.max(case((in_curr, 1), else_=0)).label("in_curr"),
+        func.max(case((in_prev, StockPrice.price))).label("old_price"),
+        func.max(case((in_curr, StockPrice.price))).label("new_price"),
+        func.max(case((in_prev, StockPrice.variation))).label("old_variation"),
+        func.max(case((in_curr, StockPrice.variation))).label("new_variation"),
+    ).where(StockPrice.timestamp.in_([ts_prev, ts_curr]))
+    if stock_codes:
+        query = query.where(StockPrice.symbol.in_(stock_codes))
+    return query.group_by(StockPrice.symbol).subquery("pair")
+
+
+def diff_snapshots(ts_prev: datetime, ts_curr: datetime, stock_codes: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Devuelve filas compactas `{symbol, status, old_price, new_price, old_variation,
+    new_variation, abs_diff, pct_diff}` con `status` en new/removed/changed/unchanged.
+    """
+    pair = _paired_snapshots(ts_prev, ts_curr, stock_codes)
+
+    abs_diff = func.coalesce(pair.c.new_price, 0) - func.coalesce(pair.c.old_price, 0)
+    pct_diff = case(
+        (and_(pair.c.old_price.isnot(None), pair.c.old_price != 0), abs_diff * 100.0 / pair.c.old_price),
+        else_=literal(0.0),
+    )
+    status = case(
+        (pair.c.in_prev == 0, literal("new")),
+        (pair.c.in_curr == 0, literal("removed")),
+        (or_(pair.c.new_price.is_distinct_from(pair.c.old_price),
+             pair.c.new_variation.is_distinct_from(pair.c.old_variation)), literal("changed")),
+        else_=literal("unchanged"),
+    )
+    stmt = select(
+        pair.c.symbol,
+        status.label("status"),
+        pair.c.old_price,
+        pair.c.new_price,
+        pair.c.old_variation,
+        pair.c.new_variation,
+        abs_diff.label("abs_diff"),
+        pct_diff.label("pct_diff"),
+    )
+    return [dict(row._mapping) for row in db.session.execute(stmt)]
+
+
+def last_two_timestamps() -> Optional[Tuple[datetime, datetime]]:
+    """(anterior, actual) de los dos últimos snapshots, usando la tabla de resúmenes si está poblada."""
+    latest = SnapshotSummary.query.order_by(SnapshotSummary.timestamp.desc()).first()
+    if latest and latest.previous_timestamp:
+        return latest.previous_timestamp, latest.timestamp
+
+    timestamps = db.session.query(StockPrice.timestamp).distinct().order_by(StockPrice.timestamp.desc()).limit(2).all()
+    if len(timestamps) < 2:
+        return None
+    return timestamps[1][0], timestamps[0][0]
+
+
+def previous_timestamp(ts: datetime) -> Optional[datetime]:
+    """Timestamp del snapshot inmediatamente anterior a `ts`."""
+    summary = db.session.get(SnapshotSummary, ts)
+    if summary and summary.previous_timestamp:
+        return summary.previous_timestamp
+    return db.session.query(func.max(StockPrice.timestamp)).filter(StockPrice.timestamp < ts).scalar()
+
+
+def _side(row: Dict[str, Any], prefix: str) -> Dict[str, Any]:
+    return {"symbol": row["symbol"], "price": row[f"{prefix}_price"], "variation": row[f"{prefix}_variation"]}
+
+
+def compare_snapshots(ts_prev: datetime, ts_curr: datetime, stock_codes: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Agrupa el resultado de `diff_snapshots` con el formato de `/api/history/compare`."""
+    result = {
+        "current_timestamp": ts_curr.strftime(TIMESTAMP_FORMAT),
+        "previous_timestamp": ts_prev.strftime(TIMESTAMP_FORMAT),
+        "new": [], "removed": [], "changes": [], "unchanged": [],
+    }
+    for row in diff_snapshots(ts_prev, ts_curr, stock_codes):
+        status = row["status"]
+        if status == "new":
+            result["new"].append(_side(row, "new"))
+        elif status == "removed":
+            result["removed"].append(_side(row, "old"))
+        elif status == "changed":
+            result["changes"].append({
+                "symbol": row["symbol"], "old": _side(row, "old"), "new": _side(row, "new"),
+                "abs_diff": row["abs_diff"], "pct_diff": row["pct_diff"],
+            })
+        else:
+            result["unchanged"].append(_side(row, "new"))
+    return result
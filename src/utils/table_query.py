@@ -0,0 +1,178 @@
+# src/utils/table_query.py
+"""
+Consultas del CRUD genérico (`/api/mantenedores/<tabla>`) que escalan con tablas grandes.
+
+- Paginación keyset: se ordena por la clave primaria y cada página continúa
+  después de la última clave vista (`cursor` opaco), sin OFFSET ni COUNT.
+- Búsqueda `q`: `ILIKE '%término%'` sobre las columnas de texto; en PostgreSQL
+  `ensure_search_indexes` crea índices GIN trigram (`pg_trgm`) que lo resuelven sin
+  escanear la tabla, y `SEARCH_FTS` define documentos de texto completo (modo `fts`).
+- Conteos: sobre tablas grandes se usa la estimación del planificador (`pg_class`,
+  o `approximate_row_count` en hypertables) en lugar de un COUNT exacto.
+- Exportación: NDJSON o CSV generados por lotes keyset, sin cargar la tabla en memoria.
+"""
+from __future__ import annotations
+import base64
+import csv
+import io
+import json
+import logging
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import String, Text, or_, text, tuple_
+
+from src.config import ESTIMATED_COUNT_MIN_ROWS
+from src.extensions import db
+
+logger = logging.getLogger(__name__)
+
+MAX_PAGE_SIZE = 1000
+EXPORT_BATCH_SIZE = 5000
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# Tablas -> columnas con índice trigram (las demás columnas de texto se buscan igual, sin índice)
+SEARCH_TRIGRAM_INDEXES = {
+    "stock_prices": ("symbol", "isin"),
+    "log_entries": ("level", "action", "message"),
+    "filtered_stock_history": ("symbol",),
+    "stock_closings": ("nemo",),
+    "dividends": ("nemo", "description"),
+}
+# Tablas -> documento de texto completo (misma expresión en el índice y en la consulta)
+SEARCH_FTS = {
+    "log_entries": "coalesce(message, '') || ' ' || coalesce(action, '') || ' ' || coalesce(stack, '')",
+}
+SEARCH_MODES = ("contains", "fts")
+
+
+def encode_cursor(values: Iterable[Any]) -> str:
+    raw = json.dumps([v.isoformat() if hasattr(v, "isoformat") else v for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> List[Any]:
+    """Valores crudos (JSON) de la clave primaria; lanza ValueError si el cursor no es válido."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except Exception as e:
+        raise ValueError(f"Cursor inválido: {e}") from e
+    if not isinstance(values, list):
+        raise ValueError("Cursor inválido.")
+    return values
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_clause(model, term: str, mode: str = "contains"):
+    """Filtro de búsqueda para `term`; `fts` solo aplica en PostgreSQL y tablas con documento definido."""
+    table_name = model.__tablename__
+    if mode == "fts" and table_name in SEARCH_FTS and db.engine.dialect.name == "postgresql":
+        return text(
+            f"to_tsvector('simple', {SEARCH_FTS[table_name]}) @@ plainto_tsquery('simple', :search_term)"
+        ).bindparams(search_term=term)
+
+    pattern = f"%{_escape_like(term)}%"
+    filters = [column.ilike(pattern, escape="\\") for column in model.__table__.columns
+               if isinstance(column.type, (String, Text))]
+    return or_(*filters) if filters else None
+
+
+def keyset_page(query, pk_columns: List, after: Optional[List[Any]], limit: int) -> Tuple[List[Any], bool]:
+    """
+    Página de hasta `limit` filas ordenadas por la clave primaria, después de `after`
+    (valores ya tipados). Devuelve `(filas, hay_más)` pidiendo una fila extra.
+    """
+    if after is not None:
+        key = tuple_(*pk_columns) if len(pk_columns) > 1 else pk_columns[0]
+        bound = tuple_(*after) if len(pk_columns) > 1 else after[0]
+        query = query.filter(key > bound)
+    rows = query.order_by(*pk_columns).limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
+
+
+def estimated_count(model) -> Optional[int]:
+    """Filas estimadas por el planificador (PostgreSQL); None si no hay estadísticas o en otro motor."""
+    if db.engine.dialect.name != "postgresql":
+        return None
+    from src.utils.timescale import timescale_enabled
+
+    table_name = model.__tablename__
+    if timescale_enabled():
+        # Las hypertables guardan las filas en sus chunks: pg_class del padre no las refleja.
+        value = db.session.execute(text("SELECT approximate_row_count(:t)"), {"t": table_name}).scalar()
+    else:
+        value = db.session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:t)"), {"t": table_name}
+        ).scalar()
+    # reltuples = -1 (PostgreSQL 14+) si la tabla nunca se analizó
+    return int(value) if value is not None and value >= 0 else None
+
+
+def table_count(model, query, searching: bool) -> Tuple[Optional[int], bool]:
+    """
+    `(total, es_estimación)`. Tablas con más de `ESTIMATED_COUNT_MIN_ROWS` filas estimadas
+    devuelven la estimación (o None si hay búsqueda: contar coincidencias sería recorrerlas).
+    """
+    estimate = estimated_count(model)
+    if estimate is not None and estimate >= ESTIMATED_COUNT_MIN_ROWS:
+        return (None, True) if searching else (estimate, True)
+    return query.order_by(None).count(), False
+
+
+def ensure_search_indexes(engine=None) -> bool:
+    """
+    Crea (si faltan) los índices trigram y de texto completo en PostgreSQL. Idempotente;
+    devuelve False sin error en otros motores o si alguno no se pudo crear (p. ej. sin `pg_trgm`).
+    """
+    engine = engine or db.engine
+    if engine.dialect.name != "postgresql":
+        return False
+    statements = {
+        "trigram": ["CREATE EXTENSION IF NOT EXISTS pg_trgm"] + [
+            f"CREATE INDEX IF NOT EXISTS ix_{table_name}_{column}_trgm ON {table_name} USING gin ({column} gin_trgm_ops)"
+            for table_name, columns in SEARCH_TRIGRAM_INDEXES.items() for column in columns
+        ],
+        "texto completo": [
+            f"CREATE INDEX IF NOT EXISTS ix_{table_name}_fts ON {table_name} USING gin (to_tsvector('simple', {document}))"
+            for table_name, document in SEARCH_FTS.items()
+        ],
+    }
+    created = True
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for kind, ddl in statements.items():
+            try:
+                for statement in ddl:
+                    conn.execute(text(statement))
+            except Exception as e:
+                # CREATE EXTENSION puede requerir permisos; la búsqueda sigue funcionando sin índices.
+                logger.warning(f"[TableQuery] No se pudieron crear los índices de {kind}: {e}")
+                created = False
+    if created:
+        logger.info("[TableQuery] ✓ Índices de búsqueda (trigram / texto completo) verificados.")
+    return created
+
+
+def iter_export(query, pk_columns: List, serialize: Callable[[Any], Dict[str, Any]], fmt: str,
+                batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    """Genera la exportación en `fmt` recorriendo la tabla por lotes keyset."""
+    after, header_written = None, False
+    while True:
+        rows, has_more = keyset_page(query, pk_columns, after, batch_size)
+        if not rows:
+            return
+        records = [serialize(r) for r in rows]
+        if fmt == "ndjson":
+            yield "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records)
+        else:
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=list(records[0]))
+            if not header_written:
+                writer.writeheader()
+                header_written = True
+            writer.writerows(records)
+            yield buffer.getvalue()
+        if not has_more:
+            return
+        after = [getattr(rows[-1], c.name) for c in pk_columns]
@@ -7,38 +7,79 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# --- Calendario bursátil de Santiago ---
+CHILE_TZ = pytz.timezone('America/Santiago')
+_CHILE_HOLIDAYS = holidays.CL()
+
+# Fases de la jornada (hora de Santiago). Fuera de ellas, o en días no hábiles, el mercado está cerrado.
+PRE_OPEN = "pre_open"
+OPEN = "open"
+CLOSE_AUCTION = "close_auction"
+AFTER_HOURS = "after_hours"
+CLOSED = "closed"
+MARKET_PHASES = (
+    (PRE_OPEN, datetime.time(9, 0), datetime.time(9, 30)),
+    (OPEN, datetime.time(9, 30), datetime.time(15, 50)),
+    (CLOSE_AUCTION, datetime.time(15, 50), datetime.time(16, 0)),
+    (AFTER_HOURS, datetime.time(16, 0), datetime.time(17, 0)),
+)
+
+
+def now_chile() -> datetime.datetime:
+    return datetime.datetime.now(CHILE_TZ)
+
+
+def is_trading_day(date_obj: datetime.date) -> bool:
+    """Día hábil bursátil: lunes a viernes y no festivo en Chile."""
+    return date_obj.weekday() < 5 and date_obj not in _CHILE_HOLIDAYS
+
+
 def get_fallback_market_time() -> datetime.datetime:
     """
     Calcula una hora de mercado de fallback basada en el último día hábil de cierre.
     - Si es un día hábil después de las 16:00, devuelve las 16:00 de hoy.
     - Si es un fin de semana, festivo, o antes de las 16:00, devuelve las 16:00 del último día hábil.
     """
-    chile_tz = pytz.timezone('America/Santiago')
-    chile_holidays = holidays.CL()
-    now_chile = datetime.datetime.now(chile_tz)
-
-    logger.info(f"Calculando hora de fallback. Hora actual en Chile: {now_chile.strftime('%Y-%m-%d %H:%M')}")
+    now = now_chile()
 
-    def is_business_day(date_obj):
-        """Verifica si una fecha es día hábil (lunes-viernes y no festivo)."""
-        return date_obj.weekday() < 5 and date_obj not in chile_holidays
+    logger.info(f"Calculando hora de fallback. Hora actual en Chile: {now.strftime('%Y-%m-%d %H:%M')}")
 
     # Caso 1: Hoy es día hábil y ya pasaron las 16:00 (hora de cierre)
-    if is_business_day(now_chile.date()) and now_chile.hour >= 16:
-        fallback_time = now_chile.replace(hour=16, minute=0, second=0, microsecond=0)
+    if is_trading_day(now.date()) and now.hour >= 16:
+        fallback_time = now.replace(hour=16, minute=0, second=0, microsecond=0)
         logger.info(f"Día hábil post-cierre. Usando las 16:00 de hoy como fallback.")
         return fallback_time
 
     # Caso 2: Es fin de semana, festivo, o un día hábil antes del cierre.
     # Buscamos el último día hábil hacia atrás.
-    last_business_day = now_chile.date() - datetime.timedelta(days=1)
-    while not is_business_day(last_business_day):
+    last_business_day = now.date() - datetime.timedelta(days=1)
+    while not is_trading_day(last_business_day):
         last_business_day -= datetime.timedelta(days=1)
     
     # Combinamos la fecha del último día hábil con la hora de cierre (16:00)
-    fallback_time = chile_tz.localize(
+    fallback_time = CHILE_TZ.localize(
         datetime.datetime.combine(last_business_day, datetime.time(16, 0))
     )
     
     logger.info(f"Fin de semana/festivo/pre-cierre. Usando cierre del último día hábil: {last_business_day.strftime('%Y-%m-%d')} a las 16:00.")
-    return fallback_time
\ No newline at end of file
+    return fallback_time
+
+
+def phase_windows(date_obj: datetime.date):
+    """Fases de `date_obj` como tuplas `(fase, inicio, fin)` con datetimes de Santiago; vacío si no es día hábil."""
+    if not is_trading_day(date_obj):
+        return []
+    return [
+        (phase, CHILE_TZ.localize(datetime.datetime.combine(date_obj, start)),
+         CHILE_TZ.localize(datetime.datetime.combine(date_obj, end)))
+        for phase, start, end in MARKET_PHASES
+    ]
+
+
+def market_phase(now: datetime.datetime | None = None) -> str:
+    """Fase del mercado en `now` (por defecto, ahora en Santiago)."""
+    now = (now or now_chile()).astimezone(CHILE_TZ)
+    for phase, start, end in phase_windows(now.date()):
+        if start <= now < end:
+            return phase
+    return CLOSED
@@ -0,0 +1,272 @@
+# src/utils/timescale.py
+"""
+Bootstrap de TimescaleDB y consultas por buckets de tiempo.
+
+`bootstrap_timescale` convierte `stock_prices` y `filtered_stock_history` en
+hypertables, activa la compresión nativa de chunks antiguos y crea agregados
+continuos por símbolo (5m / 1h / 1d). Es idempotente y se ejecuta al arrancar.
+
+`price_ohlc` y `history_buckets` leen de esos agregados cuando existen; en
+PostgreSQL sin Timescale o en SQLite (tests) calculan lo mismo con pandas a
+partir de las filas crudas, completadas con las que la retención ya archivó.
+"""
+from __future__ import annotations
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy import column, select, table, text
+
+from src.config import (
+    TIMESCALE_COMPRESS_AFTER,
+    TIMESCALE_HISTORY_CHUNK_INTERVAL,
+    TIMESCALE_PRICES_CHUNK_INTERVAL,
+)
+from src.extensions import db
+from src.models import FilteredStockHistory, StockPrice
+from src.utils.retention import naive_utc, read_archive
+
+logger = logging.getLogger(__name__)
+
+# Intervalo de la API -> intervalo SQL de `time_bucket` / frecuencia equivalente en pandas
+INTERVALS = {"5m": "5 minutes", "1h": "1 hour", "1d": "1 day"}
+_PANDAS_FREQ = {"5m": "5min", "1h": "1h", "1d": "1D"}
+
+# Política de refresco por intervalo: (start_offset, end_offset, schedule_interval)
+_REFRESH_POLICIES = {
+    "5m": ("1 day", "5 minutes", "5 minutes"),
+    "1h": ("7 days", "1 hour", "30 minutes"),
+    "1d": ("90 days", "1 day", "1 hour"),
+}
+
+PRICE_OHLC_VIEW = "stock_prices_ohlc"
+HISTORY_BUCKETS_VIEW = "filtered_stock_history_buckets"
+
+PRICE_OHLC_COLUMNS = ["open", "high", "low", "close", "volume", "amount"]
+HISTORY_BUCKET_COLUMNS = ["price", "price_difference", "percent_change"]
+
+# `UN_TRANSADAS` y `MONTO` son acumulados del día: el volumen del bucket es el último valor.
+_PRICE_OHLC_SQL = """
+SELECT symbol,
+       time_bucket(INTERVAL '{interval}', timestamp) AS bucket,
+       first(price, timestamp) AS open,
+       max(price) AS high,
+       min(price) AS low,
+       last(price, timestamp) AS close,
+       last(traded_units, timestamp) AS volume,
+       last(amount, timestamp) AS amount
+FROM stock_prices
+GROUP BY symbol, bucket
+"""
+
+# La suma de diferencias consecutivas es el cambio neto del bucket.
+_HISTORY_BUCKETS_SQL = """
+SELECT symbol,
+       time_bucket(INTERVAL '{interval}', timestamp) AS bucket,
+       last(price, timestamp) AS price,
+       sum(price_difference) AS price_difference,
+       sum(price_difference) * 100.0 / NULLIF(first(previous_price, timestamp), 0) AS percent_change
+FROM filtered_stock_history
+GROUP BY symbol, bucket
+"""
+
+_HYPERTABLES = {
+    "stock_prices": TIMESCALE_PRICES_CHUNK_INTERVAL,
+    "filtered_stock_history": TIMESCALE_HISTORY_CHUNK_INTERVAL,
+}
+_CONTINUOUS_AGGREGATES = {PRICE_OHLC_VIEW: _PRICE_OHLC_SQL, HISTORY_BUCKETS_VIEW: _HISTORY_BUCKETS_SQL}
+
+# URL del engine -> ¿existen los agregados continuos?
+_enabled_cache: Dict[str, bool] = {}
+
+
+def _ensure_time_in_primary_key(conn, table_name: str) -> None:
+    """Las hypertables exigen que la PK incluya la columna de tiempo (`id` -> `(id, timestamp)`)."""
+    row = conn.execute(text("""
+        SELECT c.conname, array_agg(a.attname::text)
+        FROM pg_constraint c
+        JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = ANY(c.conkey)
+        WHERE c.conrelid = CAST(:table AS regclass) AND c.contype = 'p'
+        GROUP BY c.conname
+    """), {"table": table_name}).first()
+    if row and "timestamp" not in row[1]:
+        logger.info(f"[Timescale] Ampliando la PK de {table_name} a ({', '.join(row[1])}, timestamp).")
+        conn.execute(text(
+            f'ALTER TABLE {table_name} DROP CONSTRAINT "{row[0]}", '
+            f'ADD PRIMARY KEY ({", ".join(row[1])}, "timestamp")'
+        ))
+
+
+def _create_hypertable(conn, table_name: str, chunk_interval: str) -> None:
+    conn.execute(text(
+        "SELECT create_hypertable(CAST(:table AS regclass), 'timestamp', "
+        "chunk_time_interval => CAST(:chunk AS INTERVAL), if_not_exists => TRUE, migrate_data => TRUE)"
+    ), {"table": table_name, "chunk": chunk_interval})
+    # Si ya era hypertable, aplica el intervalo a los chunks futuros.
+    conn.execute(text("SELECT set_chunk_time_interval(CAST(:table AS regclass), CAST(:chunk AS INTERVAL))"),
+                 {"table": table_name, "chunk": chunk_interval})
+
+
+def _enable_compression(conn, table_name: str) -> None:
+    enabled = conn.execute(text(
+        "SELECT compression_enabled FROM timescaledb_information.hypertables WHERE hypertable_name = :table"
+    ), {"table": table_name}).scalar()
+    if not enabled:
+        conn.execute(text(
+            f"ALTER TABLE {table_name} SET (timescaledb.compress, "
+            f"timescaledb.compress_segmentby = 'symbol', timescaledb.compress_orderby = 'timestamp DESC')"
+        ))
+    conn.execute(text(
+        "SELECT add_compression_policy(CAST(:table AS regclass), CAST(:after AS INTERVAL), if_not_exists => TRUE)"
+    ), {"table": table_name, "after": TIMESCALE_COMPRESS_AFTER})
+
+
+def _create_continuous_aggregate(conn, view_prefix: str, key: str, select_sql: str) -> None:
+    view = f"{view_prefix}_{key}"
+    start_offset, end_offset, schedule = _REFRESH_POLICIES[key]
+    if not conn.execute(text("SELECT to_regclass(:view)"), {"view": view}).scalar():
+        conn.execute(text(
+            f"CREATE MATERIALIZED VIEW {view} "
+            f"WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS "
+            f"{select_sql.format(interval=INTERVALS[key])} WITH NO DATA"
+        ))
+        # Materializa el histórico existente una vez; luego la política mantiene la ventana reciente.
+        conn.execute(text(f"CALL refresh_continuous_aggregate('{view}', NULL, NULL)"))
+        logger.info(f"[Timescale] Agregado continuo {view} creado.")
+    conn.execute(text(
+        "SELECT add_continuous_aggregate_policy(CAST(:view AS regclass), "
+        "start_offset => CAST(:start AS INTERVAL), end_offset => CAST(:end AS INTERVAL), "
+        "schedule_interval => CAST(:schedule AS INTERVAL), if_not_exists => TRUE)"
+    ), {"view": view, "start": start_offset, "end": end_offset, "schedule": schedule})
+
+
+def bootstrap_timescale(engine=None) -> bool:
+    """
+    Crea/actualiza hypertables, compresión y agregados continuos. Devuelve False
+    (sin error) si la DB no es PostgreSQL o no tiene la extensión disponible.
+    """
+    engine = engine or db.engine
+    if engine.dialect.name != "postgresql":
+        return False
+
+    # Los agregados continuos no se pueden crear dentro de una transacción.
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if not conn.execute(text("SELECT 1 FROM pg_available_extensions WHERE name = 'timescaledb'")).first():
+            logger.warning("[Timescale] La extensión timescaledb no está disponible. Se usarán tablas normales.")
+            return False
+        try:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS timescaledb"))
+            for table_name, chunk_interval in _HYPERTABLES.items():
+                _ensure_time_in_primary_key(conn, table_name)
+                _create_hypertable(conn, table_name, chunk_interval)
+            for view_prefix, select_sql in _CONTINUOUS_AGGREGATES.items():
+                for key in INTERVALS:
+                    _create_continuous_aggregate(conn, view_prefix, key, select_sql)
+            for table_name in _HYPERTABLES:
+                _enable_compression(conn, table_name)
+        except Exception as e:
+            # Puede fallar por permisos (CREATE EXTENSION requiere superusuario).
+            logger.warning(f"[Timescale] No se pudo completar el bootstrap de TimescaleDB: {e}")
+            return False
+        finally:
+            _enabled_cache.pop(str(engine.url), None)
+
+    logger.info("[Timescale] ✓ Hypertables, compresión y agregados continuos configurados.")
+    return True
+
+
+def timescale_enabled() -> bool:
+    """Indica si los agregados continuos existen en la DB actual (resultado cacheado por engine)."""
+    engine = db.engine
+    key = str(engine.url)
+    if key not in _enabled_cache:
+        _enabled_cache[key] = engine.dialect.name == "postgresql" and bool(
+            db.session.execute(text("SELECT to_regclass(:view)"), {"view": f"{PRICE_OHLC_VIEW}_5m"}).scalar()
+        )
+    return _enabled_cache[key]
+
+
+def _query_view(view: str, value_columns: List[str], symbols: List[str],
+                start: Optional[datetime], end: Optional[datetime]) -> List[Dict[str, Any]]:
+    view_table = table(view, column("symbol"), column("bucket"), *(column(c) for c in value_columns))
+    query = select(view_table).where(view_table.c.symbol.in_(symbols))
+    if start:
+        query = query.where(view_table.c.bucket >= start)
+    if end:
+        query = query.where(view_table.c.bucket <= end)
+    query = query.order_by(view_table.c.symbol, view_table.c.bucket)
+    return [dict(row._mapping) for row in db.session.execute(query)]
+
+
+def _raw_frame(model, columns: List[str], symbols: List[str], interval: str,
+               start: Optional[datetime], end: Optional[datetime]) -> pd.DataFrame:
+    """
+    Filas crudas ordenadas por tiempo, con la columna `bucket` equivalente a `time_bucket`.
+    Los días que la retención ya sacó de la DB se leen del archivo Parquet.
+    """
+    names = ["symbol", "timestamp", *columns]
+    query = db.session.query(*(getattr(model, c) for c in names)).filter(model.symbol.in_(symbols))
+    if start:
+        query = query.filter(model.timestamp >= start)
+    if end:
+        query = query.filter(model.timestamp <= end)
+    frame = pd.DataFrame(query.order_by(model.timestamp).all(), columns=names)
+    first_in_db = frame["timestamp"].min() if not frame.empty else naive_utc(end)
+    archived = read_archive(model.__tablename__, start, first_in_db, symbols, names)
+    if first_in_db is not None and not archived.empty:
+        archived = archived[archived["timestamp"] < first_in_db]
+    if not archived.empty:
+        frame = pd.concat([archived, frame], ignore_index=True) if not frame.empty else archived.reset_index(drop=True)
+    frame["bucket"] = pd.to_datetime(frame["timestamp"]).dt.floor(_PANDAS_FREQ[interval])
+    return frame
+
+
+def _to_records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    frame = frame.sort_values(["symbol", "bucket"])
+    records = frame.astype(object).where(frame.notna(), None).to_dict("records")
+    for record in records:
+        record["bucket"] = record["bucket"].to_pydatetime()
+    return records
+
+
+def price_ohlc(symbols: List[str], interval: str, start: Optional[datetime] = None,
+               end: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """OHLC y volumen por símbolo y bucket (`symbol, bucket, open, high, low, close, volume, amount`)."""
+    if timescale_enabled():
+        return _query_view(f"{PRICE_OHLC_VIEW}_{interval}", PRICE_OHLC_COLUMNS, symbols, start, end)
+
+    frame = _raw_frame(StockPrice, ["price", "traded_units", "amount"], symbols, interval, start, end)
+    if frame.empty:
+        return []
+    grouped = frame.groupby(["symbol", "bucket"]).agg(
+        open=("price", "first"), high=("price", "max"), low=("price", "min"), close=("price", "last"),
+        volume=("traded_units", "last"), amount=("amount", "last"),
+    )
+    return _to_records(grouped.reset_index())
+
+
+def history_buckets(symbols: List[str], interval: str, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Historial filtrado por bucket (`symbol, bucket, price, price_difference, percent_change`)."""
+    if timescale_enabled():
+        return _query_view(f"{HISTORY_BUCKETS_VIEW}_{interval}", HISTORY_BUCKET_COLUMNS, symbols, start, end)
+
+    frame = _raw_frame(FilteredStockHistory, ["price", "previous_price", "price_difference"], symbols, interval, start, end)
+    if frame.empty:
+        return []
+    grouped = frame.groupby(["symbol", "bucket"]).agg(
+        price=("price", "last"), price_difference=("price_difference", "sum"), first_previous=("previous_price", "first"),
+    ).reset_index()
+    base = grouped["first_previous"].where(grouped["first_previous"] != 0)
+    grouped["percent_change"] = grouped["price_difference"] * 100.0 / base
+    return _to_records(grouped.drop(columns="first_previous"))
+
+
+def auto_interval(days: int) -> str:
+    """Intervalo de agregación razonable para una ventana de `days` días."""
+    if days <= 2:
+        return "5m"
+    if days <= 31:
+        return "1h"
+    return "1d"
@@ -6,12 +6,18 @@ os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
 
 from src import main
 from src.extensions import db
+from src.utils.snapshot_cache import latest_snapshot_cache
+from src.utils.dashboard_views import dashboard_cache
+from src.utils.http_cache import response_cache
 
 
 @pytest.fixture
 def app():
     """Create Flask app with in-memory database for tests."""
     app = main.app
+    latest_snapshot_cache.invalidate()
+    dashboard_cache.invalidate()
+    response_cache.clear()
     with app.app_context():
         db.create_all()
     yield app
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+from src.extensions import db
+from src.models import Alert
+from src.utils import alert_engine as alert_engine_module
+from src.utils.alert_engine import AlertEngine, alert_engine
+from src.utils.db_io import store_prices_in_db
+
+
+def test_match_uses_sorted_thresholds_per_condition():
+    engine = AlertEngine()
+    engine.build([
+        (1, "AAA", 100.0, "above"), (2, "AAA", 120.0, "above"), (3, "AAA", 90.0, "below"),
+        (4, "AAA", 3.0, "pct_up"), (5, "AAA", 2.0, "pct_down"), (6, "BBB", 5000, "vol_above"),
+        (7, "AAA", 80.0, "below"),
+    ])
+    fired = engine.match([
+        {"symbol": "AAA", "price": 110.0, "variation": -2.5, "traded_units": 10},
+        {"symbol": "BBB", "price": 1.0, "variation": 0.0, "traded_units": 5000},
+        {"symbol": "ZZZ", "price": 1.0},
+    ])
+    assert sorted(f["id"] for f in fired) == [1, 5, 6]
+    # Las disparadas salen del índice: el mismo snapshot no vuelve a dispararlas.
+    assert engine.match([{"symbol": "AAA", "price": 110.0, "variation": -2.5}]) == []
+    assert sorted(f["id"] for f in engine.match([{"symbol": "AAA", "price": 79.0}])) == [3, 7]
+
+
+def test_store_prices_triggers_alerts_once(app, monkeypatch):
+    emitted = []
+    monkeypatch.setattr(alert_engine_module.socketio, "emit", lambda event, data=None, **kw: emitted.append((event, data)))
+
+    client = app.test_client()
+    assert client.post("/api/alerts", json={"symbol": "aaa", "target_price": 100, "condition": "above"}).status_code == 201
+    assert client.post("/api/alerts", json={"symbol": "AAA", "target_price": 1.5, "condition": "pct_down"}).status_code == 201
+    assert client.post("/api/alerts", json={"symbol": "AAA", "target_price": 1, "condition": "sideways"}).status_code == 400
+
+    ts = datetime(2025, 1, 10, 12, 0)
+    payload = {"listaResult": [{"NEMO": "AAA", "PRECIO_CIERRE": 101, "VARIACION": 0.5}]}
+    with app.app_context():
+        alert_engine.invalidate()
+        store_prices_in_db(payload, ts)
+        store_prices_in_db(payload, ts + timedelta(minutes=1))
+        triggered = {a.condition: a.triggered for a in db.session.query(Alert).all()}
+
+    assert triggered == {"above": True, "pct_down": False}
+    alerts = [data for event, data in emitted if event == "alert_triggered"]
+    assert len(alerts) == 1 and alerts[0]["symbol"] == "AAA" and alerts[0]["value"] == 101
+    assert client.get("/api/alerts").get_json()[0]["condition"] == "pct_down"
@@ -0,0 +1,79 @@
+import datetime
+
+from src.scripts.auto_update_scheduler import AUTO_UPDATE_INTERVALS, build_plan, next_run_after
+from src.utils import time_utils
+from src.utils.time_utils import CHILE_TZ, market_phase
+
+OPEN_CADENCE = AUTO_UPDATE_INTERVALS["3-5"]
+
+
+def _at(year, month, day, hour, minute=0):
+    return CHILE_TZ.localize(datetime.datetime(year, month, day, hour, minute))
+
+
+def test_market_phase_follows_santiago_calendar():
+    assert market_phase(_at(2026, 10, 19, 8, 59)) == "closed"
+    assert market_phase(_at(2026, 10, 19, 9, 10)) == "pre_open"
+    assert market_phase(_at(2026, 10, 19, 12, 0)) == "open"
+    assert market_phase(_at(2026, 10, 19, 15, 55)) == "close_auction"
+    assert market_phase(_at(2026, 10, 19, 16, 30)) == "after_hours"
+    assert market_phase(_at(2026, 10, 17, 12, 0)) == "closed"  # sábado
+    assert market_phase(_at(2026, 9, 18, 12, 0)) == "closed"   # Fiestas Patrias
+
+
+def test_fallback_market_time_uses_the_shared_calendar(monkeypatch):
+    monkeypatch.setattr(time_utils, "now_chile", lambda: _at(2026, 10, 19, 17, 5))
+    assert time_utils.get_fallback_market_time() == _at(2026, 10, 19, 16)
+    # Lunes 21/09 antes del cierre: el 18 y 19 son Fiestas Patrias y el 20 domingo.
+    monkeypatch.setattr(time_utils, "now_chile", lambda: _at(2026, 9, 21, 11, 0))
+    assert time_utils.get_fallback_market_time() == _at(2026, 9, 17, 16)
+
+
+def test_next_run_adapts_cadence_and_skips_non_trading_days():
+    midpoint = lambda lo, hi: (lo + hi) / 2
+
+    # Dentro de una fase sin ejecuciones previas: de inmediato.
+    now = _at(2026, 10, 19, 12, 0)
+    assert next_run_after(now, None, OPEN_CADENCE, midpoint) == (now, "open")
+    # Con una ejecución previa: último + cadencia de la fase.
+    run_at, phase = next_run_after(now, now, OPEN_CADENCE, midpoint)
+    assert phase == "open" and run_at - now == datetime.timedelta(seconds=240)
+    # Si la cadencia cae fuera de la fase, se pasa al inicio de la siguiente.
+    late = _at(2026, 10, 19, 15, 48)
+    assert next_run_after(late, late, OPEN_CADENCE, midpoint) == (_at(2026, 10, 19, 15, 50), "close_auction")
+    # Viernes tras el post-cierre -> lunes en pre-apertura; el 18/09 (festivo) se salta.
+    assert next_run_after(_at(2026, 10, 16, 17, 0), None, OPEN_CADENCE)[0] == _at(2026, 10, 19, 9, 0)
+    assert next_run_after(_at(2026, 9, 17, 18, 0), None, OPEN_CADENCE)[0] == _at(2026, 9, 21, 9, 0)
+
+    plan = build_plan(_at(2026, 10, 19, 8, 0), None, OPEN_CADENCE, size=4)
+    assert [p["phase"] for p in plan] == ["pre_open", "pre_open", "pre_open", "open"]
+    assert plan[0]["at"] == _at(2026, 10, 19, 9, 0).isoformat()
+
+
+def test_auto_update_endpoint_validates_interval(app):
+    client = app.test_client()
+    assert client.post("/api/auto-update", json={"interval": "2-4"}).status_code == 400
+    data = client.get("/api/auto-update").get_json()
+    assert data["interval"] == "off" and data["plan"] == []
+
+
+def test_trigger_reads_the_filter_off_the_event_loop(monkeypatch):
+    import asyncio
+    import threading
+
+    from src.scripts import auto_update_scheduler as module
+
+    threads = []
+
+    class FakeJob:
+        id = "job-1"
+
+    def fake_submit(app, is_auto_update=False):
+        threads.append(threading.current_thread())
+        return FakeJob(), True
+
+    monkeypatch.setattr(module, "submit_stocks_update", fake_submit)
+    scheduler = module.AutoUpdateScheduler()
+    asyncio.run(scheduler._trigger("open"))
+    assert threads and threads[0] is not threading.main_thread()
+    assert scheduler.last_job_id == "job-1"
@@ -0,0 +1,83 @@
+import os
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from src.utils import capture_archive, history_view
+from src.utils.db_io import get_latest_data
+from src.utils.price_ingest import normalize_price_payload
+
+
+def _capture(prices):
+    return {"listaResult": [{"NEMO": nemo, "PRECIO_CIERRE": str(price).replace(".", ","), "MONEDA": "CLP"}
+                            for nemo, price in prices.items()]}
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    directory = str(tmp_path / "captures")
+    monkeypatch.setattr(capture_archive, "CAPTURE_ARCHIVE_DIR", directory)
+    captures = [
+        (datetime(2024, 1, 1, 10, 0), {"AAA": 1.0, "BBB": 2.0}),
+        (datetime(2024, 1, 1, 10, 5), {"AAA": 1.0, "BBB": 2.5}),
+        (datetime(2024, 1, 2, 10, 0), {"AAA": 1.5, "CCC": 3.0}),
+    ]
+    for ts, prices in captures:
+        assert capture_archive.archive_capture(_capture(prices), ts, directory=directory)
+    return directory
+
+
+def test_archive_one_file_per_day_with_batch_per_snapshot(archive):
+    entries = capture_archive.read_manifest(archive)
+    assert [(e.file, e.batch, e.rows) for e in entries] == [
+        ("2024-01-01.arrows", 0, 2), ("2024-01-01.arrows", 1, 2), ("2024-01-02.arrows", 0, 2)]
+    # Cada snapshot se agrega al final del archivo del día, sin reescribir los anteriores.
+    assert entries[0].offset == 0 < entries[1].offset
+
+    (entry, batch), = capture_archive.read_snapshots(entries[1:2], columns=["symbol", "price"], directory=archive)
+    assert batch.schema.names == ["symbol", "price"]
+    assert capture_archive.price_map(batch)["BBB"]["price"] == 2.5
+
+    # El manifiesto reconstruido desde los .arrows coincide con el escrito al archivar,
+    # aunque el día tenga al final una escritura interrumpida.
+    with open(os.path.join(archive, "2024-01-01.arrows"), "ab") as f:
+        f.write(b"\xff\xff\xff\xff\x10\x00")
+    assert capture_archive.rebuild_manifest(archive) == 3
+    assert capture_archive.read_manifest(archive) == entries
+
+
+def test_legacy_day_files_are_still_read(tmp_path):
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    directory = str(tmp_path)
+    batch = capture_archive._to_batch(normalize_price_payload(_capture({"AAA": 1.0})), datetime(2023, 12, 29, 10, 0))
+    with pa.OSFile(os.path.join(directory, "2023-12-29.arrow"), "wb") as sink, \
+            ipc.new_file(sink, capture_archive.CAPTURE_SCHEMA) as writer:
+        writer.write_batch(batch)
+    assert capture_archive.archive_capture(_capture({"AAA": 2.0}), datetime(2024, 1, 1, 10, 0), directory=directory)
+
+    assert capture_archive.rebuild_manifest(directory) == 2
+    entries = capture_archive.read_manifest(directory)
+    assert [(e.file, e.offset) for e in entries] == [("2023-12-29.arrow", None), ("2024-01-01.arrows", 0)]
+    prices = [capture_archive.price_map(b)["AAA"]["price"]
+              for _, b in capture_archive.read_snapshots(entries, columns=["symbol", "price"], directory=directory)]
+    assert prices == [1.0, 2.0]
+
+
+def test_history_and_compare_fall_back_to_archive(archive, app):
+    history = history_view._history_from_archive(start=datetime(2024, 1, 1, 10, 1))
+    assert [h["file"] for h in history] == ["2024-01-02.arrows#0", "2024-01-01.arrows#1"]
+    assert history[1]["changes"] == 1 and history[1]["status"] == "OK"
+    assert (history[0]["new"], history[0]["removed"], history[0]["changes"]) == (1, 1, 1)
+
+    with app.app_context():
+        cmp = history_view.compare_latest()
+        latest = get_latest_data()
+    assert [i["symbol"] for i in cmp["new"]] == ["CCC"]
+    assert [i["symbol"] for i in cmp["removed"]] == ["BBB"]
+    assert [c["symbol"] for c in cmp["changes"]] == ["AAA"]
+    assert latest["source"] == "archive_fallback:2024-01-02.arrows#0"
+    assert {r["NEMO"]: r["PRECIO_CIERRE"] for r in latest["data"]} == {"AAA": 1.5, "CCC": 3.0}
@@ -0,0 +1,60 @@
+import os
+
+from src.utils import json_utils
+from src.utils.capture_index import CAPTURE_PREFIX, SUMMARY_PREFIX, CaptureFileIndex
+
+
+def _touch(directory, name, mtime):
+    path = directory / name
+    path.write_text("{}", encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def test_index_orders_by_filename_timestamp_and_tracks_changes(tmp_path, monkeypatch):
+    # mtimes invertidos: el orden debe salir del timestamp del nombre
+    older = _touch(tmp_path, "acciones-precios-plus_20240101_120000.json", 2_000_000_000)
+    newer = _touch(tmp_path, "acciones-precios-plus_20240102_120000.json", 1_000_000_000)
+    summary = _touch(tmp_path, "network_summary_20240101_130000.json", 1_000_000_000)
+    _touch(tmp_path, "screenshot_error.png", 1_000_000_000)
+
+    index = CaptureFileIndex(str(tmp_path))
+    assert index.rebuild() == 3
+    assert index.files(CAPTURE_PREFIX) == [older, newer]
+    assert index.latest_file(SUMMARY_PREFIX) == summary
+
+    rebuilds = []
+    original_rebuild = index.rebuild
+    monkeypatch.setattr(index, "rebuild", lambda: rebuilds.append(1) or original_rebuild())
+
+    # Escritura propia registrada con add: no obliga a recorrer el directorio.
+    before = index.directory_mtime()
+    latest = _touch(tmp_path, "acciones-precios-plus_20240103_120000.json", 1_000_000_000)
+    index.add(latest, before)
+    assert index.latest(CAPTURE_PREFIX, 2) == [newer, latest]
+    assert rebuilds == []
+
+    # Escritura externa: el mtime del directorio cambia y el índice se reconstruye.
+    os.remove(newer)
+    assert index.latest(CAPTURE_PREFIX, 2) == [older, latest]
+    assert rebuilds == [1]
+
+
+def test_add_does_not_hide_an_external_write_just_before_it(tmp_path):
+    index = CaptureFileIndex(str(tmp_path))
+    index.rebuild()
+    rebuilt_at = index.directory_mtime()
+
+    external = _touch(tmp_path, "acciones-precios-plus_20240101_120000.json", 1_000_000_000)
+    os.utime(tmp_path, ns=(rebuilt_at + 1_000_000, rebuilt_at + 1_000_000))  # sin depender de la resolución del mtime
+    before = index.directory_mtime()
+    own = _touch(tmp_path, "acciones-precios-plus_20240102_120000.json", 1_000_000_000)
+    index.add(own, before)
+
+    assert index.files(CAPTURE_PREFIX) == [external, own]
+
+
+def test_save_json_registers_file_in_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(json_utils, "LOGS_DIR", str(tmp_path))
+    path = json_utils.save_json_with_timestamp({"listaResult": []})
+    assert json_utils.get_latest_json_file() == path
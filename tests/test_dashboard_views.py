@@ -0,0 +1,52 @@
+from datetime import date
+
+from src.extensions import db
+from src.models import AdvancedKPI, Dividend, KpiSelection, StockClosing
+from src.utils.dashboard_views import DIVIDENDS_DASHBOARD, KPI_DASHBOARD, refresh_dashboards
+
+
+def _seed():
+    db.session.add_all([
+        StockClosing(date=date(2024, 1, 1), nemo="AAA", current_yield=1.0, belongs_to_ipsa=False),
+        StockClosing(date=date(2024, 1, 2), nemo="AAA", current_yield=2.5, belongs_to_ipsa=True),
+        StockClosing(date=date(2024, 1, 2), nemo="BBB", current_yield=3.0, belongs_to_ipsa=False),
+        KpiSelection(nemo="AAA"), KpiSelection(nemo="BBB"),
+        AdvancedKPI(nemo="AAA", roe=12.5, analyst_recommendation="Comprar", source="stub"),
+        Dividend(nemo="AAA", description="Final", limit_date=date(2024, 2, 1), payment_date=date(2024, 2, 5), value=10.0),
+        Dividend(nemo="CCC", description="Interino", limit_date=date(2024, 1, 20), payment_date=date(2024, 1, 25), value=5.0),
+    ])
+    db.session.commit()
+
+
+def test_kpi_dashboard_joins_latest_closing_and_serves_304(app):
+    with app.app_context():
+        _seed()
+    client = app.test_client()
+
+    response = client.get("/api/kpis")
+    rows = response.get_json()
+    assert [r["nemo"] for r in rows] == ["AAA", "BBB"]
+    assert rows[0]["fec_fij_cie"] == "2024-01-02" and rows[0]["dividend_yield"] == 2.5
+    assert (rows[0]["roe"], rows[0]["riesgo"], rows[0]["kpi_source"]) == (12.5, "Comprar", "stub")
+    assert rows[1]["roe"] is None and rows[1]["kpi_last_updated"] is None
+
+    etag = response.headers["ETag"]
+    assert client.get("/api/kpis", headers={"If-None-Match": etag}).status_code == 304
+
+    with app.app_context():
+        db.session.get(AdvancedKPI, "AAA").roe = 20.0
+        db.session.commit()
+        refresh_dashboards(KPI_DASHBOARD)
+    changed = client.get("/api/kpis", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.get_json()[0]["roe"] == 20.0
+
+
+def test_dividends_dashboard_marks_ipsa_from_latest_closing(app):
+    with app.app_context():
+        _seed()
+        refresh_dashboards(DIVIDENDS_DASHBOARD)
+
+    rows = app.test_client().get("/api/dividends").get_json()
+    assert [(r["nemo"], r["fec_pago"], r["is_ipsa"]) for r in rows] == [
+        ("CCC", "2024-01-25", False), ("AAA", "2024-02-05", True),
+    ]
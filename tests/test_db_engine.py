@@ -0,0 +1,43 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from src.utils import db_engine
+from src.utils.db_engine import MeteredQueuePool, engine_options, pool_status
+
+
+def test_engine_options_only_apply_to_server_databases():
+    assert engine_options("sqlite:///:memory:") == {}
+    options = engine_options("postgresql://u:p@localhost/bolsa")
+    assert options["poolclass"] is MeteredQueuePool
+    assert {"pool_size", "max_overflow", "pool_timeout", "pool_recycle", "pool_pre_ping"} <= set(options)
+
+
+def test_metered_pool_records_waits_and_timeouts(tmp_path, monkeypatch):
+    metrics = db_engine.PoolMetrics()
+    monkeypatch.setattr(db_engine, "pool_metrics", metrics)
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=MeteredQueuePool,
+                           pool_size=1, max_overflow=0, pool_timeout=0.1)
+
+    held = engine.connect()
+    status = pool_status(engine)
+    assert (status["checked_out"], status["overflow"], status["checkouts"]) == (1, 0, 1)
+
+    released = threading.Timer(0.05, held.close)
+    released.start()
+    with engine.connect() as conn:  # espera a que el temporizador devuelva la conexión
+        conn.execute(text("SELECT 1"))
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+    released.join()
+
+    status = pool_status(engine)
+    assert status["checkouts"] == 3 and status["timeouts"] == 1
+    assert status["wait_max_ms"] >= 40 and status["checked_out"] == 0
+
+
+def test_pool_endpoint(app):
+    body = app.test_client().get("/api/system/db-pool").get_json()
+    assert body["pool_class"] and body["gevent_wait"] is False
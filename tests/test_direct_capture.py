@@ -0,0 +1,164 @@
+import asyncio
+
+import src.main  # noqa: F401  (resuelve el orden de imports de rutas/servicios)
+from src.scripts import bolsa_service, bot_data_capture as capture
+from src.utils.capture_stats import capture_stats
+
+
+class FakeRequest:
+    def __init__(self, url):
+        self.url = url
+        self.method = "POST"
+        self.post_data = '{"filtro": 1}'
+        self.headers = {}
+
+    async def all_headers(self):
+        return {":authority": "x", "cookie": "s=1", "x-xsrf-token": "old", "accept": "application/json"}
+
+
+class FakeResponse:
+    def __init__(self, url, payload, status=200):
+        self.url = url
+        self.request = FakeRequest(url)
+        self.status = status
+        self._payload = payload
+
+    async def json(self):
+        if isinstance(self._payload, Exception):
+            raise self._payload
+        return self._payload
+
+
+class FakeAPI:
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = []
+
+    async def fetch(self, url, **kwargs):
+        self.calls.append((url, kwargs))
+        return self.responses[url]
+
+
+class FakeContext:
+    async def cookies(self, _url):
+        return [{"name": "XSRF-TOKEN", "value": "fresh"}]
+
+
+class FakePage:
+    def __init__(self, responses):
+        self.request = FakeAPI(responses)
+        self.context = FakeContext()
+
+
+PRICES_URL = "https://example/api/Cuenta_Premium/getPremiumAccionesPrecios"
+TIME_URL = "https://example/api/Comunes/getHoraMercado"
+
+
+def test_direct_capture_replays_learned_requests_and_falls_back():
+    capture.forget_learned_requests()
+    capture_stats.reset()
+    assert not capture.can_fetch_direct()
+
+    async def scenario():
+        await capture._remember_request(capture.PRICES_REQUEST, FakeResponse(PRICES_URL, None))
+        await capture._remember_request(capture.MARKET_TIME_REQUEST, FakeResponse(TIME_URL, None))
+        assert capture.can_fetch_direct()
+
+        page = FakePage({
+            PRICES_URL: FakeResponse(PRICES_URL, {"listaResult": [{"NEMO": "AAA"}]}),
+            TIME_URL: FakeResponse(TIME_URL, {"HORA": "2025-08-01 10:15:00"}),
+        })
+        market_time, raw = await bolsa_service._attempt_direct_capture(page)
+        assert raw["listaResult"][0]["NEMO"] == "AAA"
+        assert market_time.minute == 15
+        url, kwargs = page.request.calls[0]
+        assert kwargs["method"] == "POST" and kwargs["data"] == '{"filtro": 1}'
+        assert kwargs["headers"] == {"x-xsrf-token": "fresh", "accept": "application/json"}
+
+        # Sesión expirada: HTML en vez de JSON -> (None, None) para recurrir a la recarga
+        expired = FakePage({
+            PRICES_URL: FakeResponse(PRICES_URL, ValueError("not json")),
+            TIME_URL: FakeResponse(TIME_URL, {"HORA": "2025-08-01 10:16:00"}),
+        })
+        assert await bolsa_service._attempt_direct_capture(expired) == (None, None)
+
+        # Precios sin hora del mercado: también se recurre a la recarga (no se fechan con el cierre anterior).
+        no_time = FakePage({
+            PRICES_URL: FakeResponse(PRICES_URL, {"listaResult": [{"NEMO": "AAA"}]}),
+            TIME_URL: FakeResponse(TIME_URL, {}),
+        })
+        assert await bolsa_service._attempt_direct_capture(no_time) == (None, None)
+
+    asyncio.run(scenario())
+    stats = capture_stats.summary()["direct"]
+    assert (stats["count"], stats["failures"]) == (3, 2)
+    assert "p50_ms" in stats
+
+
+def test_fallback_time_is_never_the_previous_close_during_trading(monkeypatch):
+    from datetime import datetime
+
+    from src.utils.time_utils import CHILE_TZ
+
+    monkeypatch.setattr(bolsa_service, "now_chile", lambda: CHILE_TZ.localize(datetime(2025, 8, 1, 11, 30, 5, 123)))
+    assert bolsa_service.fallback_capture_time() == datetime(2025, 8, 1, 11, 30, 5)
+
+    monkeypatch.setattr(bolsa_service, "now_chile", lambda: CHILE_TZ.localize(datetime(2025, 8, 2, 11, 30)))  # sábado
+    monkeypatch.setattr(bolsa_service, "get_fallback_market_time",
+                        lambda: CHILE_TZ.localize(datetime(2025, 8, 1, 16, 0)))
+    assert bolsa_service.fallback_capture_time() == datetime(2025, 8, 1, 16, 0)
+
+
+def test_capture_is_archived_when_the_db_write_fails_but_not_when_unchanged(app, monkeypatch):
+    from datetime import datetime
+
+    from src.utils import db_io
+
+    archived, histories = [], []
+
+    async def fake_checkout(*a, **kw):
+        return object()
+
+    async def fake_checkin(*a, **kw):
+        return None
+
+    async def fake_reload(page, username, password):
+        return page, datetime(2025, 8, 1, 10, 15), {"listaResult": [{"NEMO": "AAA"}]}
+
+    monkeypatch.setattr(bolsa_service, "checkout_page", fake_checkout)
+    monkeypatch.setattr(bolsa_service, "checkin_page", fake_checkin)
+    monkeypatch.setattr(bolsa_service, "_capture_with_reload", fake_reload)
+    monkeypatch.setattr(bolsa_service, "_is_first_run_since_startup", True)
+    monkeypatch.setattr(bolsa_service, "validate_premium_data", lambda data: True)
+    monkeypatch.setattr(bolsa_service, "archive_capture", lambda raw, ts: archived.append(ts))
+    monkeypatch.setattr(bolsa_service, "save_filtered_comparison_history", lambda **kw: histories.append(1))
+
+    for result in (db_io.FAILED, db_io.UNCHANGED, db_io.STORED):
+        monkeypatch.setattr(bolsa_service, "store_prices_in_db", lambda *a, result=result, **kw: result)
+        assert asyncio.run(bolsa_service.run_bolsa_bot(app=app)) == "update_complete"
+
+    assert len(archived) == 2 and histories == [1]
+
+
+def test_learned_requests_are_forgotten_after_a_login_error(app, monkeypatch):
+    capture.forget_learned_requests()
+    capture._LEARNED_REQUESTS[capture.PRICES_REQUEST] = capture.LearnedRequest(
+        url=PRICES_URL, method="POST", headers={"x-xsrf-token": "old"}, post_data=None)
+
+    async def fake_checkout(*a, **kw):
+        return object()
+
+    async def fake_checkin(*a, **kw):
+        return None
+
+    async def expired_session(page, username, password):
+        raise bolsa_service.LoginError("sesión vencida")
+
+    monkeypatch.setattr(bolsa_service, "checkout_page", fake_checkout)
+    monkeypatch.setattr(bolsa_service, "checkin_page", fake_checkin)
+    monkeypatch.setattr(bolsa_service, "can_fetch_direct", lambda: False)
+    monkeypatch.setattr(bolsa_service, "_capture_with_reload", expired_session)
+    monkeypatch.setattr(bolsa_service.socketio, "emit", lambda *a, **k: None)
+
+    assert asyncio.run(bolsa_service.run_bolsa_bot(app=app)).startswith("error:")
+    assert not capture.can_fetch_direct()
@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src.models import StockPrice
+from src.extensions import db
+from src.utils.downsampling import downsample, lttb, minmax
+
+
+def test_lttb_and_minmax_keep_endpoints_and_extremes():
+    rng = np.random.default_rng(1)
+    x = np.arange(10_000)
+    y = np.cumsum(rng.normal(size=10_000))
+
+    idx = lttb(x, y, 200)
+    assert len(idx) == 200 and idx[0] == 0 and idx[-1] == 9_999
+    assert np.all(np.diff(idx) > 0)
+
+    idx = minmax(x, y, 200)
+    assert len(idx) <= 200
+    assert y[idx].max() == y.max() and y[idx].min() == y.min()
+
+    y[[0, 5]] = np.nan
+    assert not np.isnan(y[downsample(x, y, 50)]).any()
+
+
+def test_stock_history_window_and_max_points(app):
+    base = datetime(2025, 7, 1, 10, 0)
+    with app.app_context():
+        db.session.bulk_insert_mappings(StockPrice, [
+            {"symbol": "AAA", "timestamp": base + timedelta(minutes=i), "price": float(i % 17)} for i in range(1000)
+        ])
+        db.session.commit()
+
+    client = app.test_client()
+    body = client.get("/api/stocks/history/AAA", query_string={"max_points": 100}).get_json()
+    assert body["total_points"] == 1000 and body["downsampled"]
+    assert len(body["data"]) == len(body["labels"]) == 100
+    assert body["labels"][0] == "01/07/2025 10:00:00"
+
+    window = {"from": (base + timedelta(minutes=10)).isoformat(), "to": (base + timedelta(minutes=19)).isoformat()}
+    body = client.get("/api/stocks/history/AAA", query_string=window).get_json()
+    assert body["total_points"] == 10 and not body["downsampled"]
+
+    assert client.get("/api/stocks/history/ZZZ").get_json()["data"] == []
+    assert client.get("/api/stocks/history/AAA", query_string={"method": "avg"}).status_code == 400
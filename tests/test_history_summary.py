@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from src.utils import db_io
+from src.utils.history_summary import backfill_snapshot_summaries, query_history
+
+
+def _payload(*rows):
+    return {"listaResult": [{"NEMO": n, "PRECIO_CIERRE": p, "VARIACION": v} for n, p, v in rows]}
+
+
+def test_incremental_summaries_match_backfill(app, monkeypatch):
+    monkeypatch.setattr(db_io, "INGEST_DEDUP", False)  # el snapshot repetido debe guardarse
+    snapshots = [
+        (datetime(2025, 4, 1, 10, 0), _payload(("AAA", 1, 0.1), ("BBB", 2, 0.0))),
+        (datetime(2025, 4, 1, 10, 5), _payload(("AAA", 1.5, 0.2), ("CCC", 3, None))),
+        (datetime(2025, 4, 1, 10, 10), _payload(("AAA", 1.5, 0.2), ("CCC", 3, None))),
+    ]
+    with app.app_context():
+        for ts, payload in snapshots:
+            db_io.store_prices_in_db(payload, ts)
+        incremental = query_history()
+
+        assert [h["timestamp"] for h in incremental] == ["01/04/2025 10:10:00", "01/04/2025 10:05:00"]
+        latest, first_change = incremental
+        assert (first_change["new"], first_change["removed"], first_change["changes"]) == (1, 1, 1)
+        assert latest["status"] == "Sin cambios"
+
+        assert backfill_snapshot_summaries() == 3
+        assert query_history() == incremental
+
+
+def test_history_endpoint_time_window(app):
+    with app.app_context():
+        for minute in range(4):
+            db_io.store_prices_in_db(_payload(("AAA", minute, 0.0)), datetime(2025, 4, 2, 10, minute))
+
+    client = app.test_client()
+    window = client.get("/api/history?from=2025-04-02T10:02:00&to=2025-04-02T10:03:00").get_json()
+    assert [h["timestamp"] for h in window] == ["02/04/2025 10:03:00", "02/04/2025 10:02:00"]
+    assert len(client.get("/api/history?limit=1").get_json()) == 1
+    assert client.get("/api/history?from=ayer").status_code == 400
@@ -29,3 +29,22 @@ def test_load_and_compare(tmp_path, monkeypatch):
     assert len(cmp['changes']) == 1
     assert cmp['changes'][0]['symbol'] == 'AAA'
 
+
+
+def test_json_fallback_honours_window_and_limit(tmp_path, monkeypatch):
+    from datetime import datetime
+
+    monkeypatch.setattr(history_view, "_history_from_db", lambda **kw: [])
+    monkeypatch.setattr(history_view, "_history_from_archive", lambda *a, **kw: [])
+    for day, prices in ((1, (1, 2)), (2, (1.5, 2)), (3, (1.5, 2)), (4, (2, 3))):
+        (tmp_path / f'acciones-precios-plus_2024010{day}_120000.json').write_text(json.dumps(
+            [{"NEMO": "AAA", "PRECIO_CIERRE": prices[0]}, {"NEMO": "BBB", "PRECIO_CIERRE": prices[1]}]
+        ), encoding='utf-8')
+
+    history = history_view.load_history(str(tmp_path), start=datetime(2024, 1, 2), end=datetime(2024, 1, 3, 23, 0))
+    # El 01/01 solo sirve de base: el 02/01 cuenta su cambio respecto de él.
+    assert [(h['timestamp'], h['changes'], h['status']) for h in history] == [
+        ("03/01/2024 12:00:00", 0, 'Sin cambios'), ("02/01/2024 12:00:00", 1, 'OK'),
+    ]
+    latest = history_view.load_history(str(tmp_path), limit=1)
+    assert [(h['file'], h['changes']) for h in latest] == [('acciones-precios-plus_20240104_120000.json', 2)]
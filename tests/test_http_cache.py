@@ -0,0 +1,53 @@
+import gzip
+from datetime import date
+
+from src.extensions import db
+from src.models import StockClosing
+from src.routes.api import data_routes
+from src.scripts import closing_service
+from src.utils import http_cache
+
+
+def test_conditional_request_skips_the_query(app, monkeypatch):
+    with app.app_context():
+        db.session.add(StockClosing(date=date(2024, 1, 2), nemo="AAA", current_yield=1.0))
+        db.session.commit()
+    client = app.test_client()
+
+    first = client.get("/api/closing")
+    assert first.status_code == 200 and first.headers["Last-Modified"]
+    etag = first.headers["ETag"]
+
+    monkeypatch.setattr(data_routes, "StockClosing", None)  # la vista ya no se puede ejecutar
+    assert client.get("/api/closing", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/closing").get_json() == first.get_json()  # servido desde la caché
+    monkeypatch.undo()
+
+    # Un upsert de cierres (mismo día) cambia la versión.
+    with app.app_context():
+        db.session.get(StockClosing, (date(2024, 1, 2), "AAA")).current_yield = 2.0
+        db.session.commit()
+        closing_service.refresh_dashboards()
+    changed = client.get("/api/closing", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.get_json()[0]["ren_actual"] == 2.0
+
+
+def test_large_payloads_are_compressed_once_per_version(app, monkeypatch):
+    monkeypatch.setattr(http_cache, "HTTP_COMPRESS_MIN_BYTES", 100)
+    calls = []
+    real_gzip = http_cache._COMPRESSORS["gzip"]
+    monkeypatch.setitem(http_cache._COMPRESSORS, "gzip", lambda body: calls.append(1) or real_gzip(body))
+    with app.app_context():
+        db.session.add_all([StockClosing(date=date(2024, 1, 2), nemo=f"N{i:03d}") for i in range(20)])
+        db.session.commit()
+    client = app.test_client()
+
+    for _ in range(3):
+        response = client.get("/api/closing", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip" and "Accept-Encoding" in response.headers["Vary"]
+        assert len(gzip.decompress(response.data)) > len(response.data)
+    assert len(calls) == 1
+
+    plain = client.get("/api/closing")
+    assert "Content-Encoding" not in plain.headers and len(plain.get_json()) == 20
+    assert client.get("/api/closing", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
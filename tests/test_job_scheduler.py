@@ -0,0 +1,92 @@
+import asyncio
+
+from src.scripts.job_scheduler import JobScheduler, CANCELLED, DONE, PRIORITY_HIGH, PRIORITY_LOW, QUEUED
+
+
+def test_scheduler_priority_limits_and_dedupe():
+    order, finished = [], []
+
+    async def scenario():
+        scheduler = JobScheduler(limits={"stocks": 1, "kpis": 2})
+        scheduler.attach(asyncio.get_running_loop())
+        gate = asyncio.Event()
+
+        def job(name, wait=False):
+            async def run():
+                order.append(name)
+                if wait:
+                    await gate.wait()
+                return {"name": name}
+            return run
+
+        blocker, _ = scheduler.submit("stocks", job("blocker", wait=True), key="a")
+        await asyncio.sleep(0)
+        low, _ = scheduler.submit("stocks", job("low"), key="low", priority=PRIORITY_LOW)
+        high, _ = scheduler.submit("stocks", job("high"), key="high", priority=PRIORITY_HIGH,
+                                   on_finish=finished.append)
+        # Mismo tipo y clave que un trabajo en curso: se encola uno de seguimiento (una sola vez).
+        again, created = scheduler.submit("stocks", job("follow-up"), key="a")
+        assert created and again is not blocker and again.status == QUEUED
+        merged, created = scheduler.submit("stocks", job("duplicate"), key="a")
+        assert not created and merged is again and again.coalesced == 1 and blocker.coalesced == 0
+
+        k1, _ = scheduler.submit("kpis", job("k1", wait=True), key="1")
+        k2, _ = scheduler.submit("kpis", job("k2", wait=True), key="2")
+        await asyncio.sleep(0.01)
+        assert scheduler.stats()["stocks"] == {"limit": 1, "running": 1, "queued": 3}
+        assert scheduler.stats()["kpis"]["running"] == 2
+        assert scheduler.is_busy("stocks")
+
+        gate.set()
+        await asyncio.sleep(0.05)
+        return scheduler, [blocker, low, high, again, k1, k2]
+
+    scheduler, jobs = asyncio.run(scenario())
+    assert order == ["blocker", "k1", "k2", "high", "follow-up", "low"]
+    assert all(j.status == DONE for j in jobs)
+    assert finished == [jobs[2]] and jobs[2].result == {"name": "high"}
+    assert not scheduler.is_busy("stocks")
+    assert scheduler.list_jobs()[0].id == jobs[-1].id
+
+
+def test_scheduler_cancels_queued_and_running_jobs():
+    async def scenario():
+        scheduler = JobScheduler(limits={"dividends": 1})
+        scheduler.attach(asyncio.get_running_loop())
+
+        async def forever():
+            await asyncio.sleep(3600)
+
+        running, _ = scheduler.submit("dividends", forever, key="1")
+        queued, _ = scheduler.submit("dividends", forever, key="2")
+        await asyncio.sleep(0)
+        assert queued.status == QUEUED
+
+        scheduler.cancel(queued.id)
+        scheduler.cancel(running.id)
+        await asyncio.sleep(0.01)
+        assert scheduler.cancel("missing") is None
+        return running, queued, scheduler
+
+    running, queued, scheduler = asyncio.run(scenario())
+    assert running.status == CANCELLED and queued.status == CANCELLED
+    assert queued.started_at is None
+    assert scheduler.stats()["dividends"] == {"limit": 1, "running": 0, "queued": 0}
+
+
+def test_jobs_endpoint_reports_unknown_job(app):
+    client = app.test_client()
+    assert client.get("/api/jobs").status_code == 200
+    assert client.get("/api/jobs/nope").status_code == 404
+    assert client.delete("/api/jobs/nope").status_code == 404
+
+
+def test_update_endpoints_answer_503_without_a_loop(app, monkeypatch):
+    from src.routes.api import bot_routes
+
+    monkeypatch.setattr(bot_routes, "job_scheduler", JobScheduler())
+    monkeypatch.setattr("src.scripts.bolsa_service.job_scheduler", bot_routes.job_scheduler)
+    client = app.test_client()
+    for url in ("/api/stocks/update", "/api/dividends/update", "/api/closing/update", "/api/kpis/update"):
+        response = client.post(url)
+        assert response.status_code == 503 and response.get_json()["success"] is False
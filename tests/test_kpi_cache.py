@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from src.extensions import db
+from src.models import AdvancedKPI, KpiCacheEntry, KpiSelection, PromptConfig
+from src.routes.api import bot_routes
+from src.scripts import kpi_pipeline
+from src.scripts.kpi_pipeline import run_kpi_update
+from src.utils import kpi_cache
+
+
+def _setup(app, monkeypatch, nemos):
+    monkeypatch.setattr(kpi_pipeline, "KPI_STUB_LATENCY", 0)
+    monkeypatch.setattr(kpi_pipeline.socketio, "emit", lambda *a, **kw: None)
+    stats = kpi_cache.KpiCacheStats()
+    monkeypatch.setattr(kpi_pipeline, "kpi_cache_stats", stats)
+    monkeypatch.setattr(bot_routes, "kpi_cache_stats", stats)
+    calls = []
+    stub = kpi_pipeline.PROVIDERS["stub"]
+
+    async def counting(nemo, config):
+        calls.append(nemo)
+        return await stub(nemo, config)
+
+    monkeypatch.setitem(kpi_pipeline.PROVIDERS, "stub", counting)
+    with app.app_context():
+        db.session.add(PromptConfig(id="local", api_provider="Stub", api_key="-", prompt_template="{nemo}"))
+        db.session.add_all([KpiSelection(nemo=n) for n in nemos])
+        db.session.commit()
+    return calls
+
+
+def test_second_run_is_served_from_cache_until_a_field_expires(app, monkeypatch):
+    nemos = ["AAA", "BBB", "CCC"]
+    calls = _setup(app, monkeypatch, nemos)
+
+    first = asyncio.run(run_kpi_update(app, nemos))
+    assert first["cache"] == {"hits": 0, "stale": 0, "misses": 3, "forced": False}
+    assert sorted(calls) == nemos
+
+    calls.clear()
+    second = asyncio.run(run_kpi_update(app, nemos))
+    assert second["cache"]["hits"] == 3 and calls == []
+
+    # La recomendación de BBB venció (TTL 24 h); los demás campos siguen vigentes.
+    with app.app_context():
+        entry = KpiCacheEntry.query.filter_by(nemo="BBB").one()
+        old = (datetime.now(timezone.utc) - timedelta(hours=25)).isoformat()
+        entry.fetched_at = {**entry.fetched_at, "analyst_recommendation": old}
+        db.session.commit()
+    third = asyncio.run(run_kpi_update(app, nemos))
+    assert (third["cache"]["hits"], third["cache"]["stale"]) == (2, 1) and calls == ["BBB"]
+
+    calls.clear()
+    forced = asyncio.run(run_kpi_update(app, nemos, force=True))
+    assert forced["cache"]["forced"] and sorted(calls) == nemos
+    with app.app_context():
+        assert AdvancedKPI.query.count() == 3 and KpiCacheEntry.query.count() == 3
+
+
+def test_cache_endpoint_reports_counts(app, monkeypatch):
+    nemos = ["AAA", "BBB"]
+    _setup(app, monkeypatch, nemos)
+    asyncio.run(run_kpi_update(app, ["AAA"]))
+
+    body = app.test_client().get("/api/kpis/cache").get_json()
+    assert body["provider"] == "stub" and body["runs"] == 1
+    assert body["last_run"]["misses"] == 1
+    assert body["current"] == {"hit": 1, "stale": 0, "miss": 1}
+    assert body["ttl_hours"]["analyst_recommendation"] == 24
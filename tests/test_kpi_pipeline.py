@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+import pytest
+
+from src.extensions import db
+from src.models import AdvancedKPI, PromptConfig
+from src.scripts import kpi_pipeline
+from src.scripts.kpi_pipeline import KpiProvider, TokenBucket, enrich_kpis, run_kpi_update
+
+
+def test_token_bucket_limits_rate_after_burst():
+    async def scenario():
+        bucket = TokenBucket(rate=50, capacity=5)
+        started = time.perf_counter()
+        for _ in range(15):
+            await bucket.acquire()
+        return time.perf_counter() - started
+
+    # 5 de ráfaga inmediatos + 10 a 50/s ≈ 0,2 s
+    assert 0.18 <= asyncio.run(scenario()) < 1.0
+
+
+def test_provider_rates_only_accept_registered_providers():
+    kpi_pipeline.validate_provider_rates(kpi_pipeline.KPI_PROVIDER_RATES)
+    for rates in ({"openai": "1:3"}, {"stub": "rápido"}, {"stub": "0"}, {"stub": "-1:2"}, {"stub": "2:0.5"}, {"stub": "nan"}):
+        with pytest.raises(ValueError, match="BOLSA_KPI_PROVIDER_RATES"):
+            kpi_pipeline.validate_provider_rates(rates)
+
+
+def test_stub_provider_end_to_end_throughput(app, monkeypatch):
+    monkeypatch.setattr(kpi_pipeline, "KPI_STUB_LATENCY", 0.05)
+    monkeypatch.setattr(kpi_pipeline, "KPI_CONCURRENCY", 10)
+    monkeypatch.setattr(kpi_pipeline, "KPI_UPSERT_BATCH", 8)
+    events = []
+    monkeypatch.setattr(kpi_pipeline.socketio, "emit", lambda event, data=None, **kw: events.append((event, data)))
+    nemos = [f"NEMO{i:02d}" for i in range(40)]
+
+    with app.app_context():
+        db.session.add(PromptConfig(id="local", api_provider="Stub", api_key="-", prompt_template="{nemo}"))
+        db.session.commit()
+
+    started = time.perf_counter()
+    result = asyncio.run(run_kpi_update(app, nemos))
+    elapsed = time.perf_counter() - started
+
+    # Secuencial serían 40 × 0,05 s = 2 s; con 10 en paralelo (y 200/s de límite) ~0,25 s.
+    assert result["provider"] == "stub" and result["succeeded"] == 40 and result["failed"] == []
+    assert elapsed < 1.0
+    progress = [data for event, data in events if event == "kpi_update_progress"]
+    assert len(progress) == 40 and progress[-1]["progress"] == "40/40"
+    with app.app_context():
+        assert AdvancedKPI.query.count() == 40
+        assert {k.source for k in AdvancedKPI.query.all()} == {"Stub local"}
+
+
+def test_failed_attempts_are_retried_and_upserted_in_batches(app, monkeypatch):
+    monkeypatch.setattr(kpi_pipeline, "retry_delay", lambda attempt: 0)
+    monkeypatch.setattr(kpi_pipeline.socketio, "emit", lambda *a, **kw: None)
+    calls = {}
+
+    async def flaky(nemo, config):
+        calls[nemo] = calls.get(nemo, 0) + 1
+        if nemo == "DOWN" or calls[nemo] == 1:
+            raise ConnectionError("timeout")
+        return {"roe": float(calls[nemo]), "source": "flaky"}
+
+    provider = KpiProvider("flaky", flaky, rate=1000, burst=100)
+    with app.app_context():
+        db.session.add(AdvancedKPI(nemo="AAA", roe=1.0, source="antiguo"))
+        db.session.commit()
+
+    stats = asyncio.run(enrich_kpis(app, ["AAA", "BBB", "DOWN"], provider, max_retries=2, batch_size=1))
+
+    assert (stats.succeeded, stats.failures, stats.batches) == (2, ["DOWN"], 2)
+    assert calls == {"AAA": 2, "BBB": 2, "DOWN": 3}
+    with app.app_context():
+        assert {k.nemo: (k.roe, k.source) for k in AdvancedKPI.query.all()} == {"AAA": (2.0, "flaky"), "BBB": (2.0, "flaky")}
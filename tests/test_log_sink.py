@@ -0,0 +1,71 @@
+import logging
+
+from src.models.log_entry import LogEntry
+from src.utils.log_sink import LogSink, LogSinkHandler
+
+
+def test_sink_dedupes_and_drops_low_severity_under_flood(app):
+    sink = LogSink(max_pending=3, batch_size=10, flush_interval=3600)
+    sink.start(app)
+    try:
+        for _ in range(50):
+            assert sink.submit("ERROR", "captcha no resuelto", "bot_automation")
+        assert sink.submit("INFO", "uno", "frontend") and sink.submit("INFO", "dos", "frontend")
+        assert not sink.submit("INFO", "tres", "frontend")  # buffer lleno: se descarta
+        assert sink.submit("CRITICAL", "login caído", "bot_automation")  # desplaza al INFO más antiguo
+        assert sink.stats()["pending"] == 3
+    finally:
+        sink.stop()
+
+    with app.app_context():
+        messages = [e.message for e in LogEntry.query.order_by(LogEntry.id)]
+    assert messages == [
+        "captcha no resuelto (repetido 50 veces)", "dos", "login caído",
+        "Se descartaron 2 entradas de log por saturación del buffer.",
+    ]
+    assert sink.stats()["batches"] == 1 and sink.stats()["deduplicated"] == 49
+
+
+def test_handler_persists_log_records_with_stack(app):
+    sink = LogSink(flush_interval=3600)
+    sink.init_app(app)
+    bot_logger = logging.getLogger("tests.bolsa_service")
+    handler = LogSinkHandler(sink, level=logging.WARNING)
+    bot_logger.addHandler(handler)
+    try:
+        bot_logger.info("no se persiste")
+        try:
+            raise RuntimeError("timeout")
+        except RuntimeError:
+            bot_logger.exception("Fallo en la captura")
+    finally:
+        bot_logger.removeHandler(handler)
+
+    with app.app_context():
+        entry = LogEntry.query.one()
+    assert (entry.level, entry.action, entry.message) == ("ERROR", "bolsa_service", "Fallo en la captura")
+    assert "RuntimeError: timeout" in entry.stack
+
+
+def test_bot_failure_is_persisted_once(app, monkeypatch):
+    import asyncio
+
+    from src.scripts import bolsa_service
+
+    async def failing_checkout(*a, **kw):
+        raise RuntimeError("pool agotado")
+
+    monkeypatch.setattr(bolsa_service, "checkout_page", failing_checkout)
+    sink = LogSink(flush_interval=3600)
+    sink.init_app(app)
+    handler = LogSinkHandler(sink, level=logging.WARNING)
+    bolsa_service.logger.addHandler(handler)
+    try:
+        assert asyncio.run(bolsa_service.run_bolsa_bot(app=app)) == "error: pool agotado"
+    finally:
+        bolsa_service.logger.removeHandler(handler)
+
+    with app.app_context():
+        entry = LogEntry.query.one()
+    assert entry.action == "bolsa_service" and "pool agotado" in entry.message
+    assert "RuntimeError: pool agotado" in entry.stack
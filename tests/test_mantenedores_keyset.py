@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from src.extensions import db
+from src.models import LogEntry, StockPrice
+
+
+def _seed_prices():
+    base = datetime(2025, 3, 1, 10, 0, 0)
+    db.session.add_all([
+        StockPrice(symbol=symbol, timestamp=base + timedelta(minutes=m), price=float(m))
+        for symbol in ("AAA", "BBB", "CCC") for m in range(7)
+    ])
+    db.session.commit()
+
+
+def test_keyset_pages_walk_composite_key_without_gaps(app):
+    client = app.test_client()
+    with app.app_context():
+        _seed_prices()
+
+    seen, cursor = [], None
+    while True:
+        url = "/api/mantenedores/stock_prices?per_page=4" + (f"&cursor={cursor}" if cursor else "")
+        body = client.get(url).get_json()
+        if cursor is None:
+            assert body["pagination"]["total_records"] == 21
+            assert body["pagination"]["total_is_estimate"] is False
+        seen.extend((r["symbol"], r["timestamp"]) for r in body["records"])
+        cursor = body["pagination"]["next_cursor"]
+        if not body["pagination"]["has_next"]:
+            break
+
+    assert len(seen) == 21 and seen == sorted(set(seen))
+    assert client.get("/api/mantenedores/stock_prices?cursor=not-a-cursor").status_code == 400
+    # La paginación por OFFSET sigue disponible con `page`.
+    legacy = client.get("/api/mantenedores/stock_prices?page=2&per_page=10").get_json()
+    assert legacy["pagination"]["current_page"] == 2 and len(legacy["records"]) == 10
+
+
+def test_search_escapes_wildcards_and_export_streams(app):
+    client = app.test_client()
+    with app.app_context():
+        db.session.add_all([
+            LogEntry(level="INFO", message="avance 100% completo"),
+            LogEntry(level="INFO", message="avance 1000 filas"),
+            LogEntry(level="ERROR", message="falló la captura"),
+        ])
+        db.session.commit()
+
+    found = client.get("/api/mantenedores/log_entries?q=100%25").get_json()
+    assert [r["message"] for r in found["records"]] == ["avance 100% completo"]
+
+    ndjson = client.get("/api/mantenedores/log_entries/export?format=ndjson&q=avance")
+    assert ndjson.mimetype == "application/x-ndjson"
+    assert [json.loads(line)["id"] for line in ndjson.get_data(as_text=True).splitlines()] == [1, 2]
+
+    exported = client.get("/api/mantenedores/log_entries/export?format=csv")
+    rows = list(csv.DictReader(io.StringIO(exported.get_data(as_text=True))))
+    assert exported.headers["Content-Disposition"] == 'attachment; filename="log_entries.csv"'
+    assert [r["level"] for r in rows] == ["INFO", "INFO", "ERROR"]
+    assert client.get("/api/mantenedores/log_entries/export?format=xml").status_code == 400
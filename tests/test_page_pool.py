@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from src.scripts import bot_page_manager as pm
+
+
+class FakePage:
+    def __init__(self, name):
+        self.name = name
+        self.url = "about:blank"
+        self.closed = False
+
+    def is_closed(self):
+        return self.closed
+
+    async def evaluate(self, _expr):
+        return "complete"
+
+    async def goto(self, url, **_kwargs):
+        await asyncio.sleep(0.01)
+        self.url = url
+
+    async def close(self):
+        self.closed = True
+
+
+def test_pool_checkout_is_per_target_and_recreates_dead_pages(monkeypatch):
+    created = []
+
+    async def fake_get_page(target=pm.PRICES_PAGE):
+        page = pm._PAGES.get(target)
+        if page is None or page.is_closed():
+            page = FakePage(target)
+            created.append(target)
+            pm._PAGES[target] = page
+        return page
+
+    monkeypatch.setattr(pm, "get_page", fake_get_page)
+    monkeypatch.setattr(pm, "_PAGES", {})
+    monkeypatch.setattr(pm, "_PAGE_LOCKS", {})
+
+    async def scenario():
+        order = []
+
+        async def job(target, tag):
+            async with pm.pooled_page(target) as page:
+                order.append(("start", tag))
+                assert pm.PAGE_TARGETS[target] in page.url
+                await asyncio.sleep(0.05)
+                order.append(("end", tag))
+
+        # Mismo destino: se serializa. Destinos distintos: corren en paralelo.
+        await asyncio.gather(job(pm.DIVIDENDS_PAGE, "d1"), job(pm.DIVIDENDS_PAGE, "d2"), job(pm.CLOSING_PAGE, "c1"))
+        d_events = [e for e in order if e[1].startswith("d")]
+        assert d_events == [("start", "d1"), ("end", "d1"), ("start", "d2"), ("end", "d2")]
+        assert order.index(("start", "c1")) < order.index(("end", "d1"))
+        assert not any(v["in_use"] for v in pm.pool_status().values())
+
+        pm._PAGES[pm.DIVIDENDS_PAGE].closed = True
+        async with pm.pooled_page(pm.DIVIDENDS_PAGE) as page:
+            assert not page.is_closed()
+
+    asyncio.run(scenario())
+    assert created == [pm.DIVIDENDS_PAGE, pm.CLOSING_PAGE, pm.DIVIDENDS_PAGE]
+
+
+def test_warm_up_task_is_kept_and_its_errors_are_logged(monkeypatch, caplog):
+    from src.scripts import bolsa_service
+
+    async def failing_warm_up():
+        raise RuntimeError("navegador cerrado")
+
+    async def run():
+        monkeypatch.setattr(bolsa_service, "warm_up_pages", failing_warm_up)
+        monkeypatch.setattr(bolsa_service, "perform_session_health_check", lambda page, *_: asyncio.sleep(0, page))
+        monkeypatch.setattr(bolsa_service.socketio, "emit", lambda *a, **k: None)
+        monkeypatch.setattr(bolsa_service, "_is_first_run_since_startup", True)
+        monkeypatch.setattr(bolsa_service, "_ensure_target_page", lambda *a, **k: asyncio.sleep(0, False))
+        with pytest.raises(bolsa_service.DataCaptureError):
+            await bolsa_service._capture_with_reload(FakePage("precios"), "u", "p")
+        task = bolsa_service._warm_up_task
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0)
+        return task
+
+    task = asyncio.run(run())
+    assert isinstance(task.exception(), RuntimeError)
+    assert "Falló el precalentamiento" in caplog.text and "navegador cerrado" in caplog.text
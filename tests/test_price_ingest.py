@@ -0,0 +1,88 @@
+from datetime import datetime
+
+from src.extensions import db
+from src.models import LastUpdate
+from src.models.stock_price import StockPrice
+from src.utils import db_io
+from src.utils.price_ingest import normalize_price_payload
+from src.utils.snapshot_cache import latest_snapshot_cache
+
+
+def test_normalize_price_payload_comma_decimals_and_filter():
+    data = {
+        "listaResult": [
+            {"NEMO": "AAA", "PRECIO_CIERRE": "1.234,5", "VARIACION": "-0,75", "MONTO": "1500", "MONEDA": "CLP"},
+            {"NEMO": "BBB", "PRECIO_CIERRE": 10, "VARIACION": "x", "UN_TRANSADAS": 7.9},
+            {"NEMO": "AAA", "PRECIO_CIERRE": "2,5"},
+            {"PRECIO_CIERRE": 3},
+            "bad",
+        ]
+    }
+
+    frame = normalize_price_payload(data)
+    assert list(frame["symbol"]) == ["BBB", "AAA"]
+    aaa = frame[frame["symbol"] == "AAA"].iloc[0]
+    assert aaa["price"] == 2.5
+
+    bbb = frame[frame["symbol"] == "BBB"].iloc[0]
+    assert bbb["price"] == 10.0
+    assert bbb["traded_units"] == 7
+
+    filtered = normalize_price_payload(data, filtered_symbols=["aaa"])
+    assert list(filtered["symbol"]) == ["AAA"]
+
+
+def test_store_prices_columnar_upserts(app):
+    data = {"listaResult": [{"NEMO": "COL", "PRECIO_CIERRE": "100,5", "VARIACION": "1,2", "MONTO": 20}]}
+    ts = datetime(2025, 2, 3, 11, 0, 0)
+
+    with app.app_context():
+        db_io.store_prices_in_db(data, ts)
+        data["listaResult"][0]["PRECIO_CIERRE"] = "101"
+        db_io.store_prices_in_db(data, ts)
+        prices = StockPrice.query.all()
+
+    assert len(prices) == 1
+    assert prices[0].price == 101.0
+    assert prices[0].variation == 1.2
+    assert prices[0].amount == 20
+
+
+def test_identical_capture_only_records_heartbeat(app, monkeypatch):
+    first = {"listaResult": [{"NEMO": "AAA", "PRECIO_CIERRE": "10,5", "MONTO": 5}, {"NEMO": "BBB", "PRECIO_CIERRE": 2}]}
+    reordered = {"listaResult": list(reversed(first["listaResult"]))}
+    ts = datetime(2025, 2, 4, 13, 0, 0)
+
+    events = []
+    monkeypatch.setattr(db_io.socketio, "emit", lambda event, data=None, **kw: events.append((event, data)))
+
+    with app.app_context():
+        assert db_io.store_prices_in_db(first, ts) == db_io.STORED
+        latest_snapshot_cache.invalidate()  # la huella del último snapshot también se obtiene desde la DB
+        events.clear()
+        assert db_io.store_prices_in_db(reordered, datetime(2025, 2, 4, 13, 1, 0)) == db_io.UNCHANGED
+        # El cliente sale de "actualizando" aunque no haya datos nuevos.
+        assert events == [("new_data", {'message': 'Sin cambios', 'unchanged': True})]
+        assert StockPrice.query.count() == 2
+        assert db.session.get(LastUpdate, LastUpdate.DATA_ID).timestamp == ts
+        assert db.session.get(LastUpdate, LastUpdate.HEARTBEAT_ID).timestamp == datetime(2025, 2, 4, 13, 1, 0)
+
+        # Mismo timestamp con un solo cambio: solo esa fila pasa por el upsert.
+        written = []
+        original = db_io.write_price_frame
+        monkeypatch.setattr(db_io, "write_price_frame",
+                            lambda frame, *a: written.append(list(frame["symbol"])) or original(frame, *a))
+        changed = {"listaResult": [{"NEMO": "AAA", "PRECIO_CIERRE": "10,5", "MONTO": 5}, {"NEMO": "BBB", "PRECIO_CIERRE": 3}]}
+        assert db_io.store_prices_in_db(changed, ts) == db_io.STORED
+        assert written == [["BBB"]]
+        assert {p.symbol: p.price for p in StockPrice.query.all()} == {"AAA": 10.5, "BBB": 3.0}
+
+
+def test_failed_write_is_reported_separately_from_unchanged(app, monkeypatch):
+    def broken_write(*args):
+        raise RuntimeError("DB caída")
+
+    monkeypatch.setattr(db_io, "write_price_frame", broken_write)
+    with app.app_context():
+        result = db_io.store_prices_in_db({"listaResult": [{"NEMO": "AAA", "PRECIO_CIERRE": 1}]}, datetime(2025, 2, 4, 13))
+        assert result == db_io.FAILED and StockPrice.query.count() == 0
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+from src.extensions import socketio
+from src.utils.db_io import store_prices_in_db
+from src.utils.price_push import PUSH_COLUMNS, PricePushHub, compute_delta, price_push_hub, room_for
+
+
+def _row(symbol, price, variation=0.0):
+    return {"NEMO": symbol, "PRECIO_CIERRE": price, "VARIACION": variation, "timestamp": "ignorado"}
+
+
+def test_compute_delta_and_rooms(monkeypatch):
+    changed, removed = compute_delta([_row("AAA", 1), _row("BBB", 2), _row("CCC", 3)],
+                                     [_row("AAA", 1), _row("BBB", 2.5), _row("DDD", 4)])
+    assert [r[0] for r in changed] == ["BBB", "DDD"] and removed == ["CCC"]
+    assert changed[0][PUSH_COLUMNS.index("PRECIO_CIERRE")] == 2.5
+    assert room_for([" bbb", "AAA", ""]) == "prices:AAA,BBB" and room_for([]) == "prices:*"
+
+    sent = []
+    monkeypatch.setattr(socketio, "emit", lambda event, data, to=None: sent.append((to, data)))
+    hub = PricePushHub()
+    hub.subscribe("s1", [])
+    hub.subscribe("s2", ["aaa"])
+    hub.subscribe("s3", ["AAA"])
+    hub.subscribe("s3", ["CCC"])  # cambia de filtro: deja la sala anterior
+    assert hub.rooms()["prices:AAA"]["members"] == 1
+
+    seq = hub.publish(datetime(2025, 1, 10, 12), [_row("AAA", 1), _row("CCC", 3)], [_row("AAA", 2)])
+    messages = dict(sent)
+    assert seq == 1 and set(messages) == {"prices:*", "prices:AAA", "prices:CCC"}
+    assert [r[0] for r in messages["prices:*"]["rows"]] == ["AAA"] and messages["prices:*"]["removed"] == ["CCC"]
+    assert messages["prices:CCC"] == {"seq": 1, "ts": "10/01/2025 12:00:00", "rows": [], "removed": ["CCC"]}
+
+    hub.unsubscribe("s1")
+    assert "prices:*" not in hub.rooms()
+
+
+def test_clients_receive_snapshot_then_only_changed_rows(app):
+    ts = datetime(2025, 1, 10, 12, 0)
+    with app.app_context():
+        store_prices_in_db({"listaResult": [{"NEMO": "AAA", "PRECIO_CIERRE": 1}, {"NEMO": "BBB", "PRECIO_CIERRE": 2}]}, ts)
+
+    client = socketio.test_client(app)
+    client.emit("subscribe_prices", {"codes": ["bbb"]})
+    snapshot = [m for m in client.get_received() if m["name"] == "price_snapshot"][0]["args"][0]
+    assert [r[0] for r in snapshot["rows"]] == ["BBB"] and snapshot["seq"] == price_push_hub.seq
+
+    with app.app_context():
+        store_prices_in_db({"listaResult": [{"NEMO": "AAA", "PRECIO_CIERRE": 1.5}, {"NEMO": "BBB", "PRECIO_CIERRE": 2}]},
+                           ts + timedelta(minutes=1))
+        store_prices_in_db({"listaResult": [{"NEMO": "AAA", "PRECIO_CIERRE": 1.5}, {"NEMO": "BBB", "PRECIO_CIERRE": 3}]},
+                           ts + timedelta(minutes=2))
+    deltas = [m["args"][0] for m in client.get_received() if m["name"] == "price_delta"]
+    client.disconnect()
+
+    assert [d["seq"] for d in deltas] == [snapshot["seq"] + 1, snapshot["seq"] + 2]
+    assert deltas[0]["rows"] == [] and [r[0] for r in deltas[1]["rows"]] == ["BBB"]
+    assert not price_push_hub.rooms()
@@ -0,0 +1,115 @@
+from datetime import date, datetime, timedelta
+
+from src.extensions import db
+from src.models import LogEntry, StockPrice, StockPriceDaily
+from src.utils import retention
+from src.utils.retention import RetentionPolicy, apply_policy
+
+
+def _seed_prices(days=4):
+    start = datetime(2025, 3, 3, 9, 30)
+    rows = []
+    for d in range(days):
+        for m in range(0, 60, 10):
+            ts = start + timedelta(days=d, minutes=m)
+            for symbol, base in (("AAA", 100.0), ("BBB", 50.0)):
+                rows.append(StockPrice(symbol=symbol, timestamp=ts, price=base + d + m / 10,
+                                       traded_units=1000 * (m + 1), amount=10_000 * (m + 1)))
+    db.session.add_all(rows)
+    db.session.commit()
+
+
+def test_prices_roll_up_into_daily_rows_and_raw_rows_are_deleted_in_batches(app):
+    policy = RetentionPolicy(StockPrice, keep_days=2, rollup=True, archive=False)
+    with app.app_context():
+        _seed_prices()
+        summary = apply_policy(policy, today=date(2025, 3, 7), batch_size=5)
+
+        assert summary["days"] == 2 and summary["rolled_up"] == 4 and summary["deleted"] == 24
+        assert db.session.query(db.func.min(StockPrice.timestamp)).scalar() == datetime(2025, 3, 5, 9, 30)
+        aaa = db.session.get(StockPriceDaily, ("AAA", date(2025, 3, 4)))
+        assert (aaa.open, aaa.high, aaa.low, aaa.close) == (101.0, 106.0, 101.0, 106.0)
+        assert (aaa.volume, aaa.amount, aaa.samples) == (51_000, 510_000, 6)
+
+    body = app.test_client().get("/api/stocks/history/AAA?interval=1d").get_json()
+    assert body["labels"][:2] == ["03/03/2025 00:00:00", "04/03/2025 00:00:00"]
+    assert body["close"][:2] == [105.0, 106.0] and len(body["labels"]) == 4
+
+
+def test_rows_are_kept_when_archive_cannot_be_written(app, monkeypatch):
+    monkeypatch.setattr(retention, "pq", None)
+    policy = RetentionPolicy(StockPrice, keep_days=2, rollup=True, archive=True)
+    with app.app_context():
+        _seed_prices()
+        summary = apply_policy(policy, today=date(2025, 3, 7))
+        assert summary["kept_days"] == ["2025-03-03", "2025-03-04"] and summary["deleted"] == 0
+        assert StockPrice.query.count() == 48 and StockPriceDaily.query.count() == 4
+
+        # Las ejecuciones siguientes no vuelven a cargar ni a resumir los días ya resumidos.
+        loads = []
+        monkeypatch.setattr(retention, "_load_day", lambda model, day: loads.append(day))
+        summary = apply_policy(policy, today=date(2025, 3, 7))
+        assert summary["archive_unavailable"] and loads == []
+        assert summary["rolled_up"] == 0 and summary["deleted"] == 0 and StockPrice.query.count() == 48
+
+
+def test_old_log_entries_are_deleted(app):
+    with app.app_context():
+        db.session.add_all([LogEntry(level="INFO", message=f"m{d}", timestamp=datetime(2025, 1, 1) + timedelta(days=d))
+                            for d in range(10)])
+        db.session.commit()
+        summary = apply_policy(RetentionPolicy(LogEntry, keep_days=3), today=date(2025, 1, 10))
+        assert summary["deleted"] == 6
+        assert [e.message for e in LogEntry.query.order_by(LogEntry.timestamp)] == ["m6", "m7", "m8", "m9"]
+
+
+def test_archived_days_are_still_served_by_the_history_endpoint(app, monkeypatch, tmp_path):
+    import pytest
+    pytest.importorskip("pyarrow")
+    monkeypatch.setattr(retention, "ARCHIVE_DIR", str(tmp_path))
+    policy = RetentionPolicy(StockPrice, keep_days=2, rollup=True, archive=True)
+    with app.app_context():
+        _seed_prices()
+        summary = apply_policy(policy, today=date(2025, 3, 7))
+        assert summary["archived"] == 24 and summary["deleted"] == 24
+        assert retention.archived_days("stock_prices") == [date(2025, 3, 3), date(2025, 3, 4)]
+        # El filtro por símbolo se aplica al leer el Parquet.
+        assert len(retention.read_archive("stock_prices", symbols=["AAA"])) == 12
+
+    body = app.test_client().get("/api/stocks/history/AAA?interval=raw&max_points=5000").get_json()
+    assert body["total_points"] == 24
+    assert body["labels"][0] == "03/03/2025 09:30:00" and body["data"][:2] == [100.0, 101.0]
+
+
+def test_archived_days_are_bucketed_without_timescale(app, monkeypatch, tmp_path):
+    import pytest
+    pytest.importorskip("pyarrow")
+    monkeypatch.setattr(retention, "ARCHIVE_DIR", str(tmp_path))
+    with app.app_context():
+        _seed_prices()
+        apply_policy(RetentionPolicy(StockPrice, keep_days=2, rollup=True, archive=True), today=date(2025, 3, 7))
+
+    body = app.test_client().get("/api/stocks/history/AAA?interval=1h").get_json()
+    # Dos buckets por día (09:00 y 10:00): los dos días archivados y los dos que siguen en la DB.
+    assert len(body["labels"]) == 8
+    assert body["labels"][:2] == ["03/03/2025 09:00:00", "03/03/2025 10:00:00"]
+    assert body["open"][:2] == [100.0, 103.0] and body["close"][:2] == [102.0, 105.0]
+    assert body["labels"][4] == "05/03/2025 09:00:00"
+
+
+def test_archive_reads_accept_timezone_aware_bounds(app, monkeypatch, tmp_path):
+    import pytest
+    pytest.importorskip("pyarrow")
+    monkeypatch.setattr(retention, "ARCHIVE_DIR", str(tmp_path))
+    with app.app_context():
+        _seed_prices()
+        apply_policy(RetentionPolicy(StockPrice, keep_days=2, rollup=True, archive=True), today=date(2025, 3, 7))
+
+    client = app.test_client()
+    response = client.get("/api/stocks/history/AAA?interval=raw&from=2025-03-04T00:00:00Z&max_points=5000")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["total_points"] == 18 and body["labels"][0] == "04/03/2025 09:30:00"
+    # Sin filas en la DB el corte es el `to` con zona horaria.
+    response = client.get("/api/stocks/history/AAA?interval=raw&from=2025-03-03T00:00:00Z&to=2025-03-03T23:59:00Z")
+    assert response.status_code == 200 and response.get_json()["total_points"] == 6
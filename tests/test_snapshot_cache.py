@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from src.extensions import db
+from src.models.stock_price import StockPrice
+from src.utils import db_io
+
+
+def _payload(*rows):
+    return {"listaResult": [{"NEMO": n, "PRECIO_CIERRE": p, "VARIACION": 0.1} for n, p in rows]}
+
+
+def test_stocks_endpoint_served_from_snapshot_cache(app):
+    ts1 = datetime(2025, 3, 1, 10, 0, 0)
+    ts2 = datetime(2025, 3, 1, 10, 5, 0)
+    client = app.test_client()
+
+    with app.app_context():
+        db_io.store_prices_in_db(_payload(("AAA", 1), ("BBB", 2)), ts1)
+        assert client.get("/api/stocks").get_json()["timestamp"] == "01/03/2025 10:00:00"
+
+        db_io.store_prices_in_db(_payload(("AAA", 3), ("CCC", 4)), ts2)
+        # Sin tocar la DB: la caché fue publicada por la ingesta.
+        db.session.query(StockPrice).delete()
+        db.session.commit()
+
+    body = client.get("/api/stocks").get_json()
+    assert body["timestamp"] == "01/03/2025 10:05:00"
+    assert sorted(r["NEMO"] for r in body["data"]) == ["AAA", "CCC"]
+
+    filtered = client.get("/api/stocks?code=ccc&code=ZZZ").get_json()
+    assert [r["NEMO"] for r in filtered["data"]] == ["CCC"]
+    assert filtered["data"][0]["PRECIO_CIERRE"] == 4.0
+
+
+def test_crud_delete_invalidates_snapshot_cache(app):
+    with app.app_context():
+        db_io.store_prices_in_db(_payload(("AAA", 1)), datetime(2025, 3, 2, 10, 0, 0))
+        assert db_io.get_latest_data()["data"]
+
+    client = app.test_client()
+    assert client.delete("/api/mantenedores/stock_prices/all").status_code == 200
+
+    with app.app_context():
+        assert db_io.get_latest_snapshot() is None
@@ -0,0 +1,54 @@
+from datetime import datetime
+
+import pytest
+
+from src.utils import db_io
+from src.utils.snapshot_diff import diff_snapshots
+
+
+def _payload(*rows):
+    return {"listaResult": [{"NEMO": n, "PRECIO_CIERRE": p, "VARIACION": v} for n, p, v in rows]}
+
+
+T1, T2, T3 = datetime(2025, 5, 2, 10, 0), datetime(2025, 5, 2, 10, 1), datetime(2025, 5, 2, 10, 2)
+
+
+def _seed():
+    db_io.store_prices_in_db(_payload(("AAA", 10, 1.0), ("BBB", 5, None), ("OLD", 1, 0.0)), T1)
+    db_io.store_prices_in_db(_payload(("AAA", 12, 1.0), ("BBB", 5, None), ("NEW", 7, 0.5)), T2)
+    db_io.store_prices_in_db(_payload(("AAA", 12, 1.0), ("BBB", 5, 0.3)), T3)
+
+
+def test_diff_snapshots_statuses_and_diffs(app):
+    with app.app_context():
+        _seed()
+        rows = {r["symbol"]: r for r in diff_snapshots(T1, T2)}
+
+        assert {s: r["status"] for s, r in rows.items()} == {
+            "AAA": "changed", "BBB": "unchanged", "OLD": "removed", "NEW": "new",
+        }
+        assert rows["AAA"]["abs_diff"] == pytest.approx(2)
+        assert rows["AAA"]["pct_diff"] == pytest.approx(20)
+
+        # Cambio solo de variación (NULL -> valor) y pares de timestamps arbitrarios
+        assert {r["symbol"]: r["status"] for r in diff_snapshots(T2, T3)}["BBB"] == "changed"
+        assert {r["symbol"] for r in diff_snapshots(T1, T3, ["AAA"])} == {"AAA"}
+
+
+def test_compare_endpoints_share_engine(app):
+    with app.app_context():
+        _seed()
+        latest = db_io.compare_last_two_db_entries()
+        assert latest["previous_timestamp"] == "02/05/2025 10:01:00"
+        assert [c["symbol"] for c in latest["changes"]] == ["BBB"]
+
+    client = app.test_client()
+    resp = client.get("/api/history/compare", query_string={"from": T1.isoformat(), "to": T2.isoformat()})
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert body["changes"][0]["old"]["price"] == 10
+    assert body["changes"][0]["new"]["price"] == 12
+    assert [r["symbol"] for r in body["new"]] == ["NEW"]
+    assert [r["symbol"] for r in body["removed"]] == ["OLD"]
+
+    assert client.get("/api/history/compare", query_string={"from": T1.isoformat()}).status_code == 400
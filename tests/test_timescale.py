@@ -0,0 +1,46 @@
+from datetime import datetime
+
+import pytest
+
+from src.extensions import db
+from src.models import FilteredStockHistory
+from src.utils import db_io
+from src.utils.timescale import bootstrap_timescale, history_buckets, price_ohlc, timescale_enabled
+
+
+def _payload(price, units):
+    return {"listaResult": [{"NEMO": "AAA", "PRECIO_CIERRE": price, "UN_TRANSADAS": units}]}
+
+
+def test_price_ohlc_fallback_without_timescale(app):
+    with app.app_context():
+        assert bootstrap_timescale() is False
+        assert timescale_enabled() is False
+        for minute, price, units in [(0, 10, 100), (2, 12, 150), (4, 9, 180), (6, 11, 200)]:
+            db_io.store_prices_in_db(_payload(price, units), datetime(2025, 6, 2, 10, minute))
+
+        first, second = price_ohlc(["AAA"], "5m")
+        assert first["bucket"] == datetime(2025, 6, 2, 10, 0)
+        assert (first["open"], first["high"], first["low"], first["close"], first["volume"]) == (10, 12, 9, 9, 180)
+        assert (second["open"], second["close"]) == (11, 11)
+        assert len(price_ohlc(["AAA"], "1d")) == 1
+
+    resp = app.test_client().get("/api/stocks/history/aaa", query_string={"interval": "5m"})
+    body = resp.get_json()
+    assert body["labels"] == ["02/06/2025 10:00:00", "02/06/2025 10:05:00"]
+    assert body["data"] == [9, 11]
+    assert app.test_client().get("/api/stocks/history/AAA", query_string={"interval": "2m"}).status_code == 400
+
+
+def test_history_buckets_net_change(app):
+    with app.app_context():
+        db.session.add_all([
+            FilteredStockHistory(timestamp=datetime(2025, 6, 2, 10, 1), symbol="AAA", price=11, previous_price=10, price_difference=1),
+            FilteredStockHistory(timestamp=datetime(2025, 6, 2, 10, 3), symbol="AAA", price=12.5, previous_price=11, price_difference=1.5),
+        ])
+        db.session.commit()
+
+        (bucket,) = history_buckets(["AAA"], "1h")
+        assert bucket["price"] == 12.5
+        assert bucket["price_difference"] == pytest.approx(2.5)
+        assert bucket["percent_change"] == pytest.approx(25)